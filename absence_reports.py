@@ -4,18 +4,18 @@ from datetime import datetime, timedelta
 import calendar
 import plotly.figure_factory as ff
 import plotly.express as px
-from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
 
 def ausencias_report_page():
     """Página de relatório de mapa de ausências"""
     st.title("Mapa de Ausências")
     
     # Inicializar o gerenciador de banco de dados
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Carregar dados do banco de dados em vez de Excel
-    absences_df = db_manager.query_to_df("SELECT * FROM absences")
-    users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
+    absences_df = load_table('absences', db_manager)
+    users_df = load_table('utilizadores', db_manager)
     
     # Verificar se há dados
     if absences_df.empty:
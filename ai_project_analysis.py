@@ -7,6 +7,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 from database_manager import DatabaseManager
 from typing import Dict, List, Any, Optional, Union, Tuple
+from date_utils import parse_dates
 
 class ProjectAIAnalyzer:
     def __init__(self):
@@ -24,12 +25,12 @@ class ProjectAIAnalyzer:
             # Preparar dados
             # No método __init__ da classe ProjectAIAnalyzer, modifique as linhas que fazem a conversão de data:
             if not self.timesheet_df.empty:
-                self.timesheet_df['start_date'] = pd.to_datetime(self.timesheet_df['start_date'], format='mixed')
-                self.timesheet_df['end_date'] = pd.to_datetime(self.timesheet_df['end_date'], format='mixed')
+                self.timesheet_df['start_date'] = parse_dates(self.timesheet_df['start_date'])
+                self.timesheet_df['end_date'] = parse_dates(self.timesheet_df['end_date'])
                 
             if not self.projects_df.empty:
-                self.projects_df['start_date'] = pd.to_datetime(self.projects_df['start_date'], format='mixed')
-                self.projects_df['end_date'] = pd.to_datetime(self.projects_df['end_date'], format='mixed')
+                self.projects_df['start_date'] = parse_dates(self.projects_df['start_date'])
+                self.projects_df['end_date'] = parse_dates(self.projects_df['end_date'])
                 
         except Exception as e:
             # Em caso de erro, inicializar com DataFrames vazios
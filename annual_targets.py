@@ -2,7 +2,8 @@ import sqlite3
 import pandas as pd
 import streamlit as st
 from database_manager import DatabaseManager
-import calendar
+from group_membership import membership_index
+from business_calendar import get_business_calendar
 from datetime import date, datetime
 
 def create_annual_targets_table():
@@ -40,33 +41,8 @@ def create_annual_targets_table():
     print("Tabelas 'annual_targets' e 'annual_targets_collaborators' criadas ou verificadas.")
 
 def calculate_working_days_in_year(year):
-    """Calcula o número de dias úteis em um ano, considerando feriados em Portugal"""
-    # Feriados nacionais fixos em Portugal
-    holidays = [
-        date(year, 1, 1),   # Ano Novo
-        date(year, 2, 20),  # Dia da Liberdade
-        date(year, 4, 25),  # Dia da Liberdade
-        date(year, 5, 1),   # Dia do Trabalhador
-        date(year, 6, 10),  # Dia de Portugal
-        date(year, 8, 15),  # Assunção de Nossa Senhora
-        date(year, 10, 5),  # Implantação da República
-        date(year, 11, 1),  # Dia de Todos os Santos
-        date(year, 12, 1),  # Restauração da Independência
-        date(year, 12, 8),  # Dia da Imaculada Conceição
-        date(year, 12, 25)  # Natal
-    ]
-    
-    # Calcular os dias úteis no ano
-    working_days = 0
-    for month in range(1, 13):
-        num_days = calendar.monthrange(year, month)[1]
-        for day in range(1, num_days + 1):
-            current_date = date(year, month, day)
-            # Verificar se não é fim de semana e não é feriado
-            if current_date.weekday() < 5 and current_date not in holidays:
-                working_days += 1
-    
-    return working_days
+    """Calcula o número de dias úteis em um ano, considerando feriados em Portugal (incluindo os móveis)"""
+    return get_business_calendar().business_days(date(year, 1, 1), date(year, 12, 31))
 
 class AnnualTargetManager:
     def __init__(self):
@@ -640,38 +616,12 @@ def annual_targets_page():
             )
             users_df = DatabaseManager().query_to_df("SELECT * FROM utilizadores WHERE active = 1")
             
-            # Preparar opções de colaboradores filtrados por grupo (empresa)
-            filtered_users = []
-            for _, user in users_df.iterrows():
-                try:
-                    # Obter os grupos do usuário
-                    if isinstance(user['groups'], str):
-                        user_groups = eval(user['groups'])
-                    else:
-                        user_groups = user['groups'] if user['groups'] is not None else []
-                    
-                    # Converter para lista caso seja outro tipo
-                    if not isinstance(user_groups, list):
-                        if isinstance(user_groups, dict):
-                            user_groups = list(user_groups.values())
-                        else:
-                            user_groups = [user_groups]
-                    
-                    # Verificar se o usuário pertence à empresa selecionada
-                    company_match = False
-                    for group in user_groups:
-                        if isinstance(group, str) and group.lower() == company_name.lower():
-                            company_match = True
-                            break
-                        elif isinstance(group, (int, float)) and str(group) == str(company_name):
-                            company_match = True
-                            break
-                    
-                    if company_match:
-                        filtered_users.append(user)
-                except Exception as e:
-                    st.warning(f"Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-                    continue
+            # Colaboradores da empresa selecionada (índice de pertença user_groups)
+            company_users = {
+                user_id for user_id, user_teams in membership_index.teams_by_user(DatabaseManager()).items()
+                if any(str(team).lower() == str(company_name).lower() for team in user_teams)
+            }
+            filtered_users = [user for _, user in users_df[users_df['user_id'].isin(list(company_users))].iterrows()]
             
             # Criar opções para multiselect
             user_options = []
@@ -801,38 +751,12 @@ def annual_targets_page():
                     )
                     users_df = DatabaseManager().query_to_df("SELECT * FROM utilizadores WHERE active = 1")
                     
-                    # Preparar opções de colaboradores filtrados por grupo (empresa)
-                    filtered_users = []
-                    for _, user in users_df.iterrows():
-                        try:
-                            # Obter os grupos do usuário
-                            if isinstance(user['groups'], str):
-                                user_groups = eval(user['groups'])
-                            else:
-                                user_groups = user['groups'] if user['groups'] is not None else []
-                            
-                            # Converter para lista caso seja outro tipo
-                            if not isinstance(user_groups, list):
-                                if isinstance(user_groups, dict):
-                                    user_groups = list(user_groups.values())
-                                else:
-                                    user_groups = [user_groups]
-                            
-                            # Verificar se o usuário pertence à empresa selecionada
-                            company_match = False
-                            for group in user_groups:
-                                if isinstance(group, str) and group.lower() == company_name.lower():
-                                    company_match = True
-                                    break
-                                elif isinstance(group, (int, float)) and str(group) == str(company_name):
-                                    company_match = True
-                                    break
-                            
-                            if company_match:
-                                filtered_users.append(user)
-                        except Exception as e:
-                            st.warning(f"Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-                            continue
+                    # Colaboradores da empresa selecionada (índice de pertença user_groups)
+                    company_users = {
+                        user_id for user_id, user_teams in membership_index.teams_by_user(DatabaseManager()).items()
+                        if any(str(team).lower() == str(company_name).lower() for team in user_teams)
+                    }
+                    filtered_users = [user for _, user in users_df[users_df['user_id'].isin(list(company_users))].iterrows()]
                     
                     # Criar opções para multiselect
                     user_options = []
@@ -4,6 +4,8 @@ import hashlib  # ← ADICIONAR ESTA LINHA
 from datetime import datetime
 from rate_manager import rate_page
 from database_manager import UserManager, GroupManager, ClientManager, ProjectManager, TaskCategoryManager, RateManager
+from timesheet_import import import_file
+from group_membership import parse_groups_value
 
 def unified_hash_password(password):
     """Hash unificado para todo o sistema"""
@@ -348,13 +350,60 @@ def render_project_form(is_edit=False, item=None, calculation_mode="Rate × Hora
         'clients_df': clients_df
     }
 
+def timesheet_import_page():
+    """Importação em massa de registos de horas (CSV/XLSX)"""
+    st.header("Importar Horas")
+    st.write(
+        "Colunas aceites: utilizador (email, nome ou user_id), projeto (nome ou project_id), "
+        "categoria, data início, data fim e/ou horas, faturável, horas extra, descrição."
+    )
+
+    uploaded_file = st.file_uploader("Ficheiro de horas", type=["csv", "xlsx"])
+    if uploaded_file is None:
+        return
+
+    dry_run = st.checkbox("Apenas validar (não gravar)", value=True)
+
+    if st.button("Importar"):
+        progress = st.empty()
+
+        def report_progress(rows, inserted, rejected):
+            progress.info(f"{rows} linhas processadas: {inserted} inseridas, {rejected} rejeitadas")
+
+        try:
+            result = import_file(
+                uploaded_file,
+                file_name=uploaded_file.name,
+                dry_run=dry_run,
+                progress_callback=report_progress
+            )
+        except Exception as e:
+            st.error(f"Erro ao importar ficheiro: {e}")
+            return
+
+        rejected_df = result['rejected']
+        if dry_run:
+            st.success(f"{result['rows'] - len(rejected_df)} de {result['rows']} linhas válidas")
+        else:
+            st.success(f"{result['inserted']} registos importados em {result['seconds']:.1f}s")
+
+        if not rejected_df.empty:
+            st.warning(f"{len(rejected_df)} linhas rejeitadas")
+            st.dataframe(rejected_df)
+            st.download_button(
+                "Descarregar linhas rejeitadas",
+                rejected_df.to_csv(index=False).encode('utf-8'),
+                file_name="linhas_rejeitadas.csv",
+                mime="text/csv"
+            )
+
 def main():
     st.title("Configurações do Sistema")
     
     # Menu para diferentes entidades
     menu = st.sidebar.selectbox(
         "Configurar",
-        ["Utilizadores", "Grupos", "Clientes", "Projetos", "Rates", "Categorias de Tarefas"]
+        ["Utilizadores", "Grupos", "Clientes", "Projetos", "Rates", "Categorias de Tarefas", "Importar Horas"]
     )
     
     # Inicialização dos gerenciadores
@@ -369,6 +418,9 @@ def main():
     elif menu == "Rates":
         rate_page()
         return
+    elif menu == "Importar Horas":
+        timesheet_import_page()
+        return
     elif menu == "Categorias de Tarefas":
         current_manager = TaskCategoryManager()
     
@@ -943,7 +995,7 @@ def main():
                             
                             # Processar os grupos atuais
                             try:
-                                current_groups = eval(item["groups"]) if isinstance(item["groups"], str) else []
+                                current_groups = parse_groups_value(item["groups"])
                             except:
                                 current_groups = []
                             
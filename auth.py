@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
 import hashlib
-from db_utils import read_table_from_db, save_table_to_db, execute_query
+from db_utils import execute_query, insert_rows, next_id, read_row_from_db
+from user_cache import user_profile_cache
 
 class Auth:
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.table_name = 'utilizadores'
+        # Cache de perfis em memória (invalidada pelo UserManager)
+        self.use_cache = use_cache
     
     def initialize_session(self):
         if 'logged_in' not in st.session_state:
@@ -13,28 +16,46 @@ class Auth:
         if 'user_info' not in st.session_state:
             st.session_state.user_info = None
     
+    def get_user_by_email(self, email, use_cache=None):
+        """Obtém a linha do utilizador pelo email (pesquisa indexada), usando a cache se ativa"""
+        use_cache = self.use_cache if use_cache is None else use_cache
+        
+        if use_cache:
+            user_data = user_profile_cache.get(email)
+            if user_data is not None:
+                return user_data
+        
+        user_data = read_row_from_db(f"SELECT * FROM {self.table_name} WHERE email = ? LIMIT 1", (email,))
+        if user_data is not None and use_cache:
+            user_profile_cache.put(user_data)
+        return user_data
+    
     def login(self, email, password):
         if not email or not password:
             return False, "Por favor, preencha todos os campos."
         
         try:
-            # Obter dados da tabela de usuários do banco
-            users_df = read_table_from_db(self.table_name)
+            # Obter apenas a linha do usuário
+            user_data = self.get_user_by_email(email)
             
             # Verificar se o email existe
-            if users_df.empty or email not in users_df['email'].values:
+            if user_data is None:
                 return False, "Email não encontrado."
             
-            # Obter dados do usuário
-            user_data = users_df[users_df['email'] == email].iloc[0]
-            
             # Verificar a senha
             password_hash = hashlib.sha256(str(password).encode()).hexdigest()
+            if password_hash != user_data['password'] and self.use_cache:
+                # A senha pode ter sido alterada noutro processo: confirmar na base de dados
+                user_profile_cache.invalidate(email=email)
+                user_data = self.get_user_by_email(email)
+                if user_data is None:
+                    return False, "Email não encontrado."
+            
             if password_hash != user_data['password']:
                 return False, "Senha incorreta."
             
             # Login bem-sucedido
-            return True, user_data.to_dict()
+            return True, user_data
         
         except Exception as e:
             print(f"Erro ao fazer login: {e}")
@@ -42,29 +63,18 @@ class Auth:
     
     def register_user(self, data):
         try:
-            # Obter dados atuais
-            users_df = read_table_from_db(self.table_name)
-            
-            # Verificar se o email já existe
-            if not users_df.empty and data['email'] in users_df['email'].values:
+            # Verificar se o email já existe (sem carregar a tabela inteira)
+            if execute_query(f"SELECT 1 FROM {self.table_name} WHERE email = ? LIMIT 1", (data['email'],)):
                 return False, "Este email já está registrado."
             
             # Hash da senha
             data['password'] = hashlib.sha256(str(data['password']).encode()).hexdigest()
             
             # Criar novo ID
-            if users_df.empty:
-                new_id = 1
-            else:
-                new_id = users_df['user_id'].max() + 1
-            data['user_id'] = new_id
-            
-            # Adicionar novo usuário
-            new_user_df = pd.DataFrame([data])
-            updated_df = pd.concat([users_df, new_user_df], ignore_index=True)
+            data['user_id'] = next_id(self.table_name, 'user_id')
             
-            # Salvar no banco
-            save_table_to_db(updated_df, self.table_name)
+            # Inserir apenas a nova linha (mantém esquema e índices da tabela)
+            insert_rows(self.table_name, data)
             
             return True, "Usuário registrado com sucesso!"
         
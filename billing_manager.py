@@ -1,9 +1,13 @@
 # billing_manager.py
 
+import sqlite3
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, _execute_in_transaction
+from page_data import get_db_manager, load_table
+from db_migrations import ensure_table_indexes
+from revenue_rollup import ROLLUP_TABLE_SQL, invoice_months, refresh_revenue_rollup
 
 class BillingManager:
     def __init__(self):
@@ -14,6 +18,9 @@ class BillingManager:
     
     def _create_tables(self):
         """Cria a tabela de faturas se não existir ou recria se estiver com estrutura incompatível"""
+        # Faturação agregada por equipa/mês (mantida pelos métodos de escrita abaixo)
+        self.db.execute_query(ROLLUP_TABLE_SQL)
+        
         # Primeiro verificamos se a tabela existe
         check_query = "SELECT name FROM sqlite_master WHERE type='table' AND name='invoices'"
         tables = self.db.query_to_df(check_query)
@@ -29,6 +36,8 @@ class BillingManager:
                 print("Tabela invoices existe mas tem estrutura incompatível. Recriando...")
                 drop_query = "DROP TABLE invoices"
                 self.db.execute_query(drop_query)
+                # Os totais agregados das faturas apagadas deixam de ser válidos
+                self.db.execute_query("DELETE FROM revenue_rollup")
                 # A tabela será criada abaixo
         
         # Criar a tabela
@@ -50,6 +59,9 @@ class BillingManager:
         );
         """
         self.db.execute_query(create_query)
+        
+        # Índices de client_id/project_id/datas (idempotente)
+        ensure_table_indexes(self.db, 'invoices')
 
     def create_invoice(self, data):
         """Cria um novo registro de fatura"""
@@ -64,7 +76,14 @@ class BillingManager:
         placeholders = ', '.join(['?'] * len(data))
         
         query = f"INSERT INTO invoices ({columns}) VALUES ({placeholders})"
-        cursor = self.db.execute_query(query, tuple(data.values()))
+        with self.db._get_connection() as conn:
+            try:
+                cursor = _execute_in_transaction(conn, query, tuple(data.values()))
+                refresh_revenue_rollup(conn, invoice_months(conn, "WHERE invoice_id = ?", (cursor.lastrowid,)))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
         
         return cursor.lastrowid
     
@@ -115,13 +134,31 @@ class BillingManager:
         params = list(data.values())
         params.append(invoice_id)
         
-        self.db.execute_query(query, params)
+        with self.db._get_connection() as conn:
+            try:
+                # Recalcular o mês antigo e o novo (a data de pagamento pode mudar)
+                months = invoice_months(conn, "WHERE invoice_id = ?", (invoice_id,))
+                _execute_in_transaction(conn, query, params)
+                months |= invoice_months(conn, "WHERE invoice_id = ?", (invoice_id,))
+                refresh_revenue_rollup(conn, months)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
         return True
     
     def delete_invoice(self, invoice_id):
         """Exclui um registro de fatura"""
         query = "DELETE FROM invoices WHERE invoice_id = ?"
-        self.db.execute_query(query, (invoice_id,))
+        with self.db._get_connection() as conn:
+            try:
+                months = invoice_months(conn, "WHERE invoice_id = ?", (invoice_id,))
+                _execute_in_transaction(conn, query, (invoice_id,))
+                refresh_revenue_rollup(conn, months)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
         return True
     
     def get_client_total(self, client_id):
@@ -181,10 +218,10 @@ def billing_page():
     
     # Inicializar gerenciadores
     billing_manager = BillingManager()
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Carregar dados necessários
-    clients_df = db_manager.query_to_df("SELECT * FROM clients WHERE active = 1")
+    clients_df = load_table('clients', db_manager, active_only=True)
     
     # Criar tabs para melhor organização
     tab1, tab2 = st.tabs(["Registar Faturas", "Consultar Faturas"])
@@ -0,0 +1,165 @@
+"""
+Distribuição mensal do orçamento dos projetos (horas e custo planeados).
+
+O orçamento de cada projeto (total_hours, total_cost) é repartido pelos meses
+na proporção dos dias úteis do projeto que caem em cada mês. A matriz
+projeto × mês sai de uma única passagem NumPy sobre as somas acumuladas de
+dias úteis do BusinessCalendar, em vez de dois ciclos dia a dia por projeto
+e por mês.
+
+Os indicadores mensais e os gráficos "planeado vs. realizado por mês" leem
+os valores planeados desta matriz.
+"""
+import numpy as np
+import pandas as pd
+
+from business_calendar import get_business_calendar
+from date_utils import parse_dates
+
+
+def _project_days(projects_df):
+    """Datas de início e fim dos projetos como datetime64[D] (NaT quando inválidas)"""
+    start = parse_dates(projects_df['start_date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+    end = parse_dates(projects_df['end_date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+    return start, end
+
+
+def _budget(projects_df, column):
+    """Coluna de orçamento como float64 (0 quando vazia ou inexistente)"""
+    if column not in projects_df.columns:
+        return np.zeros(len(projects_df))
+    return np.nan_to_num(pd.to_numeric(projects_df[column], errors='coerce').to_numpy(dtype='float64'), nan=0.0)
+
+
+def _business_days_matrix(calendar, start, end, period_start, period_end):
+    """Dias úteis de [start, end] ∩ [period_start, period_end] com broadcasting (datas sem NaT)"""
+    first = np.maximum(start, period_start)
+    last = np.minimum(end, period_end)
+    # Uma única chamada: as duas contagens vêm do mesmo estado do calendário
+    after_last, before_first = calendar.business_days_before(np.stack((last + np.timedelta64(1, 'D'), first)))
+    counts = after_last - before_first
+    return np.where(last >= first, counts, 0)
+
+
+def month_range(first_month, last_month=None):
+    """Meses de first_month a last_month (inclusive) como array datetime64[M]"""
+    first = np.datetime64(pd.Timestamp(first_month).strftime('%Y-%m'), 'M')
+    last = first if last_month is None else np.datetime64(pd.Timestamp(last_month).strftime('%Y-%m'), 'M')
+    return np.arange(first, last + 1)
+
+
+class BudgetProration:
+    def __init__(self, project_ids, months, share, budget_hours, budget_cost, business_days):
+        """Matriz projeto × mês da fração do orçamento planeada para cada mês
+
+        Args:
+            project_ids: ids dos projetos (linhas)
+            months: meses (colunas), datetime64[M]
+            share: fração do projeto em cada mês (dias úteis no mês / dias úteis do projeto)
+            budget_hours, budget_cost: orçamento total de cada projeto
+            business_days: dias úteis totais de cada projeto
+        """
+        self.project_ids = pd.Index(project_ids, name='project_id')
+        self.months = months
+        self.share = share
+        self.budget_hours = budget_hours
+        self.budget_cost = budget_cost
+        self.business_days = business_days
+
+    @property
+    def planned_hours(self):
+        """Horas planeadas por projeto e mês"""
+        return self.share * self.budget_hours[:, None]
+
+    @property
+    def planned_cost(self):
+        """Custo planeado por projeto e mês"""
+        return self.share * self.budget_cost[:, None]
+
+    @property
+    def month_labels(self):
+        """Meses no formato YYYY-MM"""
+        return [str(month) for month in self.months]
+
+    def _month_position(self, year, month):
+        """Coluna do mês na matriz (None se estiver fora do intervalo calculado)"""
+        position = int(np.datetime64(f'{year:04d}-{month:02d}', 'M') - self.months[0])
+        return position if 0 <= position < len(self.months) else None
+
+    def for_month(self, year, month):
+        """Fração, horas e custo planeados de cada projeto no mês (DataFrame indexado por project_id)"""
+        position = self._month_position(year, month)
+        share = self.share[:, position] if position is not None else np.zeros(len(self.project_ids))
+        return pd.DataFrame({
+            'share': share,
+            'planned_hours': share * self.budget_hours,
+            'planned_cost': share * self.budget_cost,
+            'business_days': self.business_days,
+        }, index=self.project_ids)
+
+    def for_project(self, project_id):
+        """Fração, horas e custo planeados do projeto em cada mês (DataFrame com a coluna 'month')"""
+        row = self.project_ids.get_loc(project_id)
+        return pd.DataFrame({
+            'month': self.months.astype('datetime64[ns]'),
+            'share': self.share[row],
+            'planned_hours': self.share[row] * self.budget_hours[row],
+            'planned_cost': self.share[row] * self.budget_cost[row],
+        })
+
+    def to_frame(self, values='planned_hours'):
+        """Matriz como DataFrame (projetos nas linhas, meses YYYY-MM nas colunas)"""
+        matrix = self.share if values == 'share' else getattr(self, values)
+        return pd.DataFrame(matrix, index=self.project_ids, columns=self.month_labels)
+
+
+def prorate_budget(projects_df, first_month, last_month=None, calendar=None):
+    """Reparte o orçamento de todos os projetos pelos meses de first_month a last_month
+
+    Projetos com datas inválidas ou sem dias úteis ficam com fração 0 em todos os meses.
+    """
+    calendar = calendar or get_business_calendar()
+    months = month_range(first_month, last_month)
+    start, end = _project_days(projects_df)
+    valid = ~(np.isnat(start) | np.isnat(end))
+    # Datas inválidas são substituídas por um intervalo vazio para o cálculo vetorizado
+    start = np.where(valid, start, months[0].astype('datetime64[D]'))
+    end = np.where(valid, end, start - np.timedelta64(1, 'D'))
+
+    month_start = months.astype('datetime64[D]')
+    month_end = (months + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    in_month = _business_days_matrix(calendar, start[:, None], end[:, None], month_start[None, :], month_end[None, :])
+    total = _business_days_matrix(calendar, start, end, start, end)
+
+    share = np.divide(in_month, total[:, None], out=np.zeros(in_month.shape), where=total[:, None] > 0)
+    return BudgetProration(
+        projects_df['project_id'].to_numpy(),
+        months,
+        share,
+        _budget(projects_df, 'total_hours'),
+        _budget(projects_df, 'total_cost'),
+        total,
+    )
+
+
+def period_share(projects_df, period_start, period_end, calendar=None):
+    """Fração dos dias úteis de cada projeto que cai em [period_start, period_end] (Series indexada por project_id)"""
+    calendar = calendar or get_business_calendar()
+    start, end = _project_days(projects_df)
+    first = np.datetime64(pd.Timestamp(period_start).date(), 'D')
+    last = np.datetime64(pd.Timestamp(period_end).date(), 'D')
+    in_period = calendar.business_days(np.maximum(start, first), np.minimum(end, last))
+    total = calendar.business_days(start, end)
+    share = np.divide(in_period, total, out=np.zeros(len(total)), where=total > 0)
+    return pd.Series(share, index=pd.Index(projects_df['project_id'].to_numpy(), name='project_id'))
+
+
+def elapsed_share(projects_df, as_of, calendar=None):
+    """Fração dos dias úteis de cada projeto já decorrida em as_of (Series indexada por project_id)"""
+    calendar = calendar or get_business_calendar()
+    start, end = _project_days(projects_df)
+    as_of_day = np.datetime64(pd.Timestamp(as_of).date(), 'D')
+    elapsed = calendar.business_days(start, np.minimum(end, as_of_day))
+    total = calendar.business_days(start, end)
+    share = np.divide(elapsed, total, out=np.zeros(len(total)), where=total > 0)
+    return pd.Series(share, index=pd.Index(projects_df['project_id'].to_numpy(), name='project_id'))
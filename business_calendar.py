@@ -0,0 +1,247 @@
+"""
+Calendário de dias úteis em Portugal.
+
+Os feriados nacionais (fixos e móveis, calculados a partir da Páscoa) são
+gerados por ano e juntos num np.busdaycalendar. Para todo o intervalo de anos
+coberto é guardado um array com a soma acumulada dos dias úteis, pelo que o
+número de dias úteis entre duas datas é uma diferença de dois valores do
+array, também para colunas inteiras de datas (ex.: início/fim dos projetos).
+
+Os registos de ausência do tipo 'feriado' (tabela absences) podem ser
+acrescentados como feriados adicionais com get_business_calendar(db_manager).
+"""
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+from date_utils import parse_dates
+
+
+# Intervalo de anos coberto à partida (alargado automaticamente quando necessário)
+FIRST_YEAR = 2000
+LAST_YEAR = 2040
+
+# Segunda a sexta
+WEEKMASK = '1111100'
+
+# O Carnaval não é feriado obrigatório; passa a contar com INCLUDE_CARNIVAL = True
+INCLUDE_CARNIVAL = False
+
+# Feriados suspensos entre 2013 e 2015 (Corpo de Deus, 5 de outubro, 1 de novembro, 1 de dezembro)
+_SUSPENDED_YEARS = range(2013, 2016)
+
+# Calendários partilhados em simultâneo (um por conjunto de feriados adicionais)
+MAX_CALENDARS = 16
+
+# Estado de um BusinessCalendar para um intervalo de anos; é substituído por
+# inteiro quando o intervalo é alargado, para que cada leitura use um estado coerente
+_CalendarState = namedtuple('_CalendarState', 'first_year last_year holidays busdaycalendar start cumulative')
+
+
+def easter_sunday(year):
+    """Domingo de Páscoa (algoritmo anónimo gregoriano)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def get_feriados_portugal(year):
+    """Lista ordenada dos feriados nacionais de Portugal no ano indicado"""
+    easter = easter_sunday(year)
+    holidays = {
+        date(year, 1, 1),              # Ano Novo
+        easter - timedelta(days=2),    # Sexta-feira Santa
+        easter,                        # Páscoa
+        date(year, 4, 25),             # Dia da Liberdade
+        date(year, 5, 1),              # Dia do Trabalhador
+        date(year, 6, 10),             # Dia de Portugal
+        date(year, 8, 15),             # Assunção de Nossa Senhora
+        date(year, 12, 8),             # Imaculada Conceição
+        date(year, 12, 25),            # Natal
+    }
+    if year not in _SUSPENDED_YEARS:
+        holidays |= {
+            easter + timedelta(days=60),  # Corpo de Deus
+            date(year, 10, 5),            # Implantação da República
+            date(year, 11, 1),            # Todos os Santos
+            date(year, 12, 1),            # Restauração da Independência
+        }
+    if INCLUDE_CARNIVAL:
+        holidays.add(easter - timedelta(days=47))
+    return sorted(holidays)
+
+
+def _to_days(values):
+    """Converte uma data ou coluna de datas para datetime64[D] (NaT quando inválida)"""
+    if isinstance(values, pd.Series):
+        return parse_dates(values, errors='coerce').to_numpy(dtype='datetime64[D]')
+    if isinstance(values, (list, tuple, np.ndarray, pd.Index)):
+        return pd.to_datetime(pd.Series(values), errors='coerce').to_numpy(dtype='datetime64[D]')
+    if values is None or (not isinstance(values, str) and pd.isna(values)):
+        return np.datetime64('NaT', 'D')
+    return np.datetime64(pd.Timestamp(values).date(), 'D')
+
+
+class BusinessCalendar:
+    def __init__(self, extra_holidays=(), first_year=FIRST_YEAR, last_year=LAST_YEAR):
+        """Pré-calcula os feriados e a soma acumulada dos dias úteis de first_year a last_year
+
+        Args:
+            extra_holidays: datas adicionais a tratar como feriado (ex.: ausências 'feriado')
+        """
+        self.extra_holidays = tuple(sorted(set(extra_holidays)))
+        self._lock = threading.Lock()
+        self._state = self._build(first_year, last_year)
+
+    def _build(self, first_year, last_year):
+        """Constrói o estado do calendário para o intervalo de anos indicado (sem o instalar)"""
+        holidays = [day for year in range(first_year, last_year + 1) for day in get_feriados_portugal(year)]
+        holidays = np.array(sorted(set(holidays) | set(self.extra_holidays)), dtype='datetime64[D]')
+
+        busdaycalendar = np.busdaycalendar(weekmask=WEEKMASK, holidays=holidays)
+        start = np.datetime64(f'{first_year}-01-01', 'D')
+        days = np.arange(start, np.datetime64(f'{last_year + 1}-01-01', 'D'))
+        # cumulative[i] = dias úteis antes do dia start + i
+        cumulative = np.concatenate(([0], np.cumsum(np.is_busday(days, busdaycal=busdaycalendar))))
+        return _CalendarState(first_year, last_year, holidays, busdaycalendar, start, cumulative)
+
+    def _ensure_range(self, days):
+        """Estado que cobre todas as datas, alargando o calendário se necessário
+
+        O novo estado é construído fora do objeto e instalado numa única
+        atribuição com o lock; quem chama usa apenas o estado devolvido.
+        """
+        state = self._state
+        valid = days[~np.isnat(days)]
+        if valid.size == 0:
+            return state
+        years = valid.astype('datetime64[Y]').astype(int) + 1970
+        first_year, last_year = int(years.min()), int(years.max())
+        if first_year < state.first_year or last_year > state.last_year:
+            with self._lock:
+                state = self._state
+                if first_year < state.first_year or last_year > state.last_year:
+                    state = self._build(min(first_year, state.first_year), max(last_year, state.last_year))
+                    self._state = state
+        return state
+
+    @property
+    def first_year(self):
+        """Primeiro ano coberto"""
+        return self._state.first_year
+
+    @property
+    def last_year(self):
+        """Último ano coberto"""
+        return self._state.last_year
+
+    @property
+    def holidays(self):
+        """Feriados do intervalo coberto (datetime64[D], ordenados)"""
+        return self._state.holidays
+
+    @property
+    def busdaycalendar(self):
+        """np.busdaycalendar com os feriados do intervalo coberto"""
+        return self._state.busdaycalendar
+
+    def business_days_before(self, days):
+        """Dias úteis desde o início do calendário até ao dia anterior a cada data
+
+        days é um array datetime64[D] de qualquer forma (sem NaT); a diferença
+        entre dois valores dá os dias úteis de um intervalo semiaberto.
+        """
+        days = np.asarray(days, dtype='datetime64[D]')
+        state = self._ensure_range(days.ravel())
+        return state.cumulative[(days - state.start).astype('int64')]
+
+    def business_days(self, start, end):
+        """Número de dias úteis entre start e end, ambos incluídos
+
+        Aceita datas isoladas (date, datetime, Timestamp, texto) ou colunas de
+        datas; nesse caso devolve um array. Datas inválidas ou end < start dão 0.
+        """
+        start_days = np.atleast_1d(_to_days(start))
+        end_days = np.atleast_1d(_to_days(end))
+        state = self._ensure_range(np.concatenate((start_days, end_days)))
+
+        invalid = np.isnat(start_days) | np.isnat(end_days)
+        start_index = np.where(invalid, 0, (start_days - state.start).astype('int64'))
+        end_index = np.where(invalid, 0, (end_days - state.start).astype('int64') + 1)
+        counts = state.cumulative[end_index] - state.cumulative[start_index]
+        counts = np.where(invalid | (end_index <= start_index), 0, counts)
+
+        if np.ndim(start) == 0 and np.ndim(end) == 0 and not isinstance(start, (list, tuple)):
+            return int(counts[0])
+        return counts
+
+    def is_business_day(self, dates):
+        """Indica se cada data é dia útil (datas inválidas dão False)"""
+        days = np.atleast_1d(_to_days(dates))
+        state = self._ensure_range(days)
+        result = np.zeros(days.shape, dtype=bool)
+        valid = ~np.isnat(days)
+        result[valid] = np.is_busday(days[valid], busdaycal=state.busdaycalendar)
+        if np.ndim(dates) == 0:
+            return bool(result[0])
+        return result
+
+    def holidays_between(self, start, end):
+        """Feriados (incluindo os que calham ao fim de semana) entre start e end, como lista de date"""
+        start_day, end_day = _to_days(start), _to_days(end)
+        holidays = self._ensure_range(np.array([start_day, end_day])).holidays
+        selected = holidays[(holidays >= start_day) & (holidays <= end_day)]
+        return [day.astype(object) for day in selected]
+
+
+def load_absence_holidays(db_manager):
+    """Datas das ausências do tipo 'feriado' (cada dia entre start_date e end_date)"""
+    absences = db_manager.query_to_df(
+        "SELECT start_date, end_date FROM absences WHERE lower(absence_type) LIKE '%feriado%'"
+    )
+    if absences.empty:
+        return []
+
+    starts = parse_dates(absences['start_date'], errors='coerce').dt.date
+    ends = parse_dates(absences['end_date'], errors='coerce').dt.date
+    days = set()
+    for start, end in zip(starts, ends):
+        if pd.isna(start):
+            continue
+        end = start if pd.isna(end) or end < start else end
+        days.update(start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    return sorted(days)
+
+
+@lru_cache(maxsize=MAX_CALENDARS)
+def _calendar_for(extra_holidays):
+    """Calendário partilhado para um conjunto de feriados adicionais (tuplo ordenado)"""
+    return BusinessCalendar(extra_holidays)
+
+
+def get_business_calendar(db_manager=None):
+    """Calendário partilhado; com db_manager inclui as ausências 'feriado' dessa base de dados"""
+    extra_holidays = ()
+    if db_manager is not None:
+        try:
+            extra_holidays = tuple(load_absence_holidays(db_manager))
+        except Exception as e:
+            print(f"Erro ao carregar feriados da tabela absences: {e}")
+
+    return _calendar_for(extra_holidays)
+
+
+def calcular_dias_uteis_projeto(data_inicio, data_fim):
+    """Dias úteis (seg-sex, sem feriados nacionais) entre duas datas, ambas incluídas"""
+    return get_business_calendar().business_days(data_inicio, data_fim)
@@ -0,0 +1,222 @@
+"""
+Eventos do calendário já convertidos, por colaborador e mês.
+
+Navegar entre meses (ou voltar a um mês já visto) reconstruía sempre as
+mesmas listas de eventos. A cache guarda os eventos já no formato do
+componente (dicionários prontos a serializar) em três tipos de entrada, por
+base de dados:
+
+  - ('work', user_id, ano, mês): registos de horas do colaborador na janela do mês
+  - ('absences', ano, mês): ausências (não feriados) de todos os colaboradores
+  - ('holidays', ano): feriados do ano, partilhados por todos os colaboradores
+
+e ainda ('users', ano, mês), os colaboradores com registos na janela do mês
+(usado na vista "todos os colaboradores" do administrador).
+
+As entradas são invalidadas apenas quando uma escrita toca esse colaborador e
+mês: o TimesheetManagerSQL e o AbsenceManager chamam invalidate_entries /
+invalidate_absences com as datas do registo antes e depois da escrita. Mudar
+nomes de colaboradores ou projetos (que aparecem nos títulos) descarta a cache
+da base de dados. As entradas expiram ao fim de ttl_seconds, para apanhar
+escritas feitas fora dos managers.
+
+Os eventos são calculados fora do lock. Cada invalidação incrementa a geração
+da base de dados e um cálculo só é guardado se a geração não mudou entretanto:
+um cálculo que leu os dados antes de uma escrita não volta a pôr em cache
+eventos desatualizados depois de a escrita os ter invalidado.
+
+Os eventos devolvidos são partilhados entre sessões e não devem ser alterados
+(desserializar JSON a cada visita custava tanto como voltar a converter).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import pandas as pd
+
+
+# O calendário mostra um mês de cada vez: a grelha mensal tem 6 semanas a
+# começar no domingo anterior ao dia 1 (primeiro dia da semana do FullCalendar)
+WINDOW_DAYS = 42
+
+
+def calendar_window(year, month):
+    """Janela visível do mês: (primeiro dia da grelha, dia seguinte ao último)"""
+    first_day = date(year, month, 1)
+    window_start = first_day - timedelta(days=(first_day.weekday() + 1) % 7)
+    return window_start, window_start + timedelta(days=WINDOW_DAYS)
+
+
+def _day(value):
+    """Data (date) de um valor de data/hora; None quando vazio ou inválido"""
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return None
+    return None if pd.isna(timestamp) else timestamp.date()
+
+
+def is_holiday(absence_type):
+    """Indica se o tipo de ausência é um feriado"""
+    return absence_type is not None and 'feriado' in str(absence_type).lower()
+
+
+def window_months(start, end=None):
+    """Meses (ano, mês) cuja janela do calendário se sobrepõe a [start, end]"""
+    first, last = _day(start), _day(end)
+    if first is None:
+        return []
+    if last is None or last < first:
+        last = first
+
+    # A janela de um mês começa no máximo 6 dias antes do dia 1 e acaba no
+    # máximo 14 dias depois do fim do mês: basta ver um mês para cada lado
+    months = []
+    for index in range(first.year * 12 + first.month - 2, last.year * 12 + last.month + 1):
+        year, month = index // 12, index % 12 + 1
+        window_start, window_end = calendar_window(year, month)
+        if first < window_end and last >= window_start:
+            months.append((year, month))
+    return months
+
+
+class CalendarEventCache:
+    def __init__(self, ttl_seconds=300, max_entries=20000):
+        """Inicializa a cache com o tempo de vida (em segundos) e o número máximo de entradas"""
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (ficheiro, tipo, ...) -> (guardado_em, valor)
+        self._generations = {}  # ficheiro -> número de invalidações
+        self._clears = 0  # número de clear() de todas as bases de dados
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(db_file, *parts):
+        """Chave de uma entrada: ficheiro da base de dados e partes da chave"""
+        return (os.path.abspath(db_file),) + parts
+
+    def _generation(self, db_file):
+        """Geração atual da base de dados (chamar com o lock; db_file já absoluto)"""
+        return self._clears, self._generations.get(db_file, 0)
+
+    def _invalidated(self, db_file):
+        """Marca uma invalidação da base de dados (chamar com o lock; db_file já absoluto)"""
+        self._generations[db_file] = self._generations.get(db_file, 0) + 1
+
+    def _get(self, key):
+        """Valor guardado ou None se não existir/expirou (chamar com o lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        """Guarda o valor, descartando os menos usados acima de max_entries (chamar com o lock)"""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_or_compute(self, key, compute):
+        """Valor da entrada, calculado com compute() se não estiver em cache"""
+        with self._lock:
+            value = self._get(key)
+            generation = self._generation(key[0])
+        if value is None:
+            value = compute()
+            with self._lock:
+                # Uma invalidação durante o cálculo torna o resultado suspeito
+                if self._generation(key[0]) == generation:
+                    self._put(key, value)
+        return value
+
+    def month_users(self, db_file, year, month, compute):
+        """Colaboradores com registos na janela do mês (compute() devolve a lista de user_id)"""
+        return self._get_or_compute(self._key(db_file, 'users', year, month), compute)
+
+    def work_events(self, db_file, year, month, user_ids, compute):
+        """Eventos de horas dos colaboradores no mês, por colaborador
+
+        compute(user_ids_em_falta) devolve {user_id: lista de eventos} apenas
+        para os colaboradores que não estão em cache; quem não tem registos
+        fica com uma lista vazia.
+        """
+        keys = {int(user_id): self._key(db_file, 'work', int(user_id), year, month) for user_id in user_ids}
+        events = {}
+        db_file = os.path.abspath(db_file)
+        with self._lock:
+            for user_id, key in keys.items():
+                value = self._get(key)
+                if value is not None:
+                    events[user_id] = value
+            generation = self._generation(db_file)
+
+        missing = [user_id for user_id in keys if user_id not in events]
+        if missing:
+            computed = compute(missing)
+            with self._lock:
+                store = self._generation(db_file) == generation
+                for user_id in missing:
+                    events[user_id] = computed.get(user_id, [])
+                    if store:
+                        self._put(keys[user_id], events[user_id])
+        return events
+
+    def absence_events(self, db_file, year, month, compute):
+        """Ausências (não feriados) na janela do mês, calculadas com compute() se necessário"""
+        return self._get_or_compute(self._key(db_file, 'absences', year, month), compute)
+
+    def holiday_events(self, db_file, year, compute):
+        """Feriados do ano, calculados com compute() se necessário"""
+        return self._get_or_compute(self._key(db_file, 'holidays', year), compute)
+
+    def invalidate_entries(self, db_file, user_id, start, end=None):
+        """Descarta os eventos de horas do colaborador nos meses que [start, end] toca"""
+        if user_id is None:
+            return
+        user_id = int(user_id)
+        with self._lock:
+            self._invalidated(os.path.abspath(db_file))
+            for year, month in window_months(start, end):
+                self._entries.pop(self._key(db_file, 'work', user_id, year, month), None)
+                # Um colaborador sem registos no mês passa a tê-lo
+                users_key = self._key(db_file, 'users', year, month)
+                users = self._get(users_key)
+                if users is not None and user_id not in users:
+                    self._put(users_key, users + [user_id])
+
+    def invalidate_absences(self, db_file, start, end=None, holiday=False):
+        """Descarta as ausências dos meses que [start, end] toca (e os feriados desses anos)"""
+        months = window_months(start, end)
+        with self._lock:
+            self._invalidated(os.path.abspath(db_file))
+            for year, month in months:
+                self._entries.pop(self._key(db_file, 'absences', year, month), None)
+            if holiday:
+                first, last = _day(start), _day(end) or _day(start)
+                if first is not None:
+                    for year in range(first.year, max(first.year, last.year) + 1):
+                        self._entries.pop(self._key(db_file, 'holidays', year), None)
+
+    def clear(self, db_file=None):
+        """Descarta as entradas da base de dados indicada (todas, se None)"""
+        with self._lock:
+            if db_file is None:
+                self._clears += 1
+                self._entries.clear()
+                return
+            db_file = os.path.abspath(db_file)
+            self._invalidated(db_file)
+            for key in [key for key in self._entries if key[0] == db_file]:
+                del self._entries[key]
+
+
+# Instância partilhada por todo o processo (página do calendário e managers)
+calendar_event_cache = CalendarEventCache()
@@ -1,146 +1,306 @@
 import streamlit as st
 from streamlit_calendar import calendar
 import pandas as pd
-from datetime import datetime
-from database_manager import DatabaseManager
+from datetime import date, datetime, timedelta
+from calendar import month_name
+from functools import partial
+from page_data import get_db_manager, load_table
+from date_utils import DATETIME_FORMAT, DATE_FORMAT, parse_dates
+from calendar_cache import calendar_event_cache, calendar_window
+
+# Duração máxima de um registo de horas; permite pesquisar por start_date
+# (indexado) também o limite inferior da janela
+MAX_ENTRY_DAYS = 1
+
+# Acima deste número de colaboradores a query lê a janela toda em vez de usar IN (...)
+MAX_IN_USERS = 500
+
+def _in_clause(column, values):
+    """Filtro SQL "column IN (?, ...)" e respetivos parâmetros"""
+    values = [int(value) for value in values]
+    return f" AND {column} IN ({', '.join(['?'] * len(values))})", values
+
+def _window_params(window_start, window_end):
+    """Parâmetros de "start_date >= ? AND start_date < ? AND end_date >= ?" para a janela"""
+    return [
+        (window_start - timedelta(days=MAX_ENTRY_DAYS)).strftime(DATETIME_FORMAT),
+        window_end.strftime(DATETIME_FORMAT),
+        window_start.strftime(DATETIME_FORMAT),
+    ]
+
+def load_calendar_entries(db_manager, window_start, window_end, user_ids=None, project_ids=None):
+    """Registos de horas que se sobrepõem à janela [window_start, window_end[ (filtrados em SQL)"""
+    query = """
+    SELECT id, user_id, project_id, start_date, end_date, hours, billable, overtime, description
+    FROM timesheet
+    WHERE start_date >= ? AND start_date < ? AND end_date >= ?
+    """
+    params = _window_params(window_start, window_end)
+    if user_ids is not None:
+        clause, values = _in_clause('user_id', user_ids)
+        query += clause
+        params += values
+    if project_ids is not None:
+        clause, values = _in_clause('project_id', project_ids)
+        query += clause
+        params += values
+    return db_manager.query_to_df(query, tuple(params))
+
+def load_window_users(db_manager, window_start, window_end):
+    """Colaboradores com registos de horas na janela"""
+    users = db_manager.query_to_df(
+        """
+        SELECT DISTINCT user_id
+        FROM timesheet
+        WHERE start_date >= ? AND start_date < ? AND end_date >= ?
+        """,
+        tuple(_window_params(window_start, window_end))
+    )
+    return [int(user_id) for user_id in users['user_id'].dropna()]
+
+def load_calendar_absences(db_manager, window_start, window_end):
+    """Ausências (incluindo feriados) que se sobrepõem à janela"""
+    return db_manager.query_to_df(
+        """
+        SELECT absence_id, user_id, start_date, end_date, absence_type, description
+        FROM absences
+        WHERE start_date < ? AND end_date >= ?
+        """,
+        (window_end.strftime(DATE_FORMAT), window_start.strftime(DATE_FORMAT))
+    )
+
+def _user_names(users_df, user_ids):
+    """Nome de cada colaborador de user_ids ("Usuário Desconhecido" quando não existe)"""
+    users = users_df.drop_duplicates('user_id')
+    names = pd.Series(
+        (users['First_Name'].astype(str) + ' ' + users['Last_Name'].astype(str)).to_numpy(),
+        index=users['user_id']
+    )
+    return user_ids.map(names).fillna("Usuário Desconhecido")
+
+def _text(values):
+    """Coluna de texto com '' nos valores vazios"""
+    return values.astype(object).where(values.notna(), '').astype(str)
+
+def _is_holiday(absences_df):
+    """Máscara das ausências que são feriados"""
+    return (absences_df['absence_type'].astype(str).str.lower().str.contains('feriado') & absences_df['absence_type'].notna()).to_numpy()
+
+def _work_events(timesheet_data, users_df, projects_df):
+    """Eventos dos registos de horas (um por linha de timesheet_data, pela mesma ordem)"""
+    if timesheet_data.empty:
+        return []
+    
+    project_names = projects_df.drop_duplicates('project_id').set_index('project_id')['project_name']
+    titles = (
+        _user_names(users_df, timesheet_data['user_id']) + " - " +
+        timesheet_data['project_id'].map(project_names).fillna("Projeto Desconhecido").astype(str)
+    )
+    starts = parse_dates(timesheet_data['start_date'], errors='coerce').dt.strftime(DATETIME_FORMAT)
+    ends = parse_dates(timesheet_data['end_date'], errors='coerce').dt.strftime(DATETIME_FORMAT)
+    billable = timesheet_data['billable'].fillna(False).astype(bool)
+    overtime = timesheet_data['overtime'].fillna(False).astype(bool)
+    hours = pd.to_numeric(timesheet_data['hours'], errors='coerce').fillna(0.0)
+    
+    return [
+        {
+            'id': str(entry_id),
+            'title': title,
+            'start': start,
+            'end': end,
+            'description': description,
+            'backgroundColor': '#1E88E5' if is_billable else '#FF4B4B',
+            'extendedProps': {
+                'hours': float(entry_hours),
+                'billable': 'Sim' if is_billable else 'Não',
+                'overtime': 'Sim' if is_overtime else 'Não',
+                'type': 'work'
+            }
+        }
+        for entry_id, title, start, end, description, is_billable, is_overtime, entry_hours in zip(
+            timesheet_data['id'].tolist(), titles.tolist(), starts.tolist(), ends.tolist(),
+            _text(timesheet_data['description']).tolist(), billable.tolist(), overtime.tolist(), hours.tolist()
+        )
+    ]
+
+def _holiday_events(holidays_df):
+    """Um evento de fundo por data de feriado (o primeiro registo de cada data)"""
+    holiday_dates = parse_dates(holidays_df['start_date'], errors='coerce').dt.strftime(DATE_FORMAT)
+    holiday_names = _text(holidays_df['description']).replace('', "Feriado")
+    unique_holidays = pd.Series(holiday_names.to_numpy(), index=holiday_dates.to_numpy())
+    unique_holidays = unique_holidays[~unique_holidays.index.duplicated()]
+    
+    return [
+        {
+            'id': f"holiday_{holiday_date}",
+            'title': name,  # Apenas o nome do feriado
+            'start': holiday_date,
+            'end': holiday_date,
+            'backgroundColor': '#4CAF50',  # Verde para feriados
+            'textColor': '#FFFFFF',
+            'allDay': True,
+            'display': 'background',  # Exibe como fundo para destacar o dia todo
+            'extendedProps': {
+                'type': 'holiday'
+            }
+        }
+        for holiday_date, name in unique_holidays.items()
+    ]
+
+def _absence_events(absences_df, users_df):
+    """Eventos das ausências que não são feriados (um por linha, pela mesma ordem)"""
+    titles = (
+        _user_names(users_df, absences_df['user_id']) + " - " +
+        _text(absences_df['absence_type']).replace('', "Ausência")
+    )
+    starts = parse_dates(absences_df['start_date'], errors='coerce').dt.strftime(DATE_FORMAT)
+    ends = parse_dates(absences_df['end_date'], errors='coerce').dt.strftime(DATE_FORMAT)
+    
+    return [
+        {
+            'id': f"absence_{absence_id}",
+            'title': title,
+            'start': start,
+            'end': end,
+            'description': description,
+            'backgroundColor': '#FFC107',  # Amarelo para ausências
+            'allDay': True,
+            'extendedProps': {
+                'type': 'absence'
+            }
+        }
+        for absence_id, title, start, end, description in zip(
+            absences_df['absence_id'].tolist(), titles.tolist(), starts.tolist(), ends.tolist(),
+            _text(absences_df['description']).tolist()
+        )
+    ]
 
 def prepare_calendar_events(timesheet_data, users_df, projects_df, absences_df, current_user_info):
     """
     Prepara eventos do calendário com restrições baseadas no papel do usuário
     Inclui horas faturáveis, não faturáveis e feriados
+    
+    timesheet_data e absences_df já vêm limitados à janela visível; nomes de
+    colaboradores e projetos são obtidos com um map por coluna, sem pesquisas
+    por registo.
     """
     events = []
+    is_admin = current_user_info['role'].lower() == 'admin'
     
     # Filtrar dados baseado no papel do usuário
-    if current_user_info['role'].lower() != 'admin':
+    if not is_admin:
         timesheet_data = timesheet_data[timesheet_data['user_id'] == current_user_info['user_id']]
         # Não filtramos feriados por usuário - eles serão exibidos para todos
     
     # Processar registros de horas
-    for _, row in timesheet_data.iterrows():
-        try:
-            # Buscar nome do usuário
-            user_query = users_df[users_df['user_id'] == row['user_id']]
-            if user_query.empty:
-                user_name = "Usuário Desconhecido"
-            else:
-                user_name = f"{user_query['First_Name'].iloc[0]} {user_query['Last_Name'].iloc[0]}"
-            
-            # Buscar nome do projeto
-            project_query = projects_df[projects_df['project_id'] == row['project_id']]
-            if project_query.empty:
-                project_name = "Projeto Desconhecido"
-            else:
-                project_name = project_query['project_name'].iloc[0]
-            
-            # Converter billable para booleano para garantir a compatibilidade
-            is_billable = False
-            if 'billable' in row:
-                if isinstance(row['billable'], bool):
-                    is_billable = row['billable']
-                elif isinstance(row['billable'], (int, float)):
-                    is_billable = bool(row['billable'])
-                elif isinstance(row['billable'], str):
-                    is_billable = row['billable'].lower() in ('true', 't', 'yes', 'y', '1')
-            
-            event = {
-                'id': str(row['id']),
-                'title': f"{user_name} - {project_name}",
-                'start': pd.to_datetime(row['start_date']).strftime('%Y-%m-%d %H:%M:%S'),
-                'end': pd.to_datetime(row['end_date']).strftime('%Y-%m-%d %H:%M:%S'),
-                'description': str(row.get('description', '')),
-                'backgroundColor': '#1E88E5' if is_billable else '#FF4B4B',
-                'extendedProps': {
-                    'hours': float(row.get('hours', 0)),
-                    'billable': 'Sim' if is_billable else 'Não',
-                    'overtime': 'Sim' if row.get('overtime', False) else 'Não',
-                    'type': 'work'
-                }
-            }
-            events.append(event)
-        except Exception as e:
-            st.error(f"Erro ao processar registro de horas: {str(e)}")
-            continue
+    events.extend(_work_events(timesheet_data, users_df, projects_df))
     
     # Separar e processar feriados
     try:
-        # Filtrar apenas feriados
-        holidays_df = absences_df[
-            absences_df['absence_type'].notna() & 
-            absences_df['absence_type'].astype(str).str.lower().str.contains('feriado')
-        ]
-        
-        # Agrupar feriados por data para evitar duplicatas
-        unique_holidays = {}
-        for _, row in holidays_df.iterrows():
-            start_date = pd.to_datetime(row['start_date']).strftime('%Y-%m-%d')
-            
-            # Obter descrição do feriado
-            holiday_name = str(row.get('description', '')) if row.get('description') is not None else ""
-            if not holiday_name:
-                holiday_name = "Feriado"
-            
-            # Usamos a data como chave para evitar duplicatas
-            if start_date not in unique_holidays:
-                unique_holidays[start_date] = holiday_name
+        is_holiday = _is_holiday(absences_df)
         
-        # Criar eventos para cada feriado único
-        for date, name in unique_holidays.items():
-            event = {
-                'id': f"holiday_{date}",
-                'title': name,  # Apenas o nome do feriado
-                'start': date,
-                'end': date,
-                'backgroundColor': '#4CAF50',  # Verde para feriados
-                'textColor': '#FFFFFF',
-                'allDay': True,
-                'display': 'background',  # Exibe como fundo para destacar o dia todo
-                'extendedProps': {
-                    'type': 'holiday'
-                }
-            }
-            events.append(event)
+        # Um feriado por data (o primeiro registo de cada data), para evitar duplicatas
+        events.extend(_holiday_events(absences_df[is_holiday]))
         
         # Processar outras ausências (não feriados)
-        non_holidays = absences_df[
-            ~(absences_df['absence_type'].notna() & 
-              absences_df['absence_type'].astype(str).str.lower().str.contains('feriado'))
-        ]
+        non_holidays = absences_df[~is_holiday]
         
         # Filtrar ausências não-feriados por usuário
-        if current_user_info['role'].lower() != 'admin':
+        if not is_admin:
             non_holidays = non_holidays[non_holidays['user_id'] == current_user_info['user_id']]
         
-        # Processar ausências regulares (não feriados)
-        for _, row in non_holidays.iterrows():
-            try:
-                # Buscar nome do usuário
-                user_query = users_df[users_df['user_id'] == row['user_id']]
-                if user_query.empty:
-                    user_name = "Usuário Desconhecido"
-                else:
-                    user_name = f"{user_query['First_Name'].iloc[0]} {user_query['Last_Name'].iloc[0]}"
-                
-                # Obter tipo de ausência com valor padrão para o título
-                abs_type = str(row.get('absence_type', '')) if row.get('absence_type') is not None else "Ausência"
-                
-                event = {
-                    'id': f"absence_{row['absence_id']}",
-                    'title': f"{user_name} - {abs_type}",
-                    'start': pd.to_datetime(row['start_date']).strftime('%Y-%m-%d'),
-                    'end': pd.to_datetime(row['end_date']).strftime('%Y-%m-%d'),
-                    'description': str(row.get('description', '')),
-                    'backgroundColor': '#FFC107',  # Amarelo para ausências
-                    'allDay': True,
-                    'extendedProps': {
-                        'type': 'absence'
-                    }
-                }
-                events.append(event)
-            except Exception as e:
-                st.error(f"Erro ao processar ausência (ID: {row.get('absence_id', 'desconhecido')}): {str(e)}")
-                continue
-                
+        events.extend(_absence_events(non_holidays, users_df))
+    
+    except Exception as e:
+        st.error(f"Erro ao processar feriados/ausências: {str(e)}")
+    
+    return events
+
+def _int_id(value):
+    """Identificador como int (None quando vazio)"""
+    return None if pd.isna(value) else int(value)
+
+def _user_work_events(db_manager, window_start, window_end, user_ids, users_df, projects_df):
+    """{user_id: [[project_id, evento], ...]} dos registos de horas dos colaboradores na janela"""
+    entries = load_calendar_entries(
+        db_manager, window_start, window_end,
+        user_ids if len(user_ids) <= MAX_IN_USERS else None
+    )
+    entries = entries[entries['user_id'].isin(user_ids)]
+    
+    events = {}
+    for user_id, project_id, event in zip(entries['user_id'].tolist(), entries['project_id'].tolist(), _work_events(entries, users_df, projects_df)):
+        events.setdefault(int(user_id), []).append([_int_id(project_id), event])
+    return events
+
+def _window_absence_events(db_manager, window_start, window_end, users_df):
+    """[[user_id, evento], ...] das ausências (não feriados) na janela"""
+    absences_df = load_calendar_absences(db_manager, window_start, window_end)
+    non_holidays = absences_df[~_is_holiday(absences_df)]
+    return [
+        [_int_id(user_id), event]
+        for user_id, event in zip(non_holidays['user_id'].tolist(), _absence_events(non_holidays, users_df))
+    ]
+
+def _year_holiday_events(db_manager, year):
+    """Eventos dos feriados com início no ano"""
+    holidays_df = db_manager.query_to_df(
+        """
+        SELECT absence_id, user_id, start_date, end_date, absence_type, description
+        FROM absences
+        WHERE start_date >= ? AND start_date < ? AND absence_type LIKE '%feriado%'
+        """,
+        (f'{year:04d}-01-01', f'{year + 1:04d}-01-01')
+    )
+    return _holiday_events(holidays_df)
+
+def cached_calendar_events(db_manager, users_df, projects_df, year, month, current_user_info, user_ids=None, project_ids=None):
+    """
+    Eventos do mês visível montados a partir da calendar_event_cache
+    
+    Mesmo resultado que load_calendar_entries + prepare_calendar_events, mas os
+    registos de horas ficam em cache por colaborador e mês, as ausências por
+    mês e os feriados por ano: só as partes invalidadas por escritas (ou
+    ainda não vistas) são lidas e convertidas.
+    """
+    db_file = db_manager.db_file
+    window_start, window_end = calendar_window(year, month)
+    is_admin = current_user_info['role'].lower() == 'admin'
+    
+    if not is_admin:
+        user_ids = [current_user_info['user_id']]
+    elif user_ids is None:
+        user_ids = calendar_event_cache.month_users(
+            db_file, year, month, partial(load_window_users, db_manager, window_start, window_end)
+        )
+    
+    work = calendar_event_cache.work_events(
+        db_file, year, month, user_ids,
+        partial(_user_work_events, db_manager, window_start, window_end, users_df=users_df, projects_df=projects_df)
+    )
+    projects = None if project_ids is None else {int(project_id) for project_id in project_ids}
+    events = [
+        event
+        for user_id in dict.fromkeys(int(user_id) for user_id in user_ids)
+        for project_id, event in work[user_id]
+        if projects is None or project_id in projects
+    ]
+    
+    try:
+        # Feriados do(s) ano(s) da janela, partilhados por todos os colaboradores
+        first_day = window_start.strftime(DATE_FORMAT)
+        last_day = (window_end - timedelta(days=1)).strftime(DATE_FORMAT)
+        for holiday_year in range(window_start.year, window_end.year + 1):
+            holidays = calendar_event_cache.holiday_events(db_file, holiday_year, partial(_year_holiday_events, db_manager, holiday_year))
+            events.extend(event for event in holidays if first_day <= event['start'] <= last_day)
+        
+        # Ausências: todas para admin, apenas as próprias para os restantes
+        absences = calendar_event_cache.absence_events(
+            db_file, year, month, partial(_window_absence_events, db_manager, window_start, window_end, users_df)
+        )
+        own_id = int(current_user_info['user_id'])
+        events.extend(event for user_id, event in absences if is_admin or user_id == own_id)
+    
     except Exception as e:
         st.error(f"Erro ao processar feriados/ausências: {str(e)}")
     
@@ -151,30 +311,52 @@ def calendar_page():
     
     try:
         # Carregar dados do banco SQLite em vez de arquivos Excel
-        db_manager = DatabaseManager()
+        db_manager = get_db_manager()
         
-        # Consultar tabelas necessárias
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        projects_df = db_manager.query_to_df("SELECT * FROM projects")
-        absences_df = db_manager.query_to_df("SELECT * FROM absences")
+        # Tabelas pequenas (nomes e filtros); os registos de horas e as ausências
+        # são lidos apenas para a janela do mês visível
+        users_df = load_table('utilizadores', db_manager)
+        projects_df = load_table('projects', db_manager)
         
         # Verificar o papel do usuário atual
         is_admin = st.session_state.user_info['role'].lower() == 'admin'
         current_user_info = st.session_state.user_info
         
+        # Mês visível
+        today = datetime.now()
+        col1, col2 = st.columns(2)
+        with col1:
+            month = st.selectbox(
+                "Mês",
+                range(1, 13),
+                format_func=lambda x: month_name[x],
+                index=today.month - 1,
+                key="cal_month"
+            )
+        with col2:
+            year = st.selectbox(
+                "Ano",
+                range(today.year - 2, today.year + 2),
+                index=2,
+                key="cal_year"
+            )
+        window_start, window_end = calendar_window(year, month)
+        
         # Filtros - mostrar todos apenas para admin
+        user_ids = None
+        project_ids = None
         if is_admin:
             col1, col2 = st.columns(2)
             with col1:
                 # Simplificar o filtro de usuários
-                user_list = []
-                for _, user in users_df.iterrows():
-                    user_list.append(f"{user['First_Name']} {user['Last_Name']}")
+                user_options = dict(zip(
+                    users_df['First_Name'].astype(str) + ' ' + users_df['Last_Name'].astype(str),
+                    users_df['user_id']
+                ))
                 
                 selected_users = st.multiselect(
                     "Filtrar por Usuário",
-                    options=user_list
+                    options=list(user_options)
                 )
             
             with col2:
@@ -184,34 +366,20 @@ def calendar_page():
                     options=projects_df['project_name'].unique().tolist()
                 )
             
-            # Aplicar filtros para admin
-            filtered_data = timesheet_df.copy()
-            
+            # Aplicar filtros para admin (na query)
             if selected_users:
-                user_ids = []
-                for user_name in selected_users:
-                    first_name, last_name = user_name.split(' ', 1)
-                    user = users_df[
-                        (users_df['First_Name'] == first_name) & 
-                        (users_df['Last_Name'] == last_name)
-                    ]
-                    if not user.empty:
-                        user_ids.append(user['user_id'].iloc[0])
-                filtered_data = filtered_data[filtered_data['user_id'].isin(user_ids)]
+                user_ids = [user_options[user_name] for user_name in selected_users]
             
             if selected_projects:
-                project_ids = []
-                for project_name in selected_projects:
-                    project = projects_df[projects_df['project_name'] == project_name]
-                    if not project.empty:
-                        project_ids.append(project['project_id'].iloc[0])
-                filtered_data = filtered_data[filtered_data['project_id'].isin(project_ids)]
+                project_ids = projects_df[projects_df['project_name'].isin(selected_projects)]['project_id'].tolist()
         else:
             # Para usuários normais, filtrar apenas seus próprios dados
-            filtered_data = timesheet_df[timesheet_df['user_id'] == current_user_info['user_id']]
+            user_ids = [current_user_info['user_id']]
         
-        # Converter dados para eventos
-        events = prepare_calendar_events(filtered_data, users_df, projects_df, absences_df, current_user_info)
+        # Converter dados para eventos (a partir da cache por colaborador e mês)
+        events = cached_calendar_events(
+            db_manager, users_df, projects_df, year, month, current_user_info, user_ids, project_ids
+        )
         
         # Configuração do calendário
         calendar_options = {
@@ -221,6 +389,12 @@ def calendar_page():
                 "right": "dayGridMonth,timeGridWeek,timeGridDay"
             },
             "initialView": "timeGridWeek",
+            "initialDate": date(year, month, 1).isoformat(),
+            # A navegação fica limitada à janela carregada; os outros meses escolhem-se acima
+            "validRange": {
+                "start": window_start.isoformat(),
+                "end": window_end.isoformat()
+            },
             "slotMinTime": "08:00:00",
             "slotMaxTime": "20:00:00",
             "slotDuration": "00:30:00",
@@ -232,8 +406,8 @@ def calendar_page():
             }
         }
         
-        # Renderizar calendário
-        calendar(events=events, options=calendar_options)
+        # Renderizar calendário (a chave por mês reinicia o componente na data escolhida)
+        calendar(events=events, options=calendar_options, key=f"calendar_{year}_{month:02d}")
         
         # Legenda com três categorias
         st.markdown("---")
@@ -244,8 +418,8 @@ def calendar_page():
             st.markdown("🔴 Horas Não Faturáveis")
         with col3:
             st.markdown("🟢 Feriados")
-            
+    
     except Exception as e:
         st.error(f"Erro ao carregar calendário: {str(e)}")
         import traceback
-        st.error(traceback.format_exc())
\ No newline at end of file
+        st.error(traceback.format_exc())
@@ -12,8 +12,11 @@ from datetime import datetime, timedelta
 import calendar
 from fpdf import FPDF
 from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
 from collaborator_targets import CollaboratorTargetCalculator
-from report_utils import get_feriados_portugal
+from business_calendar import get_business_calendar
+from date_utils import parse_dates
+from group_membership import membership_index
 
 # Configuração do logging
 logging.basicConfig(
@@ -25,55 +28,26 @@ logging.basicConfig(
     ]
 )
 
-def get_available_users(users_df, selected_teams):
+def get_available_users(users_df, selected_teams, db_manager=None):
     """
     Função para obter colaboradores disponíveis baseado nas equipes selecionadas
     """
-    available_users = []
+    db_manager = db_manager or DatabaseManager()
+    teams_by_user = membership_index.teams_by_user(db_manager)
     
     if "Todas" not in selected_teams:
-        # Filtrar usuários pelas equipes selecionadas
-        for _, user in users_df.iterrows():
-            try:
-                if isinstance(user['groups'], str):
-                    user_groups = eval(user['groups'])
-                else:
-                    user_groups = user['groups'] if user['groups'] is not None else []
-                
-                # Converter para lista se for outro tipo
-                if not isinstance(user_groups, list):
-                    if isinstance(user_groups, dict):
-                        user_groups = list(user_groups.values())
-                    else:
-                        user_groups = [user_groups]
-                
-                # Verificar se o usuário pertence a alguma das equipes selecionadas
-                if any(team in user_groups for team in selected_teams):
-                    available_users.append({
-                        'user_id': user['user_id'],
-                        'name': f"{user['First_Name']} {user['Last_Name']}",
-                        'team': user_groups[0] if user_groups else 'Sem equipe'
-                    })
-            except Exception as e:
-                logging.warning(f"Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-    else:
-        # Todos os usuários disponíveis
-        for _, user in users_df.iterrows():
-            try:
-                user_groups = eval(user['groups']) if isinstance(user['groups'], str) else (user['groups'] if user['groups'] is not None else [])
-                if not isinstance(user_groups, list):
-                    if isinstance(user_groups, dict):
-                        user_groups = list(user_groups.values())
-                    else:
-                        user_groups = [user_groups]
-                
-                available_users.append({
-                    'user_id': user['user_id'],
-                    'name': f"{user['First_Name']} {user['Last_Name']}",
-                    'team': user_groups[0] if user_groups else 'Sem equipe'
-                })
-            except Exception as e:
-                logging.warning(f"Erro ao processar usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
+        # Filtrar usuários pelas equipes selecionadas (índice de pertença user_groups)
+        team_users = membership_index.users_in_teams(db_manager, selected_teams)
+        users_df = users_df[users_df['user_id'].isin(list(team_users))]
+    
+    available_users = []
+    for user in users_df[['user_id', 'First_Name', 'Last_Name']].to_dict('records'):
+        user_teams = teams_by_user.get(int(user['user_id']), [])
+        available_users.append({
+            'user_id': user['user_id'],
+            'name': f"{user['First_Name']} {user['Last_Name']}",
+            'team': user_teams[0] if user_teams else 'Sem equipe'
+        })
     
     return available_users
 
@@ -85,7 +59,7 @@ def collaborator_email_report():
     st.title("📧 Relatório de Indicadores de Colaboradores")
     
     # Inicializar gerenciadores
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     collaborator_target_calculator = CollaboratorTargetCalculator()
     
     # Verificar se o usuário é administrador
@@ -95,12 +69,12 @@ def collaborator_email_report():
     
     # Carregamento de dados básicos
     try:
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups WHERE active = 1")
+        users_df = load_table('utilizadores', db_manager, active_only=True)
+        timesheet_df = load_table('timesheet', db_manager)
+        groups_df = load_table('groups', db_manager, active_only=True)
         
         # Converter datas
-        timesheet_df['start_date'] = pd.to_datetime(timesheet_df['start_date'], format='mixed', errors='coerce')
+        timesheet_df['start_date'] = parse_dates(timesheet_df['start_date'], errors='coerce')
         
     except Exception as e:
         st.error(f"Erro ao carregar dados: {str(e)}")
@@ -251,7 +225,7 @@ def collaborator_email_report():
         if should_load:
             with st.spinner("Carregando colaboradores..."):
                 # Carregar colaboradores
-                st.session_state.available_users = get_available_users(users_df, selected_teams)
+                st.session_state.available_users = get_available_users(users_df, selected_teams, db_manager)
                 st.session_state.teams_loaded = selected_teams.copy()
                 
                 if st.session_state.available_users:
@@ -405,7 +379,9 @@ Equipe de Gestão"""
             st.warning("Filtro de colaboradores está ativo mas nenhum colaborador foi selecionado. O relatório incluirá todos os colaboradores das equipes selecionadas.")
             use_collaborator_filter = False
         
-        with st.spinner("Gerando e enviando relatório..."):
+        # Todas as leituras do relatório usam a mesma vista da base de dados,
+        # sem serem afetadas por registos de horas feitos entretanto
+        with st.spinner("Gerando e enviando relatório..."), db_manager.snapshot():
             # Criar diretório temporário para os arquivos
             temp_dir = tempfile.mkdtemp()
             
@@ -626,24 +602,11 @@ def generate_collaborator_pdf_report(
         pdf.cell(0, 10, 'Resumo Executivo', 0, 1)
         
         # Calcular dias úteis do período incluindo feriados
-        month_year_pairs = set()
-        current_date = start_date
-        while current_date <= end_date:
-            month_year_pairs.add((current_date.month, current_date.year))
-            current_date += timedelta(days=1)
-            
-        # Obter todos os feriados dos anos envolvidos no período
-        all_holidays = []
-        for _, year in month_year_pairs:
-            all_holidays.extend(get_feriados_portugal(year))
+        calendario = get_business_calendar()
+        all_holidays = calendario.holidays_between(start_date, end_date)
         
         # Calcular dias úteis excluindo feriados
-        dias_uteis = 0
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date.weekday() < 5 and current_date.date() not in all_holidays:  # 0-4 são dias úteis (seg-sex)
-                dias_uteis += 1
-            current_date += timedelta(days=1)
+        dias_uteis = calendario.business_days(start_date, end_date)
 
         # Calcular horas úteis totais para o período
         horas_uteis_periodo = dias_uteis * 8
@@ -1213,34 +1176,13 @@ def get_collaborator_indicators(
 
         # Adicionar log para depuração específica do período
         logging.info(f"Período de consulta: de {start_date_str} até {end_date_str}")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
+        users_df = load_table('utilizadores', db_manager, active_only=True)
+        groups_df = load_table('groups', db_manager)
         
         # Filtrar por equipe
         if "Todas" not in selected_teams:
-            # Encontrar os usuários que pertencem às equipes selecionadas
-            filtered_users = []
-            for _, user in users_df.iterrows():
-                try:
-                    if isinstance(user['groups'], str):
-                        user_groups = eval(user['groups'])
-                    else:
-                        user_groups = user['groups'] if user['groups'] is not None else []
-                    
-                    # Converter para lista se for outro tipo
-                    if not isinstance(user_groups, list):
-                        if isinstance(user_groups, dict):
-                            user_groups = list(user_groups.values())
-                        else:
-                            user_groups = [user_groups]
-                    
-                    # Verificar se o usuário pertence a alguma das equipes selecionadas
-                    if any(team in user_groups for team in selected_teams):
-                        filtered_users.append(user['user_id'])
-                except Exception as e:
-                    logging.warning(f"Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-            
-            # Filtrar usuários
+            # Utilizadores das equipes selecionadas (índice de pertença user_groups)
+            filtered_users = list(membership_index.users_in_teams(db_manager, selected_teams))
             users_df = users_df[users_df['user_id'].isin(filtered_users)]
         
         # Aplicar filtro específico de colaboradores se ativo
@@ -1252,25 +1194,8 @@ def get_collaborator_indicators(
         if users_df.empty:
             return []
         
-        # Calculando dias úteis do período considerando feriados
-        month_year_pairs = set()
-        current_date = start_date
-        while current_date <= end_date:
-            month_year_pairs.add((current_date.month, current_date.year))
-            current_date += timedelta(days=1)
-            
-        # Obter todos os feriados dos anos envolvidos no período
-        all_holidays = []
-        for month, year in month_year_pairs:
-            all_holidays.extend(get_feriados_portugal(year))
-        
-        # Calcular dias úteis excluindo feriados
-        dias_uteis = 0
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date.weekday() < 5 and current_date.date() not in all_holidays:  # 0-4 são dias úteis (seg-sex)
-                dias_uteis += 1
-            current_date += timedelta(days=1)
+        # Calculando dias úteis do período excluindo feriados
+        dias_uteis = get_business_calendar().business_days(start_date, end_date)
                 
         # Calcular horas úteis totais para o período
         horas_uteis_periodo = dias_uteis * 8
@@ -1283,8 +1208,8 @@ def get_collaborator_indicators(
             try:
                 user_timesheet = timesheet_df[
                     (timesheet_df['user_id'] == user['user_id']) & 
-                    (pd.to_datetime(timesheet_df['start_date'], format='mixed') >= start_date_str) &
-                    (pd.to_datetime(timesheet_df['start_date'], format='mixed') <= end_date_str)
+                    (parse_dates(timesheet_df['start_date']) >= start_date_str) &
+                    (parse_dates(timesheet_df['start_date']) <= end_date_str)
                 ]
             except Exception as e:
                 # Fallback em caso de erro de conversão de data
@@ -1440,9 +1365,9 @@ def get_collaborator_absences(db_manager, start_date, end_date, selected_teams):
     """
     try:
         # Carregar dados necessários
-        absences_df = db_manager.query_to_df("SELECT * FROM absences")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
+        absences_df = load_table('absences', db_manager)
+        users_df = load_table('utilizadores', db_manager, active_only=True)
+        groups_df = load_table('groups', db_manager)
         
         # Verificar se há dados
         if absences_df.empty:
@@ -1464,29 +1389,8 @@ def get_collaborator_absences(db_manager, start_date, end_date, selected_teams):
         
         # Filtrar por equipe se necessário
         if "Todas" not in selected_teams:
-            # Encontrar os usuários que pertencem às equipes selecionadas
-            filtered_users = []
-            for _, user in users_df.iterrows():
-                try:
-                    if isinstance(user['groups'], str):
-                        user_groups = eval(user['groups'])
-                    else:
-                        user_groups = user['groups'] if user['groups'] is not None else []
-                    
-                    # Converter para lista se for outro tipo
-                    if not isinstance(user_groups, list):
-                        if isinstance(user_groups, dict):
-                            user_groups = list(user_groups.values())
-                        else:
-                            user_groups = [user_groups]
-                    
-                    # Verificar se o usuário pertence a alguma das equipes selecionadas
-                    if any(team in user_groups for team in selected_teams):
-                        filtered_users.append(user['user_id'])
-                except Exception as e:
-                    logging.warning(f"Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-            
-            # Filtrar ausências pelos usuários das equipes selecionadas
+            # Utilizadores das equipes selecionadas (índice de pertença user_groups)
+            filtered_users = list(membership_index.users_in_teams(db_manager, selected_teams))
             filtered_absences = filtered_absences[filtered_absences['user_id'].isin(filtered_users)]
         
         # Preparar lista de ausências
@@ -1554,24 +1458,11 @@ def generate_collaborator_excel_report(
         df = pd.DataFrame(colaboradores)
         
         # Calcular dias úteis considerando feriados
-        month_year_pairs = set()
-        current_date = start_date
-        while current_date <= end_date:
-            month_year_pairs.add((current_date.month, current_date.year))
-            current_date += timedelta(days=1)
-            
-        # Obter todos os feriados dos anos envolvidos no período
-        all_holidays = []
-        for _, year in month_year_pairs:
-            all_holidays.extend(get_feriados_portugal(year))
+        calendario = get_business_calendar()
+        all_holidays = calendario.holidays_between(start_date, end_date)
         
         # Calcular dias úteis excluindo feriados
-        dias_uteis = 0
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date.weekday() < 5 and current_date.date() not in all_holidays:
-                dias_uteis += 1
-            current_date += timedelta(days=1)
+        dias_uteis = calendario.business_days(start_date, end_date)
         
         # Preparar dados para o Excel
         resumo_data = {
@@ -0,0 +1,75 @@
+"""
+Indicadores mensais de ocupação e faturabilidade por colaborador.
+
+Em vez de percorrer os colaboradores e filtrar o timesheet inteiro para cada
+um (com uma query de metas por colaborador), o mês é filtrado uma vez, as
+horas totais e faturáveis saem de um único groupby('user_id') e as metas do
+mês são lidas numa só query. As linhas por colaborador resultam de merges.
+"""
+import numpy as np
+import pandas as pd
+
+from date_utils import parse_dates
+
+
+# Metas de ocupação e de horas faturáveis (% das horas úteis do mês)
+TARGET_OCCUPATION = 87.5
+TARGET_BILLABLE = 75.0
+
+INDICATOR_COLUMNS = [
+    'user_id', 'name', 'occupation_percentage', 'billable_percentage',
+    'occupation_color', 'billable_color', 'target_occupation', 'target_billable',
+    'total_hours', 'billable_hours', 'billable_hours_target', 'revenue_target',
+]
+
+
+def month_hours_by_user(timesheet_df, year, month):
+    """Horas totais e faturáveis de cada colaborador no mês (DataFrame com user_id, total_hours, billable_hours)"""
+    start_dates = parse_dates(timesheet_df['start_date'], errors='coerce')
+    month_df = timesheet_df.loc[
+        ((start_dates.dt.year == year) & (start_dates.dt.month == month)).to_numpy(),
+        ['user_id', 'hours', 'billable']
+    ]
+    hours = pd.to_numeric(month_df['hours'], errors='coerce').fillna(0.0)
+    return pd.DataFrame({
+        'user_id': month_df['user_id'],
+        'total_hours': hours,
+        'billable_hours': hours.where((month_df['billable'] == True).to_numpy(), 0.0),
+    }).groupby('user_id', as_index=False).sum()
+
+
+def compute_collaborator_indicators(timesheet_df, users_df, year, month, working_hours, targets_df=None):
+    """Indicadores do mês para os colaboradores de users_df (pela ordem de users_df)
+
+    Args:
+        timesheet_df: registos de horas (user_id, start_date, hours, billable)
+        users_df: colaboradores a incluir (user_id, First_Name, Last_Name)
+        working_hours: horas úteis do mês (dias úteis × 8)
+        targets_df: metas do mês (user_id, billable_hours_target, revenue_target), opcional
+    """
+    indicators = users_df[['user_id', 'First_Name', 'Last_Name']].merge(
+        month_hours_by_user(timesheet_df, year, month), on='user_id', how='left'
+    )
+    indicators[['total_hours', 'billable_hours']] = indicators[['total_hours', 'billable_hours']].fillna(0.0)
+    indicators['name'] = indicators['First_Name'].astype(str) + ' ' + indicators['Last_Name'].astype(str)
+
+    if working_hours > 0:
+        indicators['occupation_percentage'] = indicators['total_hours'] / working_hours * 100
+        indicators['billable_percentage'] = indicators['billable_hours'] / working_hours * 100
+    else:
+        indicators['occupation_percentage'] = 0.0
+        indicators['billable_percentage'] = 0.0
+
+    indicators['target_occupation'] = TARGET_OCCUPATION
+    indicators['target_billable'] = TARGET_BILLABLE
+    indicators['occupation_color'] = np.where(indicators['occupation_percentage'] >= TARGET_OCCUPATION, 'green', 'red')
+    indicators['billable_color'] = np.where(indicators['billable_percentage'] >= TARGET_BILLABLE, 'green', 'red')
+
+    if targets_df is not None and not targets_df.empty:
+        targets = targets_df[['user_id', 'billable_hours_target', 'revenue_target']].drop_duplicates('user_id')
+        indicators = indicators.merge(targets, on='user_id', how='left')
+    else:
+        indicators['billable_hours_target'] = np.nan
+        indicators['revenue_target'] = np.nan
+
+    return indicators[INDICATOR_COLUMNS]
@@ -3,6 +3,7 @@ import sqlite3
 import pandas as pd
 import streamlit as st
 from database_manager import DatabaseManager
+from group_membership import parse_groups_value
 from annual_targets import AnnualTargetManager
 
 def create_collaborator_targets_table():
@@ -63,16 +64,8 @@ class CollaboratorTargetCalculator:
         for _, user in users_df.iterrows():
             # Processar o campo groups que pode estar em diferentes formatos
             try:
-                if isinstance(user['groups'], str):
-                    groups = eval(user['groups'])
-                else:
-                    groups = user['groups']
-                
-                # Converter para lista se for dicionário ou outro tipo
-                if isinstance(groups, dict):
-                    groups = list(groups.values())
-                elif not isinstance(groups, list):
-                    groups = [groups]
+                # Lista de grupos (texto, dicionário ou valor simples), sem eval
+                groups = parse_groups_value(user['groups'])
                 
                 # Converter strings numéricas para inteiros
                 groups = [int(g) if isinstance(g, str) and g.isdigit() else g for g in groups]
@@ -336,6 +329,14 @@ class CollaboratorTargetCalculator:
             query = "SELECT * FROM collaborator_targets WHERE user_id = ? ORDER BY year DESC, month"
             return self.db.query_to_df(query, (user_id,))
     
+    def get_month_targets(self, year, month, user_ids=None):
+        """Obtém numa única query os targets do mês de todos os usuários (ou apenas dos indicados)"""
+        query = "SELECT * FROM collaborator_targets WHERE year = ? AND month = ?"
+        targets = self.db.query_to_df(query, (year, month))
+        if user_ids is not None:
+            targets = targets[targets['user_id'].isin(list(user_ids))]
+        return targets
+    
     def get_company_targets(self, company, year):
         """Obtém os targets de todos os usuários de uma empresa"""
         query = "SELECT * FROM collaborator_targets WHERE company_name = ? AND year = ? ORDER BY month, user_id"
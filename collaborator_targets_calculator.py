@@ -5,7 +5,8 @@ from datetime import datetime
 import calendar
 import plotly.express as px
 import plotly.graph_objects as go
-from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
+from group_membership import parse_groups_value
 import io
 
 def collaborator_targets_calculator_page():
@@ -17,7 +18,7 @@ def collaborator_targets_calculator_page():
     st.title("Cálculo de Metas por Colaborador")
     
     # Inicializar o gerenciador de banco de dados
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Constantes importantes
     MAX_BILLABLE_HOURS_PER_MONTH = 22 * 8 * 0.8  # ~140.8 horas/mês (22 dias úteis, 8h/dia, 80% faturáveis)
@@ -59,7 +60,7 @@ def collaborator_targets_calculator_page():
             return
             
         # Carregar usuários ativos apenas dos grupos Tech, DS e LRB
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
+        users_df = load_table('utilizadores', db_manager, active_only=True)
         
         # Filtrar usuários dos grupos específicos
         tech_users = []
@@ -72,13 +73,7 @@ def collaborator_targets_calculator_page():
                     continue
                     
                 # Processar o campo groups
-                groups = eval(str(user['groups'])) if isinstance(user['groups'], str) else user['groups']
-                
-                # Converter para lista se for dicionário ou outro tipo
-                if isinstance(groups, dict):
-                    groups = list(groups.values())
-                elif not isinstance(groups, list):
-                    groups = [groups]
+                groups = parse_groups_value(user['groups'])
                 
                 # Converter strings numéricas para inteiros
                 groups = [int(g) if isinstance(g, str) and g.isdigit() else g for g in groups]
@@ -107,7 +102,7 @@ def collaborator_targets_calculator_page():
             st.metric("LRB", len(lrb_users))
             
         # Obter rates
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
+        rates_df = load_table('rates', db_manager)
         
         # Se não encontrar usuários nos grupos específicos
         if len(tech_users) + len(ds_users) + len(lrb_users) == 0:
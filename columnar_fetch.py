@@ -0,0 +1,93 @@
+"""
+Leitura colunar de resultados SQLite para DataFrame.
+
+pd.read_sql_query constrói a lista completa de tuplos, cria um DataFrame a
+partir dela e só depois infere o tipo de cada coluna. Aqui o cursor é lido em
+blocos (fetchmany) e cada bloco é convertido diretamente para arrays NumPy
+com o tipo declarado em schema_registry (float64 para ids, horas e valores;
+object para texto e datas). O resultado tem o mesmo contrato que
+pd.read_sql_query seguido de coerce_dtypes.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+from schema_registry import FLOAT, BOOL, get_column_type
+
+
+BATCH_SIZE = 50000
+
+# Tipos lidos diretamente para float64 (None -> NaN); coerce_dtypes trata o resto
+_NUMERIC_KINDS = ('Int32', 'Int64', FLOAT, BOOL)
+
+
+def _column_to_array(values, numeric):
+    """Converte a coluna (array object) de um bloco para float64 quando é numérica"""
+    if numeric:
+        try:
+            return values.astype('float64')
+        except (ValueError, TypeError):
+            # Texto não numérico numa coluna numérica: fica como object e
+            # coerce_dtypes converte com pd.to_numeric(errors='coerce')
+            pass
+    return values
+
+
+def _finalize_column(chunks):
+    """Junta os blocos de uma coluna e infere o tipo das colunas não declaradas"""
+    if not chunks:
+        return np.array([], dtype=object)
+    if any(chunk.dtype == object for chunk in chunks):
+        array = np.concatenate([chunk.astype(object, copy=False) for chunk in chunks])
+    else:
+        return np.concatenate(chunks)
+
+    # Mesma inferência que pd.read_sql_query (coerce_float=True)
+    inferred = infer_dtype(array, skipna=True)
+    if inferred in ('integer', 'floating', 'mixed-integer-float'):
+        has_nulls = pd.isna(array).any()
+        if inferred == 'integer' and not has_nulls:
+            return array.astype('int64')
+        return array.astype('float64')
+    if inferred == 'boolean' and not pd.isna(array).any():
+        return array.astype('bool')
+    return array
+
+
+def read_sql_columnar(conn, query, params=None, batch_size=BATCH_SIZE):
+    """Executa a query e devolve um DataFrame, lendo o cursor em blocos por coluna
+
+    Args:
+        conn: conexão sqlite3
+        query: SQL a executar
+        params: parâmetros da query (tuplo, lista ou dicionário)
+        batch_size: número de linhas lidas por fetchmany
+    """
+    cursor = conn.execute(query, params or ())
+    try:
+        if cursor.description is None:
+            return pd.DataFrame()
+
+        columns = [description[0] for description in cursor.description]
+        numeric = [get_column_type(column) in _NUMERIC_KINDS for column in columns]
+        chunks = [[] for _ in columns]
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            # Um único array 2D por bloco: mais barato do que transpor com zip(*rows)
+            block = np.empty((len(rows), len(columns)), dtype=object)
+            block[:] = rows
+            for position in range(len(columns)):
+                chunks[position].append(_column_to_array(block[:, position], numeric[position]))
+    finally:
+        cursor.close()
+
+    # Construído por posição: uma query pode ter colunas com o mesmo nome (ex.: SELECT t.*, p.*)
+    df = pd.DataFrame(
+        {position: _finalize_column(column_chunks) for position, column_chunks in enumerate(chunks)},
+        copy=False
+    )
+    df.columns = columns
+    return df
@@ -13,9 +13,12 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
 import numpy as np
 from fpdf import FPDF
 import matplotlib.pyplot as plt
+from date_utils import parse_dates
+from group_membership import membership_index
 
 def format_hours_minutes(hours):
     """Converte um valor decimal de horas para o formato HH:MM"""
@@ -596,33 +599,33 @@ def commercial_indicators_email():
         return
     
     # Inicializar o DatabaseManager
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     try:
         # Carregar tabelas necessárias
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
-        clients_df = db_manager.query_to_df("SELECT * FROM clients")
+        users_df = load_table('utilizadores', db_manager)
+        groups_df = load_table('groups', db_manager)
+        clients_df = load_table('clients', db_manager)
         
         # Tentar carregar categorias e atividades, com tratamento de erro
         try:
-            categories_df = db_manager.query_to_df("SELECT * FROM task_categories")
+            categories_df = load_table('task_categories', db_manager)
         except:
             categories_df = pd.DataFrame(columns=['task_category_id', 'task_category'])
             st.warning("Tabela de categorias não encontrada.")
             
         try:
-            activities_df = db_manager.query_to_df("SELECT * FROM activities")
+            activities_df = load_table('activities', db_manager)
         except:
             activities_df = pd.DataFrame(columns=['activity_id', 'activity_name'])
             st.warning("Tabela de atividades não encontrada.")
         
         # Carregar dados de timesheet
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
+        timesheet_df = load_table('timesheet', db_manager)
         
         # Converter datas para datetime
         if not timesheet_df.empty:
-            timesheet_df['start_date'] = pd.to_datetime(timesheet_df['start_date'], format='mixed', errors='coerce')
+            timesheet_df['start_date'] = parse_dates(timesheet_df['start_date'], errors='coerce')
         
         # Verificar se existe a coluna new_client na tabela timesheet
         if 'new_client' not in timesheet_df.columns:
@@ -708,21 +711,10 @@ Equipe de Gestão"""
                 
                 # Filtrar dados da equipe comercial (group_id 5)
                 # Primeiro identificar os usuários da equipe comercial
-                commercial_team_users = []
-                for _, user in users_df.iterrows():
-                    try:
-                        if isinstance(user['groups'], str):
-                            user_groups = eval(user['groups'])
-                            if isinstance(user_groups, dict):
-                                user_groups = list(user_groups.values())
-                            
-                            # Verificar se o usuário pertence ao grupo comercial
-                            commercial_group = groups_df[groups_df['id'] == 5]['group_name'].iloc[0] if not groups_df[groups_df['id'] == 5].empty else None
-                            
-                            if commercial_group and commercial_group in user_groups:
-                                commercial_team_users.append(user['user_id'])
-                    except Exception as e:
-                        continue
+                commercial_group = groups_df[groups_df['id'] == 5]['group_name'].iloc[0] if not groups_df[groups_df['id'] == 5].empty else None
+                commercial_team_users = (
+                    sorted(membership_index.users_in_teams(db_manager, commercial_group)) if commercial_group else []
+                )
                 
                 # Filtrar registros de timesheet da equipe comercial
                 if commercial_team_users:
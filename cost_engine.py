@@ -0,0 +1,250 @@
+"""
+Cálculo vetorizado do custo dos registos de horas.
+
+Regra única usada por dashboards, relatórios e emails:
+  - taxa = timesheet.rate_value quando preenchido; caso contrário a rate do
+    colaborador (utilizadores.rate_id -> rates.rate_cost); sem taxa o custo é 0
+  - custo = horas × taxa, a dobrar para horas extra
+  - horas ponderadas = horas, a dobrar para horas extra
+
+add_entry_costs acrescenta as colunas de custo a todo o DataFrame de uma vez
+(merge + np.where), em vez de filtrar utilizadores e rates registo a registo.
+Os totais por projeto/colaborador/mês saem de um único groupby.
+
+Com rate_history, a rate do colaborador é a que estava em vigor na data de
+cada registo (pd.merge_asof por rate e data); alterar uma rate deixa de
+revalorizar os registos anteriores à alteração. Com user_rate_history, a rate
+atribuída ao colaborador (rate_id) também é a da data do registo
+(pd.merge_asof por colaborador e data); mudar um colaborador de rate deixa de
+revalorizar o seu histórico.
+"""
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from date_utils import parse_dates
+
+
+OVERTIME_MULTIPLIER = 2
+
+# Valores de texto aceites como "hora extra"
+_TRUE_STRINGS = ('true', 't', 'yes', 'y', '1')
+
+COST_COLUMNS = ['rate_applied', 'is_overtime', 'base_cost', 'cost', 'weighted_hours']
+
+
+def overtime_mask(values):
+    """Converte a coluna overtime (bool, 0/1 ou texto) num array booleano (nulos = False)"""
+    if values.dtype == bool:
+        return values.to_numpy()
+    numeric = pd.to_numeric(values, errors='coerce').astype('float64')
+    text = values.astype(str).str.strip().str.lower().isin(_TRUE_STRINGS).to_numpy(dtype=bool)
+    numeric = numeric.to_numpy()
+    return np.where(np.isnan(numeric), text, numeric != 0)
+
+
+def build_user_rates(users_df, rates_df):
+    """Tabela user_id -> rate_cost (merge de utilizadores com rates)"""
+    if users_df is None or rates_df is None or users_df.empty or rates_df.empty:
+        return pd.Series(dtype='float64')
+
+    user_rates = users_df[['user_id', 'rate_id']].drop_duplicates('user_id').merge(
+        rates_df[['rate_id', 'rate_cost']].drop_duplicates('rate_id'),
+        on='rate_id',
+        how='left'
+    )
+    return pd.Series(
+        pd.to_numeric(user_rates['rate_cost'], errors='coerce').to_numpy(dtype='float64'),
+        index=user_rates['user_id'].to_numpy()
+    )
+
+
+def load_rate_history(db_manager):
+    """Lê rate_history (DataFrame vazio se a tabela ainda não existir)"""
+    try:
+        return db_manager.query_to_df("SELECT rate_id, rate_cost, valid_from, valid_to FROM rate_history")
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        print(f"Histórico de rates indisponível: {e}")
+        return pd.DataFrame(columns=['rate_id', 'rate_cost', 'valid_from', 'valid_to'])
+
+
+def load_user_rate_history(db_manager):
+    """Lê user_rate_history (DataFrame vazio se a tabela ainda não existir)"""
+    try:
+        return db_manager.query_to_df("SELECT user_id, rate_id, valid_from, valid_to FROM user_rate_history")
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        print(f"Histórico de rates dos colaboradores indisponível: {e}")
+        return pd.DataFrame(columns=['user_id', 'rate_id', 'valid_from', 'valid_to'])
+
+
+def resolve_rate_ids_as_of(user_ids, dates, user_rate_history):
+    """rate_id atribuída a cada colaborador na data de cada registo
+
+    Os períodos de user_rate_history são semiabertos [valid_from, valid_to).
+    Retorna um array float64 alinhado com user_ids/dates (NaN quando a data não
+    cai em nenhum período do colaborador).
+    """
+    result = np.full(len(user_ids), np.nan)
+    if user_rate_history is None or user_rate_history.empty:
+        return result
+
+    entries = pd.DataFrame({
+        'row': np.arange(len(user_ids)),
+        'user_id': pd.to_numeric(pd.Series(user_ids), errors='coerce').to_numpy(dtype='float64'),
+        'date': dates,
+    }).dropna(subset=['user_id', 'date'])
+    history = pd.DataFrame({
+        'user_id': pd.to_numeric(user_rate_history['user_id'], errors='coerce').to_numpy(dtype='float64'),
+        'rate_id': pd.to_numeric(user_rate_history['rate_id'], errors='coerce').to_numpy(dtype='float64'),
+        'valid_from': parse_dates(user_rate_history['valid_from'], errors='coerce').to_numpy(),
+        'valid_to': parse_dates(user_rate_history['valid_to'], errors='coerce').to_numpy(),
+    }).dropna(subset=['user_id', 'valid_from'])
+    if entries.empty or history.empty:
+        return result
+
+    merged = pd.merge_asof(
+        entries.sort_values('date'),
+        history.sort_values('valid_from'),
+        left_on='date',
+        right_on='valid_from',
+        by='user_id',
+        direction='backward'
+    )
+    expired = merged['valid_to'].notna() & (merged['date'] >= merged['valid_to'])
+    result[merged['row'].to_numpy()] = merged['rate_id'].where(~expired).to_numpy(dtype='float64')
+    return result
+
+
+def resolve_rates_as_of(timesheet_df, users_df, rate_history, date_column='start_date', user_rate_history=None):
+    """Rate do colaborador em vigor na data de cada registo
+
+    A rate_id é a que o colaborador tinha na data (user_rate_history) ou, sem
+    período nessa data, a atual (users_df). Os períodos de rate_history são
+    semiabertos [valid_from, valid_to). Retorna um array float64 alinhado com
+    timesheet_df (NaN quando o colaborador não tem rate ou a data não cai em
+    nenhum período).
+    """
+    result = np.full(len(timesheet_df), np.nan)
+    if rate_history is None or rate_history.empty:
+        return result
+
+    dates = parse_dates(timesheet_df[date_column], errors='coerce').dt.normalize().to_numpy()
+    rate_ids = np.full(len(timesheet_df), np.nan)
+    if users_df is not None and not users_df.empty:
+        user_rate_ids = users_df.drop_duplicates('user_id').set_index('user_id')['rate_id']
+        rate_ids = pd.to_numeric(timesheet_df['user_id'].map(user_rate_ids), errors='coerce').to_numpy(dtype='float64')
+    assigned_rate_ids = resolve_rate_ids_as_of(timesheet_df['user_id'].to_numpy(), dates, user_rate_history)
+    rate_ids = np.where(np.isnan(assigned_rate_ids), rate_ids, assigned_rate_ids)
+
+    entries = pd.DataFrame({
+        'row': np.arange(len(timesheet_df)),
+        'rate_id': rate_ids,
+        'date': dates,
+    }).dropna(subset=['rate_id', 'date'])
+
+    history = pd.DataFrame({
+        'rate_id': pd.to_numeric(rate_history['rate_id'], errors='coerce').to_numpy(dtype='float64'),
+        'rate_cost': pd.to_numeric(rate_history['rate_cost'], errors='coerce').to_numpy(dtype='float64'),
+        'valid_from': parse_dates(rate_history['valid_from'], errors='coerce').to_numpy(),
+        'valid_to': parse_dates(rate_history['valid_to'], errors='coerce').to_numpy(),
+    }).dropna(subset=['rate_id', 'valid_from'])
+    if entries.empty or history.empty:
+        return result
+
+    merged = pd.merge_asof(
+        entries.sort_values('date'),
+        history.sort_values('valid_from'),
+        left_on='date',
+        right_on='valid_from',
+        by='rate_id',
+        direction='backward'
+    )
+    # Período já fechado antes da data do registo
+    expired = merged['valid_to'].notna() & (merged['date'] >= merged['valid_to'])
+    result[merged['row'].to_numpy()] = merged['rate_cost'].where(~expired).to_numpy(dtype='float64')
+    return result
+
+
+def add_entry_costs(timesheet_df, users_df=None, rates_df=None, user_rates=None, rate_history=None,
+                    user_rate_history=None):
+    """Retorna uma cópia do timesheet com as colunas de custo por registo
+
+    Args:
+        timesheet_df: registos de horas (user_id, hours e, opcionalmente, rate_value e overtime)
+        users_df, rates_df: tabelas utilizadores e rates, para a rate do colaborador
+        user_rates: alternativa a users_df/rates_df (Series ou dicionário user_id -> rate)
+        rate_history: tabela rate_history; se indicada (com users_df), a rate do
+            colaborador é a que estava em vigor na data do registo, usando a rate
+            atual apenas para datas sem período no histórico
+        user_rate_history: tabela user_rate_history; se indicada (com
+            rate_history), a rate_id do colaborador é a que tinha na data do registo
+
+    Colunas acrescentadas: rate_applied, is_overtime, base_cost (horas × taxa),
+    cost (base_cost a dobrar nas horas extra) e weighted_hours.
+    """
+    df = timesheet_df.copy()
+    if df.empty:
+        for column in COST_COLUMNS:
+            df[column] = pd.Series(dtype=bool if column == 'is_overtime' else 'float64')
+        return df
+
+    if user_rates is None:
+        user_rates = build_user_rates(users_df, rates_df)
+    elif isinstance(user_rates, dict):
+        user_rates = pd.Series(user_rates, dtype='float64')
+
+    rates = pd.to_numeric(df['user_id'].map(user_rates), errors='coerce').to_numpy(dtype='float64')
+    if rate_history is not None and not rate_history.empty:
+        as_of_rates = resolve_rates_as_of(df, users_df, rate_history, user_rate_history=user_rate_history)
+        rates = np.where(np.isnan(as_of_rates), rates, as_of_rates)
+    if 'rate_value' in df.columns:
+        entry_rates = pd.to_numeric(df['rate_value'], errors='coerce').to_numpy(dtype='float64')
+        rates = np.where(np.isnan(entry_rates), rates, entry_rates)
+    rates = np.nan_to_num(rates, nan=0.0)
+
+    # Horas inválidas não contam (como no cálculo registo a registo)
+    hours = np.nan_to_num(pd.to_numeric(df['hours'], errors='coerce').to_numpy(dtype='float64'), nan=0.0)
+    if 'overtime' in df.columns:
+        is_overtime = overtime_mask(df['overtime'])
+    else:
+        is_overtime = np.zeros(len(df), dtype=bool)
+
+    multiplier = np.where(is_overtime, OVERTIME_MULTIPLIER, 1)
+    df['rate_applied'] = rates
+    df['is_overtime'] = is_overtime
+    df['base_cost'] = hours * rates
+    df['cost'] = df['base_cost'].to_numpy() * multiplier
+    df['weighted_hours'] = hours * multiplier
+    return df
+
+
+def summarize_costs(entries_df, by):
+    """Totais de horas, horas ponderadas e custo agrupados por uma ou mais colunas
+
+    entries_df deve já ter as colunas de add_entry_costs.
+    """
+    entries_df = entries_df.assign(hours=pd.to_numeric(entries_df['hours'], errors='coerce'))
+    return entries_df.groupby(by, dropna=False).agg(
+        hours=('hours', 'sum'),
+        weighted_hours=('weighted_hours', 'sum'),
+        cost=('cost', 'sum'),
+        entries=('cost', 'size'),
+    ).reset_index()
+
+
+def costs_by_project(entries_df):
+    """Totais por projeto"""
+    return summarize_costs(entries_df, 'project_id')
+
+
+def costs_by_user(entries_df):
+    """Totais por colaborador"""
+    return summarize_costs(entries_df, 'user_id')
+
+
+def costs_by_month(entries_df, date_column='start_date', by=None):
+    """Totais por mês (coluna 'month' no formato YYYY-MM), opcionalmente também por outra coluna"""
+    df = entries_df.copy()
+    df['month'] = parse_dates(df[date_column], errors='coerce').dt.strftime('%Y-%m')
+    group = ['month'] if by is None else ([by] if isinstance(by, str) else list(by)) + ['month']
+    return summarize_costs(df, group)
@@ -1,15 +1,26 @@
 # dashboard.py
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import io
 from datetime import datetime, timedelta
+from functools import partial
 import calendar
-from database_manager import DatabaseManager, UserManager, ProjectManager, ClientManager, GroupManager
+from database_manager import UserManager, ProjectManager, ClientManager, GroupManager
+from page_data import current_data_version, get_db_manager, load_table
 from annual_targets import AnnualTargetManager
 from collaborator_targets import CollaboratorTargetCalculator
 from billing_manager import BillingManager
+from date_utils import parse_dates
+from cost_engine import add_entry_costs, load_rate_history, load_user_rate_history
+from group_membership import membership_index
+from business_calendar import get_business_calendar
+from project_indicators import compute_project_indicators
+from revenue_rollup import compute_revenue_indicators, load_revenue_rollup
+from collaborator_indicators import TARGET_BILLABLE, TARGET_OCCUPATION, compute_collaborator_indicators
+from section_cache import section_cache
 
 # Exportar a função dashboard_page para ser acessada de outros módulos
 __all__ = ['dashboard_page']
@@ -21,11 +32,8 @@ def dashboard_page():
     st.title("Dashboard de Indicadores")
     
     try:
-        # Inicializar gerenciadores
-        db_manager = DatabaseManager()
-        annual_target_manager = AnnualTargetManager()
-        collaborator_target_calculator = CollaboratorTargetCalculator()
-        billing_manager = BillingManager()
+        # Inicializar gerenciadores (os restantes são criados apenas pela secção que os usa)
+        db_manager = get_db_manager()
         
         # Selecionar mês e ano atuais para referência
         now = datetime.now()
@@ -55,7 +63,7 @@ def dashboard_page():
                 )
             
             # Carregar dados das equipes
-            groups_df = db_manager.query_to_df("SELECT * FROM groups WHERE active = 1")
+            groups_df = load_table('groups', db_manager, active_only=True)
             
             # Filtro de equipe
             teams = ["Todas"] + groups_df["group_name"].tolist()
@@ -66,184 +74,124 @@ def dashboard_page():
                 key="dash_team"
             )
         
-        # Tabs do dashboard
-        tab1, tab2, tab3 = st.tabs([
-            "Indicadores de Colaboradores", 
-            "Indicadores de Projetos", 
-            "Indicadores de Faturação"
-        ])
-        
-        with tab1:
-            show_collaborator_indicators(
-                db_manager, 
-                collaborator_target_calculator, 
-                month, 
-                year, 
-                selected_team
-            )
+        # Secção do dashboard: apenas a secção escolhida é calculada nesta execução
+        section = st.radio(
+            "Secção",
+            options=list(DASHBOARD_SECTIONS),
+            horizontal=True,
+            key="dash_section",
+            label_visibility="collapsed"
+        )
         
-        with tab2:
-            show_project_indicators(
-                db_manager, 
-                annual_target_manager, 
-                month, 
-                year, 
-                selected_team
-            )
+        # Resultados por (secção, mês, ano, equipa) e versão dos dados; um resultado
+        # desatualizado é mostrado enquanto o novo é calculado em segundo plano
+        data_version = current_data_version(db_manager.db_file)
+        section_data, show_section = DASHBOARD_SECTIONS[section]
         
-        with tab3:
-            show_revenue_indicators(
-                db_manager, 
-                annual_target_manager,
-                billing_manager,
-                month, 
-                year, 
-                selected_team
+        with st.spinner("A calcular indicadores..."):
+            data, computed_at, stale = section_cache.get(
+                (section, month, year, selected_team),
+                data_version,
+                partial(section_data, db_manager, month, year, selected_team)
             )
+        
+        if stale:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.caption(f"A mostrar resultados calculados às {computed_at:%H:%M:%S}; os dados estão a ser atualizados.")
+            with col2:
+                st.button("Atualizar", key="dash_refresh")
+        
+        show_section(data, month, year, selected_team)
+        
+        # Preparar em segundo plano as outras secções do mesmo período e equipa
+        for other_section, (other_data, _) in DASHBOARD_SECTIONS.items():
+            if other_section != section:
+                section_cache.prefetch(
+                    (other_section, month, year, selected_team),
+                    data_version,
+                    partial(other_data, db_manager, month, year, selected_team)
+                )
     
     except Exception as e:
         st.error(f"Erro ao carregar o dashboard: {str(e)}")
         import traceback
         st.code(traceback.format_exc(), language="python")
 
-def show_collaborator_indicators(db_manager, collaborator_target_calculator, month, year, selected_team):
+def collaborator_section_data(db_manager, month, year, selected_team):
     """
-    Mostra indicadores de performance dos colaboradores
+    Calcula os dados da secção de colaboradores (sem elementos do Streamlit, ver section_cache)
     com metas de 87.5% para ocupação e 75% para horas faturáveis
     considerando os feriados de Portugal
     """
-    # Exibir título com informações de referência (equipe e mês)
-    month_name = calendar.month_name[month]
-    if selected_team == "Todas":
-        st.subheader(f"Indicadores de Colaboradores - Todas as Equipas - {month_name}/{year}")
-    
     # Carregar dados necessários
-    timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-    users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
-    groups_df = db_manager.query_to_df("SELECT * FROM groups")
+    timesheet_df = load_table('timesheet', db_manager)
+    users_df = load_table('utilizadores', db_manager, active_only=True)
     
     # Filtrar por equipe se necessário
     if selected_team != "Todas":
-        # Exibir título com equipe específica
-        st.subheader(f"Indicadores de Colaboradores - Equipa: {selected_team} - {month_name}/{year}")
-        
-        # Encontrar os usuários que pertencem à equipa selecionada
-        filtered_users = []
-        for _, user in users_df.iterrows():
-            try:
-                if isinstance(user['groups'], str):
-                    user_groups = eval(user['groups'])
-                else:
-                    user_groups = user['groups'] if user['groups'] is not None else []
-                
-                # Converter para lista se for outro tipo
-                if not isinstance(user_groups, list):
-                    if isinstance(user_groups, dict):
-                        user_groups = list(user_groups.values())
-                    else:
-                        user_groups = [user_groups]
-                
-                # Verificar se o usuário pertence à equipe selecionada
-                if selected_team in user_groups:
-                    filtered_users.append(user['user_id'])
-            except Exception as e:
-                st.warning(f"Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-        
-        # Filtrar usuários
-        users_df = users_df[users_df['user_id'].isin(filtered_users)]
+        # Utilizadores da equipa selecionada (índice de pertença user_groups)
+        filtered_users = membership_index.users_in_teams(db_manager, selected_team)
+        users_df = users_df[users_df['user_id'].isin(list(filtered_users))]
     
     if users_df.empty:
-        st.warning("Não foram encontrados colaboradores com os filtros selecionados.")
-        return
+        return None
     
-    # Calcular dias úteis do mês considerando feriados
-    from report_utils import get_feriados_portugal
+    # Calcular dias úteis do mês considerando feriados (nacionais e ausências 'feriado')
+    calendario = get_business_calendar(db_manager)
     
     primeiro_dia = datetime(year, month, 1)
     ultimo_dia = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
     
-    # Obter lista de feriados para o ano
-    feriados = get_feriados_portugal(year)
-    
     # Identificar feriados no mês atual
-    feriados_no_mes = []
-    for feriado in feriados:
-        if feriado.month == month and feriado.year == year:
-            feriados_no_mes.append(feriado)
-    
-    # Exibir informações sobre feriados do mês
-    if feriados_no_mes:
-        feriados_info = ", ".join([f"{f.day}/{f.month}" for f in feriados_no_mes])
-        st.info(f"⚠️ Feriados considerados em {month_name}/{year}: {feriados_info}")
+    feriados_no_mes = calendario.holidays_between(primeiro_dia, ultimo_dia)
     
     # Calcular dias úteis (de trabalho) no mês, excluindo feriados
-    dias_uteis = 0
-    data_atual = primeiro_dia
-    while data_atual <= ultimo_dia:
-        # Se não for sábado (5) nem domingo (6) e não for feriado
-        if data_atual.weekday() < 5 and data_atual.date() not in feriados:
-            dias_uteis += 1
-        data_atual += timedelta(days=1)
+    dias_uteis = calendario.business_days(primeiro_dia, ultimo_dia)
     
     # Horas úteis totais (considerando 8 horas por dia útil)
     horas_uteis_mes = dias_uteis * 8
     
-    # Para cada colaborador, calcular indicadores
-    collaborator_indicators = []
-    
-    for _, user in users_df.iterrows():
-        # Obter dados de metas do colaborador
-        user_targets = collaborator_target_calculator.get_user_targets(user['user_id'], year)
-        
-        # Filtrar entradas de timesheet para o colaborador e mês específico
-        try:
-            user_timesheet = timesheet_df[
-                (timesheet_df['user_id'] == user['user_id']) & 
-                (pd.to_datetime(timesheet_df['start_date'], format='mixed').dt.month == month) &
-                (pd.to_datetime(timesheet_df['start_date'], format='mixed').dt.year == year)
-            ]
-        except Exception as e:
-            # Fallback em caso de erro de conversão de data
-            st.warning(f"Erro ao filtrar timesheet para {user['First_Name']} {user['Last_Name']}: {e}")
-            user_timesheet = pd.DataFrame()
-        
-        # Calcular horas realizadas (total de horas registradas)
-        total_hours = user_timesheet['hours'].sum() if not user_timesheet.empty else 0
-        
-        # Calcular horas faturáveis (apenas entradas marcadas como billable=True)
-        billable_hours = user_timesheet[user_timesheet['billable'] == True]['hours'].sum() if not user_timesheet.empty else 0
-        
-        # Calcular percentuais de ocupação e faturabilidade baseados nas horas realizadas
-        # Ocupação = (Horas realizadas / Horas úteis do mês) * 100
-        occupation_percentage = (total_hours / horas_uteis_mes * 100) if horas_uteis_mes > 0 else 0
-        
-        # Faturabilidade = (Horas faturáveis / Horas úteis do mês) * 100
-        billable_percentage = (billable_hours / horas_uteis_mes * 100) if horas_uteis_mes > 0 else 0
-        
-        # Metas definidas
-        target_occupation = 87.5  # Meta de ocupação (87,5%)
-        target_billable = 75.0    # Meta de horas faturáveis (75.0%)
-        
-        # Determinar cores dos indicadores - simplificado para verde/vermelho
-        occupation_color = "green" if occupation_percentage >= target_occupation else "red"
-        billable_color = "green" if billable_percentage >= target_billable else "red"
-        
-        # Adicionar ao array de indicadores
-        collaborator_indicators.append({
-            "user_id": user['user_id'],
-            "name": f"{user['First_Name']} {user['Last_Name']}",
-            "occupation_percentage": occupation_percentage,
-            "billable_percentage": billable_percentage,
-            "occupation_color": occupation_color,
-            "billable_color": billable_color,
-            "target_occupation": target_occupation,
-            "target_billable": target_billable,
-            "total_hours": total_hours,  # Quantidade de horas realizadas
-            "billable_hours": billable_hours  # Quantidade de horas faturáveis
-        })
+    # Indicadores de todos os colaboradores numa passagem: mês filtrado uma vez,
+    # um groupby por colaborador e as metas do mês lidas numa única query
+    month_targets = CollaboratorTargetCalculator().get_month_targets(year, month, users_df['user_id'])
+    indicators_df = compute_collaborator_indicators(timesheet_df, users_df, year, month, horas_uteis_mes, month_targets)
+    
+    return {
+        'indicators_df': indicators_df,
+        'feriados_no_mes': feriados_no_mes,
+        'dias_uteis': dias_uteis,
+        'horas_uteis_mes': horas_uteis_mes,
+    }
+
+def show_collaborator_indicators(data, month, year, selected_team):
+    """
+    Mostra indicadores de performance dos colaboradores
+    a partir dos dados de collaborator_section_data
+    """
+    # Exibir título com informações de referência (equipe e mês)
+    month_name = calendar.month_name[month]
+    if selected_team == "Todas":
+        st.subheader(f"Indicadores de Colaboradores - Todas as Equipas - {month_name}/{year}")
+    else:
+        st.subheader(f"Indicadores de Colaboradores - Equipa: {selected_team} - {month_name}/{year}")
+    
+    if data is None:
+        st.warning("Não foram encontrados colaboradores com os filtros selecionados.")
+        return
+    
+    indicators_df = data['indicators_df']
+    feriados_no_mes = data['feriados_no_mes']
+    dias_uteis = data['dias_uteis']
+    horas_uteis_mes = data['horas_uteis_mes']
     
-    # Converter para DataFrame
-    indicators_df = pd.DataFrame(collaborator_indicators)
+    # Exibir informações sobre feriados do mês
+    if feriados_no_mes:
+        feriados_info = ", ".join([f"{f.day}/{f.month}" for f in feriados_no_mes])
+        st.info(f"⚠️ Feriados considerados em {month_name}/{year}: {feriados_info}")
+    
+    target_occupation = TARGET_OCCUPATION
+    target_billable = TARGET_BILLABLE
     
     # Layout de indicadores
     col1, col2 = st.columns(2)
@@ -491,7 +439,106 @@ from datetime import datetime, timedelta
 import calendar
 import io
 
-def show_project_indicators(db_manager, annual_target_manager, month, year, selected_team):
+def project_section_data(db_manager, month, year, selected_team):
+    """
+    Calcula os indicadores de todos os projetos da equipa (sem elementos do Streamlit, ver section_cache)
+    
+    Os filtros de status, tipo e projeto da secção são aplicados sobre este
+    resultado em show_project_indicators, sem novo cálculo.
+    """
+    # Carregar dados necessários - carregando todos os projetos (ativos e inativos)
+    projects_df = load_table('projects', db_manager)
+    clients_df = load_table('clients', db_manager)
+    timesheet_df = load_table('timesheet', db_manager)
+    users_df = load_table('utilizadores', db_manager)
+    rates_df = load_table('rates', db_manager)
+    
+    data = {
+        'project_types': sorted(projects_df["project_type"].unique().tolist()),
+        'project_names': sorted(projects_df["project_name"].tolist()),
+        'indicators_df': None,
+    }
+    
+    filtered_projects = projects_df
+    
+    # Filtrar por equipe
+    if selected_team != "Todas":
+        # Encontrar o ID do grupo
+        groups_df = load_table('groups', db_manager)
+        group_id = groups_df[groups_df["group_name"] == selected_team]["id"].iloc[0] if not groups_df.empty else None
+        
+        if group_id:
+            filtered_projects = filtered_projects[filtered_projects["group_id"] == group_id]
+    
+    if filtered_projects.empty:
+        return data
+    
+    # Definir o início e fim do mês de referência
+    inicio_mes = datetime(year, month, 1)
+    ultimo_dia = calendar.monthrange(year, month)[1]
+    fim_mes = datetime(year, month, ultimo_dia, 23, 59, 59)
+    
+    # Custo de cada registo calculado uma única vez para todo o timesheet,
+    # com a rate em vigor na data de cada registo
+    timesheet_df = add_entry_costs(
+        timesheet_df, users_df, rates_df,
+        rate_history=load_rate_history(db_manager),
+        user_rate_history=load_user_rate_history(db_manager)
+    )
+    
+    # Indicadores de todos os projetos de uma vez (mesmo motor dos emails executivo e de projetos):
+    # mês selecionado, acumulado do ano até hoje (com migrados), orçamento do mês
+    # proporcional aos dias úteis e percentagem esperada pelo tempo decorrido
+    indicators = compute_project_indicators(
+        filtered_projects,
+        timesheet_df,
+        inicio_mes,
+        fim_mes,
+        as_of=datetime.now(),
+        calendar=get_business_calendar(db_manager)
+    )
+    
+    client_names = clients_df.drop_duplicates('client_id').set_index('client_id')['name']
+    start_dates = parse_dates(filtered_projects['start_date'], errors='coerce')
+    end_dates = parse_dates(filtered_projects['end_date'], errors='coerce')
+    
+    data['indicators_df'] = pd.DataFrame({
+        "project_id": indicators['project_id'],
+        "project_name": filtered_projects['project_name'].to_numpy(),
+        "client_name": filtered_projects['client_id'].map(client_names).fillna("Cliente Desconhecido").to_numpy(),
+        "project_type": filtered_projects['project_type'].to_numpy(),
+        "status": filtered_projects['status'].to_numpy(),
+        "start_date": start_dates.dt.strftime('%d/%m/%Y').fillna("N/A").to_numpy(),
+        "end_date": end_dates.dt.strftime('%d/%m/%Y').fillna("N/A").to_numpy(),
+        "month_hours": indicators['period_hours'],
+        "month_budget_hours": indicators['period_budget_hours'],
+        "month_percentage": indicators['period_percentage'],
+        "month_cost": indicators['period_cost'],
+        "month_budget_cost": indicators['period_budget_cost'],
+        "year_hours": indicators['year_hours'],
+        "year_budget_hours": indicators['total_hours'],
+        "year_percentage": indicators['year_percentage'],
+        "expected_percentage": indicators['time_percentage'],
+        "percentage_ratio": indicators['percentage_ratio'],
+        "year_cost": indicators['year_cost'],
+        "year_budget_cost": indicators['total_cost'],
+        # Meta mensal - apenas dados do mês atual
+        "month_color": np.select(
+            [indicators['period_percentage'] > 80, indicators['period_percentage'] >= 60], ["red", "yellow"], "green"
+        ),
+        # Meta anual - dados acumulados do ano, incluindo migrados
+        "year_color": np.select(
+            [indicators['year_percentage'] > 60, indicators['year_percentage'] >= 40], ["red", "yellow"], "green"
+        ),
+        "horas_migradas": indicators['horas_migradas'],
+        "custo_migrado": indicators['custo_migrado'],
+        "proporcao_mes": indicators['period_share'],
+        "proporcao_atual": indicators['elapsed_share'],
+    })
+    
+    return data
+
+def show_project_indicators(data, month, year, selected_team):
     """
     Mostra indicadores de performance dos projetos com interface melhorada,
     incluindo rótulos nos gráficos e tabela formatada com dados detalhados
@@ -503,13 +550,6 @@ def show_project_indicators(db_manager, annual_target_manager, month, year, sele
     else:
         st.subheader(f"Indicadores de Projetos - Equipa: {selected_team} - {month_name}/{year}")
     
-    # Carregar dados necessários - carregando todos os projetos (ativos e inativos)
-    projects_df = db_manager.query_to_df("SELECT * FROM projects")
-    clients_df = db_manager.query_to_df("SELECT * FROM clients")
-    timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-    users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-    rates_df = db_manager.query_to_df("SELECT * FROM rates")
-    
     # Filtros adicionais para esta seção
     col1, col2, col3 = st.columns(3)
     
@@ -524,7 +564,7 @@ def show_project_indicators(db_manager, annual_target_manager, month, year, sele
     
     with col2:
         # Filtro de tipo de projeto
-        project_types = ["Todos"] + sorted(projects_df["project_type"].unique().tolist())
+        project_types = ["Todos"] + data['project_types']
         selected_type = st.selectbox(
             "Tipo de Projeto",
             options=project_types,
@@ -533,355 +573,36 @@ def show_project_indicators(db_manager, annual_target_manager, month, year, sele
     
     with col3:
         # Filtro de projeto específico
-        project_options = ["Todos"] + sorted(projects_df["project_name"].tolist())
+        project_options = ["Todos"] + data['project_names']
         selected_project = st.selectbox(
             "Projeto",
             options=project_options,
             index=0
         )
     
-    # Aplicar filtros
-    filtered_projects = projects_df.copy()
-    
-    # Filtrar por status (ativo/inativo)
-    if selected_status == "Ativos":
-        filtered_projects = filtered_projects[filtered_projects["status"].str.lower() == "active"]
-    elif selected_status == "Inativos":
-        filtered_projects = filtered_projects[filtered_projects["status"].str.lower() != "active"]
+    # Aplicar filtros sobre os indicadores já calculados (o resultado em cache não é alterado)
+    indicators_df = data['indicators_df']
     
-    # Filtrar por equipe
-    if selected_team != "Todas":
-        # Encontrar o ID do grupo
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
-        group_id = groups_df[groups_df["group_name"] == selected_team]["id"].iloc[0] if not groups_df.empty else None
+    if indicators_df is not None:
+        # Filtrar por status (ativo/inativo)
+        if selected_status == "Ativos":
+            indicators_df = indicators_df[indicators_df["status"].astype(str).str.lower() == "active"]
+        elif selected_status == "Inativos":
+            indicators_df = indicators_df[indicators_df["status"].astype(str).str.lower() != "active"]
         
-        if group_id:
-            filtered_projects = filtered_projects[filtered_projects["group_id"] == group_id]
-    
-    # Filtrar por tipo de projeto
-    if selected_type != "Todos":
-        filtered_projects = filtered_projects[filtered_projects["project_type"] == selected_type]
-    
-    # Filtrar por projeto específico
-    if selected_project != "Todos":
-        filtered_projects = filtered_projects[filtered_projects["project_name"] == selected_project]
+        # Filtrar por tipo de projeto
+        if selected_type != "Todos":
+            indicators_df = indicators_df[indicators_df["project_type"] == selected_type]
+        
+        # Filtrar por projeto específico
+        if selected_project != "Todos":
+            indicators_df = indicators_df[indicators_df["project_name"] == selected_project]
     
-    if filtered_projects.empty:
+    if indicators_df is None or indicators_df.empty:
         st.warning("Não foram encontrados projetos com os filtros selecionados.")
         return
     
-    # Calcular indicadores de projetos
-    project_indicators = []
-    
-    # Função para calcular dias úteis entre duas datas
-    def calcular_dias_uteis(data_inicio, data_fim):
-        """Calcula os dias úteis entre duas datas"""
-        dias_uteis = 0
-        data_atual = data_inicio
-        
-        while data_atual <= data_fim:
-            if data_atual.weekday() < 5:  # 0-4 são dias úteis (seg-sex)
-                dias_uteis += 1
-            data_atual += timedelta(days=1)
-        
-        return dias_uteis
-    
-    # Função para calcular a proporção de dias úteis dentro de um mês
-    def calcular_proporcao_mes(start_date, end_date, mes_ref, ano_ref):
-        """Calcula a proporção de dias úteis do projeto no mês de referência"""
-        # Se o projeto começa após ou termina antes do mês de referência, retorna 0
-        inicio_mes_ref = datetime(ano_ref, mes_ref, 1)
-        ultimo_dia_mes_ref = calendar.monthrange(ano_ref, mes_ref)[1]
-        fim_mes_ref = datetime(ano_ref, mes_ref, ultimo_dia_mes_ref, 23, 59, 59)
-        
-        if start_date > fim_mes_ref or end_date < inicio_mes_ref:
-            return 0
-        
-        # Ajustar datas para o período do mês
-        periodo_inicio = max(start_date, inicio_mes_ref)
-        periodo_fim = min(end_date, fim_mes_ref)
-        
-        # Calcular dias úteis no período do mês
-        dias_uteis_periodo = calcular_dias_uteis(periodo_inicio, periodo_fim)
-        
-        # Calcular dias úteis totais no projeto
-        dias_uteis_projeto = calcular_dias_uteis(start_date, end_date)
-        
-        if dias_uteis_projeto == 0:
-            return 0
-        
-        return dias_uteis_periodo / dias_uteis_projeto
-    
-    # Definir o início e fim do mês de referência
-    inicio_mes = datetime(year, month, 1)
-    ultimo_dia = calendar.monthrange(year, month)[1]
-    fim_mes = datetime(year, month, ultimo_dia, 23, 59, 59)
-    
-    # Início do ano
-    inicio_ano = datetime(year, 1, 1)
-    fim_ano = datetime(year, 12, 31, 23, 59, 59)
-    
-    # Data atual para considerar apenas períodos já passados na análise anual
-    data_atual = datetime.now()
-    
-    # Converter datas em timesheet para datetime para facilitar filtros posteriores
-    if 'start_date' in timesheet_df.columns:
-        try:
-            timesheet_df['start_date_dt'] = pd.to_datetime(timesheet_df['start_date'], format='mixed')
-        except Exception as e:
-            st.warning(f"Erro ao converter datas: {e}")
-            timesheet_df['start_date_dt'] = pd.to_datetime('2000-01-01')
-    
-    for _, project in filtered_projects.iterrows():
-        # Converter datas de início e fim para datetime
-        try:
-            start_date = pd.to_datetime(project['start_date'])
-            end_date = pd.to_datetime(project['end_date'])
-        except:
-            continue  # Pular projetos com datas inválidas
-        
-        # Obter registros de timesheet para o projeto
-        project_entries = timesheet_df[timesheet_df["project_id"] == project["project_id"]]
-        
-        # Verificar se existem dados migrados (horas_realizadas_mig e custo_realizado_mig)
-        horas_migradas = 0
-        if 'horas_realizadas_mig' in project and not pd.isna(project['horas_realizadas_mig']):
-            horas_migradas = float(project['horas_realizadas_mig'])
-        
-        custo_migrado = 0
-        if 'custo_realizado_mig' in project and not pd.isna(project['custo_realizado_mig']):
-            custo_migrado = float(project['custo_realizado_mig'])
-        
-        # Calcular dias úteis totais do projeto
-        dias_uteis_projeto = calcular_dias_uteis(start_date, end_date)
-        
-        # Calcular a proporção de dias úteis no mês de referência em relação ao total do projeto
-        proporcao_mes = calcular_proporcao_mes(start_date, end_date, month, year)
-        
-        # CÁLCULO PARA O MÊS ATUAL (apenas mês selecionado)
-        # Filtrar entradas do mês atual
-        try:
-            month_entries = project_entries[
-                (pd.to_datetime(project_entries["start_date"], format='mixed') >= inicio_mes) &
-                (pd.to_datetime(project_entries["start_date"], format='mixed') <= fim_mes)
-            ]
-        except Exception as e:
-            st.warning(f"Erro ao filtrar entradas do mês: {e}")
-            month_entries = pd.DataFrame()
-        
-        # Calcular horas regulares e extras para o mês
-        month_hours_regular = 0
-        month_hours_extra = 0
-        
-        if not month_entries.empty:
-            month_hours_regular = month_entries[~month_entries['overtime'].astype(bool)]['hours'].sum()
-            # Para horas extras, calcular o dobro para contabilização
-            month_hours_extra_original = month_entries[month_entries['overtime'].astype(bool)]['hours'].sum()
-            month_hours_extra = month_hours_extra_original * 2
-        
-        # Total de horas no mês (regulares + extras*2)
-        month_hours = float(month_hours_regular + month_hours_extra)
-        
-        # Calcular custo realizado para o mês
-        month_cost = 0
-        if not month_entries.empty:
-            for _, entry in month_entries.iterrows():
-                try:
-                    user_id = entry['user_id']
-                    hours = float(entry['hours'])
-                    is_overtime = entry.get('overtime', False)
-                    
-                    # Converter para booleano
-                    if isinstance(is_overtime, (int, float)):
-                        is_overtime = bool(is_overtime)
-                    elif isinstance(is_overtime, str):
-                        is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                    
-                    # Obter rate para o usuário
-                    rate_value = None
-                    if 'rate_value' in entry and not pd.isna(entry['rate_value']):
-                        rate_value = float(entry['rate_value'])
-                    else:
-                        user_info = users_df[users_df['user_id'] == user_id]
-                        
-                        if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                            rate_id = user_info['rate_id'].iloc[0]
-                            rate_info = rates_df[rates_df['rate_id'] == rate_id]
-                            
-                            if not rate_info.empty:
-                                rate_value = float(rate_info['rate_cost'].iloc[0])
-                    
-                    # Calcular custo com base no rate obtido
-                    if rate_value:
-                        entry_cost = hours * rate_value
-                        
-                        # Se for hora extra, multiplicar por 2
-                        if is_overtime:
-                            month_cost += entry_cost * 2  # Dobro para horas extras
-                        else:
-                            month_cost += entry_cost  # Normal para horas regulares
-                except Exception as e:
-                    pass
-        
-        # Meta mensal proporcional à duração do projeto
-        month_budget_hours = float(project["total_hours"]) * proporcao_mes if pd.notna(project["total_hours"]) else 0
-        month_budget_cost = float(project["total_cost"]) * proporcao_mes if pd.notna(project["total_cost"]) else 0
-        
-        # Calcular percentual de conclusão mensal
-        month_percentage = (month_hours / month_budget_hours * 100) if month_budget_hours > 0 else 0
-        
-        # CÁLCULO PARA O ANO (acumulado desde o início do ano até agora)
-        # Filtrar entradas do ano até a data atual
-        try:
-            year_entries = project_entries[
-                (pd.to_datetime(project_entries["start_date"], format='mixed') >= inicio_ano) &
-                (pd.to_datetime(project_entries["start_date"], format='mixed') <= data_atual)
-            ]
-        except Exception as e:
-            st.warning(f"Erro ao filtrar entradas do ano: {e}")
-            year_entries = pd.DataFrame()
-        
-        # Calcular horas regulares e extras para o ano
-        year_hours_regular = 0
-        year_hours_extra = 0
-        
-        if not year_entries.empty:
-            year_hours_regular = year_entries[~year_entries['overtime'].astype(bool)]['hours'].sum()
-            # Para horas extras, calcular o dobro para contabilização
-            year_hours_extra_original = year_entries[year_entries['overtime'].astype(bool)]['hours'].sum()
-            year_hours_extra = year_hours_extra_original * 2
-        
-        # Total de horas no ano (regulares + extras*2 + horas migradas)
-        year_hours = float(year_hours_regular + year_hours_extra + horas_migradas)
-        
-        # Calcular custo realizado para o ano
-        year_cost = 0
-        if not year_entries.empty:
-            for _, entry in year_entries.iterrows():
-                try:
-                    user_id = entry['user_id']
-                    hours = float(entry['hours'])
-                    is_overtime = entry.get('overtime', False)
-                    
-                    # Converter para booleano
-                    if isinstance(is_overtime, (int, float)):
-                        is_overtime = bool(is_overtime)
-                    elif isinstance(is_overtime, str):
-                        is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                    
-                    # Obter rate para o usuário
-                    rate_value = None
-                    if 'rate_value' in entry and not pd.isna(entry['rate_value']):
-                        rate_value = float(entry['rate_value'])
-                    else:
-                        user_info = users_df[users_df['user_id'] == user_id]
-                        
-                        if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                            rate_id = user_info['rate_id'].iloc[0]
-                            rate_info = rates_df[rates_df['rate_id'] == rate_id]
-                            
-                            if not rate_info.empty:
-                                rate_value = float(rate_info['rate_cost'].iloc[0])
-                    
-                    # Calcular custo com base no rate obtido
-                    if rate_value:
-                        entry_cost = hours * rate_value
-                        
-                        # Se for hora extra, multiplicar por 2
-                        if is_overtime:
-                            year_cost += entry_cost * 2  # Dobro para horas extras
-                        else:
-                            year_cost += entry_cost  # Normal para horas regulares
-                except Exception as e:
-                    pass
-        
-        # Adicionar custo migrado ao total do ano
-        year_cost += custo_migrado
-        
-        # Calcular a proporção de dias úteis entre o início do projeto e hoje
-        # em relação ao total de dias úteis do projeto
-        if start_date <= data_atual:
-            dias_uteis_ate_hoje = calcular_dias_uteis(start_date, min(data_atual, end_date))
-            proporcao_atual = dias_uteis_ate_hoje / dias_uteis_projeto if dias_uteis_projeto > 0 else 0
-        else:
-            proporcao_atual = 0
-            
-        # Orçamento total de horas e custo do projeto
-        year_budget_hours = float(project["total_hours"]) if pd.notna(project["total_hours"]) else 0.0
-        year_budget_cost = float(project["total_cost"]) if pd.notna(project["total_cost"]) else 0.0
-        
-        # Calcular percentual de conclusão anual do projeto (incluindo horas migradas)
-        year_percentage = (year_hours / year_budget_hours * 100) if year_budget_hours > 0 else 0
-        
-        # Calcular percentual esperado de conclusão, baseado no tempo decorrido
-        expected_percentage = proporcao_atual * 100
-        
-        # Comparar o percentual executado com o esperado
-        # Se percentage_ratio > 1, o projeto está consumindo horas mais rápido que o planejado
-        if expected_percentage > 0:
-            percentage_ratio = year_percentage / expected_percentage
-        else:
-            percentage_ratio = 0
-        
-        # Determinar cores dos indicadores utilizando as métricas originais
-        # Meta mensal - apenas dados do mês atual
-        if month_percentage > 80:
-            month_color = "red"
-        elif month_percentage >= 60:
-            month_color = "yellow"
-        else:
-            month_color = "green"
-            
-        # Meta anual - dados acumulados do ano, incluindo migrados
-        if year_percentage > 60:
-            year_color = "red"
-        elif year_percentage >= 40:
-            year_color = "yellow"
-        else:
-            year_color = "green"
-        
-        # Obter nome do cliente
-        client_name = clients_df[clients_df["client_id"] == project["client_id"]]["name"].iloc[0] if not clients_df.empty else "Cliente Desconhecido"
-        
-        # Converter datas para formato datetime e aplicar formatação
-        try:
-            start_date_fmt = pd.to_datetime(project["start_date"]).strftime('%d/%m/%Y') if pd.notna(project["start_date"]) else "N/A"
-            end_date_fmt = pd.to_datetime(project["end_date"]).strftime('%d/%m/%Y') if pd.notna(project["end_date"]) else "N/A"
-        except:
-            start_date_fmt = "N/A"
-            end_date_fmt = "N/A"
-        
-        # Adicionar ao array de indicadores
-        project_indicators.append({
-            "project_id": project["project_id"],
-            "project_name": project["project_name"],
-            "client_name": client_name,
-            "project_type": project["project_type"],
-            "status": project["status"],
-            "start_date": start_date_fmt,
-            "end_date": end_date_fmt,
-            "month_hours": month_hours,
-            "month_budget_hours": month_budget_hours,
-            "month_percentage": month_percentage,
-            "month_cost": month_cost,
-            "month_budget_cost": month_budget_cost,
-            "year_hours": year_hours,
-            "year_budget_hours": year_budget_hours,
-            "year_percentage": year_percentage,
-            "expected_percentage": expected_percentage,
-            "percentage_ratio": percentage_ratio,
-            "year_cost": year_cost,
-            "year_budget_cost": year_budget_cost,
-            "month_color": month_color,
-            "year_color": year_color,
-            "horas_migradas": horas_migradas,
-            "custo_migrado": custo_migrado,
-            "proporcao_mes": proporcao_mes,
-            "proporcao_atual": proporcao_atual
-        })
-    
-    # Converter para DataFrame
-    indicators_df = pd.DataFrame(project_indicators)
+    indicators_df = indicators_df.reset_index(drop=True)
     
     # Layout de indicadores
     col1, col2 = st.columns(2)
@@ -1411,36 +1132,58 @@ def show_project_indicators(db_manager, annual_target_manager, month, year, sele
     else:
         st.warning("Não há dados disponíveis para exibir na tabela.")
 
-def show_revenue_indicators(db_manager, annual_target_manager, billing_manager, month, year, selected_team):
+def revenue_section_data(db_manager, month, year, selected_team):
     """
-    Mostra indicadores de faturação baseados nos registros reais de faturas
+    Calcula os indicadores de faturação e as faturas do ano (sem elementos do Streamlit, ver section_cache)
     """
-    st.subheader("Indicadores de Faturação")
-    
     # Carregar dados necessários
-    annual_targets = annual_target_manager.read()
-    invoices_df = billing_manager.get_invoice()  # Buscar todas as faturas
-    clients_df = db_manager.query_to_df("SELECT * FROM clients")
-    projects_df = db_manager.query_to_df("SELECT * FROM projects")
-    groups_df = db_manager.query_to_df("SELECT * FROM groups")
+    annual_targets = AnnualTargetManager().read()
+    groups_df = load_table('groups', db_manager)
     
     # Filtrar por equipe, se necessário
     if selected_team != "Todas":
         annual_targets = annual_targets[annual_targets["company_name"] == selected_team]
     
     if annual_targets.empty:
-        st.warning("Não foram encontradas metas de faturação com os filtros selecionados.")
-        return
+        return {'warning': "Não foram encontradas metas de faturação com os filtros selecionados."}
     
     # Calcular as metas para o ano atual
     year_targets = annual_targets[annual_targets["target_year"] == year]
     
     if year_targets.empty:
-        st.warning(f"Não foram encontradas metas definidas para o ano {year}.")
+        return {'warning': f"Não foram encontradas metas definidas para o ano {year}."}
+    
+    invoices_df = BillingManager().get_invoice()  # Buscar todas as faturas
+    
+    # Faturação do mês, trimestre e ano de cada meta a partir da tabela agregada
+    indicators_df = compute_revenue_indicators(year_targets, load_revenue_rollup(db_manager, year), groups_df, month)
+    
+    # Faturas do ano atual
+    year_invoices = invoices_df
+    if not invoices_df.empty:
+        year_invoices = invoices_df[
+            pd.to_datetime(invoices_df['payment_date']).dt.year == year
+        ]
+    
+    return {
+        'warning': None,
+        'has_invoices': not invoices_df.empty,
+        'indicators_df': indicators_df,
+        'year_invoices': year_invoices,
+    }
+
+def show_revenue_indicators(data, month, year, selected_team):
+    """
+    Mostra indicadores de faturação baseados nos registros reais de faturas
+    """
+    st.subheader("Indicadores de Faturação")
+    
+    if data['warning']:
+        st.warning(data['warning'])
         return
     
     # Verificar se temos dados de faturação
-    if invoices_df.empty:
+    if not data['has_invoices']:
         st.warning("Não há registros de faturação disponíveis. Por favor, registre faturas no sistema.")
         
         # Mostrar instruções sobre como registrar faturas
@@ -1456,136 +1199,10 @@ def show_revenue_indicators(db_manager, annual_target_manager, billing_manager,
             As faturas registradas serão automaticamente consideradas nos indicadores de faturação.
             """)
     
-    # Definir períodos
-    primeiro_dia_mes = datetime(year, month, 1)
-    ultimo_dia_mes = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
-    
-    inicio_ano = datetime(year, 1, 1)
-    fim_ano = datetime(year, 12, 31, 23, 59, 59)
-    
     # Determinar trimestre atual
     current_quarter = (month - 1) // 3 + 1
-    inicio_trimestre = datetime(year, ((current_quarter - 1) * 3) + 1, 1)
-    fim_trimestre_mes = min(current_quarter * 3, 12)
-    ultimo_dia_trimestre = calendar.monthrange(year, fim_trimestre_mes)[1]
-    fim_trimestre = datetime(year, fim_trimestre_mes, ultimo_dia_trimestre, 23, 59, 59)
     
-    # Calcular indicadores de faturação
-    revenue_indicators = []
-    
-    for _, target in year_targets.iterrows():
-        company_name = target["company_name"]
-        annual_target = target["target_value"]
-        
-        # Calcular metas mensais e trimestrais
-        monthly_target = annual_target / 12
-        quarterly_target = annual_target / 4
-        
-        # Filtrar faturas por empresa usando projetos associados à empresa
-        company_invoices = invoices_df.copy()
-        
-        if company_name != "Todas" and not invoices_df.empty:
-            # Mapear projetos da empresa
-            company_projects = []
-            
-            # Identificar o group_id correspondente à empresa
-            group_id = None
-            for _, group in groups_df.iterrows():
-                if group['group_name'] == company_name:
-                    group_id = group['id']
-                    break
-            
-            if group_id is not None:
-                # Filtrar projetos da empresa pelo group_id
-                company_projects_df = projects_df[projects_df['group_id'] == group_id]
-                company_projects = company_projects_df['project_id'].tolist()
-                
-                # Filtrar faturas pelos projetos da empresa
-                if company_projects:
-                    company_invoices = company_invoices[company_invoices['project_id'].isin(company_projects)]
-                else:
-                    company_invoices = pd.DataFrame()  # Sem projetos, sem faturas
-        
-        # Calcular faturação efetiva por período usando datas de pagamento das faturas
-        if not company_invoices.empty:
-            # Converter datas para datetime
-            company_invoices['payment_date'] = pd.to_datetime(company_invoices['payment_date'])
-            
-            # Filtrar para o mês atual
-            month_invoices = company_invoices[
-                (company_invoices['payment_date'] >= primeiro_dia_mes) & 
-                (company_invoices['payment_date'] <= ultimo_dia_mes)
-            ]
-            monthly_revenue = month_invoices['amount'].sum() if not month_invoices.empty else 0
-            
-            # Filtrar para o trimestre atual
-            quarter_invoices = company_invoices[
-                (company_invoices['payment_date'] >= inicio_trimestre) & 
-                (company_invoices['payment_date'] <= fim_trimestre)
-            ]
-            quarterly_revenue = quarter_invoices['amount'].sum() if not quarter_invoices.empty else 0
-            
-            # Filtrar para o ano atual
-            year_invoices = company_invoices[
-                (company_invoices['payment_date'] >= inicio_ano) & 
-                (company_invoices['payment_date'] <= fim_ano)
-            ]
-            annual_revenue = year_invoices['amount'].sum() if not year_invoices.empty else 0
-        else:
-            # Sem faturas registradas
-            monthly_revenue = 0
-            quarterly_revenue = 0
-            annual_revenue = 0
-        
-        # Calcular percentuais de conclusão
-        monthly_percentage = (monthly_revenue / monthly_target * 100) if monthly_target > 0 else 0
-        quarterly_percentage = (quarterly_revenue / quarterly_target * 100) if quarterly_target > 0 else 0
-        annual_percentage = (annual_revenue / annual_target * 100) if annual_target > 0 else 0
-        
-        # Determinar cores dos indicadores
-        # Mensal
-        if monthly_percentage >= 80:
-            monthly_color = "green"
-        elif monthly_percentage >= 60:
-            monthly_color = "yellow"
-        else:
-            monthly_color = "red"
-        
-        # Trimestral
-        if quarterly_percentage >= 80:
-            quarterly_color = "green"
-        elif quarterly_percentage >= 60:
-            quarterly_color = "yellow"
-        else:
-            quarterly_color = "red"
-            
-        # Anual
-        if annual_percentage >= 80:
-            annual_color = "green"
-        elif annual_percentage >= 60:
-            annual_color = "yellow"
-        else:
-            annual_color = "red"
-        
-        # Adicionar ao array de indicadores
-        revenue_indicators.append({
-            "company_name": company_name,
-            "monthly_target": monthly_target,
-            "monthly_revenue": monthly_revenue,
-            "monthly_percentage": monthly_percentage,
-            "quarterly_target": quarterly_target,
-            "quarterly_revenue": quarterly_revenue,
-            "quarterly_percentage": quarterly_percentage,
-            "annual_target": annual_target,
-            "annual_revenue": annual_revenue,
-            "annual_percentage": annual_percentage,
-            "monthly_color": monthly_color,
-            "quarterly_color": quarterly_color,
-            "annual_color": annual_color
-        })
-    
-    # Converter para DataFrame
-    indicators_df = pd.DataFrame(revenue_indicators)
+    indicators_df = data['indicators_df']
     
     # Layout de indicadores
     col1, col2, col3 = st.columns(3)
@@ -1824,11 +1441,9 @@ def show_revenue_indicators(db_manager, annual_target_manager, billing_manager,
     st.markdown("---")
     st.markdown("### Faturas Registradas")
     
-    if not invoices_df.empty:
+    if data['has_invoices']:
         # Faturas do ano atual
-        year_invoices = invoices_df[
-            pd.to_datetime(invoices_df['payment_date']).dt.year == year
-        ]
+        year_invoices = data['year_invoices']
         
         if not year_invoices.empty:
             # Seleção de visualização por período
@@ -1965,4 +1580,12 @@ def show_revenue_indicators(db_manager, annual_target_manager, billing_manager,
     else:
         st.info("Não há faturas registradas no sistema.")
     
-    
\ No newline at end of file
+    
+
+
+# Secções do dashboard: rótulo -> (cálculo dos dados, apresentação)
+DASHBOARD_SECTIONS = {
+    "Indicadores de Colaboradores": (collaborator_section_data, show_collaborator_indicators),
+    "Indicadores de Projetos": (project_section_data, show_project_indicators),
+    "Indicadores de Faturação": (revenue_section_data, show_revenue_indicators),
+}
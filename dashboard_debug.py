@@ -5,7 +5,10 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import calendar
-from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
+from date_utils import parse_dates
+from group_membership import membership_index
+from business_calendar import get_business_calendar
 
 def dashboard_debug():
     """
@@ -14,7 +17,7 @@ def dashboard_debug():
     st.title("Depuração de Dados de Colaboradores")
     
     # Inicializar gerenciador de banco de dados
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Selecionar mês e ano de referência
     now = datetime.now()
@@ -39,7 +42,7 @@ def dashboard_debug():
         )
         
     # Carregar dados das equipes
-    groups_df = db_manager.query_to_df("SELECT * FROM groups WHERE active = 1")
+    groups_df = load_table('groups', db_manager, active_only=True)
     
     # Filtro de equipe
     teams = ["Todas"] + groups_df["group_name"].tolist()
@@ -51,8 +54,8 @@ def dashboard_debug():
     )
     
     # Carregar dados necessários
-    timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-    users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
+    timesheet_df = load_table('timesheet', db_manager)
+    users_df = load_table('utilizadores', db_manager, active_only=True)
     
     # Definir período
     primeiro_dia = datetime(year, month, 1)
@@ -60,40 +63,17 @@ def dashboard_debug():
     
     st.write(f"Período analisado: {primeiro_dia.strftime('%d/%m/%Y')} a {ultimo_dia.strftime('%d/%m/%Y')}")
     
-    # Calcular dias úteis no mês, excluindo fins de semana
-    dias_uteis = 0
-    data_atual = primeiro_dia
-    while data_atual <= ultimo_dia:
-        if data_atual.weekday() < 5:  # 0-4 são dias úteis (seg-sex)
-            dias_uteis += 1
-        data_atual += timedelta(days=1)
+    # Calcular dias úteis no mês, excluindo fins de semana e feriados (como no dashboard)
+    calendario = get_business_calendar(db_manager)
+    dias_uteis = calendario.business_days(primeiro_dia, ultimo_dia)
     
     st.write(f"Dias úteis no mês: {dias_uteis} (= {dias_uteis * 8} horas úteis)")
     
     # Filtrar usuários por equipe, se necessário
     filtered_users = users_df.copy()
     if selected_team != "Todas":
-        user_ids = []
-        for _, user in users_df.iterrows():
-            try:
-                if isinstance(user['groups'], str):
-                    user_groups = eval(user['groups'])
-                else:
-                    user_groups = user['groups'] if user['groups'] is not None else []
-                
-                # Converter para lista se for outro tipo
-                if not isinstance(user_groups, list):
-                    if isinstance(user_groups, dict):
-                        user_groups = list(user_groups.values())
-                    else:
-                        user_groups = [user_groups]
-                
-                # Verificar se o usuário pertence à equipe selecionada
-                if selected_team in user_groups:
-                    user_ids.append(user['user_id'])
-            except Exception as e:
-                st.write(f"⚠️ Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-                st.write(f"Valor de groups: {user['groups']}")
+        # Utilizadores da equipa selecionada (índice de pertença user_groups)
+        user_ids = list(membership_index.users_in_teams(db_manager, selected_team))
         
         filtered_users = users_df[users_df['user_id'].isin(user_ids)]
     
@@ -128,7 +108,7 @@ def dashboard_debug():
         
         # Converter datas para datetime na tabela
         try:
-            timesheet_df['start_date_dt'] = pd.to_datetime(timesheet_df['start_date'], format='mixed', errors='coerce')
+            timesheet_df['start_date_dt'] = parse_dates(timesheet_df['start_date'], errors='coerce')
         except Exception as e:
             st.write(f"⚠️ Erro ao converter datas: {str(e)}")
             # Mostrar algumas datas de exemplo
@@ -201,7 +181,7 @@ def dashboard_debug():
         dias_no_mes.append({
             'data': data.strftime('%d/%m/%Y'),
             'dia_semana': calendar.day_name[dia_semana],
-            'dia_util': dia_semana < 5,
+            'dia_util': calendario.is_business_day(data),
         })
     
     st.write(pd.DataFrame(dias_no_mes))
\ No newline at end of file
@@ -1,15 +1,167 @@
 import sqlite3
 import pandas as pd
 import os
-from contextlib import contextmanager
-from datetime import datetime
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
 import hashlib
+from schema_registry import coerce_dtypes
+from date_utils import DATE_COLUMNS, DATE_FORMAT, format_date_value, normalize_dates, normalize_date_series
+from user_cache import user_profile_cache
+from group_membership import membership_index, parse_groups_value
+from query_cache import USE_QUERY_CACHE, get_data_version, is_cacheable, query_cache
+from columnar_fetch import read_sql_columnar
+from query_log import track_query
+from revenue_rollup import refresh_revenue_rollup
+from calendar_cache import calendar_event_cache, is_holiday
+
+
+# Modo de pool: cada thread (worker do Streamlit) mantém uma conexão persistente
+# por ficheiro de base de dados, em vez de abrir/fechar uma conexão por query.
+# Pode ser desligado com a variável de ambiente RTIME_DB_POOL=0.
+USE_CONNECTION_POOL = os.environ.get('RTIME_DB_POOL', '1') != '0'
+
+# PRAGMAs aplicados uma única vez quando a conexão persistente é aberta
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # leitores não bloqueiam escritores
+    "PRAGMA synchronous=NORMAL",      # seguro em WAL e com menos fsyncs
+    "PRAGMA cache_size=-20000",       # ~20 MB de cache de páginas
+    "PRAGMA mmap_size=268435456",     # 256 MB mapeados em memória
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",       # espera até 5s por um lock
+)
+
+# Motor de leitura do query_to_df: 'numpy' (columnar_fetch, padrão) ou 'pandas'
+# (pd.read_sql_query). Pode ser escolhido com RTIME_QUERY_ENGINE.
+QUERY_ENGINE = os.environ.get('RTIME_QUERY_ENGINE', 'numpy')
+
+_thread_local = threading.local()
+
+
+def _open_pooled_connection(db_file):
+    """Abre uma conexão SQLite já configurada com os PRAGMAs de desempenho"""
+    conn = sqlite3.connect(db_file, timeout=5)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_pooled_connection(db_file='timetracker.db'):
+    """Retorna a conexão persistente da thread atual para o ficheiro indicado"""
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    
+    key = os.path.abspath(db_file)
+    conn = connections.get(key)
+    if conn is None:
+        conn = _open_pooled_connection(db_file)
+        connections[key] = conn
+    return conn
+
+
+def close_pooled_connections():
+    """Fecha todas as conexões persistentes da thread atual"""
+    connections = getattr(_thread_local, 'connections', None)
+    if not connections:
+        return
+    for conn in connections.values():
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
+
+
+@contextmanager
+def get_connection(db_file='timetracker.db', pooled=None):
+    """Retorna uma conexão: a persistente da thread (modo pool) ou uma nova que é fechada no fim"""
+    if pooled is None:
+        pooled = USE_CONNECTION_POOL
+    
+    if pooled:
+        conn = get_pooled_connection(db_file)
+        try:
+            yield conn
+        except Exception:
+            # Não deixar uma transação pendente na conexão partilhada
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+    else:
+        conn = None
+        try:
+            conn = sqlite3.connect(db_file)
+            yield conn
+        finally:
+            if conn:
+                conn.close()
+
+
+def get_snapshot(db_file='timetracker.db'):
+    """Retorna (conexão, versão dos dados) do snapshot ativo na thread atual, ou None"""
+    snapshots = getattr(_thread_local, 'snapshots', None)
+    if not snapshots:
+        return None
+    return snapshots.get(os.path.abspath(db_file))
+
+
+@contextmanager
+def read_snapshot(db_file='timetracker.db', in_memory=False):
+    """Serve todas as leituras da thread atual a partir de uma vista consistente da base de dados
+    
+    Enquanto o contexto estiver ativo, query_to_df/fetch_all/fetch_one de qualquer
+    DatabaseManager desta thread leem do snapshot, pelo que um relatório que faz
+    várias queries ao longo de vários segundos não vê escritas concorrentes a meio.
+    
+    Args:
+        db_file: base de dados
+        in_memory: se False (padrão) abre uma transação de leitura numa conexão
+            dedicada (em WAL não bloqueia quem regista horas); se True copia a
+            base de dados para memória com a API de backup do sqlite3
+    """
+    snapshots = getattr(_thread_local, 'snapshots', None)
+    if snapshots is None:
+        snapshots = _thread_local.snapshots = {}
+    
+    key = os.path.abspath(db_file)
+    if key in snapshots:
+        # Snapshot já ativo (ex.: geração de PDF e Excel no mesmo pedido)
+        yield snapshots[key][0]
+        return
+    
+    # Versão lida antes de fixar o snapshot: se houver uma escrita entretanto,
+    # as entradas da cache guardadas pelo snapshot ficam apenas desatualizadas
+    version = get_data_version(db_file)
+    if in_memory:
+        conn = sqlite3.connect(':memory:')
+        source = sqlite3.connect(db_file, timeout=5)
+        try:
+            source.backup(conn)
+        finally:
+            source.close()
+    else:
+        conn = _open_pooled_connection(db_file)
+        conn.execute("BEGIN")
+        # A primeira leitura fixa a vista da transação
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    
+    snapshots[key] = (conn, version)
+    try:
+        yield conn
+    finally:
+        del snapshots[key]
+        if conn.in_transaction:
+            conn.rollback()
+        conn.close()
 
 
 class DatabaseManager:
-    def __init__(self, db_file='timetracker.db'):
+    def __init__(self, db_file='timetracker.db', pooled=None):
         """Inicializa o gerenciador de banco de dados SQLite"""
         self.db_file = db_file
+        # None = usar o modo global (USE_CONNECTION_POOL)
+        self.pooled = USE_CONNECTION_POOL if pooled is None else pooled
         # Cria o banco de dados, se não existir
         self._initialize_db()
     
@@ -19,75 +171,95 @@ class DatabaseManager:
             # O banco de dados já deve ter sido criado pelo script de migração
             pass
     
-    @contextmanager
     def _get_connection(self):
         """Retorna uma conexão com o banco de dados"""
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_file)
-            yield conn
-        finally:
-            if conn:
-                conn.close()
+        return get_connection(self.db_file, self.pooled)
+    
+    def _get_read_connection(self):
+        """Retorna a conexão do snapshot ativo (ver read_snapshot) ou uma conexão normal"""
+        snapshot = get_snapshot(self.db_file)
+        if snapshot is not None:
+            return nullcontext(snapshot[0])
+        return self._get_connection()
+    
+    def snapshot(self, in_memory=False):
+        """Contexto em que todas as leituras da thread usam uma vista consistente (ver read_snapshot)"""
+        return read_snapshot(self.db_file, in_memory=in_memory)
     
     def execute_query(self, query, params=None):
         """Executa uma query SQL com parâmetros opcionais"""
-        with self._get_connection() as conn:
+        with self._get_connection() as conn, track_query(query, params) as info:
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             conn.commit()
+            info['rows'] = cursor.rowcount
             return cursor
     
     def fetch_all(self, query, params=None):
         """Executa uma query e retorna todos os resultados"""
-        cursor = self.execute_query(query, params)
-        return cursor.fetchall()
+        # Os resultados são lidos antes de a conexão ser libertada
+        with self._get_read_connection() as conn, track_query(query, params) as info:
+            rows = conn.execute(query, params or ()).fetchall()
+            info['rows'] = len(rows)
+            return rows
     
     def fetch_one(self, query, params=None):
         """Executa uma query e retorna um único resultado"""
-        cursor = self.execute_query(query, params)
-        return cursor.fetchone()
+        with self._get_read_connection() as conn, track_query(query, params) as info:
+            row = conn.execute(query, params or ()).fetchone()
+            info['rows'] = int(row is not None)
+            return row
     
-    def query_to_df(self, query, params=None):
-        """Executa uma query e retorna um DataFrame pandas com tipos corrigidos"""
-        with self._get_connection() as conn:
-            if params:
-                df = pd.read_sql_query(query, conn, params=params)
-            else:
-                df = pd.read_sql_query(query, conn)
+    def query_to_df(self, query, params=None, parse_dates=False, use_cache=True, table=None):
+        """Executa uma query e retorna um DataFrame pandas com tipos corrigidos
+        
+        Os tipos de cada coluna vêm do registo declarativo em schema_registry.
+        Com parse_dates=True as colunas de data são devolvidas como datetime64.
+        table indica que todas as colunas vêm dessa tabela (sem JOIN/aliases),
+        o que ativa os tipos CATEGORY do seu esquema.
+        Os resultados de SELECT ficam em cache (query_cache) até à próxima
+        escrita na base de dados; use_cache=False força a leitura.
+        """
+        with track_query(query, params) as info:
+            snapshot = get_snapshot(self.db_file)
+            use_cache = use_cache and USE_QUERY_CACHE and is_cacheable(query, self.db_file)
+            if use_cache:
+                cache_key = query_cache.make_key(self.db_file, query, params, parse_dates, table)
+                # Dentro de um snapshot vale a versão dos dados do início do snapshot
+                version = snapshot[1] if snapshot is not None else get_data_version(self.db_file)
+                df = query_cache.get(cache_key, version)
+                if df is not None:
+                    info['rows'], info['cached'] = len(df), True
+                    return df
             
-            # Sanitizar dados e corrigir tipos
-            for col in df.columns:
-                # Para colunas que normalmente são inteiros
-                if col.endswith('_id') or col == 'id':
-                    try:
-                        # Tenta converter para numérico
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                        # Substitui NaN por 0
-                        df[col] = df[col].fillna(0).astype('Int64')  # tipo Int64 permite NaN
-                    except Exception as e:
-                        print(f"Erro ao converter coluna {col}: {e}")
-                
-                # Para colunas booleanas
-                elif col in ['active', 'billable', 'overtime', 'approved']:
-                    try:
-                        df[col] = df[col].astype('bool')
-                    except:
-                        # Se falhar, tenta converter para int primeiro
-                        try:
-                            df[col] = pd.to_numeric(df[col], errors='coerce')
-                            df[col] = df[col].fillna(0).astype('bool')
-                        except Exception as e:
-                            print(f"Erro ao converter coluna booleana {col}: {e}")
+            with self._get_read_connection() as conn:
+                if QUERY_ENGINE == 'numpy':
+                    df = read_sql_columnar(conn, query, params)
+                elif params:
+                    df = pd.read_sql_query(query, conn, params=params)
+                else:
+                    df = pd.read_sql_query(query, conn)
             
+            df = coerce_dtypes(df, parse_dates=parse_dates, table=table)
+            info['rows'] = len(df)
+            if use_cache:
+                query_cache.put(cache_key, version, df)
             return df
         
+def _execute_in_transaction(conn, query, params=()):
+    """Executa um statement numa transação aberta pelo chamador (sem commit; registado no query_log)"""
+    with track_query(query, params) as info:
+        cursor = conn.execute(query, params)
+        info['rows'] = cursor.rowcount
+        return cursor
+
+
 class TimesheetManagerSQL:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db_file='timetracker.db'):
+        self.db = DatabaseManager(db_file)
     
     def create(self, data):
         """Cria um novo registro de timesheet"""
@@ -100,18 +272,73 @@ class TimesheetManagerSQL:
         if 'updated_at' not in data:
             data['updated_at'] = current_time
         
+        # Datas sempre no formato canónico
+        normalize_dates(data, 'timesheet')
+        
         # Preparar as colunas e valores para a query
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['?'] * len(data))
         
         query = f"INSERT INTO timesheet ({columns}) VALUES ({placeholders})"
         cursor = self.db.execute_query(query, tuple(data.values()))
+        self._invalidate_calendar((data.get('user_id'), data.get('start_date'), data.get('end_date')))
         
         # Retorna o ID do novo registro
         return cursor.lastrowid
     
+    def create_many(self, entries, chunk_size=5000):
+        """Cria vários registros de timesheet em transações por blocos
+        
+        Aceita um DataFrame ou uma lista de dicionários. Usa executemany numa
+        única conexão, com um commit por bloco de chunk_size registos.
+        Retorna o número de registos inseridos.
+        """
+        if not isinstance(entries, pd.DataFrame):
+            entries = pd.DataFrame(list(entries))
+        if entries.empty:
+            return 0
+        
+        entries = entries.copy()
+        # Datas normalizadas por coluna (e não registo a registo)
+        for column, fmt in DATE_COLUMNS['timesheet'].items():
+            if column in entries.columns:
+                entries[column] = normalize_date_series(entries[column], fmt)
+        
+        current_time = datetime.now().isoformat()
+        for column in ('created_at', 'updated_at'):
+            if column not in entries.columns:
+                entries[column] = current_time
+        
+        # pd.NA/NaN não são aceites pelo sqlite3
+        entries = entries.astype(object).where(entries.notna(), None)
+        
+        columns = list(entries.columns)
+        query = f"INSERT INTO timesheet ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        
+        inserted = 0
+        with self.db._get_connection() as conn:
+            for start in range(0, len(entries), chunk_size):
+                chunk = entries.iloc[start:start + chunk_size]
+                with track_query(query, chunk, many=True) as info:
+                    conn.executemany(query, chunk.itertuples(index=False, name=None))
+                    info['rows'] = len(chunk)
+                conn.commit()
+                inserted += len(chunk)
+        
+        # Um registo por colaborador e dia basta para invalidar o calendário
+        days = entries.reindex(columns=['user_id', 'start_date', 'end_date']).dropna(subset=['user_id'])
+        days = days.assign(
+            start_date=days['start_date'].astype(str).str[:10],
+            end_date=days['end_date'].astype(str).str[:10]
+        ).drop_duplicates()
+        self._invalidate_calendar(*days.itertuples(index=False, name=None))
+        
+        return inserted
+    
     def update(self, id, data):
         """Atualiza um registro existente"""
+        normalize_dates(data, 'timesheet')
+        
         # Preparar os pares coluna=valor para a query
         set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
         
@@ -121,15 +348,29 @@ class TimesheetManagerSQL:
         params = list(data.values())
         params.append(id)
         
+        before = self._calendar_scope(id)
         self.db.execute_query(query, params)
+        self._invalidate_calendar(before, self._calendar_scope(id))
         return True
     
     def delete(self, id):
         """Exclui um registro"""
+        before = self._calendar_scope(id)
         query = "DELETE FROM timesheet WHERE id = ?"
         self.db.execute_query(query, (id,))
+        self._invalidate_calendar(before)
         return True
     
+    def _calendar_scope(self, id):
+        """(user_id, start_date, end_date) do registo, para invalidar a cache do calendário"""
+        return self.db.fetch_one("SELECT user_id, start_date, end_date FROM timesheet WHERE id = ?", (id,))
+    
+    def _invalidate_calendar(self, *rows):
+        """Descarta os eventos do calendário do colaborador nos meses de cada registo (user_id, início, fim)"""
+        for row in rows:
+            if row is not None:
+                calendar_event_cache.invalidate_entries(self.db.db_file, *row)
+    
     def get_user_entries(self, user_id, start_date=None, end_date=None):
         """Obtém registros de um usuário com filtro de datas opcional"""
         query = "SELECT * FROM timesheet WHERE user_id = ?"
@@ -157,6 +398,11 @@ class TimesheetManagerSQL:
         return entries['hours'].sum()
 
 
+def _rate_id(value):
+    """rate_id como inteiro (None quando vazio)"""
+    return None if value is None or pd.isna(value) else int(value)
+
+
 class UserManager:
     def __init__(self):
         self.db = DatabaseManager()
@@ -165,6 +411,42 @@ class UserManager:
         """Gera hash de senha com SHA-256"""
         return hashlib.sha256(str(password).encode()).hexdigest()
     
+    def _sync_user_groups(self, conn, user_id, groups):
+        """Substitui as linhas de user_groups do utilizador pelas equipas indicadas (sem commit)
+        
+        groups é o valor da coluna utilizadores.groups (nomes ou ids das equipas).
+        """
+        _execute_in_transaction(conn, "DELETE FROM user_groups WHERE user_id = ?", (user_id,))
+        for position, group in enumerate(parse_groups_value(groups)):
+            _execute_in_transaction(
+                conn,
+                """INSERT OR IGNORE INTO user_groups (user_id, group_id, position)
+                SELECT ?, id, ? FROM groups WHERE group_name = ? OR CAST(id AS TEXT) = ?""",
+                (user_id, position, str(group), str(group))
+            )
+    
+    def _record_rate_assignment(self, conn, user_id, rate_id, valid_from):
+        """Regista em user_rate_history que o colaborador tem rate_id a partir de valid_from
+        
+        Períodos semiabertos [valid_from, valid_to), como em RateManager._record_rate_change:
+        o período em vigor é fechado em valid_from e os que começavam depois dessa
+        data são substituídos. Sem rate_id apenas fecha o período. Não faz commit.
+        """
+        valid_from = format_date_value(valid_from or date.today(), DATE_FORMAT)
+        _execute_in_transaction(conn, "DELETE FROM user_rate_history WHERE user_id = ? AND valid_from >= ?", (user_id, valid_from))
+        _execute_in_transaction(
+            conn,
+            "UPDATE user_rate_history SET valid_to = ? WHERE user_id = ? AND (valid_to IS NULL OR valid_to > ?)",
+            (valid_from, user_id, valid_from)
+        )
+        rate_id = _rate_id(rate_id)
+        if rate_id is not None:
+            _execute_in_transaction(
+                conn,
+                "INSERT INTO user_rate_history (user_id, rate_id, valid_from, valid_to, created_at) VALUES (?, ?, ?, NULL, ?)",
+                (user_id, rate_id, valid_from, datetime.now().isoformat())
+            )
+    
     def create(self, data):
         """Cria um novo usuário"""
         # Gerar hash da senha se fornecida
@@ -175,8 +457,20 @@ class UserManager:
         placeholders = ', '.join(['?'] * len(data))
         
         query = f"INSERT INTO utilizadores ({columns}) VALUES ({placeholders})"
-        cursor = self.db.execute_query(query, tuple(data.values()))
-        
+        with self.db._get_connection() as conn:
+            try:
+                cursor = _execute_in_transaction(conn, query, tuple(data.values()))
+                if 'groups' in data:
+                    self._sync_user_groups(conn, cursor.lastrowid, data['groups'])
+                # A rate atribuída na criação vale também para registos anteriores
+                if data.get('rate_id') is not None:
+                    self._record_rate_assignment(conn, cursor.lastrowid, data['rate_id'], RATE_HISTORY_START)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        
+        membership_index.invalidate()
         return cursor.lastrowid
     
     def read(self, id=None):
@@ -186,8 +480,13 @@ class UserManager:
         else:
             return self.db.query_to_df("SELECT * FROM utilizadores WHERE user_id = ?", (id,))
     
-    def update(self, id, data):
-        """Atualiza um usuário existente"""
+    def update(self, id, data, valid_from=None):
+        """Atualiza um usuário existente
+        
+        Uma mudança de rate_id vale a partir de valid_from (por omissão hoje): os
+        registos de horas anteriores continuam a ser valorizados com a rate que o
+        colaborador tinha na sua data (ver cost_engine).
+        """
         # REMOVER O AUTO-HASH - app.py já envia hash correto
         
         set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
@@ -197,13 +496,41 @@ class UserManager:
         params = list(data.values())
         params.append(id)
         
-        self.db.execute_query(query, params)
+        with self.db._get_connection() as conn:
+            try:
+                previous = conn.execute("SELECT rate_id FROM utilizadores WHERE user_id = ?", (id,)).fetchone()
+                _execute_in_transaction(conn, query, params)
+                if 'groups' in data:
+                    self._sync_user_groups(conn, id, data['groups'])
+                if 'rate_id' in data and previous is not None and _rate_id(previous[0]) != _rate_id(data['rate_id']):
+                    self._record_rate_assignment(conn, id, data['rate_id'], valid_from)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        
+        # O perfil em cache (ex.: hash da senha) e a pertença às equipas deixaram de ser válidos
+        user_profile_cache.invalidate(user_id=id)
+        membership_index.invalidate()
+        # O nome aparece nos títulos dos eventos do calendário
+        if 'First_Name' in data or 'Last_Name' in data:
+            calendar_event_cache.clear(self.db.db_file)
         return True
     
     def delete(self, id):
         """Exclui um usuário"""
-        query = "DELETE FROM utilizadores WHERE user_id = ?"
-        self.db.execute_query(query, (id,))
+        with self.db._get_connection() as conn:
+            try:
+                _execute_in_transaction(conn, "DELETE FROM utilizadores WHERE user_id = ?", (id,))
+                _execute_in_transaction(conn, "DELETE FROM user_groups WHERE user_id = ?", (id,))
+                _execute_in_transaction(conn, "DELETE FROM user_rate_history WHERE user_id = ?", (id,))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        user_profile_cache.invalidate(user_id=id)
+        membership_index.invalidate()
+        calendar_event_cache.clear(self.db.db_file)
         return True
     
     def login(self, email, password):
@@ -242,6 +569,7 @@ class GroupManager:
         
         query = f"INSERT INTO groups ({columns}) VALUES ({placeholders})"
         cursor = self.db.execute_query(query, tuple(data.values()))
+        membership_index.invalidate()
         
         return cursor.lastrowid
     
@@ -262,12 +590,21 @@ class GroupManager:
         params.append(id)
         
         self.db.execute_query(query, params)
+        # O índice de pertença guarda os nomes das equipas
+        membership_index.invalidate()
         return True
     
     def delete(self, id):
-        """Exclui um grupo"""
-        query = "DELETE FROM groups WHERE id = ?"
-        self.db.execute_query(query, (id,))
+        """Exclui um grupo (e a pertença dos utilizadores a esse grupo)"""
+        with self.db._get_connection() as conn:
+            try:
+                _execute_in_transaction(conn, "DELETE FROM groups WHERE id = ?", (id,))
+                _execute_in_transaction(conn, "DELETE FROM user_groups WHERE group_id = ?", (id,))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        membership_index.invalidate()
         return True
 
 
@@ -322,8 +659,15 @@ class ClientManager:
     
     def delete(self, id):
         """Exclui um cliente"""
-        query = "DELETE FROM clients WHERE client_id = ?"
-        self.db.execute_query(query, (id,))
+        with self.db._get_connection() as conn:
+            try:
+                _execute_in_transaction(conn, "DELETE FROM clients WHERE client_id = ?", (id,))
+                # As faturas do cliente deixam de contar na faturação agregada
+                refresh_revenue_rollup(conn)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
         return True
     
     def get_active_clients(self):
@@ -375,6 +719,8 @@ class ProjectManager:
             except (ValueError, TypeError):
                 data['total_cost'] = 0.0
         
+        normalize_dates(data, 'projects')
+        
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['?'] * len(data))
         
@@ -398,6 +744,8 @@ class ProjectManager:
             except (ValueError, TypeError):
                 data['hourly_rate'] = 0.0
         
+        normalize_dates(data, 'projects')
+        
         set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
         
         query = f"UPDATE projects SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE project_id = ?"
@@ -405,7 +753,19 @@ class ProjectManager:
         params = list(data.values())
         params.append(id)
         
-        self.db.execute_query(query, params)
+        with self.db._get_connection() as conn:
+            try:
+                _execute_in_transaction(conn, query, params)
+                # A faturação do projeto passa a contar para a nova equipa
+                if 'group_id' in data:
+                    refresh_revenue_rollup(conn)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        # O nome do projeto aparece nos títulos dos eventos do calendário
+        if 'project_name' in data:
+            calendar_event_cache.clear(self.db.db_file)
         return True
     
     def read(self, id=None):
@@ -417,8 +777,16 @@ class ProjectManager:
     
     def delete(self, id):
         """Exclui um projeto"""
-        query = "DELETE FROM projects WHERE project_id = ?"
-        self.db.execute_query(query, (id,))
+        with self.db._get_connection() as conn:
+            try:
+                _execute_in_transaction(conn, "DELETE FROM projects WHERE project_id = ?", (id,))
+                # As faturas do projeto deixam de contar na faturação agregada
+                refresh_revenue_rollup(conn)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        calendar_event_cache.clear(self.db.db_file)
         return True
     
     def get_active_projects(self):
@@ -517,17 +885,50 @@ class ActivityManager:
         return True
 
 
+# Início do primeiro período de rate_history: a rate que existia antes do
+# histórico vale para todos os registos anteriores à primeira alteração
+RATE_HISTORY_START = '1900-01-01'
+
+
 class RateManager:
     def __init__(self):
         self.db = DatabaseManager()
     
-    def create(self, data):
-        """Cria uma nova rate"""
+    def _record_rate_change(self, conn, rate_id, rate_cost, valid_from):
+        """Abre em rate_history um período com rate_cost a partir de valid_from
+        
+        Os períodos são semiabertos [valid_from, valid_to): o período em vigor é
+        fechado em valid_from e os que começavam depois dessa data são
+        substituídos. Não faz commit.
+        """
+        valid_from = format_date_value(valid_from or date.today(), DATE_FORMAT)
+        _execute_in_transaction(conn, "DELETE FROM rate_history WHERE rate_id = ? AND valid_from >= ?", (rate_id, valid_from))
+        _execute_in_transaction(
+            conn,
+            "UPDATE rate_history SET valid_to = ? WHERE rate_id = ? AND (valid_to IS NULL OR valid_to > ?)",
+            (valid_from, rate_id, valid_from)
+        )
+        _execute_in_transaction(
+            conn,
+            "INSERT INTO rate_history (rate_id, rate_cost, valid_from, valid_to, created_at) VALUES (?, ?, ?, NULL, ?)",
+            (rate_id, rate_cost, valid_from, datetime.now().isoformat())
+        )
+    
+    def create(self, data, valid_from=None):
+        """Cria uma nova rate (em vigor a partir de valid_from, por omissão hoje)"""
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['?'] * len(data))
         
         query = f"INSERT INTO rates ({columns}) VALUES ({placeholders})"
-        cursor = self.db.execute_query(query, tuple(data.values()))
+        with self.db._get_connection() as conn:
+            try:
+                cursor = _execute_in_transaction(conn, query, tuple(data.values()))
+                if data.get('rate_cost') is not None:
+                    self._record_rate_change(conn, cursor.lastrowid, data['rate_cost'], valid_from)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
         
         return cursor.lastrowid
     
@@ -538,8 +939,22 @@ class RateManager:
         else:
             return self.db.query_to_df("SELECT * FROM rates WHERE rate_id = ?", (id,))
     
-    def update(self, id, data):
-        """Atualiza uma rate existente"""
+    def read_history(self, id=None):
+        """Lê os períodos de vigência das rates (de uma rate ou de todas)"""
+        if id is None:
+            return self.db.query_to_df("SELECT * FROM rate_history ORDER BY rate_id, valid_from")
+        else:
+            return self.db.query_to_df(
+                "SELECT * FROM rate_history WHERE rate_id = ? ORDER BY valid_from", (id,)
+            )
+    
+    def update(self, id, data, valid_from=None):
+        """Atualiza uma rate existente
+        
+        Uma alteração de rate_cost vale a partir de valid_from (por omissão hoje):
+        os registos de horas anteriores continuam a ser valorizados com a rate
+        que estava em vigor na sua data (ver cost_engine).
+        """
         set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
         
         query = f"UPDATE rates SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE rate_id = ?"
@@ -547,13 +962,29 @@ class RateManager:
         params = list(data.values())
         params.append(id)
         
-        self.db.execute_query(query, params)
+        with self.db._get_connection() as conn:
+            try:
+                previous = conn.execute("SELECT rate_cost FROM rates WHERE rate_id = ?", (id,)).fetchone()
+                _execute_in_transaction(conn, query, params)
+                new_cost = data.get('rate_cost')
+                if new_cost is not None and (previous is None or previous[0] is None or float(previous[0]) != float(new_cost)):
+                    self._record_rate_change(conn, id, new_cost, valid_from)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
         return True
     
     def delete(self, id):
-        """Exclui uma rate"""
-        query = "DELETE FROM rates WHERE rate_id = ?"
-        self.db.execute_query(query, (id,))
+        """Exclui uma rate (e o respetivo histórico)"""
+        with self.db._get_connection() as conn:
+            try:
+                _execute_in_transaction(conn, "DELETE FROM rates WHERE rate_id = ?", (id,))
+                _execute_in_transaction(conn, "DELETE FROM rate_history WHERE rate_id = ?", (id,))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
         return True
 
 
@@ -572,12 +1003,15 @@ class AbsenceManager:
             data['created_at'] = current_time
         if 'updated_at' not in data:
             data['updated_at'] = current_time
+        
+        normalize_dates(data, 'absences')
             
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['?'] * len(data))
         
         query = f"INSERT INTO absences ({columns}) VALUES ({placeholders})"
         cursor = self.db.execute_query(query, tuple(data.values()))
+        self._invalidate_calendar((data.get('start_date'), data.get('end_date'), data.get('absence_type')))
         
         return cursor.lastrowid
     
@@ -590,6 +1024,8 @@ class AbsenceManager:
     
     def update(self, id, data):
         """Atualiza um registro de ausência"""
+        normalize_dates(data, 'absences')
+        
         set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
         
         query = f"UPDATE absences SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE absence_id = ?"
@@ -597,15 +1033,30 @@ class AbsenceManager:
         params = list(data.values())
         params.append(id)
         
+        before = self._calendar_scope(id)
         self.db.execute_query(query, params)
+        self._invalidate_calendar(before, self._calendar_scope(id))
         return True
     
     def delete(self, id):
         """Exclui um registro de ausência"""
+        before = self._calendar_scope(id)
         query = "DELETE FROM absences WHERE absence_id = ?"
         self.db.execute_query(query, (id,))
+        self._invalidate_calendar(before)
         return True
     
+    def _calendar_scope(self, id):
+        """(start_date, end_date, absence_type) da ausência, para invalidar a cache do calendário"""
+        return self.db.fetch_one("SELECT start_date, end_date, absence_type FROM absences WHERE absence_id = ?", (id,))
+    
+    def _invalidate_calendar(self, *rows):
+        """Descarta as ausências do calendário nos meses de cada registo (e os feriados do ano, se for feriado)"""
+        for row in rows:
+            if row is not None:
+                start_date, end_date, absence_type = row
+                calendar_event_cache.invalidate_absences(self.db.db_file, start_date, end_date, holiday=is_holiday(absence_type))
+    
     def get_user_absences(self, user_id):
         """Obtém ausências de um usuário"""
         query = "SELECT * FROM absences WHERE user_id = ?"
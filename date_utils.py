@@ -0,0 +1,89 @@
+"""
+Formato canónico das datas guardadas na base de dados.
+
+As datas de timesheet, projects e absences passaram a ser guardadas sempre em
+ISO-8601 com formato fixo. Assim a leitura pode usar um parser de formato fixo
+(muito mais rápido) em vez de pd.to_datetime(..., format='mixed').
+"""
+from datetime import date, datetime
+import pandas as pd
+
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+# Formato canónico de cada coluna de data, por tabela
+DATE_COLUMNS = {
+    'timesheet': {'start_date': DATETIME_FORMAT, 'end_date': DATETIME_FORMAT},
+    'projects': {'start_date': DATE_FORMAT, 'end_date': DATE_FORMAT},
+    'absences': {'start_date': DATE_FORMAT, 'end_date': DATE_FORMAT},
+}
+
+
+def format_date_value(value, fmt=DATETIME_FORMAT):
+    """Converte um valor de data (str, date, datetime, Timestamp) para o formato canónico
+
+    Valores vazios ou que não sejam datas são devolvidos sem alteração.
+    """
+    if value is None or value == '':
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.strftime(fmt)
+    if isinstance(value, str):
+        # Caminho rápido: o valor já está no formato canónico
+        try:
+            datetime.strptime(value, fmt)
+            return value
+        except ValueError:
+            pass
+    try:
+        parsed = pd.to_datetime(value, format='mixed')
+    except (ValueError, TypeError):
+        return value
+    if pd.isna(parsed):
+        return value
+    return parsed.strftime(fmt)
+
+
+def normalize_dates(data, table_name):
+    """Normaliza, no dicionário de dados, as colunas de data de uma tabela"""
+    for column, fmt in DATE_COLUMNS.get(table_name, {}).items():
+        if column in data:
+            data[column] = format_date_value(data[column], fmt)
+    return data
+
+
+def normalize_date_series(values, fmt=DATETIME_FORMAT):
+    """Versão vetorizada de format_date_value para uma coluna inteira"""
+    if values.dtype.kind == 'M':
+        return values.dt.strftime(fmt).where(values.notna(), None)
+    # Caminho rápido: valores já no formato canónico não passam pelo parser genérico
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+    leftover = parsed.isna() & values.notna()
+    if not leftover.any():
+        return values
+    parsed[leftover] = pd.to_datetime(values[leftover], format='mixed', errors='coerce')
+    formatted = parsed.dt.strftime(fmt)
+    # Valores que não foram reconhecidos como data ficam como estavam
+    return formatted.where(parsed.notna(), values)
+
+
+def parse_dates(values, errors='raise'):
+    """Converte datas no formato canónico para datetime64
+
+    Usa o parser ISO-8601 de formato fixo; só os valores que ainda não estejam
+    no formato canónico (dados antigos) passam pelo parser format='mixed'.
+    """
+    if isinstance(values, pd.Series):
+        if values.dtype.kind == 'M':
+            return values
+        parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+        leftover = parsed.isna() & values.notna()
+        if leftover.any():
+            parsed[leftover] = pd.to_datetime(values[leftover], format='mixed', errors=errors)
+        return parsed
+
+    try:
+        return pd.to_datetime(values, format='ISO8601')
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, format='mixed', errors=errors)
@@ -0,0 +1,120 @@
+"""
+Página de administração com o estado da camada de acesso a dados.
+"""
+import streamlit as st
+import pandas as pd
+
+from query_cache import USE_QUERY_CACHE, query_cache
+from page_data import clear_page_data, time_page_loads
+from query_log import SLOW_QUERY_MS, clear_query_log, current_session_id, get_query_log, query_stats
+
+
+def show_query_cache_stats():
+    """Mostra os contadores e as entradas da cache de queries"""
+    st.subheader("Cache de queries")
+
+    if not USE_QUERY_CACHE:
+        st.info("A cache de queries está desligada (RTIME_QUERY_CACHE=0).")
+        return
+
+    stats = query_cache.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", f"{stats['hits']:,}")
+    col2.metric("Misses", f"{stats['misses']:,}")
+    col3.metric("Taxa de acerto", f"{stats['hit_rate']:.1%}")
+    col4.metric("Memória", f"{stats['memory_mb']:.1f} MB")
+    st.caption(
+        f"{stats['entries']} entradas em cache · {stats['invalidations']} invalidadas por escritas · "
+        f"{stats['evictions']} removidas por LRU/limite de memória"
+    )
+
+    entries = query_cache.entries()
+    if entries:
+        entries_df = pd.DataFrame(entries, columns=['Query', 'Parâmetros', 'Linhas', 'MB'])
+        entries_df['Parâmetros'] = entries_df['Parâmetros'].astype(str)
+        st.dataframe(entries_df, use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    if col1.button("Limpar cache"):
+        query_cache.clear()
+        st.rerun()
+    if col2.button("Repor contadores"):
+        query_cache.reset_stats()
+        st.rerun()
+
+
+def show_page_data_timings():
+    """Compara o carregamento das tabelas de cada página a frio e a quente (page_data)"""
+    st.subheader("Tabelas das páginas")
+    st.caption(
+        "As páginas leem as tabelas através de page_data.load_table (st.cache_data com a versão "
+        "dos dados na chave). A medição esvazia essa cache antes de cada página."
+    )
+
+    col1, col2 = st.columns(2)
+    if col1.button("Medir tempos a frio/a quente"):
+        timings = time_page_loads()
+        timings.columns = ['Página', 'Tabelas', 'Linhas', 'A frio (ms)', 'A quente (ms)', 'Speedup']
+        st.dataframe(timings.round(1), use_container_width=True, hide_index=True)
+    if col2.button("Limpar tabelas em cache"):
+        clear_page_data()
+        st.rerun()
+
+
+def show_query_log():
+    """Mostra as queries mais pesadas (tempo total e número de chamadas) e as mais lentas"""
+    st.subheader("Queries executadas")
+
+    only_session = st.checkbox("Apenas a minha sessão", value=True)
+    session_id = current_session_id() if only_session else None
+    stats = query_stats(session_id)
+
+    if stats.empty:
+        st.info("Ainda não há queries registadas.")
+        return
+
+    columns = {
+        'sql': 'Query', 'calls': 'Chamadas', 'cache_hits': 'Da cache', 'total_ms': 'Total (ms)',
+        'avg_ms': 'Média (ms)', 'max_ms': 'Máx. (ms)', 'rows': 'Linhas', 'pages': 'Páginas',
+    }
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Top por tempo total**")
+        st.dataframe(
+            stats.sort_values('total_ms', ascending=False).head(20).rename(columns=columns).round(1),
+            use_container_width=True, hide_index=True
+        )
+    with col2:
+        st.markdown("**Top por número de chamadas**")
+        st.dataframe(
+            stats.sort_values('calls', ascending=False).head(20).rename(columns=columns).round(1),
+            use_container_width=True, hide_index=True
+        )
+
+    log_df = get_query_log(session_id)
+    by_page = log_df[~log_df['cached']].groupby('page')['ms'].agg(['size', 'sum']).reset_index()
+    by_page.columns = ['Página', 'Queries', 'Total (ms)']
+    st.markdown("**Tempo na base de dados por página**")
+    st.dataframe(by_page.sort_values('Total (ms)', ascending=False).round(1), use_container_width=True, hide_index=True)
+
+    slow = log_df[(log_df['ms'] >= SLOW_QUERY_MS) & ~log_df['cached']]
+    st.markdown(f"**Queries lentas (≥ {SLOW_QUERY_MS:.0f} ms, também registadas em app.log)**")
+    if slow.empty:
+        st.caption("Nenhuma.")
+    else:
+        st.dataframe(
+            slow[['timestamp', 'ms', 'rows', 'sql', 'params', 'function', 'page']].iloc[::-1].round(1),
+            use_container_width=True, hide_index=True
+        )
+
+    if st.button("Limpar registo de queries"):
+        clear_query_log()
+        st.rerun()
+
+
+def database_admin_page():
+    """Página de administração da base de dados"""
+    st.title("Base de Dados")
+    show_query_cache_stats()
+    show_page_data_timings()
+    show_query_log()
@@ -0,0 +1,1175 @@
+"""
+Micro-benchmarks da camada de acesso a dados.
+
+Cria bases de dados SQLite sintéticas numa pasta temporária (nunca toca em
+timetracker.db) e mede o desempenho das várias estratégias de acesso.
+
+Uso:
+    python db_benchmark.py                 # corre todos os benchmarks
+    python db_benchmark.py connection_pool # corre apenas um benchmark
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import tracemalloc
+import calendar
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+from database_manager import RATE_HISTORY_START, DatabaseManager, TimesheetManagerSQL, close_pooled_connections
+from schema_registry import coerce_dtypes
+from date_utils import DATETIME_FORMAT, normalize_date_series, parse_dates
+from timesheet_import import import_file
+from query_cache import query_cache
+from columnar_fetch import read_sql_columnar
+from query_log import query_count
+from rate_resolver import RateResolver, calculate_entries_cost
+from cost_engine import add_entry_costs, costs_by_project
+from business_calendar import BusinessCalendar, get_feriados_portugal
+from budget_proration import prorate_budget
+from collaborator_indicators import TARGET_BILLABLE, TARGET_OCCUPATION, compute_collaborator_indicators
+from project_indicators import compute_project_indicators
+from revenue_rollup import compute_revenue_indicators, load_revenue_rollup, refresh_revenue_rollup
+from group_membership import membership_index
+from productivity_indicators import (
+    absence_days_by_user, compute_project_risk, compute_team_productivity, compute_user_productivity,
+    load_period_absences, load_period_entries, user_team_table
+)
+
+
+def create_sample_db(db_file, n_entries=10000, n_users=50, n_projects=200, seed=42):
+    """Cria uma base de dados sintética com a estrutura das tabelas principais"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_file)
+
+    conn.executescript("""
+    DROP TABLE IF EXISTS timesheet;
+    DROP TABLE IF EXISTS utilizadores;
+    DROP TABLE IF EXISTS projects;
+    DROP TABLE IF EXISTS rates;
+    DROP TABLE IF EXISTS groups;
+    DROP TABLE IF EXISTS clients;
+    DROP TABLE IF EXISTS absences;
+    CREATE TABLE timesheet (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        client_id INTEGER,
+        project_id INTEGER,
+        category_id INTEGER,
+        task_id INTEGER,
+        start_date TEXT,
+        end_date TEXT,
+        hours REAL,
+        billable INTEGER,
+        overtime INTEGER,
+        description TEXT,
+        rate_value REAL,
+        created_at TEXT,
+        updated_at TEXT
+    );
+    CREATE TABLE utilizadores (
+        user_id INTEGER PRIMARY KEY,
+        First_Name TEXT,
+        Last_Name TEXT,
+        email TEXT,
+        password TEXT,
+        role TEXT,
+        groups TEXT,
+        rate_id INTEGER,
+        active INTEGER
+    );
+    CREATE TABLE projects (
+        project_id INTEGER PRIMARY KEY,
+        project_name TEXT,
+        client_id INTEGER,
+        group_id INTEGER,
+        project_type TEXT,
+        start_date TEXT,
+        end_date TEXT,
+        total_hours REAL,
+        total_cost REAL,
+        hourly_rate REAL,
+        status TEXT
+    );
+    CREATE TABLE rates (
+        rate_id INTEGER PRIMARY KEY,
+        rate_name TEXT,
+        rate_cost REAL
+    );
+    CREATE TABLE groups (
+        id INTEGER PRIMARY KEY,
+        group_name TEXT,
+        active INTEGER
+    );
+    CREATE TABLE clients (
+        client_id INTEGER PRIMARY KEY,
+        name TEXT,
+        group_id INTEGER,
+        active INTEGER
+    );
+    CREATE TABLE absences (
+        absence_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        start_date TEXT,
+        end_date TEXT,
+        absence_type TEXT,
+        description TEXT
+    );
+    """)
+
+    conn.executemany(
+        "INSERT INTO rates (rate_id, rate_name, rate_cost) VALUES (?, ?, ?)",
+        [(1, 'Tech', 95.80), (2, 'LRB', 27.88), (3, 'Consultoria', 120.0), (4, 'Júnior', 45.0)]
+    )
+
+    conn.executemany(
+        "INSERT INTO groups (id, group_name, active) VALUES (?, ?, 1)",
+        [(1, 'Tech'), (2, 'LRB'), (3, 'Consultoria')]
+    )
+    conn.executemany(
+        "INSERT INTO clients (client_id, name, group_id, active) VALUES (?, ?, ?, 1)",
+        [(c, f"Cliente {c}", int(c % 3) + 1) for c in range(1, 31)]
+    )
+
+    conn.executemany(
+        "INSERT INTO utilizadores VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (u, f"Nome{u}", f"Apelido{u}", f"user{u}@empresa.pt", "x" * 64, 'user',
+             str([['Tech', 'LRB', 'Consultoria'][u % 3]]), int(u % 4) + 1, 1)
+            for u in range(1, n_users + 1)
+        ]
+    )
+
+    conn.executemany(
+        "INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (p, f"Projeto {p}", int(p % 30) + 1, int(p % 3) + 1, 'Desenvolvimento',
+             '2023-01-02', '2026-12-31', 2000.0, 100000.0, 60.0, 'active')
+            for p in range(1, n_projects + 1)
+        ]
+    )
+
+    # Uma ausência de 1 a 5 dias por colaborador e mês
+    absence_rows = []
+    for u in range(1, n_users + 1):
+        for month_start in pd.date_range('2023-01-01', '2025-12-01', freq='MS'):
+            start = month_start + pd.Timedelta(days=int(rng.integers(0, 24)))
+            end = start + pd.Timedelta(days=int(rng.integers(0, 5)))
+            absence_rows.append((u, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), 'Férias', 'Ausência de teste'))
+    conn.executemany(
+        "INSERT INTO absences (user_id, start_date, end_date, absence_type, description) VALUES (?, ?, ?, ?, ?)",
+        absence_rows
+    )
+
+    base = np.datetime64('2023-01-02T09:00')
+    offsets = rng.integers(0, 3 * 365, n_entries).astype('timedelta64[D]')
+    starts = pd.to_datetime(base + offsets)
+    hours = rng.choice([1.0, 2.0, 4.0, 8.0], n_entries)
+    ends = starts + pd.to_timedelta(hours, unit='h')
+    user_ids = rng.integers(1, n_users + 1, n_entries)
+    project_ids = rng.integers(1, n_projects + 1, n_entries)
+    billable = rng.integers(0, 2, n_entries)
+    overtime = (rng.random(n_entries) < 0.05).astype(int)
+    start_str = starts.strftime('%Y-%m-%d %H:%M:%S')
+    end_str = ends.strftime('%Y-%m-%d %H:%M:%S')
+
+    rows = (
+        (int(user_ids[i]), int(project_ids[i] % 30) + 1, int(project_ids[i]), 1, 1,
+         start_str[i], end_str[i], float(hours[i]), int(billable[i]), int(overtime[i]),
+         'Registo de teste', None, start_str[i], start_str[i])
+        for i in range(n_entries)
+    )
+    conn.executemany(
+        """INSERT INTO timesheet (user_id, client_id, project_id, category_id, task_id,
+        start_date, end_date, hours, billable, overtime, description, rate_value,
+        created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows
+    )
+    conn.commit()
+    conn.close()
+    return db_file
+
+
+def sample_db(tmp_dir, n_entries):
+    """Retorna (criando se necessário) uma base de dados sintética com n_entries registos"""
+    db_file = os.path.join(tmp_dir, f'benchmark_{n_entries}.db')
+    if not os.path.exists(db_file):
+        print(f"A criar base de dados sintética com {n_entries:,} registos em {db_file}...")
+        create_sample_db(db_file, n_entries)
+    return db_file
+
+
+def _measure(func):
+    """Executa func() uma vez e devolve (resultado, segundos, pico de memória em MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def _time_calls(func, iterations):
+    """Executa func() várias vezes e devolve a latência média em milissegundos"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def benchmark_connection_pool(tmp_dir, iterations=300):
+    """Compara a latência por query entre conexão-por-chamada e conexão persistente (pool)"""
+    print("\n=== Conexão por chamada vs. conexão persistente (WAL) ===")
+    db_file = sample_db(tmp_dir, 10000)
+    results = []
+
+    for pooled in (False, True):
+        db = DatabaseManager(db_file, pooled=pooled)
+        label = "pool (WAL)" if pooled else "conexão por chamada"
+
+        point = _time_calls(
+            lambda: db.fetch_one("SELECT * FROM utilizadores WHERE user_id = ?", (7,)),
+            iterations
+        )
+        small_df = _time_calls(
+            lambda: db.query_to_df("SELECT * FROM rates", use_cache=False),
+            iterations
+        )
+        user_df = _time_calls(
+            lambda: db.query_to_df("SELECT * FROM timesheet WHERE user_id = ?", (7,), use_cache=False),
+            max(iterations // 10, 1)
+        )
+        results.append((label, point, small_df, user_df))
+
+    close_pooled_connections()
+
+    print(f"{'modo':<22}{'fetch_one':>12}{'rates→df':>12}{'user→df':>12}   (ms/query)")
+    for label, point, small_df, user_df in results:
+        print(f"{label:<22}{point:>12.3f}{small_df:>12.3f}{user_df:>12.3f}")
+
+    baseline, pooled = results
+    print(f"Ganho em fetch_one: {baseline[1] / pooled[1]:.1f}x")
+    return results
+
+
+def _legacy_coerce(df):
+    """Conversão de tipos usada por query_to_df antes do schema_registry (referência)"""
+    for col in df.columns:
+        if col.endswith('_id') or col == 'id':
+            try:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+                df[col] = df[col].fillna(0).astype('Int64')
+            except Exception as e:
+                print(f"Erro ao converter coluna {col}: {e}")
+        elif col in ['active', 'billable', 'overtime', 'approved']:
+            try:
+                df[col] = df[col].astype('bool')
+            except:
+                try:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                    df[col] = df[col].fillna(0).astype('bool')
+                except Exception as e:
+                    print(f"Erro ao converter coluna booleana {col}: {e}")
+    return df
+
+
+def benchmark_schema_registry(tmp_dir, n_entries=1000000):
+    """Compara a conversão de tipos antiga com o registo declarativo num SELECT * FROM timesheet"""
+    print(f"\n=== Conversão de tipos: ciclo antigo vs. schema_registry ({n_entries:,} registos) ===")
+    db_file = sample_db(tmp_dir, n_entries)
+    db = DatabaseManager(db_file)
+
+    start = time.perf_counter()
+    with db._get_connection() as conn:
+        raw_df = pd.read_sql_query("SELECT * FROM timesheet", conn)
+    read_time = time.perf_counter() - start
+    print(f"Leitura (pd.read_sql_query, comum aos dois modos): {read_time:.2f}s")
+
+    results = []
+    for label, coerce in (("ciclo antigo", _legacy_coerce), ("schema_registry", coerce_dtypes)):
+        df = raw_df.copy()
+        start = time.perf_counter()
+        coerce(df)
+        elapsed = time.perf_counter() - start
+        # segunda passagem só para medir o pico de memória (tracemalloc abranda a execução)
+        _, _, peak = _measure(lambda: coerce(raw_df.copy()))
+        frame_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+        results.append((label, elapsed, peak, frame_mb))
+
+    print(f"{'modo':<18}{'conversão (s)':>15}{'pico (MB)':>12}{'DataFrame (MB)':>16}")
+    for label, elapsed, peak, frame_mb in results:
+        print(f"{label:<18}{elapsed:>15.3f}{peak:>12.1f}{frame_mb:>16.1f}")
+
+    # Com parse_dates=True as colunas DATE têm de sair como datetime64
+    dated = coerce_dtypes(raw_df.head(1000).copy(), parse_dates=True)
+    text_dates = [col for col in ('start_date', 'end_date') if not pd.api.types.is_datetime64_any_dtype(dated[col])]
+    if text_dates:
+        raise RuntimeError(f"coerce_dtypes(parse_dates=True) não converteu {', '.join(text_dates)}")
+    return results
+
+
+def benchmark_canonical_dates(tmp_dir, n_entries=1000000):
+    """Compara o parse de datas em texto livre (format='mixed') com o formato canónico"""
+    print(f"\n=== Datas em texto livre vs. ISO-8601 canónico ({n_entries:,} valores) ===")
+    stamps = pd.Series(pd.date_range('2021-01-01 09:00', periods=n_entries, freq='17min'))
+    # Mistura de formatos como a que existia na base de dados antes da migração
+    formats = ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d', '%Y-%m-%d %H:%M']
+    messy = stamps.dt.strftime(formats[0])
+    for i, fmt in enumerate(formats[1:], start=1):
+        mask = (np.arange(n_entries) % len(formats)) == i
+        messy[mask] = stamps[mask].dt.strftime(fmt)
+
+    start = time.perf_counter()
+    pd.to_datetime(messy, format='mixed')
+    mixed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    canonical = normalize_date_series(messy, DATETIME_FORMAT)
+    migration_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parse_dates(canonical)
+    canonical_time = time.perf_counter() - start
+
+    print(f"format='mixed' (texto livre):     {mixed_time * 1000:>10.1f} ms por leitura")
+    print(f"parse_dates (formato canónico):   {canonical_time * 1000:>10.1f} ms por leitura")
+    print(f"migração única (normalização):    {migration_time * 1000:>10.1f} ms")
+    return mixed_time, canonical_time, migration_time
+
+
+def benchmark_bulk_import(tmp_dir, n_entries=100000, n_single=2000):
+    """Compara create() registo a registo com create_many() e mede import_file() de um CSV"""
+    print("\n=== Inserção de horas: create() vs. create_many() vs. import_file() ===")
+    db_file = create_sample_db(os.path.join(tmp_dir, 'benchmark_import.db'), n_entries=0)
+    manager = TimesheetManagerSQL(db_file)
+
+    rng = np.random.default_rng(7)
+    starts = pd.date_range('2024-01-01 09:00', periods=n_entries, freq='7min')
+    entries = pd.DataFrame({
+        'user_id': rng.integers(1, 51, n_entries),
+        'client_id': 1,
+        'project_id': rng.integers(1, 201, n_entries),
+        'start_date': starts.strftime(DATETIME_FORMAT),
+        'end_date': (starts + pd.Timedelta(hours=2)).strftime(DATETIME_FORMAT),
+        'hours': 2.0,
+        'billable': rng.integers(0, 2, n_entries),
+        'overtime': 0,
+        'description': 'Registo importado',
+    })
+
+    records = entries.head(n_single).to_dict('records')
+    start = time.perf_counter()
+    for record in records:
+        manager.create({key: value.item() if hasattr(value, 'item') else value for key, value in record.items()})
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manager.create_many(entries)
+    many_time = time.perf_counter() - start
+
+    # Ficheiro CSV como os exportados do Excel (datas dia/mês, referências por email/nome)
+    csv_file = os.path.join(tmp_dir, 'horas.csv')
+    pd.DataFrame({
+        'Utilizador': 'user' + entries['user_id'].astype(str) + '@empresa.pt',
+        'Projeto': 'Projeto ' + entries['project_id'].astype(str),
+        'Data Início': starts.strftime('%d/%m/%Y %H:%M'),
+        'Horas': entries['hours'],
+        'Faturável': np.where(entries['billable'] == 1, 'Sim', 'Não'),
+    }).to_csv(csv_file, index=False, sep=';')
+    result = import_file(csv_file, db_file=db_file)
+
+    print(f"create() por registo:  {single_time / n_single * 1000:>8.3f} ms/registo "
+          f"(estimativa para {n_entries:,}: {single_time / n_single * n_entries:.0f}s)")
+    print(f"create_many():         {many_time / n_entries * 1000:>8.3f} ms/registo ({many_time:.2f}s)")
+    print(f"import_file() CSV:     {result['seconds'] / n_entries * 1000:>8.3f} ms/registo "
+          f"({result['seconds']:.2f}s, {result['inserted']:,} inseridos, {len(result['rejected'])} rejeitados)")
+    return single_time, many_time, result['seconds']
+
+
+def benchmark_query_cache(tmp_dir, iterations=200):
+    """Compara leituras das tabelas de referência com e sem a cache de queries"""
+    print("\n=== Tabelas de referência: leitura direta vs. cache de queries ===")
+    db_file = sample_db(tmp_dir, 10000)
+    db = DatabaseManager(db_file)
+    queries = ["SELECT * FROM projects", "SELECT * FROM utilizadores", "SELECT * FROM rates"]
+
+    query_cache.reset_stats()
+    results = []
+    for query in queries:
+        direct = _time_calls(lambda: db.query_to_df(query, use_cache=False), iterations)
+        cached = _time_calls(lambda: db.query_to_df(query), iterations)
+        results.append((query, direct, cached))
+
+    print(f"{'query':<32}{'direta':>10}{'cache':>10}   (ms/query)")
+    for query, direct, cached in results:
+        print(f"{query:<32}{direct:>10.3f}{cached:>10.3f}")
+    stats = query_cache.stats()
+    print(f"hits={stats['hits']} misses={stats['misses']} memória={stats['memory_mb']:.2f} MB")
+    return results
+
+
+def benchmark_columnar_fetch(tmp_dir, sizes=(100000, 1000000, 5000000), max_traced=1000000):
+    """Compara pd.read_sql_query com a leitura colunar (fetchmany + NumPy) em SELECT * FROM timesheet"""
+    print("\n=== Leitura de timesheet: pd.read_sql_query vs. columnar_fetch ===")
+    engines = (
+        ("pandas", lambda conn, query: pd.read_sql_query(query, conn)),
+        ("numpy", read_sql_columnar),
+    )
+    results = []
+    for n_entries in sizes:
+        db_file = sample_db(tmp_dir, n_entries)
+        conn = sqlite3.connect(db_file)
+        for label, read in engines:
+            start = time.perf_counter()
+            df = coerce_dtypes(read(conn, "SELECT * FROM timesheet"))
+            elapsed = time.perf_counter() - start
+            del df
+            # pico de memória numa segunda passagem (tracemalloc abranda a execução)
+            peak = None
+            if n_entries <= max_traced:
+                _, _, peak = _measure(lambda: coerce_dtypes(read(conn, "SELECT * FROM timesheet")))
+            results.append((n_entries, label, elapsed, n_entries / elapsed, peak))
+        conn.close()
+
+    print(f"{'registos':>10}  {'motor':<8}{'tempo (s)':>12}{'linhas/s':>14}{'pico (MB)':>12}")
+    for n_entries, label, elapsed, throughput, peak in results:
+        peak_text = f"{peak:>12.0f}" if peak is not None else f"{'-':>12}"
+        print(f"{n_entries:>10,}  {label:<8}{elapsed:>12.2f}{throughput:>14,.0f}{peak_text}")
+    return results
+
+
+# Número máximo de queries para resolver as rates de um projeto (regressão)
+MAX_RATE_QUERIES = 5
+
+
+def _legacy_entries_cost(entries, db):
+    """Custo de projeto com duas queries por registo, como em project_reports antes do RateResolver (referência)"""
+    custo_realizado = 0
+    for _, entry in entries.iterrows():
+        rate_value = None
+        if not pd.isna(entry['rate_value']):
+            rate_value = float(entry['rate_value'])
+        else:
+            user_info = db.query_to_df(
+                f"SELECT rate_id FROM utilizadores WHERE user_id = {entry['user_id']}", use_cache=False
+            )
+            if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
+                rate_info = db.query_to_df(
+                    f"SELECT rate_cost FROM rates WHERE rate_id = {user_info['rate_id'].iloc[0]}", use_cache=False
+                )
+                if not rate_info.empty:
+                    rate_value = float(rate_info['rate_cost'].iloc[0])
+        if rate_value:
+            cost = float(entry['hours']) * rate_value
+            custo_realizado += cost * 2 if entry['overtime'] else cost
+    return custo_realizado
+
+
+def benchmark_rate_resolver(tmp_dir, n_entries=20000):
+    """Custo de um projeto com n_entries registos: queries por registo vs. RateResolver"""
+    print(f"\n=== Custo de projeto com {n_entries:,} registos: queries por registo vs. RateResolver ===")
+    db_file = os.path.join(tmp_dir, f'benchmark_project_{n_entries}.db')
+    if not os.path.exists(db_file):
+        create_sample_db(db_file, n_entries, n_projects=1)
+    db = DatabaseManager(db_file)
+    entries = db.query_to_df("SELECT * FROM timesheet WHERE project_id = ?", (1,), use_cache=False)
+
+    results = []
+    for label, compute in (
+        ("queries por registo", lambda: _legacy_entries_cost(entries, db)),
+        ("RateResolver", lambda: calculate_entries_cost(entries, RateResolver(db))[0]),
+    ):
+        logged_before = query_count()
+        start = time.perf_counter()
+        cost = compute()
+        elapsed = time.perf_counter() - start
+        queries = query_count() - logged_before
+        results.append((label, elapsed, queries, cost))
+
+    print(f"{'modo':<22}{'tempo (s)':>12}{'queries':>10}{'custo':>16}")
+    for label, elapsed, queries, cost in results:
+        print(f"{label:<22}{elapsed:>12.3f}{queries:>10,}{cost:>16,.2f}")
+
+    (_, _, _, legacy_cost), (_, _, resolver_queries, resolver_cost) = results
+    if abs(legacy_cost - resolver_cost) > 0.01:
+        raise RuntimeError(f"Custos diferentes: {legacy_cost:.2f} vs {resolver_cost:.2f}")
+    if resolver_queries > MAX_RATE_QUERIES:
+        raise RuntimeError(f"Regressão: {resolver_queries} queries para resolver as rates (máximo {MAX_RATE_QUERIES})")
+    return results
+
+
+def _legacy_project_costs(timesheet_df, users_df, rates_df):
+    """Custo por projeto com filtro de utilizadores/rates por registo, como em show_project_indicators antes do cost_engine (referência)"""
+    costs = {}
+    for project_id in timesheet_df['project_id'].unique():
+        project_cost = 0
+        for _, entry in timesheet_df[timesheet_df['project_id'] == project_id].iterrows():
+            rate_value = None
+            if not pd.isna(entry['rate_value']):
+                rate_value = float(entry['rate_value'])
+            else:
+                user_info = users_df[users_df['user_id'] == entry['user_id']]
+                if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
+                    rate_info = rates_df[rates_df['rate_id'] == user_info['rate_id'].iloc[0]]
+                    if not rate_info.empty:
+                        rate_value = float(rate_info['rate_cost'].iloc[0])
+            if rate_value:
+                cost = float(entry['hours']) * rate_value
+                project_cost += cost * 2 if entry['overtime'] else cost
+        costs[project_id] = project_cost
+    return pd.Series(costs).sort_index()
+
+
+def benchmark_project_costs(tmp_dir, n_entries=10000):
+    """Custo por projeto: ciclo por registo com filtro de utilizadores vs. uma passagem vetorizada"""
+    print(f"\n=== Custo por projeto com {n_entries:,} registos: ciclo por registo vs. cost_engine ===")
+    db = DatabaseManager(sample_db(tmp_dir, n_entries))
+    timesheet_df = db.query_to_df("SELECT * FROM timesheet", use_cache=False)
+    users_df = db.query_to_df("SELECT * FROM utilizadores", use_cache=False)
+    rates_df = db.query_to_df("SELECT * FROM rates", use_cache=False)
+
+    def vectorized():
+        costs = costs_by_project(add_entry_costs(timesheet_df, users_df, rates_df))
+        return costs.set_index('project_id')['cost'].sort_index()
+
+    start = time.perf_counter()
+    legacy = _legacy_project_costs(timesheet_df, users_df, rates_df)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    engine = vectorized()
+    engine_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}{'custo total':>18}")
+    print(f"{'ciclo por registo':<26}{legacy_seconds:>12.3f}{legacy.sum():>18,.2f}")
+    print(f"{'cost_engine':<26}{engine_seconds:>12.3f}{engine.sum():>18,.2f}")
+    print(f"Speedup: {legacy_seconds / engine_seconds:.0f}x")
+
+    if not np.allclose(legacy.to_numpy(), engine.reindex(legacy.index).to_numpy()):
+        raise RuntimeError("Custos por projeto diferentes entre o ciclo por registo e o cost_engine")
+    return legacy_seconds, engine_seconds
+
+
+def _legacy_reassigned_costs(timesheet_df, user_rate_history, rates_df):
+    """Custo registo a registo com a rate que o colaborador tinha na data do registo (referência)"""
+    rate_costs = rates_df.set_index('rate_id')['rate_cost']
+    costs = []
+    for _, entry in timesheet_df.iterrows():
+        rate_value = None
+        if not pd.isna(entry['rate_value']):
+            rate_value = float(entry['rate_value'])
+        else:
+            day = entry['start_date'][:10]
+            for _, period in user_rate_history[user_rate_history['user_id'] == entry['user_id']].iterrows():
+                if period['valid_from'] <= day and (pd.isna(period['valid_to']) or day < period['valid_to']):
+                    rate_value = float(rate_costs[period['rate_id']])
+        cost = float(entry['hours']) * rate_value if rate_value else 0.0
+        costs.append(cost * 2 if entry['overtime'] else cost)
+    return np.array(costs)
+
+
+def benchmark_rate_reassignment(tmp_dir, n_entries=10000, reassigned_on='2024-07-01', seed=42):
+    """Custo com colaboradores que mudaram de rate: ciclo por registo vs. cost_engine com user_rate_history"""
+    print(f"\n=== Custo de {n_entries:,} registos com mudanças de rate dos colaboradores ===")
+    db = DatabaseManager(sample_db(tmp_dir, n_entries))
+    timesheet_df = db.query_to_df("SELECT * FROM timesheet", use_cache=False)
+    users_df = db.query_to_df("SELECT * FROM utilizadores", use_cache=False)
+    rates_df = db.query_to_df("SELECT * FROM rates", use_cache=False)
+
+    # Metade dos colaboradores passa para outra rate em reassigned_on (como UserManager.update)
+    rng = np.random.default_rng(seed)
+    moved = users_df.sample(frac=0.5, random_state=seed)
+    new_rate_ids = rng.choice(rates_df['rate_id'].to_numpy(), len(moved))
+    is_moved = users_df['user_id'].isin(moved['user_id']).to_numpy()
+    user_rate_history = pd.concat([
+        pd.DataFrame({
+            'user_id': users_df['user_id'].to_numpy(),
+            'rate_id': users_df['rate_id'].to_numpy(),
+            'valid_from': RATE_HISTORY_START,
+            'valid_to': np.where(is_moved, reassigned_on, None),
+        }),
+        pd.DataFrame({
+            'user_id': moved['user_id'].to_numpy(),
+            'rate_id': new_rate_ids,
+            'valid_from': reassigned_on,
+            'valid_to': None,
+        }),
+    ], ignore_index=True)
+    current_users = users_df.assign(
+        rate_id=users_df['user_id'].map(pd.Series(new_rate_ids, index=moved['user_id'].to_numpy())).fillna(users_df['rate_id'])
+    )
+    rate_history = pd.DataFrame({
+        'rate_id': rates_df['rate_id'].to_numpy(),
+        'rate_cost': rates_df['rate_cost'].to_numpy(),
+        'valid_from': RATE_HISTORY_START,
+        'valid_to': None,
+    })
+
+    start = time.perf_counter()
+    legacy = _legacy_reassigned_costs(timesheet_df, user_rate_history, rates_df)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    engine = add_entry_costs(
+        timesheet_df, current_users, rates_df,
+        rate_history=rate_history, user_rate_history=user_rate_history
+    )['cost'].to_numpy()
+    engine_seconds = time.perf_counter() - start
+    current_rate = add_entry_costs(timesheet_df, current_users, rates_df, rate_history=rate_history)['cost'].to_numpy()
+
+    print(f"{'modo':<26}{'tempo (s)':>12}{'custo total':>18}")
+    print(f"{'ciclo por registo':<26}{legacy_seconds:>12.3f}{legacy.sum():>18,.2f}")
+    print(f"{'cost_engine':<26}{engine_seconds:>12.3f}{engine.sum():>18,.2f}")
+    print(f"Registos revalorizados com a rate atual (sem user_rate_history): {int((~np.isclose(current_rate, legacy)).sum()):,}")
+
+    if not np.allclose(legacy, engine):
+        raise RuntimeError("Custos diferentes entre o ciclo por registo e o cost_engine com user_rate_history")
+    return legacy_seconds, engine_seconds
+
+
+def _legacy_business_days(start, end):
+    """Dias úteis contados dia a dia, como nos ciclos while dos dashboards (referência)"""
+    holidays = []
+    for year in range(start.year, end.year + 1):
+        holidays.extend(get_feriados_portugal(year))
+    dias_uteis = 0
+    data_atual = start
+    while data_atual <= end:
+        if data_atual.weekday() < 5 and data_atual not in holidays:
+            dias_uteis += 1
+        data_atual += timedelta(days=1)
+    return dias_uteis
+
+
+def benchmark_business_days(tmp_dir, n_projects=2000, seed=42):
+    """Dias úteis de cada projeto: ciclo dia a dia vs. somas acumuladas do BusinessCalendar"""
+    print(f"\n=== Dias úteis de {n_projects:,} projetos: ciclo dia a dia vs. BusinessCalendar ===")
+    rng = np.random.default_rng(seed)
+    starts = pd.Series(pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n_projects), unit='D'))
+    ends = starts + pd.to_timedelta(rng.integers(0, 2 * 365, n_projects), unit='D')
+
+    start = time.perf_counter()
+    legacy = np.array([_legacy_business_days(s.date(), e.date()) for s, e in zip(starts, ends)])
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calendario = BusinessCalendar()
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = calendario.business_days(starts, ends)
+    vectorized_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}")
+    print(f"{'ciclo dia a dia':<26}{legacy_seconds:>12.3f}")
+    print(f"{'construção do calendário':<26}{build_seconds:>12.3f}")
+    print(f"{'BusinessCalendar':<26}{vectorized_seconds:>12.4f}")
+    print(f"Speedup: {legacy_seconds / vectorized_seconds:.0f}x")
+
+    if not np.array_equal(legacy, vectorized):
+        raise RuntimeError("Dias úteis diferentes entre o ciclo dia a dia e o BusinessCalendar")
+    return legacy_seconds, vectorized_seconds
+
+
+def _legacy_month_share(start, end, year, month):
+    """Proporção do projeto no mês com dois ciclos dia a dia, como calcular_proporcao_mes (referência)"""
+    inicio_mes = date(year, month, 1)
+    fim_mes = date(year, month, calendar.monthrange(year, month)[1])
+    if start > fim_mes or end < inicio_mes:
+        return 0
+    dias_uteis_projeto = _legacy_business_days(start, end)
+    if dias_uteis_projeto == 0:
+        return 0
+    return _legacy_business_days(max(start, inicio_mes), min(end, fim_mes)) / dias_uteis_projeto
+
+
+def benchmark_budget_proration(tmp_dir, n_projects=200, year=2023, seed=42):
+    """Orçamento mensal de cada projeto num ano: ciclos por projeto e mês vs. matriz projeto × mês"""
+    print(f"\n=== Orçamento mensal de {n_projects:,} projetos em {year}: ciclos por projeto vs. matriz ===")
+    rng = np.random.default_rng(seed)
+    starts = pd.Timestamp(f'{year - 1}-01-01') + pd.to_timedelta(rng.integers(0, 2 * 365, n_projects), unit='D')
+    ends = starts + pd.to_timedelta(rng.integers(0, 2 * 365, n_projects), unit='D')
+    projects_df = pd.DataFrame({
+        'project_id': np.arange(n_projects),
+        'start_date': starts.strftime('%Y-%m-%d'),
+        'end_date': ends.strftime('%Y-%m-%d'),
+        'total_hours': rng.integers(100, 5000, n_projects).astype(float),
+        'total_cost': rng.integers(1000, 100000, n_projects).astype(float),
+    })
+
+    start = time.perf_counter()
+    legacy = np.array([
+        [_legacy_month_share(s.date(), e.date(), year, month) for month in range(1, 13)]
+        for s, e in zip(starts, ends)
+    ]) * projects_df['total_hours'].to_numpy()[:, None]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = prorate_budget(projects_df, f'{year}-01-01', f'{year}-12-01').planned_hours
+    matrix_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}{'horas planeadas':>18}")
+    print(f"{'ciclos por projeto':<26}{legacy_seconds:>12.3f}{legacy.sum():>18,.1f}")
+    print(f"{'matriz projeto × mês':<26}{matrix_seconds:>12.4f}{matrix.sum():>18,.1f}")
+    print(f"Speedup: {legacy_seconds / matrix_seconds:.0f}x")
+
+    if not np.allclose(legacy, matrix):
+        raise RuntimeError("Orçamento mensal diferente entre os ciclos por projeto e a matriz")
+    return legacy_seconds, matrix_seconds
+
+
+def benchmark_page_data(tmp_dir, n_entries=200000):
+    """Tabelas de cada página lidas a frio (cache vazia) e a quente (st.cache_data com a versão dos dados)"""
+    print(f"\n=== Tabelas por página com {n_entries:,} registos: a frio vs. a quente ===")
+    try:
+        from page_data import time_page_loads
+    except ImportError as e:
+        print(f"Benchmark indisponível (page_data requer streamlit): {e}")
+        return None
+
+    db = DatabaseManager(sample_db(tmp_dir, n_entries))
+    timings = time_page_loads(db, pages=['dashboard_page', 'executive_dashboard_email', 'team_productivity_page', 'calendar_page'])
+    print(f"{'página':<26}{'a frio (ms)':>14}{'a quente (ms)':>16}{'speedup':>10}")
+    for row in timings.itertuples():
+        print(f"{row.page:<26}{row.cold_ms:>14.1f}{row.warm_ms:>16.1f}{row.speedup:>9.0f}x")
+    return timings
+
+
+def _legacy_collaborator_indicators(db, timesheet_df, users_df, year, month, working_hours):
+    """Indicadores com um ciclo por colaborador e uma query de metas cada, como em show_collaborator_indicators (referência)"""
+    start_dates = parse_dates(timesheet_df['start_date'], errors='coerce')
+    in_month = (start_dates.dt.month == month) & (start_dates.dt.year == year)
+    rows = []
+    for _, user in users_df.iterrows():
+        db.query_to_df(
+            "SELECT * FROM collaborator_targets WHERE user_id = ? AND year = ? ORDER BY month",
+            (int(user['user_id']), year), use_cache=False
+        )
+        user_timesheet = timesheet_df[(timesheet_df['user_id'] == user['user_id']) & in_month]
+        total_hours = user_timesheet['hours'].sum()
+        billable_hours = user_timesheet[user_timesheet['billable'] == True]['hours'].sum()
+        rows.append({
+            'user_id': user['user_id'],
+            'occupation_percentage': total_hours / working_hours * 100,
+            'billable_percentage': billable_hours / working_hours * 100,
+            'occupation_color': 'green' if total_hours / working_hours * 100 >= TARGET_OCCUPATION else 'red',
+            'billable_color': 'green' if billable_hours / working_hours * 100 >= TARGET_BILLABLE else 'red',
+        })
+    return pd.DataFrame(rows)
+
+
+def benchmark_collaborator_indicators(tmp_dir, n_entries=1000000, n_users=200, year=2024, month=5):
+    """Indicadores de colaboradores: ciclo por colaborador vs. um groupby e uma query de metas"""
+    print(f"\n=== Indicadores de {n_users} colaboradores com {n_entries:,} registos: ciclo vs. groupby ===")
+    db_file = os.path.join(tmp_dir, f'benchmark_{n_entries}_{n_users}_users.db')
+    if not os.path.exists(db_file):
+        print(f"A criar base de dados sintética com {n_entries:,} registos e {n_users} colaboradores em {db_file}...")
+        create_sample_db(db_file, n_entries, n_users=n_users)
+        conn = sqlite3.connect(db_file)
+        conn.execute("""CREATE TABLE collaborator_targets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, year INTEGER, month INTEGER,
+            billable_hours_target REAL, revenue_target REAL, company_name TEXT)""")
+        conn.executemany(
+            "INSERT INTO collaborator_targets (user_id, year, month, billable_hours_target, revenue_target, company_name) VALUES (?, ?, ?, 120, 9000, 'Empresa')",
+            [(u, year, m) for u in range(1, n_users + 1) for m in range(1, 13)]
+        )
+        conn.commit()
+        conn.close()
+
+    db = DatabaseManager(db_file)
+    timesheet_df = db.query_to_df("SELECT * FROM timesheet", use_cache=False)
+    users_df = db.query_to_df("SELECT * FROM utilizadores WHERE active = 1", use_cache=False)
+    working_hours = BusinessCalendar().business_days(date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])) * 8
+
+    start = time.perf_counter()
+    legacy = _legacy_collaborator_indicators(db, timesheet_df, users_df, year, month, working_hours)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    targets = db.query_to_df(
+        "SELECT * FROM collaborator_targets WHERE year = ? AND month = ?", (year, month), use_cache=False
+    )
+    grouped = compute_collaborator_indicators(timesheet_df, users_df, year, month, working_hours, targets)
+    grouped_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}")
+    print(f"{'ciclo por colaborador':<26}{legacy_seconds:>12.3f}")
+    print(f"{'groupby + merge':<26}{grouped_seconds:>12.3f}")
+    print(f"Speedup: {legacy_seconds / grouped_seconds:.0f}x")
+
+    columns = ['occupation_percentage', 'billable_percentage']
+    if not np.allclose(legacy[columns].to_numpy(dtype=float), grouped[columns].to_numpy(dtype=float)) or \
+            not legacy['occupation_color'].equals(grouped['occupation_color']):
+        raise RuntimeError("Indicadores diferentes entre o ciclo por colaborador e o groupby")
+    return legacy_seconds, grouped_seconds
+
+
+def _legacy_project_indicators(projects_df, entries_df, period_start, period_end, year_start, as_of):
+    """Horas e custo por projeto com um filtro do timesheet por projeto, como em show_project_indicators (referência)"""
+    dates = parse_dates(entries_df['start_date'], errors='coerce')
+    rows = []
+    for _, project in projects_df.iterrows():
+        project_mask = entries_df['project_id'] == project['project_id']
+        period_entries = entries_df[project_mask & (dates >= period_start) & (dates <= period_end)]
+        year_entries = entries_df[project_mask & (dates >= year_start) & (dates <= as_of)]
+        rows.append({
+            'project_id': project['project_id'],
+            'period_hours': period_entries['weighted_hours'].sum(),
+            'period_cost': period_entries['cost'].sum(),
+            'year_hours': year_entries['weighted_hours'].sum(),
+            'year_cost': year_entries['cost'].sum(),
+        })
+    return pd.DataFrame(rows)
+
+
+def benchmark_project_indicators(tmp_dir, n_entries=1000000, year=2024, month=5):
+    """Indicadores de projetos: ciclo por projeto vs. um groupby com máscaras de período"""
+    print(f"\n=== Indicadores de projetos com {n_entries:,} registos: ciclo por projeto vs. groupby ===")
+    db = DatabaseManager(sample_db(tmp_dir, n_entries))
+    projects_df = db.query_to_df("SELECT * FROM projects", use_cache=False)
+    users_df = db.query_to_df("SELECT * FROM utilizadores", use_cache=False)
+    rates_df = db.query_to_df("SELECT * FROM rates", use_cache=False)
+    entries_df = add_entry_costs(db.query_to_df("SELECT * FROM timesheet", use_cache=False), users_df, rates_df)
+
+    period_start = pd.Timestamp(year, month, 1)
+    period_end = pd.Timestamp(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
+    year_start = pd.Timestamp(year, 1, 1)
+    as_of = pd.Timestamp(year, 12, 31)
+
+    start = time.perf_counter()
+    legacy = _legacy_project_indicators(projects_df, entries_df, period_start, period_end, year_start, as_of)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grouped = compute_project_indicators(projects_df, entries_df, period_start, period_end, as_of=as_of, calendar=BusinessCalendar())
+    grouped_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}")
+    print(f"{'ciclo por projeto':<26}{legacy_seconds:>12.3f}")
+    print(f"{'groupby + máscaras':<26}{grouped_seconds:>12.3f}")
+    print(f"Speedup: {legacy_seconds / grouped_seconds:.0f}x")
+
+    columns = ['period_hours', 'period_cost', 'year_hours', 'year_cost']
+    if not np.allclose(legacy[columns].to_numpy(dtype=float), grouped[columns].to_numpy(dtype=float)):
+        raise RuntimeError("Indicadores diferentes entre o ciclo por projeto e o groupby")
+    return legacy_seconds, grouped_seconds
+
+
+def _legacy_revenue_indicators(invoices_df, year_targets, groups_df, projects_df, year, month):
+    """Faturação por meta com um filtro das faturas por equipa e período, como em show_revenue_indicators (referência)"""
+    payment_dates = pd.to_datetime(invoices_df['payment_date'])
+    month_mask = (payment_dates.dt.year == year) & (payment_dates.dt.month == month)
+    quarter_mask = (payment_dates.dt.year == year) & ((payment_dates.dt.month - 1) // 3 == (month - 1) // 3)
+    year_mask = payment_dates.dt.year == year
+    rows = []
+    for _, target in year_targets.iterrows():
+        group_id = groups_df[groups_df['group_name'] == target['company_name']]['id'].iloc[0]
+        company_mask = invoices_df['project_id'].isin(projects_df[projects_df['group_id'] == group_id]['project_id'])
+        rows.append({
+            'monthly_revenue': invoices_df[company_mask & month_mask]['amount'].sum(),
+            'quarterly_revenue': invoices_df[company_mask & quarter_mask]['amount'].sum(),
+            'annual_revenue': invoices_df[company_mask & year_mask]['amount'].sum(),
+        })
+    return pd.DataFrame(rows)
+
+
+def benchmark_revenue_rollup(tmp_dir, n_invoices=500000, year=2024, month=5, seed=42):
+    """Indicadores de faturação: todas as faturas por pedido vs. tabela revenue_rollup"""
+    print(f"\n=== Indicadores de faturação com {n_invoices:,} faturas: faturas vs. revenue_rollup ===")
+    db_file = os.path.join(tmp_dir, f'benchmark_invoices_{n_invoices}.db')
+    if not os.path.exists(db_file):
+        create_sample_db(db_file, n_entries=1000)
+        rng = np.random.default_rng(seed)
+        project_ids = rng.integers(1, 201, n_invoices)
+        payment_dates = pd.to_datetime(np.datetime64('2020-01-01') + rng.integers(0, 6 * 365, n_invoices).astype('timedelta64[D]'))
+        conn = sqlite3.connect(db_file)
+        conn.execute("""CREATE TABLE invoices (
+            invoice_id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER, project_id INTEGER,
+            invoice_number TEXT, amount REAL, issue_date TIMESTAMP, payment_date TIMESTAMP)""")
+        conn.executemany(
+            "INSERT INTO invoices (client_id, project_id, invoice_number, amount, issue_date, payment_date) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (int(project_id % 30) + 1, int(project_id), f"FAT-{i}", float(amount), day, day)
+                for i, (project_id, amount, day) in enumerate(zip(
+                    project_ids, rng.integers(100, 10000, n_invoices), payment_dates.strftime('%Y-%m-%d')
+                ))
+            ]
+        )
+        refresh_revenue_rollup(conn)
+        conn.commit()
+        conn.close()
+
+    db = DatabaseManager(db_file)
+    groups_df = db.query_to_df("SELECT * FROM groups", use_cache=False)
+    projects_df = db.query_to_df("SELECT * FROM projects", use_cache=False)
+    year_targets = pd.DataFrame({'company_name': groups_df['group_name'], 'target_value': 1000000.0})
+    invoices_query = """SELECT i.*, c.name as client_name, p.project_name FROM invoices i
+        JOIN clients c ON i.client_id = c.client_id JOIN projects p ON i.project_id = p.project_id"""
+
+    start = time.perf_counter()
+    legacy = _legacy_revenue_indicators(
+        db.query_to_df(invoices_query, use_cache=False), year_targets, groups_df, projects_df, year, month
+    )
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rollup = compute_revenue_indicators(year_targets, load_revenue_rollup(db, year), groups_df, month)
+    rollup_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}")
+    print(f"{'todas as faturas':<26}{legacy_seconds:>12.3f}")
+    print(f"{'revenue_rollup':<26}{rollup_seconds:>12.3f}")
+    print(f"Speedup: {legacy_seconds / rollup_seconds:.0f}x")
+
+    columns = ['monthly_revenue', 'quarterly_revenue', 'annual_revenue']
+    if not np.allclose(legacy[columns].to_numpy(dtype=float), rollup[columns].to_numpy(dtype=float)):
+        raise RuntimeError("Faturação diferente entre as faturas e a revenue_rollup")
+    return legacy_seconds, rollup_seconds
+
+
+def _legacy_calendar_events(timesheet_df, users_df, projects_df):
+    """Eventos com pesquisa de colaborador/projeto e pd.to_datetime por registo, como em prepare_calendar_events (referência)"""
+    events = []
+    for _, row in timesheet_df.iterrows():
+        user = users_df[users_df['user_id'] == row['user_id']]
+        project = projects_df[projects_df['project_id'] == row['project_id']]
+        events.append({
+            'id': str(row['id']),
+            'title': f"{user['First_Name'].iloc[0]} {user['Last_Name'].iloc[0]} - {project['project_name'].iloc[0]}",
+            'start': pd.to_datetime(row['start_date']).strftime('%Y-%m-%d %H:%M:%S'),
+            'end': pd.to_datetime(row['end_date']).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    return events
+
+
+def benchmark_calendar_events(tmp_dir, n_entries=200000, year=2024, month=6):
+    """Calendário de todos os colaboradores: tabela inteira e ciclo por registo vs. janela do mês em SQL"""
+    print(f"\n=== Eventos do calendário ({month:02d}/{year}, todos os colaboradores) com {n_entries:,} registos ===")
+    # Importado aqui: calendar_view depende do Streamlit
+    try:
+        from calendar_view import calendar_window, load_calendar_entries, prepare_calendar_events
+    except ImportError as e:
+        print(f"Benchmark ignorado: {e}")
+        return None
+
+    db = DatabaseManager(sample_db(tmp_dir, n_entries))
+    users_df = db.query_to_df("SELECT * FROM utilizadores", use_cache=False)
+    projects_df = db.query_to_df("SELECT * FROM projects", use_cache=False)
+    window_start, window_end = calendar_window(year, month)
+    admin = {'role': 'admin', 'user_id': 1}
+    no_absences = pd.DataFrame(columns=['absence_id', 'user_id', 'start_date', 'end_date', 'absence_type', 'description'])
+
+    # A referência só trata os registos da janela (o ciclo sobre a tabela inteira levaria minutos)
+    start = time.perf_counter()
+    timesheet_df = db.query_to_df("SELECT * FROM timesheet", use_cache=False)
+    dates = parse_dates(timesheet_df['start_date'])
+    window_df = timesheet_df[(dates >= pd.Timestamp(window_start)) & (dates < pd.Timestamp(window_end))]
+    legacy = _legacy_calendar_events(window_df, users_df, projects_df)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    entries = load_calendar_entries(db, window_start, window_end)
+    events = prepare_calendar_events(entries, users_df, projects_df, no_absences, admin)
+    window_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}{'eventos':>10}")
+    print(f"{'tabela + ciclo':<26}{legacy_seconds:>12.3f}{len(legacy):>10}")
+    print(f"{'janela SQL + map':<26}{window_seconds:>12.3f}{len(events):>10}")
+    print(f"Speedup: {legacy_seconds / window_seconds:.0f}x")
+
+    if sorted((event['id'], event['title'], event['start']) for event in legacy) != \
+            sorted((event['id'], event['title'], event['start']) for event in events):
+        raise RuntimeError("Eventos diferentes entre o ciclo por registo e a janela SQL")
+    return legacy_seconds, window_seconds
+
+
+def benchmark_calendar_cache(tmp_dir, n_entries=200000, year=2024, months=(5, 6, 7)):
+    """Navegação entre meses (todos os colaboradores): conversão a cada visita vs. calendar_event_cache"""
+    print(f"\n=== Cache de eventos do calendário ({len(months)} meses, ida e volta) com {n_entries:,} registos ===")
+    # Importado aqui: calendar_view depende do Streamlit
+    try:
+        from calendar_view import cached_calendar_events, calendar_window, load_calendar_absences, load_calendar_entries, prepare_calendar_events
+    except ImportError as e:
+        print(f"Benchmark ignorado: {e}")
+        return None
+    from calendar_cache import calendar_event_cache
+
+    db_file = sample_db(tmp_dir, n_entries)
+    db = DatabaseManager(db_file)
+    users_df = db.query_to_df("SELECT * FROM utilizadores", use_cache=False)
+    projects_df = db.query_to_df("SELECT * FROM projects", use_cache=False)
+    admin = {'role': 'admin', 'user_id': 1}
+    visits = list(months) + list(reversed(months))
+
+    start = time.perf_counter()
+    for month in visits:
+        window_start, window_end = calendar_window(year, month)
+        prepare_calendar_events(
+            load_calendar_entries(db, window_start, window_end), users_df, projects_df,
+            load_calendar_absences(db, window_start, window_end), admin
+        )
+    uncached_seconds = time.perf_counter() - start
+
+    # Primeira visita de cada mês (cache vazia) e regresso aos mesmos meses
+    calendar_event_cache.clear(db_file)
+    start = time.perf_counter()
+    for month in months:
+        cached_calendar_events(db, users_df, projects_df, year, month, admin)
+    first_visit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for month in reversed(months):
+        cached_calendar_events(db, users_df, projects_df, year, month, admin)
+    return_seconds = time.perf_counter() - start
+
+    # Uma escrita invalida apenas o colaborador e os meses do registo
+    manager = TimesheetManagerSQL(db_file)
+    entry_id = manager.create({
+        'user_id': int(users_df['user_id'].iloc[0]), 'client_id': 1, 'project_id': int(projects_df['project_id'].iloc[0]),
+        'category_id': 1, 'task_id': 1, 'start_date': f'{year}-{months[1]:02d}-10 09:00:00',
+        'end_date': f'{year}-{months[1]:02d}-10 10:00:00', 'hours': 1.0, 'billable': 1, 'overtime': 0,
+        'description': 'benchmark'
+    })
+    start = time.perf_counter()
+    events = cached_calendar_events(db, users_df, projects_df, year, months[1], admin)
+    after_write_seconds = time.perf_counter() - start
+    manager.delete(entry_id)
+
+    print(f"{'modo':<34}{'tempo (s)':>12}")
+    print(f"{'conversão a cada visita':<34}{uncached_seconds:>12.3f}")
+    print(f"{'cache: primeiras visitas':<34}{first_visit_seconds:>12.3f}")
+    print(f"{'cache: regresso aos meses':<34}{return_seconds:>12.4f}")
+    print(f"{'cache: mês após uma escrita':<34}{after_write_seconds:>12.4f}")
+    print(f"Speedup no regresso aos meses: {uncached_seconds / 2 / return_seconds:.0f}x")
+
+    if not any(event['id'] == str(entry_id) for event in events):
+        raise RuntimeError("O registo criado não aparece no calendário após a invalidação")
+    return uncached_seconds, first_visit_seconds + return_seconds
+
+
+def _legacy_cost_risk(actual_cost, planned_cost):
+    """Nível de risco de um projeto, como em productivity_dashboard antes de productivity_indicators (referência)"""
+    if planned_cost == 0:
+        return "Sem Dados"
+    variation = (actual_cost - planned_cost) / planned_cost * 100
+    if variation <= -10:
+        return "Eficiente"
+    elif variation <= 10:
+        return "No Planejado"
+    elif variation <= 20:
+        return "Atenção"
+    elif variation <= 30:
+        return "Risco Moderado"
+    return "Alto Risco"
+
+
+def benchmark_productivity_indicators(tmp_dir, n_entries=200000, year=2024, month=6):
+    """Painel consolidado: métricas de productivity_reports (ciclos por colaborador/ausência/projeto) vs. groupbys"""
+    print(f"\n=== Indicadores consolidados de produtividade ({month:02d}/{year}) com {n_entries:,} registos ===")
+    # Importado aqui: productivity_reports depende do Streamlit
+    try:
+        import productivity_reports
+    except ImportError as e:
+        print(f"Benchmark ignorado: {e}")
+        return None
+
+    db = DatabaseManager(sample_db(tmp_dir, n_entries))
+    users_df = db.query_to_df("SELECT * FROM utilizadores", use_cache=False)
+    projects_df = db.query_to_df("SELECT * FROM projects", use_cache=False)
+    rates_df = db.query_to_df("SELECT * FROM rates", use_cache=False)
+    period_start = pd.Timestamp(year, month, 1)
+    period_end = pd.Timestamp(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
+    business_days = productivity_reports.calcular_dias_uteis_projeto(period_start.date(), period_end.date())
+    user_teams = user_team_table(membership_index.teams_by_user(db))
+    main_team = user_teams[user_teams['position'] == 0].set_index('user_id')['group_name']
+    names = users_df.set_index('user_id')
+    names = names['First_Name'] + ' ' + names['Last_Name']
+
+    def month_entries():
+        entries = load_period_entries(db, period_start, period_end)
+        entries['group_name'] = entries['user_id'].map(main_team)
+        entries['nome_completo'] = entries['user_id'].map(names)
+        return entries
+
+    # Referência: tabela de ausências inteira, ciclos por colaborador/ausência e por projeto
+    start = time.perf_counter()
+    entries = month_entries()
+    absences_df = db.query_to_df("SELECT * FROM absences", use_cache=False)
+    legacy_team = productivity_reports.calcular_metricas_produtividade_atualizado(
+        entries.copy(), 'group_name', business_days * 8, users_df, absences_df, period_start, period_end
+    )
+    legacy_user = productivity_reports.calcular_metricas_produtividade_usuario(entries.copy(), absences_df, period_start, period_end)
+    costs = add_entry_costs(entries, users_df, rates_df)
+    costs = costs_by_project(costs[costs['rate_applied'] > 0]).set_index('project_id')
+    legacy_risk = []
+    for _, project in projects_df.iterrows():
+        actual = float(costs.at[project['project_id'], 'cost']) if project['project_id'] in costs.index else 0
+        total_days = productivity_reports.calcular_dias_uteis_projeto(pd.to_datetime(project['start_date']).date(), pd.to_datetime(project['end_date']).date())
+        elapsed_days = productivity_reports.calcular_dias_uteis_projeto(pd.to_datetime(project['start_date']).date(), period_end.date())
+        planned = float(project['total_cost']) * elapsed_days / total_days if total_days > 0 else 0
+        legacy_risk.append(_legacy_cost_risk(actual, planned))
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    entries = month_entries()
+    absence_days = absence_days_by_user(load_period_absences(db, period_start, period_end), period_start, period_end)
+    team = compute_team_productivity(entries, users_df, user_teams, absence_days, business_days)
+    user = compute_user_productivity(entries, absence_days, business_days)
+    risk = compute_project_risk(projects_df, add_entry_costs(entries, users_df, rates_df), period_end)
+    vectorized_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<26}{'tempo (s)':>12}")
+    print(f"{'ciclos (referência)':<26}{legacy_seconds:>12.3f}")
+    print(f"{'groupby':<26}{vectorized_seconds:>12.3f}")
+    print(f"Speedup: {legacy_seconds / vectorized_seconds:.1f}x")
+
+    checks = [
+        (legacy_team.sort_values('group_name'), team.sort_values('group_name'), 'percentual_ausencias'),
+        (legacy_user.sort_values('user_id'), user.sort_values('user_id'), 'horas_ausencia'),
+    ]
+    for expected, actual, column in checks:
+        if not np.allclose(expected[column].to_numpy(dtype='float64'), actual[column].to_numpy(dtype='float64')):
+            raise RuntimeError(f"Resultados diferentes em {column}")
+    if legacy_risk != risk['nivel_risco'].tolist():
+        raise RuntimeError("Níveis de risco diferentes")
+    return legacy_seconds, vectorized_seconds
+
+
+BENCHMARKS = {
+    'connection_pool': benchmark_connection_pool,
+    'schema_registry': benchmark_schema_registry,
+    'canonical_dates': benchmark_canonical_dates,
+    'bulk_import': benchmark_bulk_import,
+    'query_cache': benchmark_query_cache,
+    'columnar_fetch': benchmark_columnar_fetch,
+    'rate_resolver': benchmark_rate_resolver,
+    'project_costs': benchmark_project_costs,
+    'rate_reassignment': benchmark_rate_reassignment,
+    'business_days': benchmark_business_days,
+    'budget_proration': benchmark_budget_proration,
+    'page_data': benchmark_page_data,
+    'collaborator_indicators': benchmark_collaborator_indicators,
+    'project_indicators': benchmark_project_indicators,
+    'revenue_rollup': benchmark_revenue_rollup,
+    'calendar_events': benchmark_calendar_events,
+    'calendar_cache': benchmark_calendar_cache,
+    'productivity_indicators': benchmark_productivity_indicators,
+}
+
+
+def main(selected=None):
+    """Cria a base de dados sintética e corre os benchmarks selecionados"""
+    names = selected or list(BENCHMARKS)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in names:
+            if name not in BENCHMARKS:
+                print(f"Benchmark desconhecido: {name}. Disponíveis: {', '.join(BENCHMARKS)}")
+                continue
+            BENCHMARKS[name](tmp_dir)
+
+        close_pooled_connections()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
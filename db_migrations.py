@@ -0,0 +1,418 @@
+"""
+Migrações versionadas do esquema da base de dados.
+
+Cada migração tem um número de versão, uma descrição e uma função que recebe a
+conexão SQLite. As versões aplicadas ficam registadas na tabela
+`schema_migrations`, pelo que cada migração corre uma única vez por base de dados.
+
+`run_migrations()` é chamado no arranque da aplicação (main.py).
+
+Uso em linha de comandos:
+    python db_migrations.py            # aplica as migrações pendentes
+    python db_migrations.py --check    # verifica com EXPLAIN QUERY PLAN que as queries críticas usam índices
+                                       # (sai com código 1 se alguma fizer SCAN)
+"""
+import sys
+import sqlite3
+from datetime import datetime
+import pandas as pd
+
+from database_manager import RATE_HISTORY_START, get_connection
+from date_utils import DATE_COLUMNS, normalize_date_series
+from group_membership import parse_groups_value
+from revenue_rollup import create_rollup_table, refresh_revenue_rollup
+
+
+DB_FILE = 'timetracker.db'
+
+# Índices por tabela. São criados pelas migrações e também por
+# ensure_table_indexes() quando uma tabela é criada depois da migração
+# (ex.: invoices, criada pelo BillingManager).
+TABLE_INDEXES = {
+    'timesheet': [
+        # get_user_entries / filtros por colaborador e período
+        "CREATE INDEX IF NOT EXISTS idx_timesheet_user_start ON timesheet(user_id, start_date)",
+        # get_project_entries / relatórios de projeto
+        "CREATE INDEX IF NOT EXISTS idx_timesheet_project_start ON timesheet(project_id, start_date)",
+        # janelas mensais sobre todos os colaboradores
+        "CREATE INDEX IF NOT EXISTS idx_timesheet_start_date ON timesheet(start_date)",
+        # CollaboratorTargetCalculator.get_performance_vs_target filtra por strftime('%Y'/'%m', start_date)
+        "CREATE INDEX IF NOT EXISTS idx_timesheet_user_year_month ON timesheet("
+        "user_id, strftime('%Y', start_date), strftime('%m', start_date))",
+    ],
+    'utilizadores': [
+        "CREATE INDEX IF NOT EXISTS idx_utilizadores_user_id ON utilizadores(user_id)",
+    ],
+    'absences': [
+        "CREATE INDEX IF NOT EXISTS idx_absences_user_start ON absences(user_id, start_date)",
+    ],
+    'invoices': [
+        # índices de cobertura: SUM(amount) por cliente/projeto lê apenas o índice
+        "CREATE INDEX IF NOT EXISTS idx_invoices_client_amount ON invoices(client_id, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_project_amount ON invoices(project_id, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_issue_date ON invoices(issue_date)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_payment_date ON invoices(payment_date)",
+    ],
+    'user_groups': [
+        # utilizadores de uma equipa (a chave primária cobre user_id -> equipas)
+        "CREATE INDEX IF NOT EXISTS idx_user_groups_group_user ON user_groups(group_id, user_id)",
+    ],
+    'rate_history': [
+        # resolução da rate em vigor numa data (cost_engine) e manutenção pelo RateManager
+        "CREATE INDEX IF NOT EXISTS idx_rate_history_rate_from ON rate_history(rate_id, valid_from)",
+    ],
+    'user_rate_history': [
+        # rate_id de um colaborador numa data (cost_engine, RateResolver) e manutenção pelo UserManager
+        "CREATE INDEX IF NOT EXISTS idx_user_rate_history_user_from ON user_rate_history(user_id, valid_from)",
+    ],
+}
+
+
+def _table_exists(conn, table_name):
+    """Verifica se uma tabela existe na base de dados"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (table_name,)
+    ).fetchone()
+    return row is not None
+
+
+def _create_indexes(conn, tables):
+    """Cria os índices das tabelas indicadas que já existam"""
+    for table_name in tables:
+        if not _table_exists(conn, table_name):
+            print(f"Tabela {table_name} não existe; índices serão criados quando for criada.")
+            continue
+        for statement in TABLE_INDEXES[table_name]:
+            conn.execute(statement)
+
+
+def _migration_001_hot_column_indexes(conn):
+    """Índices das colunas mais consultadas de timesheet, absences e invoices"""
+    _create_indexes(conn, ['timesheet', 'utilizadores', 'absences', 'invoices'])
+    conn.execute("ANALYZE")
+
+
+def _migration_002_canonical_dates(conn):
+    """Converte as datas guardadas em texto livre para o formato ISO-8601 canónico"""
+    for table_name, columns in DATE_COLUMNS.items():
+        if not _table_exists(conn, table_name):
+            continue
+        existing_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+
+        for column, fmt in columns.items():
+            if column not in existing_columns:
+                continue
+
+            # Só valores de texto: números/NULL não são datas em texto livre
+            df = pd.read_sql_query(
+                f"SELECT rowid AS row_id, {column} AS value FROM {table_name} WHERE typeof({column}) = 'text'",
+                conn
+            )
+            if df.empty:
+                continue
+
+            normalized = normalize_date_series(df['value'], fmt)
+            changed = normalized != df['value']
+            updates = list(zip(normalized[changed].tolist(), df.loc[changed, 'row_id'].tolist()))
+            conn.executemany(f"UPDATE {table_name} SET {column} = ? WHERE rowid = ?", updates)
+
+            not_parsed = pd.to_datetime(df['value'], format='mixed', errors='coerce').isna().sum()
+            print(f"{table_name}.{column}: {len(updates)} datas normalizadas, {not_parsed} não reconhecidas")
+
+
+def _migration_003_unique_user_email(conn):
+    """Índice único em utilizadores(email) para o login por pesquisa indexada"""
+    if not _table_exists(conn, 'utilizadores'):
+        return
+
+    duplicates = conn.execute(
+        "SELECT email, COUNT(*) FROM utilizadores WHERE email IS NOT NULL GROUP BY email HAVING COUNT(*) > 1"
+    ).fetchall()
+    if duplicates:
+        # Não se apagam utilizadores automaticamente: fica um índice não único
+        emails = ', '.join(str(email) for email, _ in duplicates)
+        print(f"Emails duplicados em utilizadores ({emails}); a criar índice não único.")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_utilizadores_email ON utilizadores(email)")
+    else:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_utilizadores_email ON utilizadores(email)")
+
+
+def _migration_004_rate_history(conn):
+    """Tabela rate_history com os períodos de vigência de cada rate
+
+    Cada rate existente fica com um período aberto desde RATE_HISTORY_START, pelo
+    que os custos já calculados não mudam; as alterações seguintes são
+    registadas pelo RateManager.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS rate_history (
+        history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        rate_id INTEGER NOT NULL,
+        rate_cost REAL NOT NULL,
+        valid_from TEXT NOT NULL,
+        valid_to TEXT,
+        created_at TEXT
+    )
+    """)
+    _create_indexes(conn, ['rate_history'])
+
+    if _table_exists(conn, 'rates'):
+        conn.execute(
+            """INSERT INTO rate_history (rate_id, rate_cost, valid_from, valid_to, created_at)
+            SELECT rate_id, rate_cost, ?, NULL, ? FROM rates
+            WHERE rate_cost IS NOT NULL AND rate_id NOT IN (SELECT rate_id FROM rate_history)""",
+            (RATE_HISTORY_START, datetime.now().isoformat())
+        )
+
+
+def _migration_005_user_groups(conn):
+    """Tabela user_groups preenchida a partir da coluna utilizadores.groups
+
+    A coluna antiga é mantida (e atualizada pelo UserManager) para os módulos
+    que ainda a leem. Valores que não correspondem a nenhuma equipa são
+    reportados e ignorados.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_groups (
+        user_id INTEGER NOT NULL,
+        group_id INTEGER NOT NULL,
+        position INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, group_id)
+    )
+    """)
+    _create_indexes(conn, ['user_groups'])
+
+    if not _table_exists(conn, 'utilizadores') or not _table_exists(conn, 'groups'):
+        return
+
+    group_ids = {}
+    for group_id, group_name in conn.execute("SELECT id, group_name FROM groups"):
+        group_ids[str(group_id)] = group_id
+        group_ids[str(group_name)] = group_id
+
+    rows = []
+    unknown = set()
+    for user_id, groups in conn.execute("SELECT user_id, groups FROM utilizadores"):
+        for position, group in enumerate(parse_groups_value(groups)):
+            group_id = group_ids.get(str(group))
+            if group_id is None:
+                unknown.add(str(group))
+                continue
+            rows.append((user_id, group_id, position))
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO user_groups (user_id, group_id, position) VALUES (?, ?, ?)", rows
+    )
+    print(f"user_groups: {len(rows)} pertenças migradas")
+    if unknown:
+        print(f"Equipas desconhecidas em utilizadores.groups (ignoradas): {', '.join(sorted(unknown))}")
+
+
+def _migration_006_revenue_rollup(conn):
+    """Cria a tabela revenue_rollup e preenche-a a partir das faturas existentes"""
+    create_rollup_table(conn)
+    if all(_table_exists(conn, table) for table in ('invoices', 'clients', 'projects')):
+        refresh_revenue_rollup(conn)
+        count = conn.execute("SELECT COUNT(*) FROM revenue_rollup").fetchone()[0]
+        print(f"revenue_rollup: {count} linhas (equipa × mês) calculadas")
+
+
+def _migration_007_user_rate_history(conn):
+    """Tabela user_rate_history com os períodos em que cada colaborador teve cada rate
+
+    Cada colaborador com rate fica com um período aberto desde
+    RATE_HISTORY_START, pelo que os custos já calculados não mudam; as mudanças
+    de rate_id seguintes são registadas pelo UserManager.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_rate_history (
+        history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        rate_id INTEGER NOT NULL,
+        valid_from TEXT NOT NULL,
+        valid_to TEXT,
+        created_at TEXT
+    )
+    """)
+    _create_indexes(conn, ['user_rate_history'])
+
+    if _table_exists(conn, 'utilizadores'):
+        conn.execute(
+            """INSERT INTO user_rate_history (user_id, rate_id, valid_from, valid_to, created_at)
+            SELECT user_id, rate_id, ?, NULL, ? FROM utilizadores
+            WHERE rate_id IS NOT NULL AND user_id NOT IN (SELECT user_id FROM user_rate_history)""",
+            (RATE_HISTORY_START, datetime.now().isoformat())
+        )
+
+
+def _migration_008_invoice_indexes(conn):
+    """Índices de invoices (incluindo issue_date) em bases de dados onde a tabela
+    foi criada depois da migração 1 ou reescrita sem índices (save_table_to_db)
+    """
+    if _table_exists(conn, 'invoices'):
+        _create_indexes(conn, ['invoices'])
+        conn.execute("ANALYZE invoices")
+
+
+# (versão, descrição, função). Novas migrações são acrescentadas no fim,
+# sempre com uma versão superior à anterior.
+MIGRATIONS = [
+    (1, "Índices das colunas mais consultadas de timesheet, absences e invoices",
+     _migration_001_hot_column_indexes),
+    (2, "Datas de timesheet, projects e absences no formato ISO-8601 canónico",
+     _migration_002_canonical_dates),
+    (3, "Índice único em utilizadores(email)",
+     _migration_003_unique_user_email),
+    (4, "Histórico de rates com períodos de vigência (rate_history)",
+     _migration_004_rate_history),
+    (5, "Tabela user_groups a partir de utilizadores.groups",
+     _migration_005_user_groups),
+    (6, "Faturação agregada por equipa, ano e mês (revenue_rollup)",
+     _migration_006_revenue_rollup),
+    (7, "Histórico das rates atribuídas a cada colaborador (user_rate_history)",
+     _migration_007_user_rate_history),
+    (8, "Índices de invoices, incluindo invoices(issue_date)",
+     _migration_008_invoice_indexes),
+]
+
+
+def _ensure_schema_table(conn):
+    """Cria a tabela que regista as versões de esquema aplicadas"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL
+    )
+    """)
+    conn.commit()
+
+
+def get_schema_version(conn):
+    """Retorna a versão de esquema atual (0 se nenhuma migração foi aplicada)"""
+    _ensure_schema_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+# Bases de dados já verificadas neste processo: o Streamlit re-executa main.py
+# a cada interação e não queremos repetir a verificação.
+_checked_db_files = set()
+
+
+def run_migrations(db_file=DB_FILE, force=False):
+    """Aplica as migrações pendentes e retorna a versão de esquema final"""
+    if db_file in _checked_db_files and not force:
+        return None
+
+    with get_connection(db_file) as conn:
+        current_version = get_schema_version(conn)
+
+        for version, description, migrate in MIGRATIONS:
+            if version <= current_version:
+                continue
+
+            print(f"A aplicar migração {version}: {description}")
+            try:
+                migrate(conn)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, datetime.now().isoformat())
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"Erro ao aplicar migração {version}: {e}")
+                raise
+            current_version = version
+
+    _checked_db_files.add(db_file)
+    return current_version
+
+
+def ensure_table_indexes(db_manager, table_name):
+    """Cria os índices de uma tabela criada depois das migrações (ex.: invoices)"""
+    for statement in TABLE_INDEXES.get(table_name, []):
+        db_manager.execute_query(statement)
+
+
+# Queries críticas verificadas por check_query_plans(): (nome, SQL, parâmetros)
+HOT_QUERIES = [
+    ("Auth.login",
+     "SELECT * FROM utilizadores WHERE email = ? LIMIT 1",
+     ('user@empresa.pt',)),
+    ("TimesheetManagerSQL.get_user_entries",
+     "SELECT * FROM timesheet WHERE user_id = ? AND start_date >= ? AND end_date <= ?",
+     (1, '2024-01-01', '2024-12-31')),
+    ("TimesheetManagerSQL.get_project_entries",
+     "SELECT * FROM timesheet WHERE project_id = ?",
+     (1,)),
+    ("Timesheet por período",
+     "SELECT * FROM timesheet WHERE start_date >= ? AND start_date < ?",
+     ('2024-01-01', '2024-02-01')),
+    ("CollaboratorTargetCalculator.get_performance_vs_target (ano)",
+     "SELECT t.*, u.rate_id FROM timesheet t JOIN utilizadores u ON t.user_id = u.user_id "
+     "WHERE t.user_id = ? AND t.billable = 1 AND strftime('%Y', t.start_date) = ?",
+     (1, '2024')),
+    ("CollaboratorTargetCalculator.get_performance_vs_target (mês)",
+     "SELECT t.*, u.rate_id FROM timesheet t JOIN utilizadores u ON t.user_id = u.user_id "
+     "WHERE t.user_id = ? AND t.billable = 1 AND strftime('%Y', t.start_date) = ? "
+     "AND strftime('%m', t.start_date) = ?",
+     (1, '2024', '01')),
+    ("AbsenceManager.get_user_absences",
+     "SELECT * FROM absences WHERE user_id = ?",
+     (1,)),
+    ("BillingManager.get_client_total",
+     "SELECT SUM(amount) as total FROM invoices WHERE client_id = ?",
+     (1,)),
+    ("BillingManager.get_project_total",
+     "SELECT SUM(amount) as total FROM invoices WHERE project_id = ?",
+     (1,)),
+    ("Faturas por data de emissão",
+     "SELECT * FROM invoices WHERE issue_date >= ? AND issue_date <= ?",
+     ('2024-01-01', '2024-12-31')),
+    ("MembershipIndex (utilizadores de uma equipa)",
+     "SELECT user_id FROM user_groups WHERE group_id = ?",
+     (1,)),
+]
+
+
+def check_query_plans(db_file=DB_FILE):
+    """Verifica com EXPLAIN QUERY PLAN que cada query crítica usa um índice
+
+    Qualquer SCAN no plano (de qualquer tabela, mesmo por um índice de
+    cobertura) conta como falha.
+
+    Returns:
+        Lista de tuplos (nome, usa_indice, plano); queries sobre tabelas
+        inexistentes são ignoradas.
+    """
+    results = []
+    with get_connection(db_file) as conn:
+        for name, query, params in HOT_QUERIES:
+            try:
+                plan_rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"Ignorada '{name}': {e}")
+                continue
+
+            details = [row[-1] for row in plan_rows]
+            full_scan = any(detail.startswith("SCAN ") for detail in details)
+            uses_index = not full_scan and any("USING" in detail for detail in details)
+            results.append((name, uses_index, " | ".join(details)))
+    return results
+
+
+if __name__ == "__main__":
+    db_file = next((arg for arg in sys.argv[1:] if not arg.startswith('--')), DB_FILE)
+    version = run_migrations(db_file)
+    print(f"Versão de esquema: {version}")
+
+    if '--check' in sys.argv:
+        failures = 0
+        for name, uses_index, plan in check_query_plans(db_file):
+            status = "OK  " if uses_index else "SCAN"
+            print(f"[{status}] {name}: {plan}")
+            if not uses_index:
+                failures += 1
+        sys.exit(1 if failures else 0)
@@ -1,6 +1,10 @@
 import pandas as pd
+import numpy as np
 import sqlite3
 import os
+from datetime import date, datetime
+from database_manager import get_connection
+from query_log import track_query
 
 # Caminho para o banco de dados - ajuste conforme necessário
 DB_PATH = 'timetracker.db'
@@ -11,46 +15,225 @@ def read_table_from_db(table_name):
     Lê uma tabela do banco de dados SQLite e retorna como DataFrame.
     Substitui a funcionalidade pd.read_excel()
     """
-    conn = sqlite3.connect(DB_PATH)
     query = f"SELECT * FROM {table_name}"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    with get_connection(DB_PATH) as conn, track_query(query) as info:
+        df = pd.read_sql_query(query, conn)
+        info['rows'] = len(df)
     return df
 
 def save_table_to_db(df, table_name):
     """
     Salva um DataFrame em uma tabela do banco de dados SQLite.
     Substitui a funcionalidade df.to_excel()
+    
+    ATENÇÃO: reescreve a tabela inteira (e perde índices/constraints).
+    Para alterar poucas linhas use insert_rows/upsert_rows/update_rows/delete_rows.
     """
-    conn = sqlite3.connect(DB_PATH)
-    df.to_sql(table_name, conn, if_exists='replace', index=False)
-    conn.close()
+    with get_connection(DB_PATH) as conn, track_query(f"REPLACE TABLE {table_name}") as info:
+        df.to_sql(table_name, conn, if_exists='replace', index=False)
+        info['rows'] = len(df)
     return True
 
 def execute_query(query, params=None):
     """
     Executa uma query SQL personalizada
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    if params:
-        cursor.execute(query, params)
-    else:
-        cursor.execute(query)
-    
-    conn.commit()
-    result = cursor.fetchall()
-    conn.close()
+    with get_connection(DB_PATH) as conn, track_query(query, params) as info:
+        cursor = conn.cursor()
+        
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        
+        conn.commit()
+        result = cursor.fetchall()
+        info['rows'] = len(result) if cursor.description else cursor.rowcount
     return result
 
+def read_row_from_db(query, params=None):
+    """
+    Executa uma query e retorna a primeira linha como dicionário (ou None)
+    """
+    with get_connection(DB_PATH) as conn, track_query(query, params) as info:
+        cursor = conn.execute(query, params or ())
+        row = cursor.fetchone()
+        info['rows'] = int(row is not None)
+        if row is None:
+            return None
+        columns = [description[0] for description in cursor.description]
+    return dict(zip(columns, row))
+
 def get_table_columns(table_name):
     """
     Retorna a lista de colunas de uma tabela
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [info[1] for info in cursor.fetchall()]
-    conn.close()
-    return columns
\ No newline at end of file
+    query = f"PRAGMA table_info({table_name})"
+    with get_connection(DB_PATH) as conn, track_query(query) as info:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        columns = [column_info[1] for column_info in cursor.fetchall()]
+        info['rows'] = len(columns)
+    return columns
+
+
+def _to_sql_value(value):
+    """Converte valores pandas/numpy para tipos aceites pelo sqlite3"""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return str(value)
+    return value
+
+
+def _rows_to_records(rows):
+    """Aceita um DataFrame, um dicionário ou uma lista de dicionários e devolve lista de dicionários"""
+    if isinstance(rows, pd.DataFrame):
+        return rows.to_dict('records')
+    if isinstance(rows, dict):
+        return [rows]
+    return list(rows)
+
+
+def _group_by_columns(records):
+    """Agrupa registos pelo conjunto de colunas, para usar um único executemany por grupo"""
+    groups = {}
+    for record in records:
+        groups.setdefault(tuple(record.keys()), []).append(record)
+    return groups
+
+
+def _check_columns(conn, table_name, columns):
+    """Garante que as colunas existem na tabela (os nomes vão diretamente para o SQL)"""
+    cursor = conn.execute(f"PRAGMA table_info({table_name})")
+    table_columns = {info[1] for info in cursor.fetchall()}
+    if not table_columns:
+        raise ValueError(f"Tabela {table_name} não existe")
+    unknown = [col for col in columns if col not in table_columns]
+    if unknown:
+        raise ValueError(f"Colunas inexistentes na tabela {table_name}: {', '.join(unknown)}")
+
+
+def _run_in_transaction(statements):
+    """Executa uma lista de (sql, lista_de_parametros) numa única transação"""
+    total = 0
+    with get_connection(DB_PATH) as conn:
+        try:
+            for query, params_list in statements:
+                if params_list:
+                    with track_query(query, params_list, many=True) as info:
+                        cursor = conn.executemany(query, params_list)
+                        info['rows'] = cursor.rowcount
+                    total += cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return total
+
+
+def _insert_statements(conn, table_name, records):
+    """Prepara os INSERT (um executemany por conjunto de colunas)"""
+    statements = []
+    for columns, group in _group_by_columns(records).items():
+        _check_columns(conn, table_name, columns)
+        query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        params_list = [tuple(_to_sql_value(record[col]) for col in columns) for record in group]
+        statements.append((query, params_list))
+    return statements
+
+
+def _update_statements(conn, table_name, records, key):
+    """Prepara os UPDATE ... WHERE key = ? (um executemany por conjunto de colunas)"""
+    statements = []
+    for columns, group in _group_by_columns(records).items():
+        if key not in columns:
+            raise ValueError(f"Cada linha tem de incluir a chave '{key}'")
+        _check_columns(conn, table_name, columns)
+        set_columns = [col for col in columns if col != key]
+        if not set_columns:
+            continue
+        set_clause = ', '.join([f"{col} = ?" for col in set_columns])
+        query = f"UPDATE {table_name} SET {set_clause} WHERE {key} = ?"
+        params_list = [
+            tuple(_to_sql_value(record[col]) for col in set_columns) + (_to_sql_value(record[key]),)
+            for record in group
+        ]
+        statements.append((query, params_list))
+    return statements
+
+
+def insert_rows(table_name, rows):
+    """
+    Insere linhas numa tabela existente, mantendo o esquema e os índices.
+    Retorna o número de linhas inseridas.
+    """
+    with get_connection(DB_PATH) as conn:
+        statements = _insert_statements(conn, table_name, _rows_to_records(rows))
+    return _run_in_transaction(statements)
+
+
+def update_rows(table_name, rows, key):
+    """
+    Atualiza linhas identificadas pela coluna `key` (que tem de estar em cada linha).
+    Retorna o número de linhas alteradas.
+    """
+    with get_connection(DB_PATH) as conn:
+        statements = _update_statements(conn, table_name, _rows_to_records(rows), key)
+    return _run_in_transaction(statements)
+
+
+def upsert_rows(table_name, rows, key):
+    """
+    Atualiza as linhas cuja chave já existe e insere as restantes, numa única transação.
+    Não exige constraint UNIQUE na chave (tabelas antigas criadas com to_sql não a têm).
+    Retorna o número de linhas escritas.
+    """
+    records = _rows_to_records(rows)
+    keys = [_to_sql_value(record[key]) for record in records]
+    
+    with get_connection(DB_PATH) as conn:
+        _check_columns(conn, table_name, [key])
+        
+        # Limite de parâmetros do SQLite: consultar as chaves em blocos
+        existing = set()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ', '.join(['?'] * len(chunk))
+            query = f"SELECT {key} FROM {table_name} WHERE {key} IN ({placeholders})"
+            with track_query(query, chunk) as info:
+                found = conn.execute(query, chunk).fetchall()
+                info['rows'] = len(found)
+            existing.update(row[0] for row in found)
+        
+        to_update = [record for record, value in zip(records, keys) if value in existing]
+        to_insert = [record for record, value in zip(records, keys) if value not in existing]
+        
+        statements = _update_statements(conn, table_name, to_update, key)
+        statements += _insert_statements(conn, table_name, to_insert)
+    return _run_in_transaction(statements)
+
+
+def delete_rows(table_name, keys, key):
+    """
+    Remove as linhas cuja coluna `key` está na lista `keys`.
+    Retorna o número de linhas removidas.
+    """
+    with get_connection(DB_PATH) as conn:
+        _check_columns(conn, table_name, [key])
+    params_list = [(_to_sql_value(value),) for value in keys]
+    return _run_in_transaction([(f"DELETE FROM {table_name} WHERE {key} = ?", params_list)])
+
+
+def next_id(table_name, key):
+    """Retorna o próximo identificador livre (MAX + 1) de uma tabela"""
+    result = execute_query(f"SELECT COALESCE(MAX({key}), 0) + 1 FROM {table_name}")
+    return int(result[0][0])
@@ -15,11 +15,18 @@ from datetime import datetime, timedelta
 import calendar
 from fpdf import FPDF
 import base64
-from database_manager import DatabaseManager, UserManager, ProjectManager, ClientManager, GroupManager
+from database_manager import UserManager, ProjectManager, ClientManager, GroupManager
+from page_data import get_db_manager, load_table
 from annual_targets import AnnualTargetManager
 from billing_manager import BillingManager
 from collaborator_targets import CollaboratorTargetCalculator
-from report_utils import get_feriados_portugal, calcular_dias_uteis_projeto
+from business_calendar import get_business_calendar, calcular_dias_uteis_projeto
+from date_utils import parse_dates
+from cost_engine import add_entry_costs, load_rate_history, load_user_rate_history
+from group_membership import membership_index
+from collaborator_indicators import compute_collaborator_indicators
+from project_indicators import compute_project_indicators
+from revenue_rollup import compute_revenue_indicators, load_revenue_rollup
 
 def executive_dashboard_email():
     """
@@ -29,7 +36,7 @@ def executive_dashboard_email():
     st.title("📧 Relatório Executivo de Indicadores")
     
     # Inicializar gerenciadores
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     annual_target_manager = AnnualTargetManager()
     collaborator_target_calculator = CollaboratorTargetCalculator()
     billing_manager = BillingManager()
@@ -41,15 +48,15 @@ def executive_dashboard_email():
     
     # Carregamento de dados
     try:
-        clients_df = db_manager.query_to_df("SELECT * FROM clients WHERE active = 1")
-        projects_df = db_manager.query_to_df("SELECT * FROM projects")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups WHERE active = 1")
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
+        clients_df = load_table('clients', db_manager, active_only=True)
+        projects_df = load_table('projects', db_manager)
+        users_df = load_table('utilizadores', db_manager, active_only=True)
+        timesheet_df = load_table('timesheet', db_manager)
+        groups_df = load_table('groups', db_manager, active_only=True)
+        rates_df = load_table('rates', db_manager)
         
         # Converter datas
-        timesheet_df['start_date'] = pd.to_datetime(timesheet_df['start_date'], format='mixed', errors='coerce')
+        timesheet_df['start_date'] = parse_dates(timesheet_df['start_date'], errors='coerce')
         
         # Obter tipos de projetos únicos
         project_types = sorted(projects_df['project_type'].unique().tolist())
@@ -198,7 +205,9 @@ Equipe de Gestão"""
             st.error("Por favor, informe pelo menos um destinatário.")
             return
         
-        with st.spinner("Gerando e enviando relatório..."):
+        # Todas as leituras do relatório usam a mesma vista da base de dados,
+        # sem serem afetadas por registos de horas feitos entretanto
+        with st.spinner("Gerando e enviando relatório..."), db_manager.snapshot():
             # Criar diretório temporário para os arquivos
             temp_dir = tempfile.mkdtemp()
             
@@ -1221,35 +1230,14 @@ def get_collaborator_indicators(db_manager, collaborator_target_calculator, mont
     """
     try:
         # Carregar dados necessários
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
+        timesheet_df = load_table('timesheet', db_manager)
+        users_df = load_table('utilizadores', db_manager, active_only=True)
+        groups_df = load_table('groups', db_manager)
         
         # Filtrar por equipe
         if "Todas" not in selected_teams:
-            # Encontrar os usuários que pertencem às equipes selecionadas
-            filtered_users = []
-            for _, user in users_df.iterrows():
-                try:
-                    if isinstance(user['groups'], str):
-                        user_groups = eval(user['groups'])
-                    else:
-                        user_groups = user['groups'] if user['groups'] is not None else []
-                    
-                    # Converter para lista se for outro tipo
-                    if not isinstance(user_groups, list):
-                        if isinstance(user_groups, dict):
-                            user_groups = list(user_groups.values())
-                        else:
-                            user_groups = [user_groups]
-                    
-                    # Verificar se o usuário pertence a alguma das equipes selecionadas
-                    if any(team in user_groups for team in selected_teams):
-                        filtered_users.append(user['user_id'])
-                except Exception as e:
-                    print(f"Erro ao processar grupos do usuário {user['First_Name']} {user['Last_Name']}: {str(e)}")
-            
-            # Filtrar usuários
+            # Utilizadores das equipes selecionadas (índice de pertença user_groups)
+            filtered_users = list(membership_index.users_in_teams(db_manager, selected_teams))
             users_df = users_df[users_df['user_id'].isin(filtered_users)]
         
         if users_df.empty:
@@ -1259,76 +1247,17 @@ def get_collaborator_indicators(db_manager, collaborator_target_calculator, mont
         primeiro_dia = datetime(year, month, 1)
         ultimo_dia = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
         
-        # Obter lista de feriados para o ano
-        feriados = get_feriados_portugal(year)
-        
         # Calcular dias úteis (de trabalho) no mês, excluindo feriados
-        dias_uteis = 0
-        data_atual = primeiro_dia
-        while data_atual <= ultimo_dia:
-            # Se não for sábado (5) nem domingo (6) e não for feriado
-            if data_atual.weekday() < 5 and data_atual.date() not in feriados:
-                dias_uteis += 1
-            data_atual += timedelta(days=1)
+        dias_uteis = get_business_calendar(db_manager).business_days(primeiro_dia, ultimo_dia)
         
         # Horas úteis totais (considerando 8 horas por dia útil)
         horas_uteis_mes = dias_uteis * 8
         
-        # Para cada colaborador, calcular indicadores
-        collaborator_indicators = []
-        
-        for _, user in users_df.iterrows():
-            # Obter dados de metas do colaborador
-            user_targets = collaborator_target_calculator.get_user_targets(user['user_id'], year)
-            
-            # Filtrar entradas de timesheet para o colaborador e mês específico
-            try:
-                user_timesheet = timesheet_df[
-                    (timesheet_df['user_id'] == user['user_id']) & 
-                    (pd.to_datetime(timesheet_df['start_date'], format='mixed').dt.month == month) &
-                    (pd.to_datetime(timesheet_df['start_date'], format='mixed').dt.year == year)
-                ]
-            except Exception as e:
-                # Fallback em caso de erro de conversão de data
-                print(f"Erro ao filtrar timesheet para {user['First_Name']} {user['Last_Name']}: {e}")
-                user_timesheet = pd.DataFrame()
-            
-            # Calcular horas realizadas (total de horas registradas)
-            total_hours = user_timesheet['hours'].sum() if not user_timesheet.empty else 0
-            
-            # Calcular horas faturáveis (apenas entradas marcadas como billable=True)
-            billable_hours = user_timesheet[user_timesheet['billable'] == True]['hours'].sum() if not user_timesheet.empty else 0
-            
-            # Calcular percentuais de ocupação e faturabilidade baseados nas horas realizadas
-            # Ocupação = (Horas realizadas / Horas úteis do mês) * 100
-            occupation_percentage = (total_hours / horas_uteis_mes * 100) if horas_uteis_mes > 0 else 0
-            
-            # Faturabilidade = (Horas faturáveis / Horas úteis do mês) * 100
-            billable_percentage = (billable_hours / horas_uteis_mes * 100) if horas_uteis_mes > 0 else 0
-            
-            # Metas definidas
-            target_occupation = 87.5  # Meta de ocupação (87,5%)
-            target_billable = 75.0    # Meta de horas faturáveis (75.0%)
-            
-            # Determinar cores dos indicadores - simplificado para verde/vermelho
-            occupation_color = "green" if occupation_percentage >= target_occupation else "red"
-            billable_color = "green" if billable_percentage >= target_billable else "red"
-            
-            # Adicionar ao array de indicadores
-            collaborator_indicators.append({
-                "user_id": user['user_id'],
-                "name": f"{user['First_Name']} {user['Last_Name']}",
-                "occupation_percentage": occupation_percentage,
-                "billable_percentage": billable_percentage,
-                "occupation_color": occupation_color,
-                "billable_color": billable_color,
-                "target_occupation": target_occupation,
-                "target_billable": target_billable,
-                "total_hours": total_hours,  # Quantidade de horas realizadas
-                "billable_hours": billable_hours  # Quantidade de horas faturáveis
-            })
-        
-        return collaborator_indicators
+        # Indicadores de todos os colaboradores numa passagem (mês filtrado uma vez,
+        # um groupby por colaborador e as metas do mês numa única query)
+        month_targets = collaborator_target_calculator.get_month_targets(year, month, users_df['user_id'])
+        indicators_df = compute_collaborator_indicators(timesheet_df, users_df, year, month, horas_uteis_mes, month_targets)
+        return indicators_df.to_dict('records')
     
     except Exception as e:
         import traceback
@@ -1339,16 +1268,16 @@ def get_collaborator_indicators(db_manager, collaborator_target_calculator, mont
 def get_project_indicators(db_manager, annual_target_manager, month, year, selected_teams, selected_clients, selected_project_types):
     try:
         # Carregar dados necessários
-        projects_df = db_manager.query_to_df("SELECT * FROM projects")
-        clients_df = db_manager.query_to_df("SELECT * FROM clients")
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
+        projects_df = load_table('projects', db_manager)
+        clients_df = load_table('clients', db_manager)
+        timesheet_df = load_table('timesheet', db_manager)
+        users_df = load_table('utilizadores', db_manager)
+        rates_df = load_table('rates', db_manager)
+        groups_df = load_table('groups', db_manager)
         
         # Converter datas
-        projects_df['start_date'] = pd.to_datetime(projects_df['start_date'], format='mixed', errors='coerce')
-        projects_df['end_date'] = pd.to_datetime(projects_df['end_date'], format='mixed', errors='coerce')
+        projects_df['start_date'] = parse_dates(projects_df['start_date'], errors='coerce')
+        projects_df['end_date'] = parse_dates(projects_df['end_date'], errors='coerce')
         
         # Filtragens
         filtered_projects = projects_df.copy()
@@ -1379,180 +1308,44 @@ def get_project_indicators(db_manager, annual_target_manager, month, year, selec
         if filtered_projects.empty:
             return []
         
-        # Função para calcular dias úteis entre duas datas
-        def calcular_dias_uteis(data_inicio, data_fim):
-            """Calcula os dias úteis entre duas datas"""
-            dias_uteis = 0
-            data_atual = data_inicio
-            
-            while data_atual <= data_fim:
-                if data_atual.weekday() < 5:  # 0-4 são dias úteis (seg-sex)
-                    dias_uteis += 1
-                data_atual += timedelta(days=1)
-            
-            return dias_uteis
-        
-        # Para cada projeto, calcular métricas
-        project_indicators = []
-        
         # Definir o início e fim do mês de referência
         inicio_mes = datetime(year, month, 1)
         ultimo_dia = calendar.monthrange(year, month)[1]
         fim_mes = datetime(year, month, ultimo_dia, 23, 59, 59)
         
-        # Converter datas em timesheet para datetime para facilitar filtros
-        if 'start_date' in timesheet_df.columns:
-            try:
-                timesheet_df['start_date_dt'] = pd.to_datetime(timesheet_df['start_date'], format='mixed')
-            except Exception as e:
-                print(f"Erro ao converter datas: {e}")
-                timesheet_df['start_date_dt'] = pd.to_datetime('2000-01-01')
+        # Custo de cada registo calculado uma única vez para todo o timesheet,
+        # com a rate em vigor na data de cada registo
+        timesheet_df = add_entry_costs(
+            timesheet_df, users_df, rates_df,
+            rate_history=load_rate_history(db_manager),
+            user_rate_history=load_user_rate_history(db_manager)
+        )
+        
+        # Números de todos os projetos de uma vez (mesmo motor do dashboard e do email de projetos)
+        indicators = compute_project_indicators(
+            filtered_projects,
+            timesheet_df,
+            inicio_mes,
+            fim_mes,
+            as_of=datetime.now(),
+            calendar=get_business_calendar(db_manager)
+        ).set_index('project_id')
+        client_names = clients_df.drop_duplicates('client_id').set_index('client_id')['name']
+        
+        # Para cada projeto, classificar o risco
+        project_indicators = []
         
         for _, project in filtered_projects.iterrows():
             try:
-                # Obter registros de timesheet para o projeto
-                project_entries = timesheet_df[timesheet_df["project_id"] == project["project_id"]]
-                
-                # Verificar se existem dados migrados
-                horas_migradas = 0
-                if 'horas_realizadas_mig' in project and not pd.isna(project['horas_realizadas_mig']):
-                    horas_migradas = float(project['horas_realizadas_mig'])
-                
-                custo_migrado = 0
-                if 'custo_realizado_mig' in project and not pd.isna(project['custo_realizado_mig']):
-                    custo_migrado = float(project['custo_realizado_mig'])
-                
-                # Calcular dias úteis totais do projeto
-                dias_uteis_projeto = calcular_dias_uteis(project['start_date'], project['end_date'])
-                
-                # Entradas do projeto no mês atual
-                try:
-                    month_entries = project_entries[
-                        (pd.to_datetime(project_entries["start_date"], format='mixed') >= inicio_mes) &
-                        (pd.to_datetime(project_entries["start_date"], format='mixed') <= fim_mes)
-                    ]
-                except Exception as e:
-                    print(f"Erro ao filtrar entradas do mês: {e}")
-                    month_entries = pd.DataFrame()
-                
-                # Calcular horas regulares e extras
-                month_hours_regular = 0
-                month_hours_extra = 0
-                
-                if not month_entries.empty:
-                    month_hours_regular = month_entries[~month_entries['overtime'].astype(bool)]['hours'].sum()
-                    # Para horas extras, calcular o dobro para contabilização
-                    month_hours_extra_original = month_entries[month_entries['overtime'].astype(bool)]['hours'].sum()
-                    month_hours_extra = month_hours_extra_original * 2
-                
-                # Total de horas no mês (regulares + extras*2)
-                month_hours = float(month_hours_regular + month_hours_extra)
-                
-                # Calcular custo realizado para o mês
-                month_cost = 0
-                if not month_entries.empty:
-                    for _, entry in month_entries.iterrows():
-                        try:
-                            user_id = entry['user_id']
-                            hours = float(entry['hours'])
-                            is_overtime = entry.get('overtime', False)
-                            
-                            # Converter para booleano
-                            if isinstance(is_overtime, (int, float)):
-                                is_overtime = bool(is_overtime)
-                            elif isinstance(is_overtime, str):
-                                is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                            
-                            # Obter rate para o usuário
-                            rate_value = None
-                            if 'rate_value' in entry and not pd.isna(entry['rate_value']):
-                                rate_value = float(entry['rate_value'])
-                            else:
-                                user_info = users_df[users_df['user_id'] == user_id]
-                                
-                                if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                                    rate_id = user_info['rate_id'].iloc[0]
-                                    rate_info = rates_df[rates_df['rate_id'] == rate_id]
-                                    
-                                    if not rate_info.empty:
-                                        rate_value = float(rate_info['rate_cost'].iloc[0])
-                            
-                            # Calcular custo com base no rate obtido
-                            if rate_value:
-                                entry_cost = hours * rate_value
-                                
-                                # Se for hora extra, multiplicar por 2
-                                if is_overtime:
-                                    month_cost += entry_cost * 2  # Dobro para horas extras
-                                else:
-                                    month_cost += entry_cost  # Normal para horas regulares
-                        except Exception as e:
-                            print(f"Erro ao processar entrada: {e}")
-                
-                # Calcular percentual de tempo decorrido do projeto
-                total_days = (project['end_date'] - project['start_date']).days
-                elapsed_days = (datetime.now() - project['start_date']).days
-                elapsed_days = max(0, min(elapsed_days, total_days))  # Garantir entre 0 e total_days
-                time_percentage = (elapsed_days / total_days * 100) if total_days > 0 else 0
-                
-                # Obter horas e custo totais planejados
-                total_hours = float(project['total_hours']) if pd.notna(project['total_hours']) else 0
-                total_cost = float(project['total_cost']) if pd.notna(project['total_cost']) else 0
-                
-                # Calcular horas e custo realizados (incluindo dados migrados)
-                realized_hours = 0
-                realized_cost = 0
-                
-                if not project_entries.empty:
-                    # Calcular horas realizadas
-                    regular_hours = project_entries[~project_entries['overtime'].astype(bool)]['hours'].sum()
-                    extra_hours_original = project_entries[project_entries['overtime'].astype(bool)]['hours'].sum()
-                    extra_hours = extra_hours_original * 2
-                    realized_hours = regular_hours + extra_hours
-                    
-                    # Calcular custo realizado
-                    for _, entry in project_entries.iterrows():
-                        try:
-                            user_id = entry['user_id']
-                            hours = float(entry['hours'])
-                            is_overtime = entry.get('overtime', False)
-                            
-                            # Converter para booleano
-                            if isinstance(is_overtime, (int, float)):
-                                is_overtime = bool(is_overtime)
-                            elif isinstance(is_overtime, str):
-                                is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                            
-                            # Obter rate para o usuário
-                            user_info = users_df[users_df['user_id'] == user_id]
-                            if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                                rate_id = user_info['rate_id'].iloc[0]
-                                rate_info = rates_df[rates_df['rate_id'] == rate_id]
-                                
-                                if not rate_info.empty:
-                                    rate_value = float(rate_info['rate_cost'].iloc[0])
-                                    entry_cost = hours * rate_value
-                                    
-                                    # Se for hora extra, multiplicar por 2
-                                    if is_overtime:
-                                        realized_cost += entry_cost * 2
-                                    else:
-                                        realized_cost += entry_cost
-                        except Exception as e:
-                            print(f"Erro ao calcular custo: {e}")
-                
-                # Adicionar dados migrados
-                realized_hours += horas_migradas
-                realized_cost += custo_migrado
-                
-                # Calcular percentuais
-                hours_percentage = (realized_hours / total_hours * 100) if total_hours > 0 else 0
-                cost_percentage = (realized_cost / total_cost * 100) if total_cost > 0 else 0
-                
-                # Calcular CPI (Cost Performance Index)
-                # Valor Planejado = % tempo decorrido * custo total planejado
-                planned_value = (time_percentage / 100) * total_cost
-                cpi = planned_value / realized_cost if realized_cost > 0 else 1.0
+                numbers = indicators.loc[project['project_id']]
+                realized_hours = float(numbers['realized_hours'])
+                realized_cost = float(numbers['realized_cost'])
+                total_hours = float(numbers['total_hours'])
+                total_cost = float(numbers['total_cost'])
+                hours_percentage = float(numbers['hours_percentage'])
+                cost_percentage = float(numbers['cost_percentage'])
+                time_percentage = float(numbers['time_percentage'])
+                cpi = float(numbers['cpi'])
                 
                 # Determinar nível de risco
                 if cpi >= 1.1:
@@ -1579,8 +1372,7 @@ def get_project_indicators(db_manager, annual_target_manager, month, year, selec
                         risk_reason += f". Apesar disso, o consumo de horas está {abs(schedule_variance):.1f}% abaixo do esperado"
                 
                 # Obter nome do cliente
-                client_id = project['client_id']
-                client_name = clients_df[clients_df['client_id'] == client_id]['name'].iloc[0] if not clients_df.empty else "Cliente Desconhecido"
+                client_name = client_names.get(project['client_id'], "Cliente Desconhecido")
                 
                 # Adicionar ao array de indicadores
                 project_indicators.append({
@@ -1621,10 +1413,7 @@ def get_revenue_indicators(db_manager, annual_target_manager, billing_manager, m
     try:
         # Carregar dados necessários
         annual_targets = annual_target_manager.read()
-        invoices_df = billing_manager.get_invoice()  # Buscar todas as faturas
-        clients_df = db_manager.query_to_df("SELECT * FROM clients")
-        projects_df = db_manager.query_to_df("SELECT * FROM projects")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
+        groups_df = load_table('groups', db_manager)
         
         # Filtrar por equipe, se necessário
         if "Todas" not in selected_teams:
@@ -1639,135 +1428,10 @@ def get_revenue_indicators(db_manager, annual_target_manager, billing_manager, m
         if year_targets.empty:
             return []
         
-        # Definir períodos
-        primeiro_dia_mes = datetime(year, month, 1)
-        ultimo_dia_mes = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
-        
-        inicio_ano = datetime(year, 1, 1)
-        fim_ano = datetime(year, 12, 31, 23, 59, 59)
+        # Faturação do mês, trimestre e ano de cada meta a partir da tabela agregada
+        revenue_df = compute_revenue_indicators(year_targets, load_revenue_rollup(db_manager, year), groups_df, month)
         
-        # Determinar trimestre atual
-        current_quarter = (month - 1) // 3 + 1
-        inicio_trimestre = datetime(year, ((current_quarter - 1) * 3) + 1, 1)
-        fim_trimestre_mes = min(current_quarter * 3, 12)
-        ultimo_dia_trimestre = calendar.monthrange(year, fim_trimestre_mes)[1]
-        fim_trimestre = datetime(year, fim_trimestre_mes, ultimo_dia_trimestre, 23, 59, 59)
-        
-        # Calcular indicadores de faturação
-        revenue_indicators = []
-        
-        for _, target in year_targets.iterrows():
-            company_name = target["company_name"]
-            annual_target = target["target_value"]
-            
-            # Calcular metas mensais e trimestrais
-            monthly_target = annual_target / 12
-            quarterly_target = annual_target / 4
-            
-            # Filtrar faturas por empresa usando projetos associados à empresa
-            company_invoices = invoices_df.copy() if not invoices_df.empty else pd.DataFrame()
-            
-            if company_name != "Todas" and not company_invoices.empty:
-                # Mapear projetos da empresa
-                company_projects = []
-                
-                # Identificar o group_id correspondente à empresa
-                group_id = None
-                for _, group in groups_df.iterrows():
-                    if group['group_name'] == company_name:
-                        group_id = group['id']
-                        break
-                
-                if group_id is not None:
-                    # Filtrar projetos da empresa pelo group_id
-                    company_projects_df = projects_df[projects_df['group_id'] == group_id]
-                    company_projects = company_projects_df['project_id'].tolist()
-                    
-                    # Filtrar faturas pelos projetos da empresa
-                    if company_projects:
-                        company_invoices = company_invoices[company_invoices['project_id'].isin(company_projects)]
-                    else:
-                        company_invoices = pd.DataFrame()  # Sem projetos, sem faturas
-            
-            # Calcular faturação efetiva por período usando datas de pagamento das faturas
-            if not company_invoices.empty:
-                # Converter datas para datetime
-                company_invoices['payment_date'] = pd.to_datetime(company_invoices['payment_date'])
-                
-                # Filtrar para o mês atual
-                month_invoices = company_invoices[
-                    (company_invoices['payment_date'] >= primeiro_dia_mes) & 
-                    (company_invoices['payment_date'] <= ultimo_dia_mes)
-                ]
-                monthly_revenue = month_invoices['amount'].sum() if not month_invoices.empty else 0
-                
-                # Filtrar para o trimestre atual
-                quarter_invoices = company_invoices[
-                    (company_invoices['payment_date'] >= inicio_trimestre) & 
-                    (company_invoices['payment_date'] <= fim_trimestre)
-                ]
-                quarterly_revenue = quarter_invoices['amount'].sum() if not quarter_invoices.empty else 0
-                
-                # Filtrar para o ano atual
-                year_invoices = company_invoices[
-                    (company_invoices['payment_date'] >= inicio_ano) & 
-                    (company_invoices['payment_date'] <= fim_ano)
-                ]
-                annual_revenue = year_invoices['amount'].sum() if not year_invoices.empty else 0
-            else:
-                # Sem faturas registradas
-                monthly_revenue = 0
-                quarterly_revenue = 0
-                annual_revenue = 0
-            
-            # Calcular percentuais de conclusão
-            monthly_percentage = (monthly_revenue / monthly_target * 100) if monthly_target > 0 else 0
-            quarterly_percentage = (quarterly_revenue / quarterly_target * 100) if quarterly_target > 0 else 0
-            annual_percentage = (annual_revenue / annual_target * 100) if annual_target > 0 else 0
-            
-            # Determinar cores dos indicadores
-            # Mensal
-            if monthly_percentage >= 80:
-                monthly_color = "green"
-            elif monthly_percentage >= 60:
-                monthly_color = "yellow"
-            else:
-                monthly_color = "red"
-            
-            # Trimestral
-            if quarterly_percentage >= 80:
-                quarterly_color = "green"
-            elif quarterly_percentage >= 60:
-                quarterly_color = "yellow"
-            else:
-                quarterly_color = "red"
-                
-            # Anual
-            if annual_percentage >= 80:
-                annual_color = "green"
-            elif annual_percentage >= 60:
-                annual_color = "yellow"
-            else:
-                annual_color = "red"
-            
-            # Adicionar ao array de indicadores
-            revenue_indicators.append({
-                "company_name": company_name,
-                "monthly_target": monthly_target,
-                "monthly_revenue": monthly_revenue,
-                "monthly_percentage": monthly_percentage,
-                "quarterly_target": quarterly_target,
-                "quarterly_revenue": quarterly_revenue,
-                "quarterly_percentage": quarterly_percentage,
-                "annual_target": annual_target,
-                "annual_revenue": annual_revenue,
-                "annual_percentage": annual_percentage,
-                "monthly_color": monthly_color,
-                "quarterly_color": quarterly_color,
-                "annual_color": annual_color
-            })
-        
-        return revenue_indicators
+        return revenue_df.to_dict('records')
     
     except Exception as e:
         import traceback
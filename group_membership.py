@@ -0,0 +1,121 @@
+"""
+Pertença dos utilizadores às equipas (tabela user_groups).
+
+A coluna utilizadores.groups guarda uma lista Python em texto (ex.: "['Tech']")
+e era avaliada com eval() por utilizador, a cada pedido, só para filtrar por
+equipa. A pertença passou a estar na tabela user_groups (user_id, group_id,
+position) e este módulo mantém em memória um índice equipa -> utilizadores e
+utilizador -> equipas, construído com uma única query.
+
+O índice expira ao fim de ttl_seconds e é invalidado pelo UserManager e pelo
+GroupManager sempre que alteram utilizadores ou equipas.
+"""
+import ast
+import sqlite3
+import threading
+import time
+
+
+def parse_groups_value(value):
+    """Converte o valor da coluna utilizadores.groups numa lista (sem eval)
+
+    Aceita listas em texto ("['Tech', 'LRB']"), dicionários (usa os valores),
+    listas já convertidas e valores simples.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return []
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            # Texto simples com o nome de uma equipa
+            return [text]
+    if isinstance(value, dict):
+        return list(value.values())
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    try:
+        if value != value:  # NaN
+            return []
+    except TypeError:
+        pass
+    return [value]
+
+
+class MembershipIndex:
+    def __init__(self, ttl_seconds=300):
+        """Inicializa o índice com o tempo de vida (em segundos) de cada carregamento"""
+        self.ttl_seconds = ttl_seconds
+        self._by_db = {}
+        self._lock = threading.Lock()
+
+    def _load(self, db_manager):
+        """Lê a pertença de todos os utilizadores numa única query"""
+        try:
+            rows = db_manager.fetch_all(
+                """
+                SELECT ug.user_id, g.group_name
+                FROM user_groups ug
+                JOIN groups g ON g.id = ug.group_id
+                ORDER BY ug.user_id, ug.position
+                """
+            )
+        except sqlite3.OperationalError:
+            # Base de dados sem a migração de user_groups: usa a coluna antiga
+            rows = [
+                (user_id, group)
+                for user_id, groups in db_manager.fetch_all("SELECT user_id, groups FROM utilizadores")
+                for group in parse_groups_value(groups)
+            ]
+
+        users_by_team = {}
+        teams_by_user = {}
+        for user_id, group_name in rows:
+            users_by_team.setdefault(group_name, set()).add(int(user_id))
+            teams_by_user.setdefault(int(user_id), []).append(group_name)
+        return users_by_team, teams_by_user
+
+    def _get(self, db_manager):
+        """Retorna (equipa -> user_ids, user_id -> equipas), carregando se necessário"""
+        key = db_manager.db_file
+        with self._lock:
+            entry = self._by_db.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                return entry[1]
+
+        index = self._load(db_manager)
+        with self._lock:
+            self._by_db[key] = (time.monotonic(), index)
+        return index
+
+    def users_in_teams(self, db_manager, teams):
+        """Conjunto dos user_id que pertencem a alguma das equipas indicadas"""
+        if isinstance(teams, str):
+            teams = [teams]
+        users_by_team, _ = self._get(db_manager)
+        users = set()
+        for team in teams:
+            users |= users_by_team.get(team, set())
+        return users
+
+    def teams_of_user(self, db_manager, user_id):
+        """Equipas do utilizador, pela ordem em que foram atribuídas (a primeira é a principal)"""
+        _, teams_by_user = self._get(db_manager)
+        return list(teams_by_user.get(int(user_id), []))
+
+    def teams_by_user(self, db_manager):
+        """Cópia do mapa user_id -> equipas"""
+        _, teams_by_user = self._get(db_manager)
+        return {user_id: list(teams) for user_id, teams in teams_by_user.items()}
+
+    def invalidate(self):
+        """Descarta o índice (é recarregado no próximo acesso)"""
+        with self._lock:
+            self._by_db.clear()
+
+
+# Instância partilhada por todo o processo (UserManager, GroupManager e páginas)
+membership_index = MembershipIndex()
@@ -21,8 +21,12 @@ from auth import Auth
 from datetime import datetime
 from worked_hours_report import worked_hours_report
 # Importe as funções de acesso ao banco de dados
-from db_utils import read_table_from_db, save_table_to_db
+from db_utils import (
+    read_table_from_db, save_table_to_db, execute_query, get_table_columns,
+    insert_rows, update_rows, delete_rows, next_id
+)
 from database_manager import DatabaseManager, UserManager, ClientManager, ProjectManager, GroupManager
+from user_cache import user_profile_cache
 from billing_manager import billing_page
 from dashboard import dashboard_page
 from dashboard_debug import dashboard_debug
@@ -344,32 +348,23 @@ class UserManager:
         save_table_to_db(df, self.table_name)
     
     def create(self, data):
-        df = self.load_data()
-        if df.empty:
-            new_id = 1
-        else:
-            new_id = df['user_id'].max() + 1
-        data['user_id'] = new_id
-        df = pd.concat([df, pd.DataFrame([data])], ignore_index=True)
-        self.save_data(df)
-        return new_id
+        data['user_id'] = next_id(self.table_name, 'user_id')
+        insert_rows(self.table_name, data)
+        return data['user_id']
     
     def read(self, id=None):
-        df = self.load_data()
         if id is None:
-            return df
-        return df[df['user_id'] == id]
+            return self.load_data()
+        rows = execute_query(f"SELECT * FROM {self.table_name} WHERE user_id = ?", (id,))
+        return pd.DataFrame(rows, columns=get_table_columns(self.table_name))
     
     def update(self, id, data):
-        df = self.load_data()
-        for key, value in data.items():
-            df.loc[df['user_id'] == id, key] = value
-        self.save_data(df)
+        update_rows(self.table_name, dict(data, user_id=id), key='user_id')
+        user_profile_cache.invalidate(user_id=id)
     
     def delete(self, id):
-        df = self.load_data()
-        df = df[df['user_id'] != id]
-        self.save_data(df)
+        delete_rows(self.table_name, [id], key='user_id')
+        user_profile_cache.invalidate(user_id=id)
 
     def hash_password(self, password):
         return hashlib.sha256(str(password).encode()).hexdigest()
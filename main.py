@@ -20,9 +20,8 @@ from app import main as app_main
 from auth import Auth
 from datetime import datetime
 from worked_hours_report import worked_hours_report
-# Importe as funções de acesso ao banco de dados
-from db_utils import read_table_from_db, save_table_to_db
 from database_manager import DatabaseManager, UserManager, ClientManager, ProjectManager, GroupManager
+from group_membership import parse_groups_value
 from billing_manager import billing_page
 from dashboard import dashboard_page
 from dashboard_debug import dashboard_debug
@@ -37,9 +36,13 @@ from revenue_email_report import revenue_email_report
 #from commercial_meetings_report import commercial_meetings_report
 #from auto_project_status_email import project_status_email
 from comercial_indicators_email import commercial_indicators_email
+from db_migrations import run_migrations
 
 
 def main():
+    # Aplica migrações de esquema pendentes (só verifica uma vez por processo)
+    run_migrations()
+    
     auth = Auth()
     auth.initialize_session()
     
@@ -87,7 +90,7 @@ def main():
         
         # Informações do Usuário - reduzido espaçamento
         user_info = st.session_state.user_info
-        user_groups = eval(user_info['groups']) if isinstance(user_info['groups'], str) else user_info['groups']
+        user_groups = parse_groups_value(user_info['groups'])
         groups_str = user_groups[0] if isinstance(user_groups, list) and user_groups else "Sem grupo"
         
         st.sidebar.markdown(
@@ -185,7 +188,7 @@ def main():
             elif selected_category == "⚙️ Configurações":
                 menu = st.sidebar.selectbox(
                     "Opções",
-                    ["Gerais", "Metas Anuais"],
+                    ["Gerais", "Metas Anuais", "Base de Dados"],
                     key="config_options"
                 )
                 
@@ -194,6 +197,9 @@ def main():
                 elif menu == "Metas Anuais":
                     from annual_targets import annual_targets_page
                     annual_targets_page()
+                elif menu == "Base de Dados":
+                    from db_admin import database_admin_page
+                    database_admin_page()
                 #elif menu == "Fases de Projetos":
                     #project_phases_page()
 
@@ -329,54 +335,5 @@ def main():
         )
 
 
-class UserManager:
-    def __init__(self):
-        self.table_name = 'utilizadores'  # Nome da tabela no banco de dados
-    
-    def load_data(self):
-        # Substituir leitura do Excel por leitura do banco de dados
-        try:
-            return read_table_from_db(self.table_name)
-        except Exception as e:
-            # Em caso de erro (tabela não existe, etc.), retorna um DataFrame vazio
-            print(f"Erro ao carregar dados: {e}")
-            return pd.DataFrame()
-    
-    def save_data(self, df):
-        # Substituir gravação em Excel por gravação no banco de dados
-        save_table_to_db(df, self.table_name)
-    
-    def create(self, data):
-        df = self.load_data()
-        if df.empty:
-            new_id = 1
-        else:
-            new_id = df['user_id'].max() + 1
-        data['user_id'] = new_id
-        df = pd.concat([df, pd.DataFrame([data])], ignore_index=True)
-        self.save_data(df)
-        return new_id
-    
-    def read(self, id=None):
-        df = self.load_data()
-        if id is None:
-            return df
-        return df[df['user_id'] == id]
-    
-    def update(self, id, data):
-        df = self.load_data()
-        for key, value in data.items():
-            df.loc[df['user_id'] == id, key] = value
-        self.save_data(df)
-    
-    def delete(self, id):
-        df = self.load_data()
-        df = df[df['user_id'] != id]
-        self.save_data(df)
-
-    def hash_password(self, password):
-        return hashlib.sha256(str(password).encode()).hexdigest()
-    
-            
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Tabelas partilhadas pelas páginas Streamlit.
+
+As páginas começavam todas com SELECT * FROM timesheet/utilizadores/projects/
+rates/groups/absences e, como o Streamlit volta a correr o script a cada
+interação, as tabelas eram lidas de novo a cada clique num filtro. Este
+módulo é o ponto único de acesso a essas tabelas:
+
+  - get_db_manager(): DatabaseManager partilhado (st.cache_resource)
+  - load_table(tabela): DataFrame já com os tipos do schema_registry, guardado
+    em memória por (ficheiro, tabela) com a versão dos dados em que foi lido
+
+A versão é o PRAGMA data_version (query_cache.get_data_version): qualquer
+commit, de qualquer conexão ou processo, muda a versão e as tabelas voltam a
+ser lidas, sem TTL. Dentro de um read_snapshot é usada a versão do snapshot.
+Só a leitura mais recente de cada tabela fica em memória: com a versão na
+chave do st.cache_data, as versões antigas (que ninguém volta a pedir)
+ficavam guardadas até max_entries, sem limite de bytes.
+"""
+import os
+import threading
+import time
+import pandas as pd
+import streamlit as st
+
+from database_manager import DatabaseManager, get_snapshot
+from query_cache import get_data_version
+
+
+DB_FILE = 'timetracker.db'
+
+# Tabelas que podem ser lidas por inteiro através de load_table
+TABLES = (
+    'timesheet', 'utilizadores', 'projects', 'rates', 'groups', 'absences',
+    'clients', 'activities', 'task_categories',
+)
+
+# Tabelas lidas por cada página (usadas na comparação de tempos a frio/a quente)
+PAGE_TABLES = {
+    'dashboard_page': ('timesheet', 'utilizadores', 'projects', 'rates', 'groups', 'clients'),
+    'reports_page': ('timesheet', 'utilizadores', 'projects', 'rates', 'groups', 'clients', 'activities', 'task_categories'),
+    'team_productivity_page': ('timesheet', 'utilizadores', 'groups', 'absences'),
+    'calendar_page': ('timesheet', 'utilizadores', 'projects', 'absences'),
+    'executive_dashboard_email': ('timesheet', 'utilizadores', 'projects', 'rates', 'groups', 'clients'),
+    'project_email_report': ('timesheet', 'utilizadores', 'projects', 'rates', 'groups', 'clients'),
+    'collaborator_email_report': ('timesheet', 'utilizadores', 'groups', 'absences'),
+}
+
+
+@st.cache_resource
+def get_db_manager(db_file=DB_FILE):
+    """DatabaseManager partilhado por todas as sessões"""
+    return DatabaseManager(db_file)
+
+
+def current_data_version(db_file):
+    """Versão dos dados usada na chave da cache (a do snapshot ativo, se houver)"""
+    snapshot = get_snapshot(db_file)
+    return snapshot[1] if snapshot is not None else get_data_version(db_file)
+
+
+# (ficheiro, tabela, active_only) -> (versão dos dados, DataFrame)
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _read_table(db_file, table, active_only, data_version):
+    """Lê a tabela inteira ou reutiliza a leitura guardada para data_version (devolve uma cópia)
+
+    Uma leitura de uma versão mais recente substitui a anterior; as leituras
+    de um snapshot mais antigo não são guardadas.
+    """
+    key = (os.path.abspath(db_file), table, active_only)
+    with _tables_lock:
+        entry = _tables.get(key)
+    if entry is not None and entry[0] == data_version:
+        return entry[1].copy()
+
+    query = f"SELECT * FROM {table}" + (" WHERE active = 1" if active_only else "")
+    # A cache de queries seria uma segunda cópia das mesmas tabelas
+    df = get_db_manager(db_file).query_to_df(query, use_cache=False, table=table)
+    with _tables_lock:
+        entry = _tables.get(key)
+        if entry is None or entry[0] < data_version:
+            _tables[key] = (data_version, df)
+    return df.copy()
+
+
+def load_table(table, db_manager=None, active_only=False):
+    """Tabela inteira com os tipos do schema_registry (cópia; pode ser alterada pelo chamador)
+
+    Args:
+        table: nome da tabela (uma de TABLES)
+        db_manager: DatabaseManager a usar (padrão: get_db_manager())
+        active_only: apenas as linhas com active = 1
+    """
+    if table not in TABLES:
+        raise ValueError(f"Tabela não suportada por load_table: {table}")
+    db_file = db_manager.db_file if db_manager is not None else DB_FILE
+    return _read_table(db_file, table, active_only, current_data_version(db_file))
+
+
+def load_tables(*tables, db_manager=None):
+    """Dicionário tabela -> DataFrame para várias tabelas"""
+    return {table: load_table(table, db_manager) for table in tables}
+
+
+def clear_page_data():
+    """Descarta todas as tabelas em cache"""
+    with _tables_lock:
+        _tables.clear()
+
+
+def time_page_loads(db_manager=None, pages=None):
+    """Tempo de carregamento das tabelas de cada página a frio (cache vazia) e a quente
+
+    Retorna um DataFrame com uma linha por página: tabelas, linhas, ms a frio, ms a quente.
+    """
+    rows = []
+    for page in pages or PAGE_TABLES:
+        tables = PAGE_TABLES[page]
+        clear_page_data()
+
+        start = time.perf_counter()
+        frames = load_tables(*tables, db_manager=db_manager)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        load_tables(*tables, db_manager=db_manager)
+        warm_ms = (time.perf_counter() - start) * 1000
+
+        rows.append({
+            'page': page,
+            'tables': len(tables),
+            'rows': sum(len(df) for df in frames.values()),
+            'cold_ms': cold_ms,
+            'warm_ms': warm_ms,
+            'speedup': cold_ms / warm_ms if warm_ms > 0 else float('inf'),
+        })
+    return pd.DataFrame(rows)
@@ -5,7 +5,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from project_phase_manager import ProjectPhaseManager
-from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
 
 def phase_progress_dashboard():
     """Dashboard para monitoramento de progresso das fases de projetos"""
@@ -13,12 +13,12 @@ def phase_progress_dashboard():
     
     # Inicializar gerenciadores
     phase_manager = ProjectPhaseManager()
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Carregar dados
     projects_df = db_manager.query_to_df("SELECT * FROM projects WHERE status = 'active'")
-    clients_df = db_manager.query_to_df("SELECT * FROM clients")
-    timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
+    clients_df = load_table('clients', db_manager)
+    timesheet_df = load_table('timesheet', db_manager)
     
     # Juntar projetos com clientes
     projects_with_clients = projects_df.merge(
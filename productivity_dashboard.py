@@ -5,209 +5,99 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import calendar
 
-from timesheet import TimesheetManager
-from productivity_reports import (
-    calcular_dias_uteis_projeto, 
-    calcular_usuarios_por_equipe, 
-    calcular_metricas_produtividade_atualizado,
-    calcular_metricas_produtividade_usuario
+from page_data import current_data_version, get_db_manager, load_table
+from business_calendar import calcular_dias_uteis_projeto
+from cost_engine import add_entry_costs, load_rate_history, load_user_rate_history
+from group_membership import membership_index
+from productivity_indicators import (
+    absence_days_by_user,
+    compute_project_risk,
+    compute_team_productivity,
+    compute_user_productivity,
+    load_period_absences,
+    load_period_entries,
+    user_team_table
 )
-from risk_reports import calcular_risco_projeto
-from report_utils import get_feriados_portugal
 
-def calcular_risco_projeto_dashboard(custo_realizado, custo_planejado):
-    """
-    Calcula o risco do projeto com base no custo realizado vs planejado
-    """
-    try:
-        # Calcular variação percentual
-        if custo_planejado == 0:
-            return {
-                "nivel": "Sem Dados",
-                "cor": "gray",
-                "recomendacao": "Impossível calcular risco",
-                "variacao_percentual": 0
-            }
-        
-        variacao_percentual = ((custo_realizado - custo_planejado) / custo_planejado) * 100
-
-        # Definir níveis de risco baseados na variação
-        if variacao_percentual <= -10:
-            return {
-                "nivel": "Eficiente",
-                "cor": "green",
-                "recomendacao": "Projeto abaixo do orçamento. Bom desempenho financeiro.",
-                "variacao_percentual": variacao_percentual
-            }
-        elif -10 < variacao_percentual <= 10:
-            return {
-                "nivel": "No Planejado",
-                "cor": "blue",
-                "recomendacao": "Projeto dentro do orçamento. Desempenho financeiro adequado.",
-                "variacao_percentual": variacao_percentual
-            }
-        elif 10 < variacao_percentual <= 20:
-            return {
-                "nivel": "Atenção",
-                "cor": "orange",
-                "recomendacao": "Projeto começando a ultrapassar o orçamento. Revisar escopo e custos.",
-                "variacao_percentual": variacao_percentual
-            }
-        elif 20 < variacao_percentual <= 30:
-            return {
-                "nivel": "Risco Moderado",
-                "cor": "red",
-                "recomendacao": "Projeto significativamente acima do custo. Ações urgentes:\n- Revisar escopo\n- Identificar causas de sobrecusto",
-                "variacao_percentual": variacao_percentual
-            }
-        else:
-            return {
-                "nivel": "Alto Risco",
-                "cor": "darkred", 
-                "recomendacao": "CRÍTICO: Projeto muito acima do custo. Medidas imediatas:\n- Suspender projeto\n- Renegociar contrato\n- Replanejar completamente",
-                "variacao_percentual": variacao_percentual
-            }
-    except Exception as e:
-        st.error(f"Erro ao calcular risco do projeto: {e}")
-        return {
-            "nivel": "Erro",
-            "cor": "gray",
-            "recomendacao": "Não foi possível calcular o risco",
-            "variacao_percentual": 0
-        }
-
-def calcular_indicadores_consolidados(ano, mes):
-    """
-    Calcula indicadores consolidados de produtividade para o sistema
+@st.cache_data(show_spinner=False, max_entries=24)
+def _indicadores_consolidados(db_file, ano, mes, data_version):
+    """Indicadores do mês (data_version entra apenas na chave da cache)
+    
+    Sem chamadas ao Streamlit: os erros vão na lista 'erros' do resultado e
+    são mostrados por calcular_indicadores_consolidados.
     """
-    # Carregar dados necessários
-    timesheet_df = pd.read_excel('timesheet.xlsx')
-    users_df = pd.read_excel('utilizadores.xlsx')
-    groups_df = pd.read_excel('groups.xlsx')
-    projects_df = pd.read_excel('projects.xlsx')
-    absences_df = pd.read_excel('absences.xlsx')
-    rates_df = pd.read_excel('rates.xlsx')
+    db_manager = get_db_manager(db_file)
+    erros = []
     
-    # Definir período
+    # Definir período (o último dia conta por inteiro)
     inicio_mes = datetime(ano, mes, 1)
     ultimo_dia = calendar.monthrange(ano, mes)[1]
-    fim_mes = datetime(ano, mes, ultimo_dia)
+    fim_mes = datetime(ano, mes, ultimo_dia, 23, 59, 59)
     
     # Calcular dias úteis
     dias_uteis = calcular_dias_uteis_projeto(inicio_mes.date(), fim_mes.date())
     
-    # Processar dados do timesheet
-    dados = timesheet_df.copy()
-    dados['start_date'] = pd.to_datetime(dados['start_date'])
-    dados = dados[
-        (dados['start_date'] >= inicio_mes) &
-        (dados['start_date'] <= fim_mes)
-    ]
+    # Carregar dados necessários: tabelas pequenas em cache e apenas o mês do timesheet/ausências
+    users_df = load_table('utilizadores', db_manager)
+    projects_df = load_table('projects', db_manager)
+    rates_df = load_table('rates', db_manager)
+    dados = load_period_entries(db_manager, inicio_mes, fim_mes)
+    absences_df = load_period_absences(db_manager, inicio_mes, fim_mes)
     
-    # Adicionar grupo ao timesheet
-    dados = dados.merge(
-        groups_df[['id', 'group_name']],
-        left_on='group_id',
-        right_on='id',
-        how='left'
-    )
+    # Equipa principal e nome completo de cada registo
+    user_teams = user_team_table(membership_index.teams_by_user(db_manager))
+    equipa_principal = user_teams[user_teams['position'] == 0].set_index('user_id')['group_name']
+    nomes = users_df.drop_duplicates('user_id').set_index('user_id')
+    dados['group_name'] = dados['user_id'].map(equipa_principal)
+    dados['nome_completo'] = dados['user_id'].map(nomes['First_Name'] + ' ' + nomes['Last_Name'])
     
-    # Adicionar nome completo
-    dados = dados.merge(
-        users_df[['user_id', 'First_Name', 'Last_Name']],
-        on='user_id',
-        how='left'
-    )
-    dados['nome_completo'] = dados['First_Name'] + ' ' + dados['Last_Name']
+    # Dias úteis de ausência por colaborador, uma única vez para equipas e colaboradores
+    dias_ausencia = absence_days_by_user(absences_df, inicio_mes, fim_mes)
     
     # Métricas de produtividade por equipe
     try:
-        metricas_equipe = calcular_metricas_produtividade_atualizado(
-            dados, 
-            'group_name', 
-            dias_uteis * 8,  # horas úteis 
-            users_df,
-            absences_df,
-            inicio_mes,
-            fim_mes
-        )
+        metricas_equipe = compute_team_productivity(dados, users_df, user_teams, dias_ausencia, dias_uteis)
     except Exception as e:
-        st.error(f"Erro ao calcular métricas por equipe: {e}")
+        erros.append(f"Erro ao calcular métricas por equipe: {e}")
         metricas_equipe = pd.DataFrame()
     
     # Métricas de produtividade por usuário
     try:
-        metricas_usuario = calcular_metricas_produtividade_usuario(
-            dados,
-            absences_df,
-            inicio_mes,
-            fim_mes
-        )
+        metricas_usuario = compute_user_productivity(dados, dias_ausencia, dias_uteis)
     except Exception as e:
-        st.error(f"Erro ao calcular métricas por usuário: {e}")
+        erros.append(f"Erro ao calcular métricas por usuário: {e}")
         metricas_usuario = pd.DataFrame()
     
     # Análise de risco de projetos
-    risco_projetos = []
-    for _, projeto in projects_df.iterrows():
-        # Filtrar entradas de timesheet para o projeto
-        entries_projeto = dados[dados['project_id'] == projeto['project_id']]
-        
-        # Calcular custo realizado
-        custo_realizado = 0
-        horas_projeto = 0
-        for _, entry in entries_projeto.iterrows():
-            try:
-                user_rate_id = users_df[users_df['user_id'] == entry['user_id']]['rate_id'].iloc[0]
-                user_rate = rates_df[rates_df['rate_id'] == user_rate_id]
-                if not user_rate.empty:
-                    taxa = float(user_rate['rate_cost'].iloc[0])
-                    custo_entrada = entry['hours'] * taxa
-                    custo_realizado += custo_entrada
-                    horas_projeto += entry['hours']
-            except Exception as e:
-                st.warning(f"Erro ao calcular custo para projeto {projeto['project_name']}: {e}")
-        
-        # Calcular custo planejado proporcional
-        data_inicio = pd.to_datetime(projeto['start_date'])
-        data_fim = pd.to_datetime(projeto['end_date'])
-        dias_projeto_total = calcular_dias_uteis_projeto(data_inicio.date(), data_fim.date())
-        dias_projeto_ate_agora = calcular_dias_uteis_projeto(data_inicio.date(), fim_mes.date())
-        
-        custo_total_planejado = float(projeto.get('total_cost', 0))  # Usar get() para evitar erros
-        
-        # Adicionar log de debug
-        st.sidebar.write(f"Projeto: {projeto['project_name']}")
-        st.sidebar.write(f"Custo Total Planejado: €{custo_total_planejado:,.2f}")
-        st.sidebar.write(f"Custo Realizado: €{custo_realizado:,.2f}")
-        st.sidebar.write(f"Horas do Projeto: {horas_projeto:.2f}")
-        st.sidebar.write(f"Dias do Projeto Total: {dias_projeto_total}")
-        st.sidebar.write(f"Dias do Projeto até Agora: {dias_projeto_ate_agora}")
-        
-        # Calcular custo planejado proporcional
-        custo_planejado_ate_agora = custo_total_planejado * (dias_projeto_ate_agora / dias_projeto_total) if dias_projeto_total > 0 else 0
-        
-        # Calcular risco
-        risco = calcular_risco_projeto_dashboard(custo_realizado, custo_planejado_ate_agora)
-        
-        risco_projetos.append({
-            'nome_projeto': projeto['project_name'],
-            'nivel_risco': risco['nivel'],
-            'cor_risco': risco['cor'],
-            'custo_planejado': custo_planejado_ate_agora,
-            'custo_realizado': custo_realizado,
-            'variacao_percentual': risco['variacao_percentual']
-        })
-    
-    risco_projetos_df = pd.DataFrame(risco_projetos)
+    # Custo por registo numa única passagem (cost_engine); só contam as horas de registos com taxa
+    dados_custos = add_entry_costs(
+        dados, users_df, rates_df,
+        rate_history=load_rate_history(db_manager),
+        user_rate_history=load_user_rate_history(db_manager)
+    )
+    risco_projetos_df = compute_project_risk(projects_df, dados_custos, fim_mes)
     
     return {
         'metricas_equipe': metricas_equipe,
         'metricas_usuario': metricas_usuario,
         'risco_projetos': risco_projetos_df,
-        'dias_uteis': dias_uteis
+        'dias_uteis': dias_uteis,
+        'erros': erros
     }
 
+def calcular_indicadores_consolidados(ano, mes):
+    """
+    Calcula indicadores consolidados de produtividade para o sistema
+    
+    Os dados vêm da base de dados SQLite e o resultado fica em cache por
+    (ano, mês) até à próxima escrita (PRAGMA data_version).
+    """
+    db_file = get_db_manager().db_file
+    indicadores = _indicadores_consolidados(db_file, ano, mes, current_data_version(db_file))
+    for erro in indicadores['erros']:
+        st.error(erro)
+    return indicadores
+
 # [resto do código permanece o mesmo]
 
 def productivity_dashboard():
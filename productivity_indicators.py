@@ -0,0 +1,229 @@
+"""
+Indicadores consolidados de produtividade: equipas, colaboradores e risco de custo dos projetos.
+
+O painel consolidado lia seis ficheiros Excel a cada execução, percorria
+colaboradores × ausências com um cálculo de dias úteis por ausência e
+projetos × registos para o custo. Aqui só os registos e as ausências do mês
+são lidos da base de dados, os dias úteis de ausência saem de uma chamada
+vetorizada ao BusinessCalendar e as métricas por equipa, por colaborador e
+por projeto resultam de groupbys.
+
+As colunas e as regras são as de productivity_reports
+(calcular_metricas_produtividade_atualizado e _usuario); os níveis de risco
+de custo estão apenas em RISK_LEVELS. A equipa de cada registo é a equipa
+principal do colaborador (a primeira em user_groups).
+"""
+import numpy as np
+import pandas as pd
+
+from business_calendar import get_business_calendar
+from date_utils import DATE_FORMAT, DATETIME_FORMAT, parse_dates
+
+
+HOURS_PER_DAY = 8
+
+# Níveis de risco pela variação do custo realizado face ao planeado (%):
+# (limite superior inclusive, nível, cor); acima do último limite é "Alto Risco"
+RISK_LEVELS = [
+    (-10, "Eficiente", "green"),
+    (10, "No Planejado", "blue"),
+    (20, "Atenção", "orange"),
+    (30, "Risco Moderado", "red"),
+]
+HIGH_RISK = ("Alto Risco", "darkred")
+NO_DATA = ("Sem Dados", "gray")
+
+TEAM_COLUMNS = [
+    'group_name', 'total_horas', 'total_registros', 'horas_faturaveis', 'horas_extra',
+    'total_utilizadores', 'percentual_ausencias', 'horas_uteis_totais', 'horas_uteis_disponiveis',
+    'percentual_faturavel', 'percentual_extra', 'percentual_ocupacao',
+]
+
+USER_COLUMNS = [
+    'user_id', 'nome_completo', 'group_name', 'total_horas', 'total_registros',
+    'horas_faturaveis', 'horas_extra', 'horas_ausencia', 'horas_uteis_totais',
+    'horas_uteis_disponiveis', 'percentual_ausencias', 'percentual_ocupacao',
+    'percentual_faturavel', 'percentual_extra',
+]
+
+
+def load_period_entries(db_manager, period_start, period_end):
+    """Registos de horas com início em [period_start, period_end] (lidos em SQL)"""
+    return db_manager.query_to_df(
+        "SELECT * FROM timesheet WHERE start_date >= ? AND start_date <= ?",
+        (period_start.strftime(DATETIME_FORMAT), period_end.strftime(DATETIME_FORMAT))
+    )
+
+
+def load_period_absences(db_manager, period_start, period_end):
+    """Ausências que se sobrepõem a [period_start, period_end]"""
+    return db_manager.query_to_df(
+        "SELECT * FROM absences WHERE start_date <= ? AND end_date >= ?",
+        (period_end.strftime(DATETIME_FORMAT), period_start.strftime(DATE_FORMAT))
+    )
+
+
+def user_team_table(teams_by_user):
+    """DataFrame (user_id, group_name, position) a partir do mapa user_id -> equipas"""
+    rows = [
+        (user_id, group_name, position)
+        for user_id, teams in teams_by_user.items()
+        for position, group_name in enumerate(teams)
+    ]
+    return pd.DataFrame(rows, columns=['user_id', 'group_name', 'position'])
+
+
+def absence_days_by_user(absences_df, period_start, period_end, calendar=None):
+    """Dias úteis de ausência de cada colaborador dentro de [period_start, period_end] (Series por user_id)"""
+    calendar = calendar or get_business_calendar()
+    starts = parse_dates(absences_df['start_date'], errors='coerce')
+    ends = parse_dates(absences_df['end_date'], errors='coerce')
+    overlap = ((starts <= period_end) & (ends >= period_start)).to_numpy()
+
+    first = starts[overlap].clip(lower=period_start).to_numpy(dtype='datetime64[D]')
+    last = ends[overlap].clip(upper=period_end).to_numpy(dtype='datetime64[D]')
+    days = calendar.business_days(first, last) if overlap.any() else np.zeros(0, dtype='int64')
+    return pd.Series(days, index=absences_df['user_id'].to_numpy()[overlap], dtype='int64').groupby(level=0).sum()
+
+
+def _flag_hours(entries, column):
+    """Horas dos registos com a flag column ativa (0 nos restantes)"""
+    return entries['hours'].where(entries[column].fillna(False).astype(bool).to_numpy(), 0.0)
+
+
+def _hour_totals(entries, by):
+    """Horas totais, número de registos, horas faturáveis e horas extra por by"""
+    totals = entries.assign(
+        horas_faturaveis=_flag_hours(entries, 'billable'),
+        horas_extra=_flag_hours(entries, 'overtime'),
+    ).groupby(by).agg(
+        total_horas=('hours', 'sum'),
+        total_registros=('id', 'count'),
+        horas_faturaveis=('horas_faturaveis', 'sum'),
+        horas_extra=('horas_extra', 'sum'),
+    )
+    return totals.reset_index()
+
+
+def _percentage(numerator, denominator, condition):
+    """numerator / denominator × 100 onde condition é verdadeira (0 nas restantes), com 2 casas"""
+    numerator = np.asarray(numerator, dtype='float64')
+    denominator = np.asarray(denominator, dtype='float64')
+    return np.round(np.divide(numerator * 100, denominator, out=np.zeros(len(numerator)), where=condition), 2)
+
+
+def compute_team_productivity(entries, users_df, user_teams, absence_days, business_days):
+    """Métricas por equipa (colunas de calcular_metricas_produtividade_atualizado)
+
+    Args:
+        entries: registos do mês com a coluna group_name
+        users_df: colaboradores (user_id, active)
+        user_teams: pertença às equipas (user_id, group_name), ver user_team_table
+        absence_days: dias úteis de ausência por user_id (absence_days_by_user)
+        business_days: dias úteis do mês
+    """
+    if entries.empty:
+        return pd.DataFrame()
+
+    # Cada colaborador ativo conta em todas as suas equipas
+    active_users = users_df.loc[(users_df['active'] == True).to_numpy(), 'user_id']
+    memberships = user_teams[user_teams['user_id'].isin(active_users)]
+    teams = pd.DataFrame({
+        'total_utilizadores': memberships.groupby('group_name').size(),
+        'dias_ausencia': memberships['user_id'].map(absence_days).fillna(0).groupby(memberships['group_name']).sum(),
+    })
+    team_business_days = business_days * teams['total_utilizadores']
+    teams['percentual_ausencias'] = np.divide(
+        teams['dias_ausencia'] * 100, team_business_days,
+        out=np.zeros(len(teams)), where=team_business_days > 0
+    )
+
+    metrics = _hour_totals(entries, 'group_name')
+    team_columns = teams.reindex(metrics['group_name'])
+    metrics['total_utilizadores'] = team_columns['total_utilizadores'].to_numpy()
+    metrics['percentual_ausencias'] = team_columns['percentual_ausencias'].fillna(0).to_numpy()
+    metrics['horas_uteis_totais'] = business_days * HOURS_PER_DAY * metrics['total_utilizadores']
+    metrics['horas_uteis_disponiveis'] = np.maximum(
+        metrics['horas_uteis_totais'] * (1 - metrics['percentual_ausencias'] / 100) - metrics['total_horas'], 0
+    )
+
+    available = (metrics['horas_uteis_disponiveis'] > 0).to_numpy()
+    metrics['percentual_faturavel'] = _percentage(metrics['horas_faturaveis'], metrics['horas_uteis_totais'], available)
+    metrics['percentual_extra'] = _percentage(metrics['horas_extra'], metrics['total_horas'], (metrics['total_horas'] > 0).to_numpy())
+    metrics['percentual_ocupacao'] = _percentage(metrics['total_horas'], metrics['horas_uteis_totais'], available)
+    return metrics[TEAM_COLUMNS]
+
+
+def compute_user_productivity(entries, absence_days, business_days):
+    """Métricas por colaborador (colunas de calcular_metricas_produtividade_usuario)
+
+    Args:
+        entries: registos do mês com as colunas nome_completo e group_name
+        absence_days: dias úteis de ausência por user_id (absence_days_by_user)
+        business_days: dias úteis do mês
+    """
+    if entries.empty:
+        return pd.DataFrame()
+
+    metrics = _hour_totals(entries, ['user_id', 'nome_completo', 'group_name'])
+    working_hours = business_days * HOURS_PER_DAY
+    metrics['horas_ausencia'] = metrics['user_id'].map(absence_days).fillna(0).astype('int64') * HOURS_PER_DAY
+    metrics['horas_uteis_totais'] = working_hours
+    metrics['horas_uteis_disponiveis'] = metrics['horas_uteis_totais'] - metrics['total_horas'] - metrics['horas_ausencia']
+
+    has_hours = np.full(len(metrics), working_hours > 0)
+    metrics['percentual_ausencias'] = (metrics['horas_ausencia'] / metrics['horas_uteis_totais'] * 100).round(2)
+    metrics['percentual_ocupacao'] = _percentage(metrics['total_horas'], metrics['horas_uteis_totais'], has_hours)
+    metrics['percentual_faturavel'] = _percentage(metrics['horas_faturaveis'], metrics['horas_uteis_totais'], has_hours)
+    metrics['percentual_extra'] = _percentage(metrics['horas_extra'], metrics['horas_uteis_totais'], has_hours)
+    return metrics[USER_COLUMNS]
+
+
+def classify_cost_risk(actual_cost, planned_cost):
+    """Nível, cor e variação (%) do custo realizado face ao planeado, para arrays
+
+    Sem custo planeado o nível é "Sem Dados" (variação 0).
+    """
+    actual_cost = np.asarray(actual_cost, dtype='float64')
+    planned_cost = np.asarray(planned_cost, dtype='float64')
+    no_data = planned_cost == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variation = np.where(no_data, 0.0, (actual_cost - planned_cost) / planned_cost * 100)
+
+    conditions = [no_data] + [variation <= limit for limit, _, _ in RISK_LEVELS]
+    level = np.select(conditions, [NO_DATA[0]] + [name for _, name, _ in RISK_LEVELS], default=HIGH_RISK[0])
+    color = np.select(conditions, [NO_DATA[1]] + [color for _, _, color in RISK_LEVELS], default=HIGH_RISK[1])
+    return level, color, variation
+
+
+def compute_project_risk(projects_df, entry_costs, period_end, calendar=None):
+    """Risco de custo de todos os projetos de projects_df (pela mesma ordem)
+
+    O custo planeado é o total_cost proporcional aos dias úteis do projeto
+    decorridos até period_end; o realizado é o custo dos registos com taxa.
+    """
+    calendar = calendar or get_business_calendar()
+    costs = entry_costs[(entry_costs['rate_applied'] > 0).to_numpy()].groupby('project_id')['cost'].sum()
+    actual_cost = projects_df['project_id'].map(costs).fillna(0.0).to_numpy(dtype='float64')
+
+    total_days = calendar.business_days(projects_df['start_date'], projects_df['end_date'])
+    elapsed_days = calendar.business_days(
+        projects_df['start_date'],
+        np.full(len(projects_df), np.datetime64(pd.Timestamp(period_end).date(), 'D'))
+    )
+    total_cost = pd.to_numeric(projects_df['total_cost'], errors='coerce').to_numpy(dtype='float64') \
+        if 'total_cost' in projects_df.columns else np.zeros(len(projects_df))
+    planned_cost = np.divide(
+        total_cost * elapsed_days, total_days,
+        out=np.zeros(len(projects_df)), where=total_days > 0
+    )
+
+    level, color, variation = classify_cost_risk(actual_cost, planned_cost)
+    return pd.DataFrame({
+        'nome_projeto': projects_df['project_name'].to_numpy(),
+        'nivel_risco': level,
+        'cor_risco': color,
+        'custo_planejado': planned_cost,
+        'custo_realizado': actual_cost,
+        'variacao_percentual': variation,
+    })
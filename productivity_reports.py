@@ -4,15 +4,17 @@ import pandas as pd
 from datetime import datetime, timedelta
 import calendar
 import plotly.graph_objects as go
-from database_manager import DatabaseManager
-from report_utils import calcular_dias_uteis_projeto, get_feriados_portugal
+from page_data import get_db_manager, load_table
+from business_calendar import calcular_dias_uteis_projeto, get_feriados_portugal
+from date_utils import parse_dates
+from group_membership import parse_groups_value
 
 def calcular_usuarios_por_equipe(users_df):
     """Calcula o número de usuários ativos por equipe"""
     usuarios_por_equipe = {}
     
     for _, user in users_df[users_df['active'] == True].iterrows():
-        grupos = eval(user['groups']) if isinstance(user['groups'], str) else []
+        grupos = parse_groups_value(user['groups'])
         for grupo in grupos:
             if grupo not in usuarios_por_equipe:
                 usuarios_por_equipe[grupo] = 0
@@ -37,13 +39,13 @@ def calcular_ausencias_equipe(absences_df, users_df, inicio_mes, fim_mes, equipe
     
     # Filtrar ausências do período
     ausencias_periodo = absences_df[
-    (pd.to_datetime(absences_df['start_date'], format='mixed') <= fim_mes) &
-    (pd.to_datetime(absences_df['end_date'], format='mixed') >= inicio_mes)
+    (parse_dates(absences_df['start_date']) <= fim_mes) &
+    (parse_dates(absences_df['end_date']) >= inicio_mes)
 ]
     
     # Para cada usuário, calcular dias úteis de ausência
     for _, user in users_df[users_df['active'] == True].iterrows():
-        grupos = eval(user['groups']) if isinstance(user['groups'], str) else []
+        grupos = parse_groups_value(user['groups'])
         if equipe and equipe not in grupos:
             continue
             
@@ -76,8 +78,8 @@ def calcular_ausencias_usuario(absences_df, user_id, inicio_mes, fim_mes):
     # Filtrar ausências do período para o usuário
     ausencias_periodo = absences_df[
     (absences_df['user_id'] == user_id) &
-    (pd.to_datetime(absences_df['start_date'], format='mixed') <= fim_mes) &
-    (pd.to_datetime(absences_df['end_date'], format='mixed') >= inicio_mes)
+    (parse_dates(absences_df['start_date']) <= fim_mes) &
+    (parse_dates(absences_df['end_date']) >= inicio_mes)
 ]
     
     dias_ausencia = 0
@@ -228,14 +230,14 @@ def team_productivity_page():
     st.title("Relatório de Produtividade por Equipa")
     
     # Carregar dados do banco SQLite em vez de arquivos Excel
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Consultar tabelas necessárias
     try:
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
-        absences_df = db_manager.query_to_df("SELECT * FROM absences")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
+        timesheet_df = load_table('timesheet', db_manager)
+        groups_df = load_table('groups', db_manager)
+        absences_df = load_table('absences', db_manager)
+        users_df = load_table('utilizadores', db_manager)
     except Exception as e:
         st.error(f"Erro ao carregar dados do banco: {str(e)}")
         return
@@ -278,7 +280,7 @@ def team_productivity_page():
     
     # Aplicar filtros de data
     # Alteração na linha 277 do productivity_reports.py
-    dados['start_date'] = pd.to_datetime(dados['start_date'], format='mixed')
+    dados['start_date'] = parse_dates(dados['start_date'])
     dados = dados[
         (dados['start_date'] >= inicio_mes) &
         (dados['start_date'] <= fim_mes)
@@ -452,14 +454,14 @@ def user_productivity_page():
     st.title("Relatório de Produtividade por Colaborador")
     
     # Carregar dados do banco SQLite em vez de arquivos Excel
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Consultar tabelas necessárias
     try:
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
-        absences_df = db_manager.query_to_df("SELECT * FROM absences")
+        timesheet_df = load_table('timesheet', db_manager)
+        users_df = load_table('utilizadores', db_manager)
+        groups_df = load_table('groups', db_manager)
+        absences_df = load_table('absences', db_manager)
     except Exception as e:
         st.error(f"Erro ao carregar dados do banco: {str(e)}")
         return
@@ -505,7 +507,7 @@ def user_productivity_page():
         return
     
     # Aplicar filtros de data
-    dados['start_date'] = pd.to_datetime(dados['start_date'], format='mixed')
+    dados['start_date'] = parse_dates(dados['start_date'])
     dados = dados[
         (dados['start_date'] >= inicio_mes) & 
         (dados['start_date'] <= fim_mes)
@@ -11,10 +11,13 @@ from email.mime.application import MIMEApplication
 from datetime import datetime, timedelta
 import calendar
 from fpdf import FPDF
-from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
 from annual_targets import AnnualTargetManager
-from report_utils import calcular_dias_uteis_projeto
+from business_calendar import get_business_calendar, calcular_dias_uteis_projeto
 from risk_reports import calcular_risco_projeto
+from date_utils import parse_dates
+from cost_engine import add_entry_costs, load_rate_history, load_user_rate_history
+from project_indicators import compute_project_indicators
 
 # Configuração do logging
 logging.basicConfig(
@@ -34,7 +37,7 @@ def project_email_report():
     st.title("📧 Relatório de Indicadores de Projetos")
     
     # Inicializar gerenciadores
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     annual_target_manager = AnnualTargetManager()
     
     # Verificar se o usuário é administrador
@@ -44,17 +47,17 @@ def project_email_report():
     
     # Carregamento de dados básicos
     try:
-        projects_df = db_manager.query_to_df("SELECT * FROM projects")
-        clients_df = db_manager.query_to_df("SELECT * FROM clients")
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups WHERE active = 1")
+        projects_df = load_table('projects', db_manager)
+        clients_df = load_table('clients', db_manager)
+        timesheet_df = load_table('timesheet', db_manager)
+        users_df = load_table('utilizadores', db_manager)
+        rates_df = load_table('rates', db_manager)
+        groups_df = load_table('groups', db_manager, active_only=True)
         
         # Converter datas
-        projects_df['start_date'] = pd.to_datetime(projects_df['start_date'], format='mixed', errors='coerce')
-        projects_df['end_date'] = pd.to_datetime(projects_df['end_date'], format='mixed', errors='coerce')
-        timesheet_df['start_date'] = pd.to_datetime(timesheet_df['start_date'], format='mixed', errors='coerce')
+        projects_df['start_date'] = parse_dates(projects_df['start_date'], errors='coerce')
+        projects_df['end_date'] = parse_dates(projects_df['end_date'], errors='coerce')
+        timesheet_df['start_date'] = parse_dates(timesheet_df['start_date'], errors='coerce')
         
         # Obter tipos de projetos únicos
         project_types = sorted(projects_df['project_type'].unique().tolist())
@@ -203,7 +206,9 @@ Equipe de Gestão"""
             st.error("Por favor, informe pelo menos um destinatário.")
             return
         
-        with st.spinner("Gerando e enviando relatório..."):
+        # Todas as leituras do relatório usam a mesma vista da base de dados,
+        # sem serem afetadas por registos de horas feitos entretanto
+        with st.spinner("Gerando e enviando relatório..."), db_manager.snapshot():
             # Criar diretório temporário para os arquivos
             temp_dir = tempfile.mkdtemp()
             
@@ -841,16 +846,16 @@ def get_project_indicators(
     """
     try:
         # Carregar dados necessários
-        projects_df = db_manager.query_to_df("SELECT * FROM projects")
-        clients_df = db_manager.query_to_df("SELECT * FROM clients")
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
+        projects_df = load_table('projects', db_manager)
+        clients_df = load_table('clients', db_manager)
+        timesheet_df = load_table('timesheet', db_manager)
+        users_df = load_table('utilizadores', db_manager)
+        rates_df = load_table('rates', db_manager)
+        groups_df = load_table('groups', db_manager)
         
         # Converter datas
-        projects_df['start_date'] = pd.to_datetime(projects_df['start_date'], format='mixed', errors='coerce')
-        projects_df['end_date'] = pd.to_datetime(projects_df['end_date'], format='mixed', errors='coerce')
+        projects_df['start_date'] = parse_dates(projects_df['start_date'], errors='coerce')
+        projects_df['end_date'] = parse_dates(projects_df['end_date'], errors='coerce')
         
         # Filtragens
         filtered_projects = projects_df.copy()
@@ -883,194 +888,42 @@ def get_project_indicators(
         if filtered_projects.empty:
             return []
         
-        # Função para calcular dias úteis entre duas datas
-        def calcular_dias_uteis(data_inicio, data_fim):
-            """Calcula os dias úteis entre duas datas"""
-            dias_uteis = 0
-            data_atual = data_inicio
-            
-            while data_atual <= data_fim:
-                if data_atual.weekday() < 5:  # 0-4 são dias úteis (seg-sex)
-                    dias_uteis += 1
-                data_atual += timedelta(days=1)
-            
-            return dias_uteis
-        
-        # Para cada projeto, calcular métricas
-        project_indicators = []
+        # Custo de cada registo calculado uma única vez para todo o timesheet,
+        # com a rate em vigor na data de cada registo
+        timesheet_df = add_entry_costs(
+            timesheet_df, users_df, rates_df,
+            rate_history=load_rate_history(db_manager),
+            user_rate_history=load_user_rate_history(db_manager)
+        )
         
-        # Definir o início e fim do período para filtrar
-        inicio_periodo = start_date
-        fim_periodo = end_date
+        # Números de todos os projetos de uma vez (mesmo motor do dashboard e do email executivo);
+        # o tempo decorrido é medido até hoje ou até ao fim do período, o que vier primeiro
+        indicators = compute_project_indicators(
+            filtered_projects,
+            timesheet_df,
+            start_date,
+            end_date,
+            as_of=min(datetime.now(), end_date),
+            calendar=get_business_calendar(db_manager)
+        ).set_index('project_id')
+        client_names = clients_df.drop_duplicates('client_id').set_index('client_id')['name']
         
-        # Converter datas em timesheet para datetime para facilitar filtros
-        if 'start_date' in timesheet_df.columns:
-            try:
-                timesheet_df['start_date_dt'] = pd.to_datetime(timesheet_df['start_date'], format='mixed')
-            except Exception as e:
-                logging.warning(f"Erro ao converter datas: {e}")
-                timesheet_df['start_date_dt'] = pd.to_datetime('2000-01-01')
+        # Para cada projeto, classificar o risco
+        project_indicators = []
         
         for _, project in filtered_projects.iterrows():
             try:
-                # Obter registros de timesheet para o projeto
-                project_entries = timesheet_df[timesheet_df["project_id"] == project["project_id"]]
-                
-                # Filtrar entradas do timesheet para o período selecionado
-                period_entries = project_entries[
-                    (project_entries["start_date_dt"] >= inicio_periodo) &
-                    (project_entries["start_date_dt"] <= fim_periodo)
-                ] if 'start_date_dt' in project_entries.columns else pd.DataFrame()
-                
-                # Verificar se existem dados migrados
-                horas_migradas = 0
-                if 'horas_realizadas_mig' in project and not pd.isna(project['horas_realizadas_mig']):
-                    horas_migradas = float(project['horas_realizadas_mig'])
-                
-                custo_migrado = 0
-                if 'custo_realizado_mig' in project and not pd.isna(project['custo_realizado_mig']):
-                    custo_migrado = float(project['custo_realizado_mig'])
-                
-                # Calcular dias úteis totais do projeto
-                dias_uteis_projeto = calcular_dias_uteis(project['start_date'], project['end_date'])
-                
-                # Calcular horas regulares e extras para o período
-                hours_regular = 0
-                hours_extra = 0
-                
-                if not period_entries.empty:
-                    hours_regular = period_entries[~period_entries['overtime'].astype(bool)]['hours'].sum()
-                    # Para horas extras, multiplicamos por 2 para contabilização
-                    hours_extra_original = period_entries[period_entries['overtime'].astype(bool)]['hours'].sum()
-                    hours_extra = hours_extra_original * 2
-                
-                # Total de horas no período (regulares + extras*2)
-                period_hours = float(hours_regular + hours_extra)
-                
-                # Calcular custo realizado para o período
-                period_cost = 0
-                if not period_entries.empty:
-                    for _, entry in period_entries.iterrows():
-                        try:
-                            user_id = entry['user_id']
-                            hours = float(entry['hours'])
-                            is_overtime = entry.get('overtime', False)
-                            
-                            # Converter para booleano
-                            if isinstance(is_overtime, (int, float)):
-                                is_overtime = bool(is_overtime)
-                            elif isinstance(is_overtime, str):
-                                is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                            
-                            # Obter rate para o usuário
-                            rate_value = None
-                            if 'rate_value' in entry and not pd.isna(entry['rate_value']):
-                                rate_value = float(entry['rate_value'])
-                            else:
-                                user_info = users_df[users_df['user_id'] == user_id]
-                                
-                                if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                                    rate_id = user_info['rate_id'].iloc[0]
-                                    rate_info = rates_df[rates_df['rate_id'] == rate_id]
-                                    
-                                    if not rate_info.empty:
-                                        rate_value = float(rate_info['rate_cost'].iloc[0])
-                            
-                            # Calcular custo com base no rate obtido
-                            if rate_value:
-                                entry_cost = hours * rate_value
-                                
-                                # Se for hora extra, multiplicar por 2
-                                if is_overtime:
-                                    period_cost += entry_cost * 2  # Dobro para horas extras
-                                else:
-                                    period_cost += entry_cost  # Normal para horas regulares
-                        except Exception as e:
-                            logging.warning(f"Erro ao processar entrada: {e}")
-                
-                # Calcular o percentual de tempo decorrido do projeto até a data final do período
-                # Converter para datas no formato date()
-                data_inicio = project['start_date'].date()
-                data_fim = project['end_date'].date()
-                data_atual = min(datetime.now().date(), data_fim)
-
-                # Se o período final do relatório for anterior à data de início do projeto, 
-                # não há progresso
-                if end_date.date() <= data_inicio:
-                    dias_uteis_totais = 0
-                    dias_uteis_decorridos = 0
-                    time_percentage = 0
-                else:
-                    # Limitar a data atual à data final do relatório, se necessário
-                    data_atual = min(data_atual, end_date.date())
-                    
-                    # Calcular dias úteis totais do projeto
-                    dias_uteis_totais = calcular_dias_uteis_projeto(data_inicio, data_fim)
-                    
-                    # Calcular dias úteis decorridos até a data atual
-                    dias_uteis_decorridos = calcular_dias_uteis_projeto(data_inicio, data_atual)
-                    
-                    # Calcular percentual do tempo decorrido
-                    time_percentage = (dias_uteis_decorridos / dias_uteis_totais * 100) if dias_uteis_totais > 0 else 0
-                
-                # Obter horas e custo totais planejados
-                total_hours = float(project['total_hours']) if pd.notna(project['total_hours']) else 0
-                total_cost = float(project['total_cost']) if pd.notna(project['total_cost']) else 0
-                
-                # Calcular horas e custo realizados totais (incluindo dados migrados)
-                realized_hours = 0
-                realized_cost = 0
-                
-                if not project_entries.empty:
-                    # Calcular horas realizadas
-                    regular_hours = project_entries[~project_entries['overtime'].astype(bool)]['hours'].sum()
-                    extra_hours_original = project_entries[project_entries['overtime'].astype(bool)]['hours'].sum()
-                    extra_hours = extra_hours_original * 2
-                    realized_hours = regular_hours + extra_hours
-                    
-                    # Calcular custo realizado
-                    for _, entry in project_entries.iterrows():
-                        try:
-                            user_id = entry['user_id']
-                            hours = float(entry['hours'])
-                            is_overtime = entry.get('overtime', False)
-                            
-                            # Converter para booleano
-                            if isinstance(is_overtime, (int, float)):
-                                is_overtime = bool(is_overtime)
-                            elif isinstance(is_overtime, str):
-                                is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                            
-                            # Obter rate para o usuário
-                            user_info = users_df[users_df['user_id'] == user_id]
-                            if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                                rate_id = user_info['rate_id'].iloc[0]
-                                rate_info = rates_df[rates_df['rate_id'] == rate_id]
-                                
-                                if not rate_info.empty:
-                                    rate_value = float(rate_info['rate_cost'].iloc[0])
-                                    entry_cost = hours * rate_value
-                                    
-                                    # Se for hora extra, multiplicar por 2
-                                    if is_overtime:
-                                        realized_cost += entry_cost * 2
-                                    else:
-                                        realized_cost += entry_cost
-                        except Exception as e:
-                            logging.warning(f"Erro ao calcular custo: {e}")
-                
-                # Adicionar dados migrados
-                realized_hours += horas_migradas
-                realized_cost += custo_migrado
-                
-                # Calcular percentuais
-                hours_percentage = (realized_hours / total_hours * 100) if total_hours > 0 else 0
-                cost_percentage = (realized_cost / total_cost * 100) if total_cost > 0 else 0
-                
-                # Calcular CPI (Cost Performance Index)
-                # Valor Planejado = % tempo decorrido * custo total planejado
-                planned_value = (time_percentage / 100) * total_cost
-                cpi = planned_value / realized_cost if realized_cost > 0 else 1.0
+                numbers = indicators.loc[project['project_id']]
+                period_hours = float(numbers['period_hours'])
+                period_cost = float(numbers['period_cost'])
+                realized_hours = float(numbers['realized_hours'])
+                realized_cost = float(numbers['realized_cost'])
+                total_hours = float(numbers['total_hours'])
+                total_cost = float(numbers['total_cost'])
+                hours_percentage = float(numbers['hours_percentage'])
+                cost_percentage = float(numbers['cost_percentage'])
+                time_percentage = float(numbers['time_percentage'])
+                cpi = float(numbers['cpi'])
                 
                 # Determinar nível de risco
                 if cpi > 1.0:
@@ -1127,8 +980,7 @@ def get_project_indicators(
                         risk_reason += f". Apesar disso, o consumo de horas está {abs(schedule_variance):.1f}% abaixo do esperado"
                 """
                 # Obter nome do cliente
-                client_id = project['client_id']
-                client_name = clients_df[clients_df['client_id'] == client_id]['name'].iloc[0] if not clients_df.empty else "Cliente Desconhecido"
+                client_name = client_names.get(project['client_id'], "Cliente Desconhecido")
                 
                 # Adicionar ao array de indicadores
                 project_indicators.append({
@@ -1725,8 +1577,8 @@ def generate_project_pdf_report(
                 # Criar uma tabela por projeto com informações de recursos utilizados
                 
                 # Carregamos os dados necessários apenas uma vez aqui
-                timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-                users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
+                timesheet_df = load_table('timesheet', db_manager)
+                users_df = load_table('utilizadores', db_manager)
                 
                 for _, project_row in df.iterrows():
                     project_id = project_row['project_id']
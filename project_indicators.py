@@ -0,0 +1,127 @@
+"""
+Indicadores de horas, custo e orçamento de todos os projetos de uma vez.
+
+Fonte única dos números de projeto do dashboard e dos emails executivo e de
+projetos. Em vez de filtrar o timesheet e reconverter as datas para cada
+projeto, as datas são convertidas uma vez, as janelas (período, ano até à
+data, total) são máscaras booleanas e um único groupby('project_id') soma
+horas ponderadas (extras ×2) e custos do cost_engine. Orçamentos e tempo
+decorrido vêm do budget_proration (dias úteis).
+
+Regras comuns:
+  - horas = horas regulares + horas extra × 2; custo = coluna 'cost' do cost_engine
+  - horas/custo migrados (horas_realizadas_mig, custo_realizado_mig) somam ao
+    ano e ao total realizado
+  - percentagem esperada = fração dos dias úteis do projeto decorrida em as_of
+  - CPI = (percentagem esperada × custo orçamentado) / custo realizado (1 sem custo)
+"""
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from budget_proration import elapsed_share, period_share
+from date_utils import parse_dates
+
+
+def _numeric_column(df, column):
+    """Coluna numérica como float64 (0 quando vazia ou inexistente)"""
+    if column not in df.columns:
+        return np.zeros(len(df))
+    return np.nan_to_num(pd.to_numeric(df[column], errors='coerce').to_numpy(dtype='float64'), nan=0.0)
+
+
+def _ratio(numerator, denominator, scale=100.0):
+    """numerator / denominator × scale, com 0 onde o denominador não é positivo"""
+    return np.divide(numerator * scale, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+
+def entry_totals(entries_df, project_ids, period_start, period_end, year_start, as_of):
+    """Horas ponderadas e custo por projeto no período, no ano até as_of e no total
+
+    entries_df deve ter as colunas de add_entry_costs; as datas vêm de
+    'start_date_dt' (se já convertida) ou de 'start_date'.
+    """
+    entries = entries_df[entries_df['project_id'].isin(project_ids)]
+    if 'start_date_dt' in entries.columns:
+        dates = pd.to_datetime(entries['start_date_dt'], errors='coerce')
+    else:
+        dates = parse_dates(entries['start_date'], errors='coerce')
+
+    in_period = ((dates >= period_start) & (dates <= period_end)).to_numpy()
+    in_year = ((dates >= year_start) & (dates <= as_of)).to_numpy()
+    hours = entries['weighted_hours'].to_numpy(dtype='float64')
+    cost = entries['cost'].to_numpy(dtype='float64')
+
+    totals = pd.DataFrame({
+        'project_id': entries['project_id'].to_numpy(),
+        'period_hours': np.where(in_period, hours, 0.0),
+        'period_cost': np.where(in_period, cost, 0.0),
+        'year_hours': np.where(in_year, hours, 0.0),
+        'year_cost': np.where(in_year, cost, 0.0),
+        'realized_hours': hours,
+        'realized_cost': cost,
+    }).groupby('project_id').sum()
+    return totals.reindex(project_ids, fill_value=0.0)
+
+
+def compute_project_indicators(projects_df, entries_df, period_start, period_end, as_of=None, year_start=None, calendar=None):
+    """Indicadores de todos os projetos de projects_df (pela mesma ordem)
+
+    Args:
+        projects_df: projetos (project_id, start_date, end_date, total_hours, total_cost
+            e, opcionalmente, horas_realizadas_mig/custo_realizado_mig)
+        entries_df: timesheet com as colunas de cost_engine.add_entry_costs
+        period_start, period_end: janela do período (ex.: o mês do relatório), inclusive
+        as_of: data de referência para o ano até à data e o tempo decorrido (padrão: agora)
+        year_start: início do acumulado anual (padrão: 1 de janeiro do ano de period_start)
+        calendar: BusinessCalendar (padrão: calendário nacional)
+    """
+    as_of = pd.Timestamp(as_of if as_of is not None else datetime.now())
+    period_start, period_end = pd.Timestamp(period_start), pd.Timestamp(period_end)
+    year_start = pd.Timestamp(year_start) if year_start is not None else pd.Timestamp(period_start.year, 1, 1)
+
+    project_ids = projects_df['project_id'].to_numpy()
+    totals = entry_totals(entries_df, project_ids, period_start, period_end, year_start, as_of)
+
+    indicators = pd.DataFrame({'project_id': project_ids})
+    for column in totals.columns:
+        indicators[column] = totals[column].to_numpy()
+
+    migrated_hours = _numeric_column(projects_df, 'horas_realizadas_mig')
+    migrated_cost = _numeric_column(projects_df, 'custo_realizado_mig')
+    indicators['horas_migradas'] = migrated_hours
+    indicators['custo_migrado'] = migrated_cost
+    indicators['year_hours'] += migrated_hours
+    indicators['year_cost'] += migrated_cost
+    indicators['realized_hours'] += migrated_hours
+    indicators['realized_cost'] += migrated_cost
+
+    total_hours = _numeric_column(projects_df, 'total_hours')
+    total_cost = _numeric_column(projects_df, 'total_cost')
+    indicators['total_hours'] = total_hours
+    indicators['total_cost'] = total_cost
+
+    # Orçamento do período proporcional aos dias úteis do projeto nesse período
+    share = period_share(projects_df, period_start, period_end, calendar).to_numpy()
+    indicators['period_share'] = share
+    indicators['period_budget_hours'] = total_hours * share
+    indicators['period_budget_cost'] = total_cost * share
+    indicators['period_percentage'] = _ratio(indicators['period_hours'].to_numpy(), indicators['period_budget_hours'].to_numpy())
+
+    indicators['year_percentage'] = _ratio(indicators['year_hours'].to_numpy(), total_hours)
+    indicators['hours_percentage'] = _ratio(indicators['realized_hours'].to_numpy(), total_hours)
+    indicators['cost_percentage'] = _ratio(indicators['realized_cost'].to_numpy(), total_cost)
+
+    # Tempo decorrido (dias úteis) e comparação com o consumo de horas
+    elapsed = elapsed_share(projects_df, as_of, calendar).to_numpy()
+    indicators['elapsed_share'] = elapsed
+    indicators['time_percentage'] = elapsed * 100
+    indicators['percentage_ratio'] = _ratio(indicators['year_percentage'].to_numpy(), elapsed * 100, scale=1.0)
+
+    realized_cost = indicators['realized_cost'].to_numpy()
+    indicators['planned_value'] = elapsed * total_cost
+    indicators['cpi'] = np.divide(
+        indicators['planned_value'].to_numpy(), realized_cost,
+        out=np.ones(len(realized_cost)), where=realized_cost > 0
+    )
+    return indicators
@@ -8,7 +8,10 @@ from fpdf import FPDF
 import io
 import base64
 import streamlit as st
-from report_utils import calcular_dias_uteis_projeto
+from business_calendar import calcular_dias_uteis_projeto
+from date_utils import parse_dates
+from rate_resolver import RateResolver, add_resolved_costs, calculate_entries_cost
+from page_data import load_table
 
 # Definir a função format_hours_minutes aqui em vez de importá-la
 def format_hours_minutes(hours):
@@ -929,13 +932,13 @@ def download_project_report(project_info, client_name, db_manager):
         project_id = project_info['project_id']
         
         # Carregar entradas de timesheet
-        entries = db_manager.query_to_df(f"SELECT * FROM timesheet WHERE project_id = {project_id}")
+        entries = db_manager.query_to_df("SELECT * FROM timesheet WHERE project_id = ?", (int(project_id),))
         
         # Carregar tabelas complementares
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
-        categories_df = db_manager.query_to_df("SELECT * FROM task_categories")
-        activities_df = db_manager.query_to_df("SELECT * FROM activities")
+        users_df = load_table('utilizadores', db_manager)
+        rates_df = load_table('rates', db_manager)
+        categories_df = load_table('task_categories', db_manager)
+        activities_df = load_table('activities', db_manager)
         
         # Verificar e tratar horas migradas (horas_realizadas_mig)
         horas_migradas = 0
@@ -966,45 +969,8 @@ def download_project_report(project_info, client_name, db_manager):
         horas_realizadas_total = horas_realizadas + horas_migradas
         
         # Calcular custo realizado
-        custo_realizado = 0
-        if not entries.empty:
-            for _, entry in entries.iterrows():
-                try:
-                    user_id = entry['user_id']
-                    hours = float(entry['hours'])
-                    is_overtime = entry['overtime'] if 'overtime' in entry else False
-                    
-                    # Converter para booleano caso seja outro tipo de dado
-                    if isinstance(is_overtime, (int, float)):
-                        is_overtime = bool(is_overtime)
-                    elif isinstance(is_overtime, str):
-                        is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                    
-                    # Obter rate para o usuário
-                    rate_value = None
-                    if 'rate_value' in entry and not pd.isna(entry['rate_value']):
-                        rate_value = float(entry['rate_value'])
-                    else:
-                        user_info = db_manager.query_to_df(f"SELECT rate_id FROM utilizadores WHERE user_id = {user_id}")
-                        
-                        if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                            rate_id = user_info['rate_id'].iloc[0]
-                            rate_info = db_manager.query_to_df(f"SELECT rate_cost FROM rates WHERE rate_id = {rate_id}")
-                            
-                            if not rate_info.empty:
-                                rate_value = float(rate_info['rate_cost'].iloc[0])
-                    
-                    # Calcular custo com base no rate obtido
-                    if rate_value:
-                        entry_cost = hours * rate_value
-                        
-                        # Se for hora extra, multiplicar por 2
-                        if is_overtime:
-                            custo_realizado += entry_cost * 2  # Dobro para horas extras
-                        else:
-                            custo_realizado += entry_cost  # Normal para horas regulares
-                except Exception as e:
-                    pass
+        rate_resolver = RateResolver(db_manager)
+        custo_realizado, _ = calculate_entries_cost(entries, rate_resolver)
         
         # Adicionar custo migrado ao total
         custo_realizado_total = custo_realizado + custo_migrado
@@ -1062,41 +1028,18 @@ def download_project_report(project_info, client_name, db_manager):
         # Adicionar dados do sistema atual
         if not entries.empty:
             # Mesclar com informações de usuários para obter nomes
-            recursos_df = entries.merge(
+            recursos_df = add_resolved_costs(entries, rate_resolver).merge(
                 users_df[['user_id', 'First_Name', 'Last_Name', 'rate_id']],
                 on='user_id',
                 how='left'
             )
             
-            # Adicionar informações de custo baseadas nas rates, considerando horas extras
-            def calcular_custo_entrada(row):
-                if pd.isna(row['rate_id']):
-                    return 0
-                
-                rate_info = rates_df[rates_df['rate_id'] == row['rate_id']]
-                if rate_info.empty:
-                    return 0
-                
-                rate_value = float(rate_info['rate_cost'].iloc[0])
-                is_overtime = row.get('overtime', False)
-                
-                # Converter is_overtime para booleano
-                if isinstance(is_overtime, (int, float)):
-                    is_overtime = bool(is_overtime)
-                elif isinstance(is_overtime, str):
-                    is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                
-                # Multiplicar por 2 se for hora extra
-                multiplicador = 2 if is_overtime else 1
-                return float(row['hours']) * rate_value * multiplicador
-            
-            recursos_df['custo'] = recursos_df.apply(calcular_custo_entrada, axis=1)
+            # Custo por registo pelo cost_engine (rate_value, rate em vigor na data, horas extra a dobrar),
+            # a mesma regra dos totais do projeto
+            recursos_df['custo'] = recursos_df['cost']
             
             # Coluna para indicar se é hora extra
-            recursos_df['is_extra'] = recursos_df.apply(
-                lambda row: bool(row.get('overtime', False)), 
-                axis=1
-            )
+            recursos_df['is_extra'] = recursos_df['is_overtime']
             
             # Criar coluna de nome completo
             recursos_df['nome_completo'] = recursos_df.apply(
@@ -1142,7 +1085,7 @@ def download_project_report(project_info, client_name, db_manager):
         horas_por_atividade = None
         
         if not entries.empty:
-            timesheet_completo = entries.copy()
+            timesheet_completo = add_resolved_costs(entries, rate_resolver)
             
             # Juntar com categorias (se category_id existir nas entradas)
             if 'category_id' in timesheet_completo.columns:
@@ -1169,29 +1112,8 @@ def download_project_report(project_info, client_name, db_manager):
                 how='left'
             )
             
-            # Função para calcular custo baseado na rate do usuário e horas extras
-            def calcular_custo(row):
-                if pd.isna(row['rate_id']):
-                    return 0
-                
-                rate_info = rates_df[rates_df['rate_id'] == row['rate_id']]
-                if rate_info.empty:
-                    return 0
-                
-                rate_value = float(rate_info['rate_cost'].iloc[0])
-                is_overtime = row.get('overtime', False)
-                
-                # Converter is_overtime para booleano
-                if isinstance(is_overtime, (int, float)):
-                    is_overtime = bool(is_overtime)
-                elif isinstance(is_overtime, str):
-                    is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                
-                # Multiplicar por 2 se for hora extra
-                multiplicador = 2 if is_overtime else 1
-                return float(row['hours']) * rate_value * multiplicador
-            
-            timesheet_completo['custo_calculado'] = timesheet_completo.apply(calcular_custo, axis=1)
+            # Custo por registo pelo cost_engine, a mesma regra dos totais do projeto
+            timesheet_completo['custo_calculado'] = timesheet_completo['cost']
             
             # Verificar se há informações de categoria
             if 'task_category' in timesheet_completo.columns:
@@ -1243,8 +1165,8 @@ def download_project_report(project_info, client_name, db_manager):
         consumo_mensal = None
         try:
             # Período do projeto
-            data_inicio_projeto = pd.to_datetime(project_info['start_date'], format='mixed')
-            data_fim_projeto = pd.to_datetime(project_info['end_date'], format='mixed')
+            data_inicio_projeto = parse_dates(project_info['start_date'])
+            data_fim_projeto = parse_dates(project_info['end_date'])
             
             # Criar uma lista de meses entre o início e fim do projeto
             meses = []
@@ -1278,7 +1200,7 @@ def download_project_report(project_info, client_name, db_manager):
                 # Filtrar entradas de timesheet para o mês
                 if not entries.empty:
                     # Converter start_date para datetime
-                    entries['start_date_dt'] = pd.to_datetime(entries['start_date'], format='mixed')
+                    entries['start_date_dt'] = parse_dates(entries['start_date'])
 
                     # Use the converted datetime column for filtering
                     entries_mes = entries[
@@ -4,11 +4,14 @@ from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 from timesheet import TimesheetManager
-from report_utils import calcular_dias_uteis_projeto
-from database_manager import DatabaseManager
+from business_calendar import calcular_dias_uteis_projeto
+from budget_proration import prorate_budget
+from page_data import get_db_manager, load_table
+from rate_resolver import RateResolver, add_resolved_costs, calculate_entries_cost
 from project_phases import integrate_phases_with_project_reports
-import calendar
 from project_report_button import add_report_export_button
+from date_utils import parse_dates
+from group_membership import membership_index
 
 def format_hours_minutes(hours):
     """Converte horas decimais para formato HH:mm"""
@@ -23,15 +26,17 @@ def reports_page():
     
     try:
         # Inicializar gerenciadores
-        db_manager = DatabaseManager()
+        db_manager = get_db_manager()
         timesheet = TimesheetManager()
+        # Mapa user_id -> rate partilhado por todos os projetos do relatório
+        rate_resolver = RateResolver(db_manager)
         
         # Carregar dados das tabelas
-        clients_df = db_manager.query_to_df("SELECT * FROM clients")
-        projects_df = db_manager.query_to_df("SELECT * FROM projects")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores")
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups")
+        clients_df = load_table('clients', db_manager)
+        projects_df = load_table('projects', db_manager)
+        users_df = load_table('utilizadores', db_manager)
+        rates_df = load_table('rates', db_manager)
+        groups_df = load_table('groups', db_manager)
         
         # Verificar o papel do usuário atual e obter informações relevantes
         is_admin = st.session_state.user_info['role'].lower() == 'admin'
@@ -47,9 +52,7 @@ def reports_page():
             
             if not user_data.empty:
                 # Obter a equipe do líder
-                user_groups = eval(user_data['groups'].iloc[0]) if isinstance(user_data['groups'].iloc[0], str) else []
-                if isinstance(user_groups, dict):
-                    user_groups = list(user_groups.values())
+                user_groups = membership_index.teams_of_user(db_manager, current_user_id)
                 
                 leader_team = user_groups[0] if user_groups else None
                 
@@ -165,7 +168,7 @@ def reports_page():
                     
                     # Carregar entradas de timesheet
                     projeto_id = int(projeto_info['project_id'])
-                    entries = db_manager.query_to_df(f"SELECT * FROM timesheet WHERE project_id = {projeto_id}")
+                    entries = db_manager.query_to_df("SELECT * FROM timesheet WHERE project_id = ?", (projeto_id,))
                     
                     # Verificar e tratar horas migradas (horas_realizadas_mig)
                     horas_migradas = 0
@@ -197,48 +200,7 @@ def reports_page():
                     horas_realizadas_total = horas_realizadas + horas_migradas
                     
                     # Calcular custo realizado
-                    custo_realizado = 0
-                    custo_horas_extras = 0
-                    if not entries.empty:
-                        for _, entry in entries.iterrows():
-                            try:
-                                user_id = entry['user_id']
-                                hours = float(entry['hours'])
-                                is_overtime = entry['overtime'] if 'overtime' in entry else False
-                                # Converter para booleano caso seja outro tipo de dado
-                                if isinstance(is_overtime, (int, float)):
-                                    is_overtime = bool(is_overtime)
-                                elif isinstance(is_overtime, str):
-                                    is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                                
-                                # Obter rate para o usuário
-                                rate_value = None
-                                if 'rate_value' in entry and not pd.isna(entry['rate_value']):
-                                    rate_value = float(entry['rate_value'])
-                                else:
-                                    user_info = db_manager.query_to_df(f"SELECT rate_id FROM utilizadores WHERE user_id = {user_id}")
-                                    
-                                    if not user_info.empty and not pd.isna(user_info['rate_id'].iloc[0]):
-                                        rate_id = user_info['rate_id'].iloc[0]
-                                        rate_info = db_manager.query_to_df(f"SELECT rate_cost FROM rates WHERE rate_id = {rate_id}")
-                                        
-                                        if not rate_info.empty:
-                                            rate_value = float(rate_info['rate_cost'].iloc[0])
-                                
-                                # Calcular custo com base no rate obtido
-                                if rate_value:
-                                    entry_cost = hours * rate_value
-                                    
-                                    # Se for hora extra, multiplicar por 2
-                                    if is_overtime:
-                                        custo_horas_extras += entry_cost
-                                        custo_realizado += entry_cost * 2  # Dobro para horas extras
-                                    else:
-                                        custo_realizado += entry_cost  # Normal para horas regulares
-                            except Exception as e:
-                                debug_flag = False  # Definir como True para depuração
-                                if debug_flag:
-                                    st.sidebar.write(f"Erro ao processar entrada: {e}")
+                    custo_realizado, custo_horas_extras = calculate_entries_cost(entries, rate_resolver)
                     
                     # CORREÇÃO: Adicionar custo migrado ao total
                     custo_realizado_total = custo_realizado + custo_migrado
@@ -402,8 +364,8 @@ def reports_page():
                 # Calcular dados de consumo mensal
                 try:
                     # Período do projeto
-                    data_inicio_projeto = pd.to_datetime(projeto_info['start_date'], format='mixed')
-                    data_fim_projeto = pd.to_datetime(projeto_info['end_date'], format='mixed')
+                    data_inicio_projeto = parse_dates(projeto_info['start_date'])
+                    data_fim_projeto = parse_dates(projeto_info['end_date'])
                     
                     # Criar uma lista de meses entre o início e fim do projeto
                     meses = []
@@ -416,28 +378,24 @@ def reports_page():
                         else:
                             atual = atual.replace(month=atual.month + 1)
                     
-                    # Calcular horas planejadas por mês (distribuição uniforme)
-                    total_meses = len(meses)
-                    horas_por_mes_planejadas = projeto_info['total_hours'] / total_meses if total_meses > 0 else 0
+                    # Horas planejadas por mês, proporcionais aos dias úteis do projeto em cada mês
+                    # (uma linha da matriz projeto × mês do budget_proration)
+                    horas_planejadas_por_mes = []
+                    if meses:
+                        planeamento = prorate_budget(pd.DataFrame([projeto_info]), meses[0], meses[-1])
+                        horas_planejadas_por_mes = planeamento.planned_hours[0]
                     
                     # Preparar dados para o gráfico de consumo mensal
                     consumo_mensal = []
                     
-                    for mes in meses:
-                        # Determinar o último dia do mês
-                        ultimo_dia_mes = calendar.monthrange(mes.year, mes.month)[1]
-                        fim_mes = mes.replace(day=ultimo_dia_mes)
-                        
-                        # Calcular dias úteis no mês
-                        dias_uteis_mes = calcular_dias_uteis_projeto(mes.date(), fim_mes.date())
-                        
-                        # Horas planejadas para o mês (pode ser refinado com base em dias úteis)
-                        horas_planejadas_mes = (dias_uteis_mes / dias_uteis_totais) * projeto_info['total_hours'] if dias_uteis_totais > 0 else 0
+                    for posicao, mes in enumerate(meses):
+                        # Horas planejadas para o mês
+                        horas_planejadas_mes = float(horas_planejadas_por_mes[posicao])
                         
                         # Filtrar entradas de timesheet para o mês
                         if not entries.empty:
                             # Converter start_date para datetime
-                            entries['start_date_dt'] = pd.to_datetime(entries['start_date'], format='mixed')
+                            entries['start_date_dt'] = parse_dates(entries['start_date'])
     
                             # Use the converted datetime column for filtering
                             entries_mes = entries[
@@ -640,41 +598,18 @@ def reports_page():
                 # Adicionar dados do sistema atual
                 if not entries.empty:
                     # Mesclar com informações de usuários para obter nomes
-                    recursos_df = entries.merge(
+                    recursos_df = add_resolved_costs(entries, rate_resolver).merge(
                         users_df[['user_id', 'First_Name', 'Last_Name', 'rate_id']],
                         on='user_id',
                         how='left'
                     )
                     
-                    # Adicionar informações de custo baseadas nas rates, considerando horas extras
-                    def calcular_custo_entrada(row):
-                        if pd.isna(row['rate_id']):
-                            return 0
-                        
-                        rate_info = rates_df[rates_df['rate_id'] == row['rate_id']]
-                        if rate_info.empty:
-                            return 0
-                        
-                        rate_value = float(rate_info['rate_cost'].iloc[0])
-                        is_overtime = row.get('overtime', False)
-                        
-                        # Converter is_overtime para booleano
-                        if isinstance(is_overtime, (int, float)):
-                            is_overtime = bool(is_overtime)
-                        elif isinstance(is_overtime, str):
-                            is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                        
-                        # Multiplicar por 2 se for hora extra
-                        multiplicador = 2 if is_overtime else 1
-                        return float(row['hours']) * rate_value * multiplicador
-                    
-                    recursos_df['custo'] = recursos_df.apply(calcular_custo_entrada, axis=1)
+                    # Custo por registo pelo cost_engine (rate_value, rate em vigor na data, horas extra a dobrar),
+                    # a mesma regra dos totais do projeto
+                    recursos_df['custo'] = recursos_df['cost']
                     
                     # Coluna para indicar se é hora extra
-                    recursos_df['is_extra'] = recursos_df.apply(
-                        lambda row: bool(row.get('overtime', False)), 
-                        axis=1
-                    )
+                    recursos_df['is_extra'] = recursos_df['is_overtime']
                     
                     # Criar coluna de nome completo
                     recursos_df['nome_completo'] = recursos_df.apply(
@@ -831,11 +766,11 @@ def reports_page():
                 if not entries.empty:
                     try:
                         # Carregar tabelas de categorias e atividades
-                        categories_df = db_manager.query_to_df("SELECT * FROM task_categories")
-                        activities_df = db_manager.query_to_df("SELECT * FROM activities")
+                        categories_df = load_table('task_categories', db_manager)
+                        activities_df = load_table('activities', db_manager)
                         
                         # Adicionar informações de categoria e atividade às entradas de timesheet
-                        timesheet_completo = entries.copy()
+                        timesheet_completo = add_resolved_costs(entries, rate_resolver)
                         
                         # Juntar com categorias (se category_id existir nas entradas)
                         if 'category_id' in timesheet_completo.columns:
@@ -862,29 +797,8 @@ def reports_page():
                             how='left'
                         )
                         
-                        # Função para calcular custo baseado na rate do usuário e horas extras
-                        def calcular_custo(row):
-                            if pd.isna(row['rate_id']):
-                                return 0
-                            
-                            rate_info = rates_df[rates_df['rate_id'] == row['rate_id']]
-                            if rate_info.empty:
-                                return 0
-                            
-                            rate_value = float(rate_info['rate_cost'].iloc[0])
-                            is_overtime = row.get('overtime', False)
-                            
-                            # Converter is_overtime para booleano
-                            if isinstance(is_overtime, (int, float)):
-                                is_overtime = bool(is_overtime)
-                            elif isinstance(is_overtime, str):
-                                is_overtime = is_overtime.lower() in ('true', 't', 'yes', 'y', '1')
-                            
-                            # Multiplicar por 2 se for hora extra
-                            multiplicador = 2 if is_overtime else 1
-                            return float(row['hours']) * rate_value * multiplicador
-                        
-                        timesheet_completo['custo_calculado'] = timesheet_completo.apply(calcular_custo, axis=1)
+                        # Custo por registo pelo cost_engine, a mesma regra dos totais do projeto
+                        timesheet_completo['custo_calculado'] = timesheet_completo['cost']
                         
                         # Criar abas para análise por categoria e por atividade
                         cat_act_tab1, cat_act_tab2 = st.tabs(["Por Categoria", "Por Atividade"])
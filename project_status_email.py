@@ -14,7 +14,8 @@ from datetime import datetime, timedelta
 import calendar
 from fpdf import FPDF
 import base64
-from database_manager import DatabaseManager
+from page_data import get_db_manager, load_table
+from date_utils import parse_dates
 
 def project_status_email():
     """
@@ -23,7 +24,7 @@ def project_status_email():
     st.title("📧 Relatórios Executivos de Projetos")
     
     # Inicializar o gerenciador de banco de dados
-    db_manager = DatabaseManager()
+    db_manager = get_db_manager()
     
     # Verificar se o usuário é administrador
     if st.session_state.user_info['role'].lower() != 'admin':
@@ -32,17 +33,17 @@ def project_status_email():
     
     # Carregamento de dados
     try:
-        clients_df = db_manager.query_to_df("SELECT * FROM clients WHERE active = 1")
+        clients_df = load_table('clients', db_manager, active_only=True)
         projects_df = db_manager.query_to_df("SELECT * FROM projects WHERE status = 'active'")
-        users_df = db_manager.query_to_df("SELECT * FROM utilizadores WHERE active = 1")
-        timesheet_df = db_manager.query_to_df("SELECT * FROM timesheet")
-        groups_df = db_manager.query_to_df("SELECT * FROM groups WHERE active = 1")
-        rates_df = db_manager.query_to_df("SELECT * FROM rates")
+        users_df = load_table('utilizadores', db_manager, active_only=True)
+        timesheet_df = load_table('timesheet', db_manager)
+        groups_df = load_table('groups', db_manager, active_only=True)
+        rates_df = load_table('rates', db_manager)
         
         # Converter datas
-        timesheet_df['start_date'] = pd.to_datetime(timesheet_df['start_date'], format='mixed', errors='coerce')
-        projects_df['start_date'] = pd.to_datetime(projects_df['start_date'], format='mixed', errors='coerce')
-        projects_df['end_date'] = pd.to_datetime(projects_df['end_date'], format='mixed', errors='coerce')
+        timesheet_df['start_date'] = parse_dates(timesheet_df['start_date'], errors='coerce')
+        projects_df['start_date'] = parse_dates(projects_df['start_date'], errors='coerce')
+        projects_df['end_date'] = parse_dates(projects_df['end_date'], errors='coerce')
         
         # Obter tipos de projetos únicos
         project_types = sorted(projects_df['project_type'].unique().tolist())
@@ -0,0 +1,142 @@
+"""
+Cache em memória dos resultados de DatabaseManager.query_to_df.
+
+As entradas são indexadas por (base de dados, SQL, parâmetros) e guardadas com
+a versão dos dados em que foram lidas. A versão vem de `PRAGMA data_version`,
+lido numa conexão dedicada por ficheiro: o valor muda sempre que outra
+conexão (pool, db_utils, outros módulos ou outros processos) faz commit, pelo
+que qualquer escrita invalida as entradas antigas sem ser preciso instrumentar
+cada create/update/delete.
+
+A cache tem um limite de entradas e de memória, com remoção LRU.
+Pode ser desligada com a variável de ambiente RTIME_QUERY_CACHE=0.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+USE_QUERY_CACHE = os.environ.get('RTIME_QUERY_CACHE', '1') != '0'
+
+MAX_ENTRIES = 256
+MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+# Conexões usadas apenas para ler PRAGMA data_version (uma por ficheiro)
+_version_connections = {}
+_version_lock = threading.Lock()
+
+
+def get_data_version(db_file):
+    """Retorna a versão atual dos dados do ficheiro (muda a cada commit de outra conexão)"""
+    key = os.path.abspath(db_file)
+    with _version_lock:
+        conn = _version_connections.get(key)
+        if conn is None:
+            conn = sqlite3.connect(db_file, check_same_thread=False)
+            _version_connections[key] = conn
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def is_cacheable(query, db_file):
+    """Só se guardam em cache leituras (SELECT/WITH) de bases de dados em ficheiro"""
+    if db_file == ':memory:':
+        return False
+    return query.lstrip().split(None, 1)[0].upper() in ('SELECT', 'WITH')
+
+
+class QueryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        """Inicializa a cache com o número máximo de entradas e o limite de memória (bytes)"""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(db_file, query, params=None, parse_dates=False, table=None):
+        """Chave de cache: ficheiro, SQL normalizado (espaços), parâmetros, modo de datas e tabela"""
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        elif params is not None:
+            params = tuple(params)
+        return (os.path.abspath(db_file), ' '.join(query.split()), params, parse_dates, table)
+
+    def get(self, key, version):
+        """Retorna uma cópia do DataFrame em cache ou None (miss ou versão desatualizada)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_version, df, size = entry
+            if entry_version != version:
+                # Os dados mudaram desde que a entrada foi guardada
+                del self._entries[key]
+                self._bytes -= size
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Cópia para que o chamador possa alterar o DataFrame sem afetar a cache
+        return df.copy()
+
+    def put(self, key, version, df):
+        """Guarda uma cópia do DataFrame, removendo as entradas menos usadas se necessário"""
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes // 4:
+            # Resultados muito grandes ocupariam a cache quase toda
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (version, df.copy(), size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Esvazia a cache (os contadores são mantidos)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def reset_stats(self):
+        """Repõe a zero os contadores de hits/misses"""
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        """Retorna um dicionário com os contadores e a ocupação da cache"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'memory_mb': self._bytes / 1024 / 1024,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def entries(self):
+        """Lista (SQL, parâmetros, linhas, MB) das entradas, da mais recente para a mais antiga"""
+        with self._lock:
+            return [
+                (key[1], key[2], len(df), size / 1024 / 1024)
+                for key, (_, df, size) in reversed(self._entries.items())
+            ]
+
+
+# Instância partilhada por todos os DatabaseManager do processo
+query_cache = QueryCache()
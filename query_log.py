@@ -0,0 +1,247 @@
+"""
+Registo das queries executadas pela camada de acesso a dados.
+
+Cada statement executado pelo DatabaseManager e pelo db_utils fica registado
+num buffer circular em memória com: SQL normalizado (literais substituídos por
+?), forma dos parâmetros, tempo, linhas devolvidas, função que fez a chamada,
+página (função mais exterior do projeto na pilha) e sessão Streamlit.
+
+As queries mais lentas do que SLOW_QUERY_MS são escritas em app.log.
+Opcionalmente (RTIME_QUERY_LOG_DB=ficheiro.db) os registos são também gravados
+numa tabela query_log. Essa tabela fica num ficheiro à parte para que a
+escrita do log não invalide a cache de queries nem dispute o lock de
+timetracker.db.
+"""
+import os
+import re
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+import pandas as pd
+
+
+MAX_RECORDS = 5000
+SLOW_QUERY_MS = float(os.environ.get('RTIME_SLOW_QUERY_MS', '250'))
+QUERY_LOG_DB = os.environ.get('RTIME_QUERY_LOG_DB')
+QUERY_LOG_FLUSH_SIZE = 200
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Módulos da camada de dados: não contam como "quem chamou"
+_DB_LAYER_FILES = {
+    'database_manager.py', 'db_utils.py', 'query_log.py', 'query_cache.py', 'columnar_fetch.py',
+}
+
+_records = deque(maxlen=MAX_RECORDS)
+_recorded_count = 0  # total desde o arranque (o buffer só guarda os últimos MAX_RECORDS)
+_pending_rows = []
+_lock = threading.Lock()
+
+_slow_logger = None
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(query):
+    """Normaliza o SQL para agrupar queries iguais com valores diferentes
+
+    Ex.: "SELECT * FROM timesheet WHERE project_id = 12" e a versão com
+    project_id = 15 ficam ambas "SELECT * FROM timesheet WHERE project_id = ?".
+    """
+    normalized = ' '.join(query.split())
+    normalized = _STRING_LITERAL.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    return _IN_LIST.sub('(?, ...)', normalized)
+
+
+def params_shape(params, many=False):
+    """Descreve os parâmetros sem guardar os valores (ex.: '2 params', '500×3 params')"""
+    if params is None:
+        return ''
+    if many:
+        # Lista de tuplos (executemany) ou DataFrame (create_many)
+        width = params.shape[1] if hasattr(params, 'shape') else (len(params[0]) if len(params) else 0)
+        return f"{len(params)}×{width} params"
+    if isinstance(params, dict):
+        return f"{{{', '.join(sorted(params))}}}"
+    return f"{len(params)} params"
+
+
+def _caller():
+    """Retorna (função que chamou a camada de dados, página) a partir da pilha"""
+    frame = sys._getframe(1)
+    function = page = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PACKAGE_DIR):
+            base = os.path.basename(filename)
+            if base not in _DB_LAYER_FILES:
+                name = f"{base[:-3]}.{frame.f_code.co_name}"
+                if function is None:
+                    function = name
+                # main.py só escolhe a página; a página é a função mais exterior abaixo dele
+                if base != 'main.py' and frame.f_code.co_name != '<module>':
+                    page = name
+        frame = frame.f_back
+    return function or '', page or function or ''
+
+
+def current_session_id():
+    """Identificador da sessão Streamlit atual (None fora do Streamlit)"""
+    if 'streamlit' not in sys.modules:
+        return None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except (ImportError, TypeError):
+        return None
+    return ctx.session_id if ctx is not None else None
+
+
+def _get_slow_logger():
+    """Logger das queries lentas, escrito em app.log"""
+    global _slow_logger
+    if _slow_logger is None:
+        logger = logging.getLogger('rtime.slow_queries')
+        if not logger.handlers:
+            handler = logging.FileHandler('app.log', delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.WARNING)
+            logger.propagate = False
+        _slow_logger = logger
+    return _slow_logger
+
+
+def record_query(query, params, seconds, rows=None, many=False, cached=False):
+    """Regista uma query executada (ou servida pela cache)"""
+    function, page = _caller()
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'sql': normalize_sql(query),
+        'params': params_shape(params, many),
+        'ms': seconds * 1000,
+        'rows': rows,
+        'cached': cached,
+        'function': function,
+        'page': page,
+        'session_id': current_session_id(),
+    }
+
+    global _recorded_count
+    with _lock:
+        _records.append(record)
+        _recorded_count += 1
+        if QUERY_LOG_DB:
+            _pending_rows.append(record)
+            flush = len(_pending_rows) >= QUERY_LOG_FLUSH_SIZE
+        else:
+            flush = False
+
+    if record['ms'] >= SLOW_QUERY_MS and not cached:
+        _get_slow_logger().warning(
+            f"Query lenta ({record['ms']:.0f} ms, {rows} linhas) em {function} [{page}]: "
+            f"{record['sql']} {record['params']}"
+        )
+    if flush:
+        flush_query_log()
+
+
+@contextmanager
+def track_query(query, params=None, many=False):
+    """Mede o bloco e regista a query; o bloco pode preencher info['rows'] e info['cached']"""
+    info = {'rows': None, 'cached': False}
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record_query(query, params, time.perf_counter() - start, info['rows'], many, info['cached'])
+
+
+def flush_query_log(db_file=None):
+    """Grava na tabela query_log os registos pendentes (apenas com RTIME_QUERY_LOG_DB)"""
+    db_file = db_file or QUERY_LOG_DB
+    with _lock:
+        rows = list(_pending_rows)
+        _pending_rows.clear()
+    if not db_file or not rows:
+        return 0
+
+    try:
+        conn = sqlite3.connect(db_file, timeout=5)
+        try:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_log (
+                timestamp TEXT, sql TEXT, params TEXT, ms REAL, rows INTEGER,
+                cached INTEGER, function TEXT, page TEXT, session_id TEXT
+            )
+            """)
+            conn.executemany(
+                "INSERT INTO query_log VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (r['timestamp'], r['sql'], r['params'], r['ms'], r['rows'],
+                     int(r['cached']), r['function'], r['page'], r['session_id'])
+                    for r in rows
+                ]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Erro ao gravar query_log: {e}")
+        return 0
+    return len(rows)
+
+
+def query_count():
+    """Número total de queries registadas desde o arranque do processo"""
+    return _recorded_count
+
+
+def get_query_log(session_id=None):
+    """Retorna os registos do buffer como DataFrame (opcionalmente só de uma sessão)"""
+    with _lock:
+        records = list(_records)
+    df = pd.DataFrame(records, columns=[
+        'timestamp', 'sql', 'params', 'ms', 'rows', 'cached', 'function', 'page', 'session_id'
+    ])
+    if session_id is not None:
+        df = df[df['session_id'] == session_id]
+    return df
+
+
+def query_stats(session_id=None):
+    """Agrega o buffer por SQL normalizado: chamadas, tempo total/médio/máximo, linhas e páginas"""
+    df = get_query_log(session_id)
+    if df.empty:
+        return pd.DataFrame(columns=[
+            'sql', 'calls', 'cache_hits', 'total_ms', 'avg_ms', 'max_ms', 'rows', 'pages'
+        ])
+
+    df['executed_ms'] = df['ms'].where(~df['cached'], 0.0)
+    stats = df.groupby('sql').agg(
+        calls=('ms', 'size'),
+        cache_hits=('cached', 'sum'),
+        total_ms=('executed_ms', 'sum'),
+        max_ms=('ms', 'max'),
+        rows=('rows', 'sum'),
+        pages=('page', lambda pages: ', '.join(sorted(set(pages)))),
+    ).reset_index()
+    executed = (stats['calls'] - stats['cache_hits']).clip(lower=1)
+    stats['avg_ms'] = stats['total_ms'] / executed
+    return stats[['sql', 'calls', 'cache_hits', 'total_ms', 'avg_ms', 'max_ms', 'rows', 'pages']]
+
+
+def clear_query_log():
+    """Esvazia o buffer em memória"""
+    with _lock:
+        _records.clear()
@@ -0,0 +1,160 @@
+"""
+Resolução do custo/hora dos colaboradores para os relatórios de projeto.
+
+Em vez de duas queries por registo de horas (utilizadores -> rates), o mapa
+user_id -> rate_cost dos colaboradores envolvidos é carregado de uma vez, com
+uma query parametrizada por bloco de 500 utilizadores. Os períodos de
+user_rate_history desses utilizadores e os de rate_history das suas rates (a
+atual e as anteriores) são lidos da mesma forma, para valorizar cada registo
+com a rate em vigor na sua data.
+"""
+import sqlite3
+import pandas as pd
+
+from database_manager import DatabaseManager
+from cost_engine import add_entry_costs
+
+
+# Limite de parâmetros por statement no SQLite
+_IN_CHUNK_SIZE = 500
+
+
+class RateResolver:
+    def __init__(self, db_manager=None):
+        """Inicializa o resolvedor (o mapa de rates é carregado em load())"""
+        self.db = db_manager or DatabaseManager()
+        self._user_rates = {}
+        self._user_rate_ids = {}
+        self._loaded_users = set()
+        self._history_chunks = []
+        self._loaded_rate_ids = set()
+        self._assignment_chunks = []
+        self._assigned_rate_ids = set()
+
+    def load(self, user_ids):
+        """Carrega as rates (e o histórico) dos utilizadores indicados que ainda não estejam carregados"""
+        missing = sorted({int(user_id) for user_id in user_ids if pd.notna(user_id)} - self._loaded_users)
+
+        for start in range(0, len(missing), _IN_CHUNK_SIZE):
+            chunk = missing[start:start + _IN_CHUNK_SIZE]
+            placeholders = ', '.join(['?'] * len(chunk))
+            rows = self.db.fetch_all(
+                f"""
+                SELECT u.user_id, u.rate_id, r.rate_cost
+                FROM utilizadores u
+                LEFT JOIN rates r ON u.rate_id = r.rate_id
+                WHERE u.user_id IN ({placeholders})
+                """,
+                tuple(chunk)
+            )
+            for user_id, rate_id, rate_cost in rows:
+                if rate_id is not None:
+                    self._user_rate_ids[int(user_id)] = int(rate_id)
+                if rate_cost is not None:
+                    self._user_rates[int(user_id)] = float(rate_cost)
+            self._loaded_users.update(chunk)
+            self._load_assignments(chunk)
+
+        rate_ids = set(self._user_rate_ids.values()) | self._assigned_rate_ids
+        self._load_history(rate_ids - self._loaded_rate_ids)
+        return self
+
+    def _load_assignments(self, user_ids):
+        """Carrega os períodos de user_rate_history dos utilizadores indicados (no máximo _IN_CHUNK_SIZE)"""
+        placeholders = ', '.join(['?'] * len(user_ids))
+        try:
+            assignments = self.db.query_to_df(
+                f"SELECT user_id, rate_id, valid_from, valid_to FROM user_rate_history WHERE user_id IN ({placeholders})",
+                tuple(user_ids)
+            )
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            # Base de dados sem a migração de user_rate_history: usa-se a rate_id atual
+            print(f"Histórico de rates dos colaboradores indisponível: {e}")
+            return
+        self._assignment_chunks.append(assignments)
+        self._assigned_rate_ids.update(int(rate_id) for rate_id in assignments['rate_id'].dropna())
+
+    def _load_history(self, rate_ids):
+        """Carrega os períodos de rate_history das rates indicadas"""
+        rate_ids = sorted(rate_ids)
+        for start in range(0, len(rate_ids), _IN_CHUNK_SIZE):
+            chunk = rate_ids[start:start + _IN_CHUNK_SIZE]
+            placeholders = ', '.join(['?'] * len(chunk))
+            try:
+                history = self.db.query_to_df(
+                    f"SELECT rate_id, rate_cost, valid_from, valid_to FROM rate_history WHERE rate_id IN ({placeholders})",
+                    tuple(chunk)
+                )
+            except (sqlite3.Error, pd.errors.DatabaseError) as e:
+                # Base de dados sem a migração de rate_history: usa-se a rate atual
+                print(f"Histórico de rates indisponível: {e}")
+                break
+            self._history_chunks.append(history)
+            self._loaded_rate_ids.update(chunk)
+
+    @property
+    def user_rates(self):
+        """Mapa user_id -> rate_cost dos utilizadores já carregados (só os que têm rate)"""
+        return self._user_rates
+
+    @property
+    def users(self):
+        """DataFrame user_id/rate_id dos utilizadores já carregados"""
+        return pd.DataFrame(list(self._user_rate_ids.items()), columns=['user_id', 'rate_id'])
+
+    @property
+    def rate_history(self):
+        """Períodos de rate_history das rates já carregadas"""
+        if not self._history_chunks:
+            return pd.DataFrame(columns=['rate_id', 'rate_cost', 'valid_from', 'valid_to'])
+        return pd.concat(self._history_chunks, ignore_index=True)
+
+    @property
+    def user_rate_history(self):
+        """Períodos de user_rate_history dos utilizadores já carregados"""
+        if not self._assignment_chunks:
+            return pd.DataFrame(columns=['user_id', 'rate_id', 'valid_from', 'valid_to'])
+        return pd.concat(self._assignment_chunks, ignore_index=True)
+
+    def rate_for_user(self, user_id):
+        """Retorna o custo/hora do utilizador (None se não tiver rate)"""
+        if pd.isna(user_id):
+            return None
+        user_id = int(user_id)
+        if user_id not in self._loaded_users:
+            self.load([user_id])
+        return self._user_rates.get(user_id)
+
+
+def add_resolved_costs(entries, rate_resolver=None):
+    """Cópia dos registos com as colunas de custo do cost_engine (rates do rate_resolver)
+
+    Usa o rate_value do registo quando existe e, caso contrário, a rate do
+    colaborador em vigor na data do registo. As horas extra contam a dobrar.
+    """
+    rate_resolver = rate_resolver or RateResolver()
+    if not entries.empty:
+        rate_resolver.load(entries['user_id'].unique())
+    return add_entry_costs(
+        entries,
+        users_df=rate_resolver.users,
+        user_rates=rate_resolver.user_rates,
+        rate_history=rate_resolver.rate_history,
+        user_rate_history=rate_resolver.user_rate_history
+    )
+
+
+def calculate_entries_cost(entries, rate_resolver=None):
+    """Calcula o custo realizado de um conjunto de registos de horas (ver add_resolved_costs)
+
+    Returns:
+        Tuplo (custo_realizado, custo_horas_extras) em que custo_horas_extras é
+        o custo das horas extra antes de ser dobrado.
+    """
+    if entries.empty:
+        return 0, 0
+
+    costs = add_resolved_costs(entries, rate_resolver)
+    custo_realizado = float(costs['cost'].sum())
+    custo_horas_extras = float(costs.loc[costs['is_overtime'], 'base_cost'].sum())
+    return custo_realizado, custo_horas_extras
@@ -0,0 +1,161 @@
+"""
+Faturação agregada por equipa, ano e mês (tabela revenue_rollup).
+
+Os indicadores de faturação liam todas as faturas e, para cada meta anual,
+procuravam a equipa, filtravam as faturas pelos projetos da equipa e voltavam
+a somar o mês, o trimestre e o ano. A tabela revenue_rollup guarda a soma das
+faturas (pela data de pagamento) por equipa do projeto, ano e mês; os
+indicadores leem apenas as linhas do ano pedido.
+
+A tabela é criada e preenchida pela migração 6 e mantida pelo BillingManager
+(create/update/delete_invoice recalculam os meses afetados), pelo
+ProjectManager (mudar a equipa de um projeto ou apagá-lo reconstrói a tabela)
+e pelo ClientManager (apagar um cliente reconstrói a tabela).
+As funções de escrita recebem uma conexão SQLite e não fazem commit.
+"""
+import numpy as np
+import pandas as pd
+
+
+ROLLUP_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS revenue_rollup (
+    group_id INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    invoice_count INTEGER NOT NULL,
+    PRIMARY KEY (group_id, year, month)
+)
+"""
+
+# Mesmas junções que BillingManager.get_invoice: só contam faturas com cliente
+# e projeto existentes. Projetos sem equipa ficam no group_id 0.
+_ROLLUP_SELECT = """
+SELECT COALESCE(p.group_id, 0),
+       CAST(strftime('%Y', i.payment_date) AS INTEGER),
+       CAST(strftime('%m', i.payment_date) AS INTEGER),
+       SUM(i.amount), COUNT(*)
+FROM invoices i
+JOIN clients c ON i.client_id = c.client_id
+JOIN projects p ON i.project_id = p.project_id
+WHERE strftime('%Y', i.payment_date) IS NOT NULL{condition}
+GROUP BY 1, 2, 3
+"""
+
+# Limites das cores dos indicadores (% da meta)
+GREEN_THRESHOLD = 80
+YELLOW_THRESHOLD = 60
+
+
+def create_rollup_table(conn):
+    """Cria a tabela revenue_rollup se não existir"""
+    conn.execute(ROLLUP_TABLE_SQL)
+
+
+def invoice_months(conn, where="", params=()):
+    """Meses (ano, mês) das datas de pagamento das faturas que cumprem where"""
+    rows = conn.execute(
+        "SELECT DISTINCT CAST(strftime('%Y', payment_date) AS INTEGER), "
+        f"CAST(strftime('%m', payment_date) AS INTEGER) FROM invoices {where}",
+        params
+    ).fetchall()
+    return {(year, month) for year, month in rows if year is not None}
+
+
+def refresh_revenue_rollup(conn, months=None):
+    """Recalcula as linhas dos meses indicados (lista de (ano, mês)); None reconstrói a tabela toda"""
+    create_rollup_table(conn)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'invoices'").fetchone() is None:
+        return
+    if months is None:
+        conn.execute("DELETE FROM revenue_rollup")
+        conn.execute("INSERT INTO revenue_rollup " + _ROLLUP_SELECT.format(condition=""))
+        return
+
+    for year, month in sorted(set(months)):
+        conn.execute("DELETE FROM revenue_rollup WHERE year = ? AND month = ?", (year, month))
+        conn.execute(
+            "INSERT INTO revenue_rollup " + _ROLLUP_SELECT.format(
+                condition=" AND strftime('%Y', i.payment_date) = ? AND strftime('%m', i.payment_date) = ?"
+            ),
+            (f'{year:04d}', f'{month:02d}')
+        )
+
+
+def load_revenue_rollup(db_manager, year):
+    """Linhas do ano (group_id, month, amount); vazio se a tabela não existir"""
+    try:
+        return db_manager.query_to_df(
+            "SELECT group_id, month, amount FROM revenue_rollup WHERE year = ?", (year,)
+        )
+    except Exception as e:
+        print(f"Erro ao ler revenue_rollup: {e}")
+        return pd.DataFrame(columns=['group_id', 'month', 'amount'])
+
+
+def _color(percentage):
+    """Cor do indicador para cada percentagem da meta"""
+    return np.select(
+        [percentage >= GREEN_THRESHOLD, percentage >= YELLOW_THRESHOLD],
+        ['green', 'yellow'], default='red'
+    )
+
+
+def _percentage(revenue, target):
+    """revenue / target × 100, com 0 onde a meta não é positiva"""
+    return np.divide(revenue * 100, target, out=np.zeros(len(target)), where=target > 0)
+
+
+def compute_revenue_indicators(year_targets, rollup_df, groups_df, month):
+    """Faturação do mês, do trimestre e do ano face às metas de cada empresa
+
+    Args:
+        year_targets: metas anuais do ano (company_name, target_value)
+        rollup_df: linhas de load_revenue_rollup para o mesmo ano
+        groups_df: equipas (id, group_name), para associar company_name ao group_id
+        month: mês de referência
+
+    Returns:
+        DataFrame com uma linha por meta (pela ordem de year_targets).
+    """
+    quarter_months = range(((month - 1) // 3) * 3 + 1, ((month - 1) // 3) * 3 + 4)
+    rollup = rollup_df.assign(
+        monthly_revenue=rollup_df['amount'].where(rollup_df['month'] == month, 0.0),
+        quarterly_revenue=rollup_df['amount'].where(rollup_df['month'].isin(quarter_months), 0.0),
+        annual_revenue=rollup_df['amount'],
+    )
+    by_group = rollup.groupby('group_id')[['monthly_revenue', 'quarterly_revenue', 'annual_revenue']].sum()
+    all_groups = by_group.sum()
+
+    # Primeira equipa com o nome da empresa; empresas sem equipa (e "Todas")
+    # contam a faturação de todas as equipas, como antes
+    group_ids = groups_df.drop_duplicates('group_name').set_index('group_name')['id']
+    revenue = []
+    for company_name in year_targets['company_name']:
+        group_id = group_ids.get(company_name) if company_name != "Todas" else None
+        if group_id is None:
+            revenue.append(all_groups)
+        elif group_id in by_group.index:
+            revenue.append(by_group.loc[group_id])
+        else:
+            revenue.append(pd.Series(0.0, index=by_group.columns))
+
+    indicators = pd.DataFrame(revenue, columns=by_group.columns).reset_index(drop=True).fillna(0.0)
+    annual_target = pd.to_numeric(year_targets['target_value'], errors='coerce').fillna(0.0).to_numpy()
+    indicators.insert(0, 'company_name', year_targets['company_name'].to_numpy())
+    indicators['monthly_target'] = annual_target / 12
+    indicators['quarterly_target'] = annual_target / 4
+    indicators['annual_target'] = annual_target
+
+    for period in ('monthly', 'quarterly', 'annual'):
+        percentage = _percentage(indicators[f'{period}_revenue'].to_numpy(), indicators[f'{period}_target'].to_numpy())
+        indicators[f'{period}_percentage'] = percentage
+        indicators[f'{period}_color'] = _color(percentage)
+
+    return indicators[[
+        'company_name',
+        'monthly_target', 'monthly_revenue', 'monthly_percentage',
+        'quarterly_target', 'quarterly_revenue', 'quarterly_percentage',
+        'annual_target', 'annual_revenue', 'annual_percentage',
+        'monthly_color', 'quarterly_color', 'annual_color',
+    ]]
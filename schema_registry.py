@@ -0,0 +1,181 @@
+"""
+Registo declarativo dos tipos das colunas de cada tabela.
+
+O DatabaseManager.query_to_df usa este registo para construir DataFrames já
+tipados numa única passagem, em vez de testar e converter cada coluna com
+vários try/except a cada query.
+"""
+import numpy as np
+import pandas as pd
+# Importada com outro nome: o argumento parse_dates de coerce_dtypes tapava a função
+# (o TypeError era apanhado abaixo e as datas ficavam em texto sem aviso visível)
+from date_utils import parse_dates as parse_date_series
+
+
+# Tipos lógicos
+ID = 'Int32'           # identificadores (NULL -> 0, como sempre foi feito)
+FLOAT = 'float64'      # horas, custos, valores
+BOOL = 'bool'          # flags 0/1
+DATE = 'datetime'      # datas (convertidas apenas com parse_dates=True)
+CATEGORY = 'category'  # estados/tipos com poucos valores distintos (só com a tabela indicada)
+
+
+TABLE_SCHEMAS = {
+    'timesheet': {
+        'id': ID, 'user_id': ID, 'client_id': ID, 'project_id': ID,
+        'category_id': ID, 'task_id': ID, 'task_category_id': ID, 'activity_id': ID,
+        'hours': FLOAT, 'rate_value': FLOAT,
+        'billable': BOOL, 'overtime': BOOL,
+        'start_date': DATE, 'end_date': DATE, 'created_at': DATE, 'updated_at': DATE,
+    },
+    'utilizadores': {
+        'user_id': ID, 'rate_id': ID,
+        'active': BOOL,
+        'role': CATEGORY,
+    },
+    'projects': {
+        'project_id': ID, 'client_id': ID, 'group_id': ID,
+        'total_hours': FLOAT, 'total_cost': FLOAT, 'hourly_rate': FLOAT,
+        'horas_realizadas_mig': FLOAT, 'custo_realizado_mig': FLOAT,
+        'status': CATEGORY, 'project_type': CATEGORY,
+    },
+    'rates': {
+        'rate_id': ID,
+        'rate_cost': FLOAT,
+    },
+    'user_groups': {
+        'user_id': ID, 'group_id': ID,
+    },
+    'rate_history': {
+        'history_id': ID, 'rate_id': ID,
+        'rate_cost': FLOAT,
+        'valid_from': DATE, 'valid_to': DATE,
+    },
+    'groups': {
+        'id': ID,
+        'active': BOOL,
+    },
+    'clients': {
+        'client_id': ID, 'group_id': ID,
+        'active': BOOL,
+    },
+    'absences': {
+        'absence_id': ID, 'user_id': ID,
+        'approved': BOOL,
+        'absence_type': CATEGORY,
+    },
+    'invoices': {
+        'invoice_id': ID, 'client_id': ID, 'project_id': ID,
+        'amount': FLOAT,
+        'issue_date': DATE, 'payment_date': DATE,
+    },
+    'revenue_rollup': {
+        'group_id': ID,
+        'amount': FLOAT,
+    },
+    'collaborator_targets': {
+        'id': ID, 'user_id': ID,
+        'billable_hours_target': FLOAT, 'revenue_target': FLOAT,
+    },
+    'annual_targets': {
+        'target_id': ID,
+        'target_value': FLOAT,
+    },
+    'project_phases': {
+        'phase_id': ID, 'project_id': ID,
+        'total_hours': FLOAT, 'total_cost': FLOAT,
+    },
+    'travel_expenses': {
+        'travel_id': ID, 'user_id': ID, 'project_id': ID,
+    },
+}
+
+
+def _build_column_types(table_schemas):
+    """Junta os esquemas de todas as tabelas num único mapa coluna -> tipo
+
+    As queries com JOIN não dizem de que tabela vem cada coluna, por isso o
+    mesmo nome de coluna tem de ter o mesmo tipo em todas as tabelas. As
+    colunas CATEGORY ficam de fora: o mesmo nome (status, role, ...) existe
+    noutras tabelas e em aliases, e uma coluna categórica falha comparações e
+    operações .str com valores novos.
+    """
+    column_types = {}
+    for table_name, columns in table_schemas.items():
+        for column, kind in columns.items():
+            if kind == CATEGORY:
+                continue
+            existing = column_types.setdefault(column, kind)
+            if existing != kind:
+                raise ValueError(
+                    f"Coluna '{column}' declarada como {existing} e {kind} (tabela {table_name})"
+                )
+    return column_types
+
+
+COLUMN_TYPES = _build_column_types(TABLE_SCHEMAS)
+
+
+def get_column_type(column, table=None):
+    """Retorna o tipo declarado de uma coluna (ou o inferido pelo nome)
+
+    Com table, o esquema dessa tabela tem prioridade (incluindo CATEGORY).
+    """
+    kind = TABLE_SCHEMAS.get(table, {}).get(column) or COLUMN_TYPES.get(column)
+    if kind is None and (column == 'id' or column.endswith('_id')):
+        # Colunas de identificador não registadas (aliases, tabelas novas)
+        return 'Int64'
+    return kind
+
+
+def _to_id(series, dtype):
+    """Converte uma coluna de identificadores para inteiro nullable (NULL -> 0)"""
+    if series.dtype.kind == 'i':
+        return series.astype(dtype)
+    if series.dtype.kind != 'f':
+        series = pd.to_numeric(series, errors='coerce')
+    return series.fillna(0).astype(dtype)
+
+
+def _to_float(series):
+    """Converte uma coluna para float64"""
+    if series.dtype.kind in 'if':
+        return series.astype('float64')
+    if series.isna().all():
+        # Coluna só com NULL (ex.: rate_value em registos sem taxa própria)
+        return pd.Series(np.nan, index=series.index)
+    return pd.to_numeric(series, errors='coerce')
+
+
+def coerce_dtypes(df, parse_dates=False, table=None):
+    """Aplica os tipos declarados às colunas de um DataFrame vindo do SQLite
+
+    Args:
+        df: DataFrame devolvido por pd.read_sql_query
+        parse_dates: se True, converte também as colunas de data para datetime64
+        table: tabela de onde vêm todas as colunas (SELECT sem JOIN); só então
+            se aplicam os tipos CATEGORY
+    """
+    # Por posição: queries com JOIN podem devolver colunas repetidas (ex.: t.*, p.*)
+    for position, col in enumerate(df.columns):
+        kind = get_column_type(col, table)
+        if kind is None:
+            continue
+
+        series = df.iloc[:, position]
+        try:
+            if kind in ('Int32', 'Int64'):
+                df.isetitem(position, _to_id(series, kind))
+            elif kind == BOOL:
+                df.isetitem(position, series.astype('bool'))
+            elif kind == FLOAT:
+                df.isetitem(position, _to_float(series))
+            elif kind == CATEGORY:
+                df.isetitem(position, series.astype('category'))
+            elif kind == DATE and parse_dates:
+                df.isetitem(position, parse_date_series(series, errors='coerce'))
+        except (ValueError, TypeError) as e:
+            # Dados inesperados numa coluna não devem impedir a leitura
+            print(f"Erro ao converter coluna {col} para {kind}: {e}")
+
+    return df
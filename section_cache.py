@@ -0,0 +1,103 @@
+"""
+Resultados das secções do dashboard, calculados a pedido.
+
+O dashboard calculava os indicadores de colaboradores, projetos e faturação a
+cada re-execução do Streamlit, embora o utilizador veja uma secção de cada vez.
+Cada secção passa a ser calculada só quando é aberta e o resultado fica aqui,
+com a chave (secção, mês, ano, equipa) e a versão dos dados com que foi
+calculado (PRAGMA data_version, ver page_data.current_data_version).
+
+  - resultado com a versão atual: devolvido de imediato
+  - resultado de uma versão anterior: devolvido de imediato (marcado como
+    desatualizado) enquanto o novo cálculo corre numa thread em segundo plano
+  - sem resultado: calculado na hora (ou aguarda o cálculo já em curso)
+
+prefetch() agenda em segundo plano o cálculo de secções ainda não abertas.
+As funções de cálculo não podem chamar elementos do Streamlit (st.*), apenas
+ler dados.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class SectionCache:
+    def __init__(self, max_entries=64, max_workers=2):
+        """Inicializa a cache com o número máximo de resultados guardados e de cálculos em paralelo"""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # chave -> (versão, resultado, calculado_em)
+        self._pending = {}             # chave -> Future do cálculo em curso
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dashboard-section')
+
+    def _store(self, key, version, result):
+        """Guarda um resultado, descartando os menos usados acima de max_entries"""
+        with self._lock:
+            self._entries[key] = (version, result, datetime.now())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _compute(self, key, version, compute):
+        """Calcula e guarda o resultado (corre na thread de segundo plano)"""
+        try:
+            result = compute()
+            self._store(key, version, result)
+            return result
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _submit(self, key, version, compute):
+        """Agenda o cálculo em segundo plano, se ainda não estiver em curso (chamar com o lock)"""
+        future = self._pending.get(key)
+        if future is None:
+            future = self._executor.submit(self._compute, key, version, compute)
+            future.add_done_callback(self._report_error)
+            self._pending[key] = future
+        return future
+
+    @staticmethod
+    def _report_error(future):
+        """Regista erros dos cálculos em segundo plano (o resultado anterior continua em uso)"""
+        error = future.exception()
+        if error is not None:
+            print(f"Erro ao calcular secção do dashboard: {error}")
+
+    def get(self, key, version, compute):
+        """Resultado da secção como (resultado, calculado_em, desatualizado)
+
+        Args:
+            key: (secção, mês, ano, equipa)
+            version: versão atual dos dados
+            compute: função sem argumentos que calcula o resultado
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[0] != version:
+                    self._submit(key, version, compute)
+                return entry[1], entry[2], entry[0] != version
+            future = self._submit(key, version, compute)
+
+        # Primeira abertura: aguardar o cálculo (os erros chegam ao chamador)
+        result = future.result()
+        return result, datetime.now(), False
+
+    def prefetch(self, key, version, compute):
+        """Agenda o cálculo em segundo plano se não houver resultado para a versão atual"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self._submit(key, version, compute)
+
+    def clear(self):
+        """Descarta todos os resultados guardados"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Instância partilhada por todas as sessões
+section_cache = SectionCache()
@@ -0,0 +1,330 @@
+"""
+Importação em massa de registos de horas a partir de ficheiros CSV ou XLSX.
+
+O ficheiro é lido em blocos. Em cada bloco os utilizadores, projetos e
+categorias são resolvidos contra dicionários carregados uma única vez da base
+de dados, as datas são normalizadas para o formato canónico e as linhas
+válidas são inseridas com TimesheetManagerSQL.create_many. As linhas
+rejeitadas são devolvidas com o número da linha no ficheiro e o motivo.
+
+Uso em linha de comandos:
+    python timesheet_import.py horas.xlsx
+    python timesheet_import.py horas.csv --dry-run --rejects rejeitados.csv
+"""
+import os
+import sys
+import time
+import pandas as pd
+
+from database_manager import DatabaseManager, TimesheetManagerSQL
+from date_utils import DATETIME_FORMAT
+
+
+CHUNK_SIZE = 5000
+
+# Nomes aceites no cabeçalho do ficheiro para cada campo (comparação sem maiúsculas)
+COLUMN_ALIASES = {
+    'user': ['user_id', 'email', 'utilizador', 'colaborador', 'user'],
+    'project': ['project_id', 'projeto', 'project', 'project_name'],
+    'category': ['category_id', 'categoria', 'task_category', 'category'],
+    'task_id': ['task_id', 'atividade_id', 'activity_id'],
+    'start_date': ['start_date', 'data início', 'data inicio', 'início', 'inicio', 'data'],
+    'end_date': ['end_date', 'data fim', 'fim'],
+    'hours': ['hours', 'horas'],
+    'billable': ['billable', 'faturável', 'faturavel'],
+    'overtime': ['overtime', 'horas extra', 'hora extra'],
+    'description': ['description', 'descrição', 'descricao'],
+}
+
+TRUE_VALUES = {'1', 'true', 't', 'sim', 's', 'yes', 'y', 'x'}
+
+# Formatos de data testados por ordem (formato de formato fixo é muito mais rápido
+# que o parser genérico). Datas com barra são sempre dia/mês, como no Excel PT.
+IMPORT_DATE_FORMATS = ['ISO8601', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y', '%d-%m-%Y %H:%M', '%d-%m-%Y']
+
+
+def build_lookups(db=None):
+    """Carrega uma única vez os dicionários de utilizadores, projetos e categorias"""
+    db = db or DatabaseManager()
+
+    users_df = db.query_to_df("SELECT user_id, email, First_Name, Last_Name FROM utilizadores")
+    projects_df = db.query_to_df("SELECT project_id, project_name, client_id FROM projects")
+    try:
+        categories_df = db.query_to_df("SELECT task_category_id, task_category FROM task_categories")
+    except Exception:
+        categories_df = pd.DataFrame(columns=['task_category_id', 'task_category'])
+
+    users = {}
+    for user_id, email, first_name, last_name in users_df.itertuples(index=False):
+        users[str(int(user_id))] = int(user_id)
+        if email:
+            users[str(email).strip().lower()] = int(user_id)
+        users[f"{first_name} {last_name}".strip().lower()] = int(user_id)
+
+    projects = {}
+    project_clients = {}
+    for project_id, project_name, client_id in projects_df.itertuples(index=False):
+        projects[str(int(project_id))] = int(project_id)
+        if project_name:
+            projects[str(project_name).strip().lower()] = int(project_id)
+        project_clients[int(project_id)] = int(client_id)
+
+    categories = {}
+    for category_id, category_name in categories_df.itertuples(index=False):
+        categories[str(int(category_id))] = int(category_id)
+        if category_name:
+            categories[str(category_name).strip().lower()] = int(category_id)
+
+    return {
+        'users': users,
+        'projects': projects,
+        'project_clients': project_clients,
+        'categories': categories,
+    }
+
+
+def _rename_columns(df):
+    """Renomeia as colunas do ficheiro para os campos internos usando COLUMN_ALIASES"""
+    normalized = {str(col).strip().lower(): col for col in df.columns}
+    rename = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                rename[normalized[alias]] = field
+                break
+    return df.rename(columns=rename)
+
+
+def _lookup_keys(series):
+    """Normaliza uma coluna de referências (ids, nomes, emails) para pesquisa nos dicionários"""
+    keys = series.astype('string').str.strip().str.lower()
+    # ids lidos como float pelo Excel/CSV (ex.: "12.0")
+    return keys.str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+
+
+def _to_bool(series):
+    """Converte valores Sim/Não, 1/0, True/False para booleano"""
+    return series.astype('string').str.strip().str.lower().isin(TRUE_VALUES)
+
+
+def _parse_import_dates(series):
+    """Converte uma coluna de datas do ficheiro, tentando primeiro os formatos fixos"""
+    if series.dtype.kind == 'M':
+        return series
+    parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    pending = series.notna()
+    for fmt in IMPORT_DATE_FORMATS:
+        if not pending.any():
+            return parsed
+        values = series[pending]
+        if fmt != 'ISO8601':
+            values = values.astype(str)
+        converted = pd.to_datetime(values, format=fmt, errors='coerce')
+        parsed[pending] = converted
+        pending = pending & parsed.isna()
+    if pending.any():
+        parsed[pending] = pd.to_datetime(
+            series[pending].astype(str), format='mixed', dayfirst=True, errors='coerce'
+        )
+    return parsed
+
+
+def validate_chunk(df, lookups, first_row=2):
+    """Valida e normaliza um bloco do ficheiro
+
+    Args:
+        df: bloco do ficheiro já lido para DataFrame
+        lookups: dicionários devolvidos por build_lookups
+        first_row: número (no ficheiro) da primeira linha do bloco
+
+    Returns:
+        Tuplo (registos_validos, rejeitados): dois DataFrames, o primeiro
+        pronto para create_many e o segundo com as colunas 'linha' e 'motivo'
+        seguidas das colunas originais do ficheiro.
+    """
+    original = df.reset_index(drop=True)
+    df = _rename_columns(original)
+    row_numbers = pd.Series(range(first_row, first_row + len(df)))
+    reasons = pd.Series('', index=df.index, dtype='object')
+
+    def reject(mask, reason):
+        mask = mask & (reasons == '')
+        reasons[mask] = reason
+
+    for field in ('user', 'project', 'start_date'):
+        if field not in df.columns:
+            reasons[:] = f"coluna obrigatória em falta: {field}"
+            rejected = pd.DataFrame({'linha': row_numbers, 'motivo': reasons})
+            return pd.DataFrame(), rejected
+
+    user_ids = _lookup_keys(df['user']).map(lookups['users'])
+    reject(user_ids.isna(), "utilizador desconhecido")
+
+    project_ids = _lookup_keys(df['project']).map(lookups['projects'])
+    reject(project_ids.isna(), "projeto desconhecido")
+
+    if 'category' in df.columns:
+        category_ids = _lookup_keys(df['category']).map(lookups['categories'])
+        reject(category_ids.isna() & df['category'].notna(), "categoria desconhecida")
+    else:
+        category_ids = pd.Series(pd.NA, index=df.index)
+
+    start_dates = _parse_import_dates(df['start_date'])
+    reject(start_dates.isna(), "data de início inválida")
+
+    end_dates = (
+        _parse_import_dates(df['end_date']) if 'end_date' in df.columns
+        else pd.Series(pd.NaT, index=df.index)
+    )
+    hours = (
+        pd.to_numeric(df['hours'], errors='coerce') if 'hours' in df.columns
+        else pd.Series(float('nan'), index=df.index)
+    )
+
+    # Completar horas a partir das datas, ou a data de fim a partir das horas
+    hours = hours.fillna((end_dates - start_dates).dt.total_seconds() / 3600)
+    end_dates = end_dates.fillna(start_dates + pd.to_timedelta(hours, unit='h'))
+    reject(hours.isna() | (hours <= 0) | (hours > 24), "horas inválidas")
+    reject(end_dates < start_dates, "data de fim anterior à data de início")
+
+    valid = reasons == ''
+    entries = pd.DataFrame({
+        'user_id': user_ids[valid].astype('int64'),
+        'project_id': project_ids[valid].astype('int64'),
+        'client_id': project_ids[valid].astype('int64').map(lookups['project_clients']),
+        'start_date': start_dates[valid].dt.strftime(DATETIME_FORMAT),
+        'end_date': end_dates[valid].dt.strftime(DATETIME_FORMAT),
+        'hours': hours[valid].astype('float64'),
+        'billable': _to_bool(df['billable'][valid]).astype(int) if 'billable' in df.columns else 0,
+        'overtime': _to_bool(df['overtime'][valid]).astype(int) if 'overtime' in df.columns else 0,
+        'description': df['description'][valid].fillna('').astype(str) if 'description' in df.columns else '',
+    })
+    if 'category' in df.columns:
+        entries['category_id'] = category_ids[valid].astype('Int64')
+    if 'task_id' in df.columns:
+        entries['task_id'] = pd.to_numeric(df['task_id'][valid], errors='coerce').astype('Int64')
+
+    rejected = original[~valid].copy()
+    rejected.insert(0, 'motivo', reasons[~valid])
+    rejected.insert(0, 'linha', row_numbers[~valid])
+    return entries, rejected
+
+
+def read_file_chunks(source, chunk_size=CHUNK_SIZE, file_name=None):
+    """Lê um ficheiro CSV ou XLSX em blocos de chunk_size linhas
+
+    Args:
+        source: caminho ou objeto tipo ficheiro (ex.: st.file_uploader)
+        file_name: nome usado para decidir o formato quando source não é um caminho
+    """
+    name = (file_name or getattr(source, 'name', None) or str(source)).lower()
+
+    if name.endswith('.csv'):
+        # Separador detetado automaticamente (',' ou ';' nos ficheiros exportados do Excel PT)
+        yield from pd.read_csv(source, chunksize=chunk_size, sep=None, engine='python', dtype=str)
+        return
+
+    if not name.endswith(('.xlsx', '.xlsm')):
+        raise ValueError(f"Formato de ficheiro não suportado: {name}")
+
+    # O openpyxl em modo read_only lê as linhas em streaming, sem carregar a folha inteira
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def import_file(source, file_name=None, chunk_size=CHUNK_SIZE, dry_run=False, progress_callback=None,
+                db_file='timetracker.db'):
+    """Importa registos de horas de um ficheiro CSV/XLSX
+
+    Args:
+        source: caminho ou objeto tipo ficheiro
+        file_name: nome do ficheiro (quando source é um buffer)
+        chunk_size: linhas por bloco de leitura/transação
+        dry_run: apenas valida, sem escrever na base de dados
+        progress_callback: função opcional chamada com (linhas_lidas, inseridas, rejeitadas)
+        db_file: base de dados de destino
+
+    Returns:
+        Dicionário com 'inserted', 'rejected' (DataFrame), 'rows' e 'seconds'
+    """
+    start_time = time.perf_counter()
+    timesheet_manager = TimesheetManagerSQL(db_file)
+    lookups = build_lookups(timesheet_manager.db)
+
+    inserted = 0
+    total_rows = 0
+    rejected_chunks = []
+    next_row = 2  # linha 1 é o cabeçalho
+
+    for chunk in read_file_chunks(source, chunk_size, file_name):
+        entries, rejected = validate_chunk(chunk, lookups, first_row=next_row)
+        next_row += len(chunk)
+        total_rows += len(chunk)
+
+        if not entries.empty and not dry_run:
+            inserted += timesheet_manager.create_many(entries, chunk_size=chunk_size)
+        if not rejected.empty:
+            rejected_chunks.append(rejected)
+
+        if progress_callback:
+            progress_callback(total_rows, inserted, sum(len(r) for r in rejected_chunks))
+
+    rejected_df = (
+        pd.concat(rejected_chunks, ignore_index=True) if rejected_chunks
+        else pd.DataFrame(columns=['linha', 'motivo'])
+    )
+
+    return {
+        'rows': total_rows,
+        'inserted': inserted,
+        'rejected': rejected_df,
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0].startswith('--'):
+        print(__doc__)
+        sys.exit(1)
+
+    file_path = args[0]
+    dry_run = '--dry-run' in args
+    rejects_path = args[args.index('--rejects') + 1] if '--rejects' in args else None
+
+    if not os.path.exists(file_path):
+        print(f"Ficheiro não encontrado: {file_path}")
+        sys.exit(1)
+
+    result = import_file(file_path, dry_run=dry_run)
+
+    action = "validados" if dry_run else "inseridos"
+    print(f"{result['rows']} linhas lidas em {result['seconds']:.1f}s: "
+          f"{result['rows'] - len(result['rejected'])} {action}, {len(result['rejected'])} rejeitados")
+
+    if not result['rejected'].empty:
+        if rejects_path:
+            result['rejected'].to_csv(rejects_path, index=False)
+            print(f"Linhas rejeitadas guardadas em {rejects_path}")
+        else:
+            print(result['rejected'][['linha', 'motivo']].head(20).to_string(index=False))
+
+    sys.exit(0)
@@ -0,0 +1,56 @@
+"""
+Cache em memória (por processo) dos perfis de utilizador.
+
+Evita voltar à base de dados para obter a linha de `utilizadores` de um
+utilizador já autenticado. As entradas expiram ao fim de `ttl_seconds` e são
+invalidadas explicitamente sempre que o UserManager altera um utilizador.
+"""
+import threading
+import time
+
+
+class UserProfileCache:
+    def __init__(self, ttl_seconds=300):
+        """Inicializa a cache com o tempo de vida (em segundos) de cada entrada"""
+        self.ttl_seconds = ttl_seconds
+        self._by_email = {}
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        """Retorna uma cópia do perfil em cache para o email, ou None se não existir/expirou"""
+        with self._lock:
+            entry = self._by_email.get(email)
+            if entry is None:
+                return None
+            stored_at, profile = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._by_email[email]
+                return None
+            return dict(profile)
+
+    def put(self, profile):
+        """Guarda o perfil (dicionário com pelo menos 'email') na cache"""
+        email = profile.get('email')
+        if not email:
+            return
+        with self._lock:
+            self._by_email[email] = (time.monotonic(), dict(profile))
+
+    def invalidate(self, user_id=None, email=None):
+        """Remove da cache o utilizador indicado por user_id e/ou email"""
+        with self._lock:
+            if email is not None:
+                self._by_email.pop(email, None)
+            if user_id is not None:
+                for cached_email, (_, profile) in list(self._by_email.items()):
+                    if profile.get('user_id') == user_id:
+                        del self._by_email[cached_email]
+
+    def clear(self):
+        """Esvazia a cache"""
+        with self._lock:
+            self._by_email.clear()
+
+
+# Instância partilhada por todo o processo (Auth e UserManager)
+user_profile_cache = UserProfileCache()